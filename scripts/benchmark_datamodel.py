@@ -0,0 +1,148 @@
+#!/usr/bin/env python
+"""
+Benchmark the pydantic datamodel against the trusted-source fast path.
+
+Builds and serializes synthetic ``SoilLayer`` rows with the default path
+(constructor plus ``model_dump``) and with ``fao_soils.fastpath``
+(``construct_many``, ``validate_many`` and ``dump_many``), and reports rows per
+second for each.
+
+The generated ``model_serializer`` passes ``SerializationInfo`` on to its
+handler, which newer pydantic releases reject, so ``model_dump`` on the generated
+classes fails. The ``model_dump`` baseline therefore uses a subclass whose
+serializer does the same per-instance work (copy, then clear empty lists) but
+calls the handler the supported way. Any failing row aborts the benchmark
+instead of printing a partial table.
+
+Usage:
+    uv run python scripts/benchmark_datamodel.py [n_rows]
+
+Default: 100,000 rows
+"""
+
+import random
+import sys
+import time
+from typing import Any, Callable, Dict, List
+
+from pydantic import SerializationInfo, SerializerFunctionWrapHandler, model_serializer
+
+from fao_soils.datamodel.fao_soils_pydantic import SoilLayer
+from fao_soils.fastpath import construct_many, dump_many, validate_many
+
+LAYERS = [("D1", 0, 20), ("D2", 20, 40), ("D3", 40, 60), ("D4", 60, 80),
+          ("D5", 80, 100), ("D6", 100, 150), ("D7", 150, 200)]
+TEXTURES = ["CLAY_HEAVY", "SILTY_CLAY", "CLAY_LOAM", "SILT_LOAM", "LOAM"]
+
+
+class _DumpableSoilLayer(SoilLayer):
+    """SoilLayer with the generated wrap serializer fixed for current pydantic."""
+
+    @model_serializer(mode="wrap", when_used="unless-none")
+    def treat_empty_lists_as_none(
+            self, handler: SerializerFunctionWrapHandler,
+            info: SerializationInfo) -> Dict[str, Any]:
+        if info.exclude_none:
+            _instance = self.model_copy()
+            for field, field_info in type(_instance).model_fields.items():
+                if getattr(_instance, field) == [] and not field_info.is_required():
+                    setattr(_instance, field, None)
+        else:
+            _instance = self
+        return handler(_instance)
+
+
+def make_rows(n_rows: int, seed: int = 0) -> List[Dict[str, Any]]:
+    """
+    Generate synthetic SoilLayer rows shaped like HWSD2_LAYERS.
+
+    Args:
+        n_rows: Number of rows
+        seed: Random seed
+
+    Returns:
+        List of dicts keyed by slot name
+    """
+    rng = random.Random(seed)
+    rows = []
+    for i in range(n_rows):
+        layer, topdep, botdep = LAYERS[i % len(LAYERS)]
+        sand = round(rng.uniform(0, 80), 1)
+        clay = round(rng.uniform(0, 100 - sand), 1)
+        rows.append({
+            "id": i + 1,
+            "hwsd2_smu_id": 1 + i // 70,
+            "sequence": 1 + (i // 7) % 10,
+            "share": 10.0,
+            "drainage": "MW",
+            "layer": layer,
+            "topdep": topdep,
+            "botdep": botdep,
+            "sand": sand,
+            "silt": round(100 - sand - clay, 1),
+            "clay": clay,
+            "texture_usda": rng.choice(TEXTURES),
+            "bulk": round(rng.uniform(1.0, 1.8), 2),
+            "org_carbon": round(rng.uniform(0, 5), 2),
+            "ph_water": round(rng.uniform(4, 9), 1),
+        })
+    return rows
+
+
+def _rate(label: str, n_rows: int, func: Callable[[], Any]) -> float:
+    start = time.perf_counter()
+    func()
+    elapsed = time.perf_counter() - start
+    rate = n_rows / elapsed
+    print(f"  {label:<38} {elapsed:8.3f} s  {rate:12,.0f} rows/s")
+    return rate
+
+
+def run(n_rows: int = 100_000) -> Dict[str, float]:
+    """
+    Run the benchmark and print rows per second for each path.
+
+    Args:
+        n_rows: Number of synthetic rows
+
+    Returns:
+        Mapping of benchmark label to rows per second
+    """
+    rows = make_rows(n_rows)
+    print(f"SoilLayer, {n_rows:,} rows")
+
+    results = {}
+    print("Construct:")
+    validated = []
+    results["constructor"] = _rate(
+        "SoilLayer(**row)", n_rows, lambda: validated.extend(SoilLayer(**row) for row in rows)
+    )
+    results["validate_many"] = _rate("validate_many (TypeAdapter)", n_rows, lambda: validate_many(SoilLayer, rows))
+    trusted = []
+    results["construct_many"] = _rate(
+        "construct_many (no validation)", n_rows, lambda: trusted.extend(construct_many(SoilLayer, rows))
+    )
+
+    print("Serialize:")
+    dumpable = [_DumpableSoilLayer.model_construct(_fields_set=layer.model_fields_set, **layer.__dict__)
+                for layer in validated]
+    expected = []
+    results["model_dump"] = _rate(
+        "model_dump(exclude_none=True)", n_rows,
+        lambda: expected.extend(layer.model_dump(exclude_none=True) for layer in dumpable),
+    )
+    dumped = []
+    results["dump_many"] = _rate("dump_many (no copies)", n_rows, lambda: dumped.extend(dump_many(trusted)))
+    if dumped != expected:
+        raise RuntimeError("dump_many output differs from model_dump")
+    return results
+
+
+def main():
+    """Main entry point for command-line usage."""
+    n_rows = int(sys.argv[1]) if len(sys.argv) > 1 else 100_000
+    run(n_rows)
+
+
+if __name__ == "__main__":
+    main()
@@ -13,19 +13,28 @@ The HWSD includes:
 Downloads from: https://www.fao.org/soils-portal/data-hub/soil-maps-and-databases/harmonized-world-soil-database-v20/en/
 """
 
+import fnmatch
 import hashlib
+import json
 import logging
+import os
 import sqlite3
 import subprocess
 import tempfile
+import threading
 import zipfile
+from concurrent.futures import ThreadPoolExecutor
+from http.client import HTTPException
 from pathlib import Path
-from typing import Optional
-from urllib.request import urlopen, urlretrieve
+from typing import Callable, Iterator, Optional
+from urllib.error import HTTPError, URLError
+from urllib.request import Request, urlopen
 from urllib.parse import urlparse
 
 import pandas as pd
 
+from hwsd2_extractor import bil_pixel_format, parse_bil_header
+
 # Configure logging
 logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(levelname)s - %(message)s')
 logger = logging.getLogger(__name__)
@@ -43,6 +52,347 @@ EXPECTED_CHECKSUMS = {
     "cc3823en.pdf": None  # Placeholder - would need actual checksum
 }
 
+# Downloads are read, hashed and written in blocks of this many bytes
+DOWNLOAD_BLOCK_SIZE = 1024 * 1024
+
+# Records URL, size, SHA256 and HTTP validators of each completed download
+MANIFEST_FILENAME = "manifest.json"
+
+# Raster formats extract_zip can convert a BIL member to while extracting
+RASTER_FORMATS = ("npy",)
+
+# Rows of a BIL raster decompressed and written per block during conversion
+RASTER_BLOCK_ROWS = 256
+
+# Number of rows parsed from an mdb-export stream at a time. Peak memory during
+# conversion is bounded by one chunk rather than by the size of the table.
+MDB_EXPORT_CHUNKSIZE = 50_000
+
+# Default number of tables exported concurrently (one mdb-export process each)
+MDB_EXPORT_WORKERS = os.cpu_count() or 1
+
+# Widening order for column types seen across chunks of the same table
+_DTYPE_RANK = {"BOOLEAN": 0, "BIGINT": 1, "DOUBLE": 2, "VARCHAR": 3}
+
+
+def _column_type(series: pd.Series) -> str:
+    """Map a pandas column to the SQL type used to store it."""
+    if pd.api.types.is_bool_dtype(series):
+        return "BOOLEAN"
+    if pd.api.types.is_integer_dtype(series):
+        return "BIGINT"
+    if pd.api.types.is_float_dtype(series):
+        return "DOUBLE"
+    return "VARCHAR"
+
+
+def _conform_chunk(chunk: pd.DataFrame, column_types: dict[str, str]) -> dict[str, str]:
+    """
+    Reconcile the column types of a chunk with those of earlier chunks.
+
+    pandas infers types per chunk, so a column that only held integers in the
+    first chunk may hold floats or text in a later one. Types only ever widen
+    (BOOLEAN < BIGINT < DOUBLE < VARCHAR); the chunk is cast in place to the
+    widened types and ``column_types`` is updated.
+
+    Args:
+        chunk: DataFrame parsed from the export stream (modified in place)
+        column_types: Running SQL type per column, updated in place
+
+    Returns:
+        Mapping of columns whose type was widened by this chunk to the new type
+    """
+    widened = {}
+    for column in chunk.columns:
+        chunk_type = _column_type(chunk[column])
+        current = column_types.get(column)
+        if current is None:
+            column_types[column] = chunk_type
+            continue
+        if _DTYPE_RANK[chunk_type] > _DTYPE_RANK[current]:
+            column_types[column] = chunk_type
+            widened[column] = chunk_type
+        target = column_types[column]
+        if target == chunk_type:
+            continue
+        if target == "VARCHAR":
+            values = chunk[column]
+            chunk[column] = values.astype("string").where(values.notna(), None)
+        elif target == "DOUBLE":
+            chunk[column] = chunk[column].astype("float64")
+        elif target == "BIGINT":
+            chunk[column] = chunk[column].astype("Int64")
+    return widened
+
+
+class SQLiteSink:
+    """
+    Write streamed table chunks into a SQLite database.
+
+    Sinks may be fed several tables concurrently; writes to the database are
+    serialized with a lock while parsing continues in the other workers.
+
+    Examples:
+        >>> sink = SQLiteSink(Path("HWSD2.db"))
+        >>> sink.begin_table("D_DRAINAGE")
+        >>> sink.write_chunk("D_DRAINAGE", chunk, widened={})
+        >>> sink.close()
+    """
+
+    raw = False
+
+    def __init__(self, path: Path):
+        self.path = Path(path)
+        self.conn = sqlite3.connect(self.path, check_same_thread=False)
+        self._lock = threading.Lock()
+        self._started: set[str] = set()
+
+    def begin_table(self, table_name: str) -> None:
+        self._started.discard(table_name)
+
+    def write_chunk(self, table_name: str, chunk: pd.DataFrame, widened: dict[str, str]) -> None:
+        # SQLite is dynamically typed, so widened columns need no schema change
+        if_exists = "append" if table_name in self._started else "replace"
+        with self._lock:
+            chunk.to_sql(table_name, self.conn, if_exists=if_exists, index=False)
+        self._started.add(table_name)
+
+    def end_table(self, table_name: str, row_count: int) -> None:
+        with self._lock:
+            self.conn.commit()
+
+    def close(self) -> None:
+        self.conn.close()
+
+
+class DuckDBSink:
+    """
+    Write streamed table chunks into a DuckDB database.
+
+    The first chunk of a table creates it; later chunks are appended, and
+    columns are altered in place when a chunk widens their type.
+
+    Examples:
+        >>> sink = DuckDBSink(Path("hwsd2.ddb"))
+        >>> sink.begin_table("HWSD2_LAYERS")
+        >>> sink.write_chunk("HWSD2_LAYERS", chunk, widened={})
+        >>> sink.close()
+    """
+
+    raw = False
+
+    def __init__(self, path: Path):
+        import duckdb
+
+        self.path = Path(path)
+        self.conn = duckdb.connect(str(self.path))
+        self._lock = threading.Lock()
+        self._started: set[str] = set()
+
+    def begin_table(self, table_name: str) -> None:
+        self._started.discard(table_name)
+
+    def write_chunk(self, table_name: str, chunk: pd.DataFrame, widened: dict[str, str]) -> None:
+        with self._lock:
+            self.conn.register("_mdb_chunk", chunk)
+            try:
+                if table_name not in self._started:
+                    self.conn.execute(f'CREATE OR REPLACE TABLE "{table_name}" AS SELECT * FROM _mdb_chunk')
+                    self._started.add(table_name)
+                    return
+                for column, sql_type in widened.items():
+                    self.conn.execute(f'ALTER TABLE "{table_name}" ALTER "{column}" TYPE {sql_type}')
+                self.conn.execute(f'INSERT INTO "{table_name}" SELECT * FROM _mdb_chunk')
+            finally:
+                self.conn.unregister("_mdb_chunk")
+
+    def end_table(self, table_name: str, row_count: int) -> None:
+        pass
+
+    def close(self) -> None:
+        self.conn.close()
+
+
+class CSVSink:
+    """
+    Write each table's mdb-export output verbatim to ``<table>.csv``.
+
+    Unlike the other sinks this one receives the raw text of the export
+    stream as it is read, so the files are byte-for-byte what mdb-export
+    produces and need no re-encoding from DataFrames.
+
+    Examples:
+        >>> sink = CSVSink(Path("HWSD2_csv"))
+        >>> sink.begin_table("D_DRAINAGE")
+        >>> sink.write_raw("D_DRAINAGE", 'SYMBOL,CODE,VALUE\\n')
+        >>> sink.end_table("D_DRAINAGE", 0)
+    """
+
+    raw = True
+
+    def __init__(self, output_dir: Path):
+        self.output_dir = Path(output_dir)
+        self.output_dir.mkdir(exist_ok=True, parents=True)
+        self._files = {}
+
+    def begin_table(self, table_name: str) -> None:
+        self._close_table(table_name)
+        self._files[table_name] = open(self.output_dir / f"{table_name}.csv", "w", newline="")
+
+    def write_raw(self, table_name: str, data: str) -> None:
+        self._files[table_name].write(data)
+
+    def write_chunk(self, table_name: str, chunk: pd.DataFrame, widened: dict[str, str]) -> None:
+        pass
+
+    def end_table(self, table_name: str, row_count: int) -> None:
+        self._close_table(table_name)
+
+    def _close_table(self, table_name: str) -> None:
+        file = self._files.pop(table_name, None)
+        if file is not None:
+            file.close()
+
+    def close(self) -> None:
+        for table_name in list(self._files):
+            self._close_table(table_name)
+
+
+class ParquetSink:
+    """
+    Write each table to ``<table>.parquet`` with one row group per chunk.
+
+    Parquet files have a fixed schema, so when a later chunk widens a column
+    the row groups written so far are streamed into a new file with the
+    widened schema. This is rare (it only happens when the first chunk
+    under-represents a column) and keeps memory bounded by one row group.
+
+    Examples:
+        >>> sink = ParquetSink(Path("HWSD2_parquet"))
+        >>> sink.begin_table("HWSD2_SMU")
+        >>> sink.write_chunk("HWSD2_SMU", chunk, widened={})
+        >>> sink.end_table("HWSD2_SMU", len(chunk))
+    """
+
+    raw = False
+
+    def __init__(self, output_dir: Path):
+        import pyarrow
+        import pyarrow.parquet
+
+        self._pa = pyarrow
+        self._pq = pyarrow.parquet
+        self.output_dir = Path(output_dir)
+        self.output_dir.mkdir(exist_ok=True, parents=True)
+        # Per-table [writer, schema] while the table is being written
+        self._writers = {}
+
+    def _tmp_path(self, table_name: str) -> Path:
+        return self.output_dir / f"{table_name}.parquet.tmp"
+
+    def begin_table(self, table_name: str) -> None:
+        self._close_table(table_name)
+
+    def write_chunk(self, table_name: str, chunk: pd.DataFrame, widened: dict[str, str]) -> None:
+        table = self._pa.Table.from_pandas(chunk, preserve_index=False).replace_schema_metadata(None)
+        if table_name not in self._writers:
+            writer = self._pq.ParquetWriter(self._tmp_path(table_name), table.schema)
+            self._writers[table_name] = [writer, table.schema]
+        elif widened:
+            self._widen(table_name, table.schema, widened)
+        writer, schema = self._writers[table_name]
+        writer.write_table(table.cast(schema))
+
+    def _widen(self, table_name: str, chunk_schema, widened: dict[str, str]) -> None:
+        """Rewrite the row groups written so far with the widened schema."""
+        writer, schema = self._writers[table_name]
+        schema = self._pa.schema([chunk_schema.field(f.name) if f.name in widened else f
+                                  for f in schema])
+        writer.close()
+        tmp_path = self._tmp_path(table_name)
+        old_path = tmp_path.with_suffix(".old")
+        os.replace(tmp_path, old_path)
+        writer = self._pq.ParquetWriter(tmp_path, schema)
+        for batch in self._pq.ParquetFile(old_path).iter_batches():
+            writer.write_table(self._pa.Table.from_batches([batch]).cast(schema))
+        old_path.unlink()
+        self._writers[table_name] = [writer, schema]
+
+    def end_table(self, table_name: str, row_count: int) -> None:
+        self._close_table(table_name)
+        os.replace(self._tmp_path(table_name), self.output_dir / f"{table_name}.parquet")
+
+    def _close_table(self, table_name: str) -> None:
+        entry = self._writers.pop(table_name, None)
+        if entry is not None:
+            entry[0].close()
+
+    def close(self) -> None:
+        for table_name in list(self._writers):
+            self._close_table(table_name)
+
+
+class _TeeReader:
+    """File-like wrapper passing everything read from a stream on to callbacks."""
+
+    def __init__(self, stream, targets: list[Callable[[str], None]]):
+        self._stream = stream
+        self._targets = targets
+
+    def read(self, size: int = -1) -> str:
+        data = self._stream.read(size)
+        for target in self._targets:
+            target(data)
+        return data
+
+
+def _stream_bil_to_npy(zip_ref: zipfile.ZipFile, info: zipfile.ZipInfo,
+                       header: dict[str, str], target: Path) -> Path:
+    """
+    Decompress a single-band BIL member straight into a ``.npy`` file.
+
+    Rows are read from the compressed stream in blocks of RASTER_BLOCK_ROWS
+    and copied into a memory-mapped array, so neither the BIL file nor the
+    whole raster is ever materialized.
+
+    Args:
+        zip_ref: Open archive containing the raster
+        info: The ``.bil`` member
+        header: Parsed ``.hdr`` member
+        target: Output ``.npy`` path
+
+    Returns:
+        Path to the written ``.npy`` file
+
+    Raises:
+        ValueError: If the header describes a pixel layout ``bil_pixel_format`` does not support
+        RuntimeError: If the raster is shorter than its header
+    """
+    import numpy as np
+
+    nrows, ncols = int(header["NROWS"]), int(header["NCOLS"])
+    dtype = np.dtype(bil_pixel_format(header))
+    row_bytes = ncols * dtype.itemsize
+
+    tmp_path = target.with_suffix(".tmp.npy")
+    array = np.lib.format.open_memmap(tmp_path, mode="w+", dtype=dtype, shape=(nrows, ncols))
+    with zip_ref.open(info) as src:
+        for start in range(0, nrows, RASTER_BLOCK_ROWS):
+            stop = min(start + RASTER_BLOCK_ROWS, nrows)
+            data = src.read((stop - start) * row_bytes)
+            if len(data) != (stop - start) * row_bytes:
+                raise RuntimeError(f"Raster {info.filename} is shorter than its header")
+            array[start:stop] = np.frombuffer(data, dtype=dtype).reshape(stop - start, ncols)
+    array.flush()
+    del array
+    os.replace(tmp_path, target)
+    logger.info(f"✓ Converted {info.filename} to {target.name} ({nrows} x {ncols} {dtype})")
+    return target
+
+
+# Output formats supported by HWSDFetcher.export_mdb
+EXPORT_FORMATS = ("sqlite", "duckdb", "csv", "parquet")
+
 
 class HWSDFetcher:
     """
@@ -74,45 +424,228 @@ class HWSDFetcher:
         self.data_dir.mkdir(exist_ok=True, parents=True)
         logger.info(f"HWSD data directory: {self.data_dir.absolute()}")
     
-    def download_file(self, url: str, filename: Optional[str] = None) -> Path:
+    @property
+    def manifest_path(self) -> Path:
+        """Path to the download manifest in the data directory."""
+        return self.data_dir / MANIFEST_FILENAME
+
+    def load_manifest(self) -> dict:
         """
-        Download a file with progress tracking and verification.
-        
+        Load the download manifest.
+
+        Returns:
+            Dictionary mapping filenames to their manifest entries (empty if
+            nothing has been downloaded yet)
+        """
+        if not self.manifest_path.exists():
+            return {}
+        with open(self.manifest_path) as f:
+            return json.load(f)
+
+    def _update_manifest(self, filename: str, entry: dict) -> None:
+        """Record a completed download, replacing the manifest atomically."""
+        manifest = self.load_manifest()
+        manifest[filename] = entry
+        tmp_path = self.manifest_path.with_suffix(".json.tmp")
+        with open(tmp_path, "w") as f:
+            json.dump(manifest, f, indent=2, sort_keys=True)
+        os.replace(tmp_path, self.manifest_path)
+
+    def _remote_metadata(self, url: str) -> dict:
+        """
+        Fetch the size and HTTP validators of a remote file with a HEAD request.
+
+        Returns:
+            Dictionary with "size", "etag" and "last_modified" (values are None
+            when the server does not report them or cannot be reached)
+        """
+        try:
+            with urlopen(Request(url, method="HEAD"), timeout=60) as response:
+                headers = response.headers
+        except (HTTPError, URLError, OSError) as e:
+            logger.warning(f"Could not query {url}: {e}")
+            return {"size": None, "etag": None, "last_modified": None}
+        size = headers.get("Content-Length")
+        return {
+            "size": int(size) if size is not None else None,
+            "etag": headers.get("ETag"),
+            "last_modified": headers.get("Last-Modified"),
+        }
+
+    @staticmethod
+    def _file_sha256(file_path: Path) -> str:
+        """SHA256 of a file on disk, read in blocks."""
+        sha256_hash = hashlib.sha256()
+        with open(file_path, "rb") as f:
+            for block in iter(lambda: f.read(DOWNLOAD_BLOCK_SIZE), b""):
+                sha256_hash.update(block)
+        return sha256_hash.hexdigest()
+
+    @staticmethod
+    def _is_unchanged(entry: dict, remote: dict) -> bool:
+        """Compare a manifest entry with remote metadata; unknown fields are not compared."""
+        for key in ("size", "etag", "last_modified"):
+            if remote[key] is not None and entry.get(key) is not None and remote[key] != entry[key]:
+                return False
+        return True
+
+    def download_file(self, url: str, filename: Optional[str] = None,
+                      expected_checksum: Optional[str] = None) -> Path:
+        """
+        Download a file, resuming partial downloads and hashing as it streams.
+
+        The file is written to ``<filename>.part`` and only renamed into place
+        once complete, so an interrupted download never looks finished. A
+        later call resumes it with an HTTP Range request. The SHA256 is
+        computed while writing and stored with the server's validators in the
+        manifest; the download is skipped when the manifest entry matches the
+        local file and the server reports the same size, ETag and
+        Last-Modified date. A file without a manifest entry (downloaded before
+        the manifest existed) is hashed and recorded instead of downloaded
+        again when its size matches the server's, or when the server cannot
+        be reached.
+
         Args:
             url: URL to download from
             filename: Optional filename to save as (default: extract from URL)
-            
+            expected_checksum: Expected SHA256 hash (default: EXPECTED_CHECKSUMS entry)
+
         Returns:
             Path to downloaded file
+
+        Raises:
+            RuntimeError: If the download fails, is incomplete, or does not
+                match the expected checksum
         """
         if filename is None:
             filename = Path(urlparse(url).path).name
-        
+        if expected_checksum is None:
+            expected_checksum = EXPECTED_CHECKSUMS.get(filename)
+
         file_path = self.data_dir / filename
-        
-        # Skip if file already exists
+        part_path = file_path.with_name(f"{filename}.part")
+        remote = self._remote_metadata(url)
+        entry = self.load_manifest().get(filename)
+
         if file_path.exists():
-            logger.info(f"File already exists: {file_path}")
-            return file_path
-        
-        logger.info(f"Downloading {url} to {file_path}")
-        
+            local_size = file_path.stat().st_size
+            if (entry is not None and entry.get("url") == url and entry.get("size") == local_size
+                    and self._is_unchanged(entry, remote)):
+                logger.info(f"File unchanged, skipping download: {file_path}")
+                return file_path
+            if entry is None and remote["size"] in (None, local_size):
+                # Complete file from an older download, or the server is unreachable: keep it
+                computed_hash = self._file_sha256(file_path)
+                if expected_checksum is None or computed_hash.lower() == expected_checksum.lower():
+                    logger.info(f"Recording existing file in the manifest: {file_path}")
+                    self._update_manifest(filename, {
+                        "url": url,
+                        "size": local_size,
+                        "sha256": computed_hash,
+                        "etag": remote["etag"],
+                        "last_modified": remote["last_modified"],
+                        "mtime": file_path.stat().st_mtime,
+                    })
+                    return file_path
+                logger.info(f"Existing file does not match the expected checksum, downloading again: {file_path}")
+            elif entry is None and remote["size"] is not None and local_size < remote["size"]:
+                # Truncated file from an older, non-resumable download
+                logger.info(f"Resuming truncated file: {file_path}")
+                os.replace(file_path, part_path)
+                file_path.with_name(f"{filename}.part.json").write_text(json.dumps({"url": url, **remote}))
+            else:
+                logger.info(f"File changed or unverified, downloading again: {file_path}")
+
+        # Validators of the remote file the .part was started from; a partial
+        # download of a file that has since changed cannot be resumed
+        state_path = file_path.with_name(f"{filename}.part.json")
+        if part_path.exists():
+            started = json.loads(state_path.read_text()) if state_path.exists() else None
+            if started is None or started.get("url") != url or not self._is_unchanged(started, remote):
+                logger.info(f"Discarding stale partial download: {part_path}")
+                part_path.unlink()
+        if not part_path.exists():
+            state_path.write_text(json.dumps({"url": url, **remote}))
+
+        sha256_hash = hashlib.sha256()
+        offset = 0
+        if part_path.exists():
+            # Hash the bytes already on disk once so the digest covers the whole file
+            with open(part_path, "rb") as f:
+                for block in iter(lambda: f.read(DOWNLOAD_BLOCK_SIZE), b""):
+                    sha256_hash.update(block)
+                    offset += len(block)
+
+        request = Request(url)
+        if offset:
+            request.add_header("Range", f"bytes={offset}-")
+            if remote["etag"]:
+                request.add_header("If-Range", remote["etag"])
+            elif remote["last_modified"]:
+                request.add_header("If-Range", remote["last_modified"])
+
+        logger.info(f"Downloading {url} to {file_path}"
+                    + (f" (resuming at {offset} bytes)" if offset else ""))
+
         try:
-            # Download with progress indication
-            urlretrieve(url, file_path)
-            file_size = file_path.stat().st_size / (1024 * 1024)  # MB
-            logger.info(f"✓ Download complete: {filename} ({file_size:.1f} MB)")
-            
-        except Exception as e:
-            if file_path.exists():
-                file_path.unlink()  # Clean up partial download
+            with urlopen(request, timeout=60) as response:
+                if offset and response.status != 206:
+                    # Server ignored the range (or the file changed): start over
+                    logger.info("Server did not resume the download, restarting")
+                    sha256_hash = hashlib.sha256()
+                    offset = 0
+                mode = "ab" if offset else "wb"
+                size = offset
+                with open(part_path, mode) as f:
+                    for block in iter(lambda: response.read(DOWNLOAD_BLOCK_SIZE), b""):
+                        f.write(block)
+                        sha256_hash.update(block)
+                        size += len(block)
+        except HTTPError as e:
+            if e.code == 416:
+                # Range not satisfiable: the partial file is unusable
+                part_path.unlink()
+                state_path.unlink(missing_ok=True)
             raise RuntimeError(f"Failed to download {url}: {e}")
-        
+        except (URLError, OSError, HTTPException) as e:
+            # Keep the .part file so the next call can resume (HTTPException
+            # covers IncompleteRead when the connection drops mid-body)
+            raise RuntimeError(f"Failed to download {url}: {e}")
+
+        if remote["size"] is not None and size != remote["size"]:
+            raise RuntimeError(
+                f"Incomplete download of {url}: got {size} of {remote['size']} bytes"
+            )
+
+        computed_hash = sha256_hash.hexdigest()
+        if expected_checksum is not None and computed_hash.lower() != expected_checksum.lower():
+            part_path.unlink()
+            state_path.unlink(missing_ok=True)
+            raise RuntimeError(f"Checksum mismatch for {filename}: {computed_hash}")
+
+        os.replace(part_path, file_path)
+        state_path.unlink(missing_ok=True)
+        self._update_manifest(filename, {
+            "url": url,
+            "size": size,
+            "sha256": computed_hash,
+            "etag": remote["etag"],
+            "last_modified": remote["last_modified"],
+            "mtime": file_path.stat().st_mtime,
+        })
+
+        file_size = size / (1024 * 1024)  # MB
+        logger.info(f"✓ Download complete: {filename} ({file_size:.1f} MB)")
+        logger.info(f"File {filename} SHA256: {computed_hash}")
         return file_path
     
     def verify_checksum(self, file_path: Path, expected_checksum: Optional[str] = None) -> bool:
         """
         Verify file integrity using SHA256 checksum.
+
+        Files downloaded by ``download_file`` were hashed while streaming, so
+        the manifest digest is used if the file's size and modification time
+        still match; otherwise the file is re-read.
         
         Args:
             file_path: Path to file to verify
@@ -121,12 +654,14 @@ class HWSDFetcher:
         Returns:
             True if checksum matches (or if no expected checksum provided)
         """
-        sha256_hash = hashlib.sha256()
-        with open(file_path, "rb") as f:
-            for byte_block in iter(lambda: f.read(4096), b""):
-                sha256_hash.update(byte_block)
-        
-        computed_hash = sha256_hash.hexdigest()
+        entry = self.load_manifest().get(file_path.name)
+        stat = file_path.stat()
+        if (entry is not None and Path(file_path).parent.resolve() == self.data_dir.resolve()
+                and entry.get("size") == stat.st_size and entry.get("mtime") == stat.st_mtime):
+            computed_hash = entry["sha256"]
+        else:
+            computed_hash = self._file_sha256(file_path)
+
         logger.info(f"File {file_path.name} SHA256: {computed_hash}")
         
         if expected_checksum is None:
@@ -187,17 +722,39 @@ class HWSDFetcher:
         logger.info("✓ All HWSD components downloaded successfully!")
         return components
     
-    def extract_zip(self, zip_path: Path, extract_to: Optional[Path] = None) -> Path:
+    def extract_zip(self, zip_path: Path, extract_to: Optional[Path] = None,
+                    members: Optional[list[str]] = None, workers: Optional[int] = None,
+                    raster_format: Optional[str] = None) -> Path:
         """
         Extract a ZIP file to the specified directory.
+
+        Members are decompressed in parallel, each worker reading through its
+        own handle on the archive. With ``raster_format="npy"`` any ``.bil``
+        member is streamed straight into a memory-mappable ``.npy`` array
+        (using the matching ``.hdr`` member for its shape and data type)
+        instead of being written to disk as a BIL first.
         
         Args:
             zip_path: Path to ZIP file to extract
             extract_to: Directory to extract to (default: same name as zip without extension)
+            members: Glob patterns selecting members to extract (default: all)
+            workers: Number of members decompressed at once (default: one per CPU)
+            raster_format: Convert BIL rasters while extracting; one of RASTER_FORMATS
             
         Returns:
             Path to extraction directory
+
+        Raises:
+            ValueError: If a selected member would be written outside ``extract_to``
+
+        Examples:
+            >>> fetcher = HWSDFetcher(data_dir="./hwsd_data")
+            >>> fetcher.extract_zip(Path("hwsd_data/HWSD2_RASTER.zip"),
+            ...                     members=["*.bil", "*.hdr"], raster_format="npy")
         """
+        if raster_format is not None and raster_format not in RASTER_FORMATS:
+            raise ValueError(f"Unknown raster format {raster_format!r}; choose from {RASTER_FORMATS}")
+
         if extract_to is None:
             extract_to = self.data_dir / zip_path.stem
         
@@ -206,11 +763,45 @@ class HWSDFetcher:
         logger.info(f"Extracting {zip_path.name} to {extract_to}")
         
         with zipfile.ZipFile(zip_path, 'r') as zip_ref:
-            zip_ref.extractall(extract_to)
+            infos = [info for info in zip_ref.infolist() if not info.is_dir()]
+            names = {info.filename for info in zip_ref.infolist()}
+        if members is not None:
+            infos = [info for info in infos
+                     if any(fnmatch.fnmatch(info.filename, pattern) for pattern in members)]
+
+        # Resolve every target before writing anything, so a crafted member
+        # name such as "../x" cannot escape the extraction directory
+        root = extract_to.resolve()
+        targets = {}
+        for info in infos:
+            target = (root / info.filename).resolve()
+            if not target.is_relative_to(root):
+                raise ValueError(f"Refusing to extract {info.filename!r} outside {extract_to}")
+            targets[info.filename] = target
+
+        # Create directories up front so workers do not race to create them
+        for target in targets.values():
+            target.parent.mkdir(exist_ok=True, parents=True)
+
+        def extract_member(info: zipfile.ZipInfo) -> None:
+            with zipfile.ZipFile(zip_path, 'r') as zip_ref:
+                if raster_format is not None and info.filename.lower().endswith(".bil"):
+                    header_name = info.filename[:-4] + ".hdr"
+                    if header_name not in names:
+                        raise RuntimeError(f"No header {header_name} for raster {info.filename}")
+                    header = parse_bil_header(zip_ref.read(header_name).decode())
+                    target = targets[info.filename].with_suffix(f".{raster_format}")
+                    _stream_bil_to_npy(zip_ref, info, header, target)
+                else:
+                    zip_ref.extract(info, extract_to)
+
+        # Largest members first so the longest decompression starts immediately
+        infos.sort(key=lambda info: -info.file_size)
+        workers = max(1, min(workers or MDB_EXPORT_WORKERS, len(infos) or 1))
+        with ThreadPoolExecutor(max_workers=workers) as pool:
+            list(pool.map(extract_member, infos))
         
-        # List extracted files
-        extracted_files = list(extract_to.rglob("*"))
-        logger.info(f"✓ Extracted {len(extracted_files)} files to {extract_to}")
+        logger.info(f"✓ Extracted {len(infos)} files to {extract_to}")
         
         return extract_to
     
@@ -241,70 +832,311 @@ class HWSDFetcher:
             logger.warning("✗ mdb-tools not found. Install with: sudo apt-get install mdb-tools")
             return False
     
-    def convert_mdb_to_sqlite(self, mdb_path: Path, sqlite_path: Optional[Path] = None) -> Path:
+    def list_tables(self, mdb_path: Path) -> list[str]:
+        """
+        List the tables of a Microsoft Access database.
+
+        Args:
+            mdb_path: Path to .mdb file
+
+        Returns:
+            Table names in the order reported by mdb-tables
+        """
+        result = subprocess.run(['mdb-tables', '-1', str(mdb_path)],
+                              capture_output=True, text=True)
+        if result.returncode != 0:
+            raise RuntimeError(f"Failed to list tables: {result.stderr}")
+
+        return [name.strip() for name in result.stdout.split('\n') if name.strip()]
+
+    def iter_table_chunks(self, mdb_path: Path, table_name: str,
+                          chunksize: int = MDB_EXPORT_CHUNKSIZE,
+                          tee: Optional[list[Callable[[str], None]]] = None,
+                          ) -> Iterator[tuple[pd.DataFrame, dict[str, str]]]:
+        """
+        Stream one Access table as DataFrame chunks.
+
+        ``mdb-export`` writes the table to a pipe that is parsed incrementally,
+        so at most ``chunksize`` rows are held in memory at once. Column types
+        are kept consistent across chunks (see ``_conform_chunk``).
+
+        Args:
+            mdb_path: Path to .mdb file
+            table_name: Name of the table to export
+            chunksize: Number of rows per chunk
+            tee: Callbacks receiving the raw CSV text as it is read from the pipe
+
+        Yields:
+            Tuples of (chunk, widened) where ``widened`` maps columns whose
+            type was widened by this chunk to their new SQL type
+
+        Raises:
+            RuntimeError: If mdb-export exits with an error
+        """
+        column_types: dict[str, str] = {}
+        with tempfile.TemporaryFile() as stderr:
+            proc = subprocess.Popen(['mdb-export', str(mdb_path), table_name],
+                                    stdout=subprocess.PIPE, stderr=stderr, text=True)
+            try:
+                stream = _TeeReader(proc.stdout, tee) if tee else proc.stdout
+                for chunk in pd.read_csv(stream, chunksize=chunksize):
+                    widened = _conform_chunk(chunk, column_types)
+                    yield chunk, widened
+            finally:
+                proc.stdout.close()
+                returncode = proc.wait()
+            if returncode != 0:
+                stderr.seek(0)
+                message = stderr.read().decode(errors="replace").strip()
+                raise RuntimeError(f"mdb-export failed for table {table_name}: {message}")
+
+    def estimate_table_sizes(self, mdb_path: Path, table_names: list[str]) -> dict[str, int]:
+        """
+        Estimate the number of rows in each table with mdb-count.
+
+        Used to schedule the largest tables first. If mdb-count is not
+        available (older mdb-tools), every table is reported as size 0.
+
+        Args:
+            mdb_path: Path to .mdb file
+            table_names: Tables to size
+
+        Returns:
+            Mapping of table name to row count
+        """
+        sizes = {}
+        for table_name in table_names:
+            try:
+                result = subprocess.run(['mdb-count', str(mdb_path), table_name],
+                                      capture_output=True, text=True)
+                sizes[table_name] = int(result.stdout.strip()) if result.returncode == 0 else 0
+            except FileNotFoundError:
+                return {name: 0 for name in table_names}
+            except ValueError:
+                sizes[table_name] = 0
+        return sizes
+
+    def _convert_table(self, mdb_path: Path, table_name: str, sinks: list,
+                       chunksize: int, messages: list) -> Optional[int]:
+        """
+        Stream a single table into the sinks.
+
+        Log messages are collected in ``messages`` as (level, text) pairs
+        rather than logged directly, so that concurrent tables do not
+        interleave their output.
+
+        Returns:
+            Number of rows written, or None if the table failed
+        """
+        messages.append((logging.INFO, f"Converting table: {table_name}"))
+        try:
+            for sink in sinks:
+                sink.begin_table(table_name)
+            tee = [lambda data, sink=sink: sink.write_raw(table_name, data)
+                   for sink in sinks if sink.raw]
+            row_count = 0
+            for chunk, widened in self.iter_table_chunks(mdb_path, table_name, chunksize, tee):
+                for sink in sinks:
+                    sink.write_chunk(table_name, chunk, widened)
+                row_count += len(chunk)
+            for sink in sinks:
+                sink.end_table(table_name, row_count)
+            messages.append((logging.INFO, f"✓ Imported {row_count} rows to table {table_name}"))
+            return row_count
+
+        except Exception as e:
+            messages.append((logging.WARNING, f"Failed to import table {table_name}: {e}"))
+            return None
+
+    def _convert_tables(self, mdb_path: Path, sinks: list,
+                        chunksize: int = MDB_EXPORT_CHUNKSIZE,
+                        workers: Optional[int] = None) -> dict[str, int]:
+        """
+        Stream every table of an Access database into the given sinks.
+
+        Tables are exported concurrently by a pool of ``workers`` threads,
+        largest table first so that the longest export does not start last.
+        Each table runs its own mdb-export process, so decoding proceeds in
+        parallel while writes to each sink are serialized. Log output is
+        emitted per table, in the order reported by mdb-tables, and the
+        outputs do not depend on the number of workers.
+
+        Args:
+            mdb_path: Path to .mdb file
+            sinks: Sink objects receiving each table's chunks
+            chunksize: Number of rows per chunk
+            workers: Number of tables exported at once (default: MDB_EXPORT_WORKERS)
+
+        Returns:
+            Mapping of table name to number of rows written, in table order
+        """
+        table_names = self.list_tables(mdb_path)
+        logger.info(f"Found {len(table_names)} tables: {table_names}")
+
+        workers = max(1, min(workers or MDB_EXPORT_WORKERS, len(table_names) or 1))
+        sizes = self.estimate_table_sizes(mdb_path, table_names) if workers > 1 else {}
+        schedule = sorted(table_names, key=lambda name: -sizes.get(name, 0))
+        messages = {name: [] for name in table_names}
+
+        with ThreadPoolExecutor(max_workers=workers) as pool:
+            futures = {
+                name: pool.submit(self._convert_table, mdb_path, name, sinks,
+                                  chunksize, messages[name])
+                for name in schedule
+            }
+            row_counts = {}
+            for table_name in table_names:
+                row_count = futures[table_name].result()
+                for level, message in messages[table_name]:
+                    logger.log(level, message)
+                if row_count is not None:
+                    row_counts[table_name] = row_count
+
+        return row_counts
+
+    def convert_mdb_to_sqlite(self, mdb_path: Path, sqlite_path: Optional[Path] = None,
+                              chunksize: int = MDB_EXPORT_CHUNKSIZE,
+                              workers: Optional[int] = None) -> Path:
         """
         Convert Microsoft Access database to SQLite.
-        
+
+        Each table is streamed from mdb-export in chunks of ``chunksize`` rows
+        and appended with batched inserts, so memory use does not grow with
+        the size of the table.
+
         Args:
             mdb_path: Path to .mdb file
             sqlite_path: Path to output SQLite file (default: same name with .db extension)
-            
+            chunksize: Number of rows inserted per batch
+            workers: Number of tables exported concurrently (default: one per CPU)
+
         Returns:
             Path to created SQLite database
         """
         if sqlite_path is None:
             sqlite_path = mdb_path.with_suffix(".db")
-        
+
         if not self.check_mdb_tools():
             raise RuntimeError("mdb-tools required for .mdb conversion")
-        
+
         logger.info(f"Converting {mdb_path.name} to SQLite: {sqlite_path.name}")
-        
-        # Get list of tables in the Access database
-        result = subprocess.run(['mdb-tables', '-1', str(mdb_path)], 
-                              capture_output=True, text=True)
-        if result.returncode != 0:
-            raise RuntimeError(f"Failed to list tables: {result.stderr}")
-        
-        table_names = [name.strip() for name in result.stdout.split('\n') if name.strip()]
-        logger.info(f"Found {len(table_names)} tables: {table_names}")
-        
-        # Create SQLite database and import tables
-        conn = sqlite3.connect(sqlite_path)
-        
-        for table_name in table_names:
-            logger.info(f"Converting table: {table_name}")
-            
-            # Export table to CSV using mdb-export
-            csv_result = subprocess.run(['mdb-export', str(mdb_path), table_name],
-                                      capture_output=True, text=True)
-            if csv_result.returncode != 0:
-                logger.warning(f"Failed to export table {table_name}: {csv_result.stderr}")
-                continue
-            
-            # Read CSV data into pandas and save to SQLite
-            try:
-                # Use StringIO to read CSV from memory
-                from io import StringIO
-                csv_data = StringIO(csv_result.stdout)
-                df = pd.read_csv(csv_data)
-                df.to_sql(table_name, conn, if_exists='replace', index=False)
-                logger.info(f"✓ Imported {len(df)} rows to table {table_name}")
-                
-            except Exception as e:
-                logger.warning(f"Failed to import table {table_name}: {e}")
-        
-        conn.close()
+
+        sink = SQLiteSink(sqlite_path)
+        try:
+            self._convert_tables(mdb_path, [sink], chunksize, workers)
+        finally:
+            sink.close()
+
         logger.info(f"✓ SQLite conversion complete: {sqlite_path}")
         return sqlite_path
-    
-    def export_tables_to_csv(self, mdb_path: Path, output_dir: Optional[Path] = None) -> Path:
+
+    def convert_mdb_to_duckdb(self, mdb_path: Path, duckdb_path: Optional[Path] = None,
+                              chunksize: int = MDB_EXPORT_CHUNKSIZE,
+                              workers: Optional[int] = None) -> Path:
+        """
+        Convert Microsoft Access database directly to DuckDB.
+
+        Works like ``convert_mdb_to_sqlite`` but writes a DuckDB database,
+        skipping the intermediate CSV files that ``load_hwsd2.py`` reads.
+
+        Args:
+            mdb_path: Path to .mdb file
+            duckdb_path: Path to output DuckDB file (default: same name with .ddb extension)
+            chunksize: Number of rows inserted per batch
+            workers: Number of tables exported concurrently (default: one per CPU)
+
+        Returns:
+            Path to created DuckDB database
+        """
+        if duckdb_path is None:
+            duckdb_path = mdb_path.with_suffix(".ddb")
+
+        if not self.check_mdb_tools():
+            raise RuntimeError("mdb-tools required for .mdb conversion")
+
+        logger.info(f"Converting {mdb_path.name} to DuckDB: {duckdb_path.name}")
+
+        sink = DuckDBSink(duckdb_path)
+        try:
+            self._convert_tables(mdb_path, [sink], chunksize, workers)
+        finally:
+            sink.close()
+
+        logger.info(f"✓ DuckDB conversion complete: {duckdb_path}")
+        return duckdb_path
+
+    def export_mdb(self, mdb_path: Path, formats: tuple[str, ...] = ("sqlite", "csv"),
+                   chunksize: int = MDB_EXPORT_CHUNKSIZE,
+                   workers: Optional[int] = None) -> dict[str, Path]:
+        """
+        Export all tables of an Access database to several formats in one pass.
+
+        Each table is exported by mdb-export once and its stream is teed to
+        every requested sink, with row counts taken from the parsed chunks.
+        This replaces calling ``convert_mdb_to_sqlite`` followed by
+        ``export_tables_to_csv``, which ran mdb-export twice per table and then
+        re-read every CSV to count rows.
+
+        Args:
+            mdb_path: Path to .mdb file
+            formats: Any of "sqlite", "duckdb", "csv" and "parquet"
+            chunksize: Number of rows per chunk
+            workers: Number of tables exported concurrently (default: one per CPU)
+
+        Returns:
+            Dictionary mapping each format to its output path (database file
+            for sqlite/duckdb, directory for csv/parquet)
+
+        Examples:
+            >>> fetcher = HWSDFetcher(data_dir="./hwsd_data")
+            >>> outputs = fetcher.export_mdb(Path("hwsd_data/HWSD2_DB/HWSD2.mdb"),
+            ...                              formats=("duckdb", "parquet"))
+        """
+        unknown = set(formats) - set(EXPORT_FORMATS)
+        if unknown:
+            raise ValueError(f"Unknown export formats {sorted(unknown)}; choose from {EXPORT_FORMATS}")
+
+        if not self.check_mdb_tools():
+            raise RuntimeError("mdb-tools required for .mdb conversion")
+
+        outputs = {
+            "sqlite": mdb_path.with_suffix(".db"),
+            "duckdb": mdb_path.with_suffix(".ddb"),
+            "csv": self.data_dir / f"{mdb_path.stem}_csv",
+            "parquet": self.data_dir / f"{mdb_path.stem}_parquet",
+        }
+        sink_classes = {
+            "sqlite": SQLiteSink,
+            "duckdb": DuckDBSink,
+            "csv": CSVSink,
+            "parquet": ParquetSink,
+        }
+        outputs = {fmt: outputs[fmt] for fmt in formats}
+
+        logger.info(f"Exporting {mdb_path.name} to {', '.join(formats)}")
+
+        sinks = []
+        try:
+            for fmt in formats:
+                sinks.append(sink_classes[fmt](outputs[fmt]))
+            self._convert_tables(mdb_path, sinks, chunksize, workers)
+        finally:
+            for sink in sinks:
+                sink.close()
+
+        for fmt, path in outputs.items():
+            logger.info(f"✓ {fmt} export complete: {path}")
+        return outputs
+
+    def export_tables_to_csv(self, mdb_path: Path, output_dir: Optional[Path] = None,
+                             workers: Optional[int] = None) -> Path:
         """
         Export all tables from Access database to CSV files.
         
         Args:
             mdb_path: Path to .mdb file
             output_dir: Directory to save CSV files (default: mdb filename + "_csv")
+            workers: Number of tables exported concurrently (default: one per CPU)
             
         Returns:
             Path to directory containing CSV files
@@ -312,39 +1144,18 @@ class HWSDFetcher:
         if output_dir is None:
             output_dir = self.data_dir / f"{mdb_path.stem}_csv"
         
-        output_dir.mkdir(exist_ok=True, parents=True)
-        
         if not self.check_mdb_tools():
             raise RuntimeError("mdb-tools required for .mdb conversion")
         
         logger.info(f"Exporting tables from {mdb_path.name} to CSV files in {output_dir}")
         
-        # Get table names
-        result = subprocess.run(['mdb-tables', '-1', str(mdb_path)], 
-                              capture_output=True, text=True)
-        if result.returncode != 0:
-            raise RuntimeError(f"Failed to list tables: {result.stderr}")
-        
-        table_names = [name.strip() for name in result.stdout.split('\n') if name.strip()]
-        
-        # Export each table to CSV
-        for table_name in table_names:
-            csv_path = output_dir / f"{table_name}.csv"
-            logger.info(f"Exporting {table_name} to {csv_path.name}")
-            
-            with open(csv_path, 'w') as f:
-                result = subprocess.run(['mdb-export', str(mdb_path), table_name], 
-                                      stdout=f, text=True)
-                if result.returncode != 0:
-                    logger.warning(f"Failed to export table {table_name}")
-                    continue
-            
-            # Report row count
-            try:
-                df = pd.read_csv(csv_path)
-                logger.info(f"✓ Exported {len(df)} rows to {csv_path.name}")
-            except Exception:
-                logger.warning(f"Could not verify row count for {csv_path.name}")
+        # Row counts come from parsing the stream while it is written, so the
+        # CSV files are never read back
+        sink = CSVSink(output_dir)
+        try:
+            self._convert_tables(mdb_path, [sink], workers=workers)
+        finally:
+            sink.close()
         
         logger.info(f"✓ CSV export complete: {output_dir}")
         return output_dir
@@ -402,13 +1213,10 @@ def main():
             logger.info("\n=== Converting Databases ===")
             for mdb_file in mdb_files:
                 try:
-                    # Convert to SQLite
-                    sqlite_file = fetcher.convert_mdb_to_sqlite(mdb_file)
-                    logger.info(f"✓ SQLite database: {sqlite_file}")
-                    
-                    # Export to CSV
-                    csv_dir = fetcher.export_tables_to_csv(mdb_file)
-                    logger.info(f"✓ CSV export: {csv_dir}")
+                    # Convert to SQLite and CSV in a single pass over each table
+                    outputs = fetcher.export_mdb(mdb_file, formats=("sqlite", "csv"))
+                    logger.info(f"✓ SQLite database: {outputs['sqlite']}")
+                    logger.info(f"✓ CSV export: {outputs['csv']}")
                     
                 except Exception as e:
                     logger.error(f"Failed to convert {mdb_file.name}: {e}")
@@ -0,0 +1,311 @@
+#!/usr/bin/env python
+"""
+Audit the physical consistency of HWSD2_LAYERS.
+
+Schema validation (``fao_soils.validation``) checks types and ranges slot by
+slot; this audit checks domain invariants that span columns and rows:
+
+- ``texture_sum``: SAND + SILT + CLAY is 100 %
+- ``depth_order``: TOPDEP < BOTDEP
+- ``standard_depths``: layers D1-D7 have their standard depths
+  (0-20, 20-40, 40-60, 60-80, 80-100, 100-150, 150-200 cm)
+- ``depth_contiguity``: each layer starts where the one above ends, from 0 cm
+- ``share_sum``: sequence SHAREs add up to 100 % per SMU
+- ``cn_ratio``: CN_RATIO matches ORG_CARBON / TOTAL_N
+- ``bulk_density``: BULK and REF_BULK are physically possible
+- ``smu_id``: every layer has an HWSD2_SMU_ID
+
+Each rule is a SQL query run by DuckDB. The table is split into chunks of
+whole soil mapping units (so per-SMU rules stay within a chunk), plus one
+chunk of the rows without an HWSD2_SMU_ID, which the row-level rules also
+check, and (rule, chunk) queries run in parallel on a thread pool. HWSD2 stores
+missing numeric values as negative sentinels (-9), which the rules skip.
+
+Run it on a database built by ``load_hwsd2.py``; the JSON report lists the
+violation count and sample rows of every rule.
+
+Usage:
+    uv run python hwsd2_audit.py [db_path] [report.json]
+
+Default: hwsd2.ddb, report printed to stdout only
+"""
+
+import json
+import os
+import sys
+import time
+from concurrent.futures import ThreadPoolExecutor
+from dataclasses import asdict, dataclass, field
+from datetime import datetime, timezone
+from pathlib import Path
+from typing import Any, Dict, List, Optional, Sequence, Tuple
+
+import duckdb
+
+from hwsd2_extractor import STANDARD_LAYERS
+
+# Tolerances
+TEXTURE_SUM_TOLERANCE = 2.0  # % weight, allows for rounding of the three fractions
+SHARE_SUM_TOLERANCE = 0.5  # %
+CN_RATIO_TOLERANCE = 0.1  # relative
+CN_RATIO_ABSOLUTE_TOLERANCE = 0.5  # CN_RATIO is rounded
+# Bulk density limits in g/cm3: peat can be as light as ~0.05, and no soil is
+# denser than its mineral particles (~2.65)
+BULK_DENSITY_MIN = 0.05
+BULK_DENSITY_MAX = 2.65
+
+AUDIT_CHUNKS = 16
+AUDIT_WORKERS = os.cpu_count() or 1
+SAMPLE_SIZE = 5
+
+_STANDARD_LAYERS_SQL = ", ".join(f"('{layer}', {top}, {bottom})" for layer, top, bottom in STANDARD_LAYERS)
+
+# Each rule selects its violating rows from the SMUs in a chunk; {chunk} is
+# replaced by the chunk's HWSD2_SMU_ID range (or IS NULL) condition
+AUDIT_RULES: Dict[str, Tuple[str, str]] = {
+    "texture_sum": (
+        f"SAND + SILT + CLAY is 100 +/- {TEXTURE_SUM_TOLERANCE} %",
+        f"""
+        SELECT ID, HWSD2_SMU_ID, SEQUENCE, LAYER, SAND, SILT, CLAY,
+               SAND + SILT + CLAY AS TOTAL
+        FROM HWSD2_LAYERS
+        WHERE {{chunk}} AND SAND >= 0 AND SILT >= 0 AND CLAY >= 0
+          AND abs(SAND + SILT + CLAY - 100) > {TEXTURE_SUM_TOLERANCE}
+        """,
+    ),
+    "depth_order": (
+        "TOPDEP < BOTDEP",
+        """
+        SELECT ID, HWSD2_SMU_ID, SEQUENCE, LAYER, TOPDEP, BOTDEP
+        FROM HWSD2_LAYERS
+        WHERE {chunk} AND TOPDEP >= 0 AND BOTDEP >= 0 AND TOPDEP >= BOTDEP
+        """,
+    ),
+    "standard_depths": (
+        "Layers D1-D7 have the standard HWSD2 depths",
+        f"""
+        SELECT l.ID, l.HWSD2_SMU_ID, l.SEQUENCE, l.LAYER, l.TOPDEP, l.BOTDEP,
+               s.TOP AS EXPECTED_TOPDEP, s.BOTTOM AS EXPECTED_BOTDEP
+        FROM HWSD2_LAYERS l
+        LEFT JOIN (VALUES {_STANDARD_LAYERS_SQL}) s(LAYER, TOP, BOTTOM) ON l.LAYER = s.LAYER
+        WHERE {{chunk}}
+          AND (s.LAYER IS NULL OR l.TOPDEP IS DISTINCT FROM s.TOP OR l.BOTDEP IS DISTINCT FROM s.BOTTOM)
+        """,
+    ),
+    "depth_contiguity": (
+        "Each layer starts at the previous layer's bottom, and the first at 0 cm",
+        """
+        SELECT ID, HWSD2_SMU_ID, SEQUENCE, LAYER, TOPDEP, BOTDEP, PREVIOUS_BOTDEP
+        FROM (
+            SELECT ID, HWSD2_SMU_ID, SEQUENCE, LAYER, TOPDEP, BOTDEP,
+                   lag(BOTDEP) OVER (PARTITION BY HWSD2_SMU_ID, SEQUENCE ORDER BY LAYER, TOPDEP) AS PREVIOUS_BOTDEP
+            FROM HWSD2_LAYERS
+            WHERE {chunk}
+        )
+        WHERE TOPDEP IS DISTINCT FROM coalesce(PREVIOUS_BOTDEP, 0)
+        """,
+    ),
+    "share_sum": (
+        f"Sequence SHAREs sum to 100 +/- {SHARE_SUM_TOLERANCE} % per SMU",
+        f"""
+        SELECT HWSD2_SMU_ID, count(*) AS SEQUENCES, sum(SHARE) AS TOTAL_SHARE
+        FROM (
+            SELECT DISTINCT HWSD2_SMU_ID, SEQUENCE, SHARE
+            FROM HWSD2_LAYERS
+            WHERE {{chunk}}
+        )
+        GROUP BY HWSD2_SMU_ID
+        HAVING abs(sum(SHARE) - 100) > {SHARE_SUM_TOLERANCE}
+        """,
+    ),
+    "cn_ratio": (
+        f"CN_RATIO = ORG_CARBON * 10 / TOTAL_N within {CN_RATIO_TOLERANCE:.0%}",
+        f"""
+        SELECT ID, HWSD2_SMU_ID, SEQUENCE, LAYER, ORG_CARBON, TOTAL_N, CN_RATIO,
+               round(ORG_CARBON * 10 / TOTAL_N, 2) AS EXPECTED_CN_RATIO
+        FROM HWSD2_LAYERS
+        WHERE {{chunk}} AND ORG_CARBON >= 0 AND TOTAL_N > 0 AND CN_RATIO >= 0
+          AND abs(CN_RATIO - ORG_CARBON * 10 / TOTAL_N)
+              > greatest({CN_RATIO_ABSOLUTE_TOLERANCE}, {CN_RATIO_TOLERANCE} * ORG_CARBON * 10 / TOTAL_N)
+        """,
+    ),
+    "bulk_density": (
+        f"BULK and REF_BULK within {BULK_DENSITY_MIN}-{BULK_DENSITY_MAX} g/cm3",
+        f"""
+        SELECT ID, HWSD2_SMU_ID, SEQUENCE, LAYER, BULK, REF_BULK
+        FROM HWSD2_LAYERS
+        WHERE {{chunk}}
+          AND ((BULK >= 0 AND BULK NOT BETWEEN {BULK_DENSITY_MIN} AND {BULK_DENSITY_MAX})
+               OR (REF_BULK >= 0 AND REF_BULK NOT BETWEEN {BULK_DENSITY_MIN} AND {BULK_DENSITY_MAX}))
+        """,
+    ),
+    "smu_id": (
+        "Every layer has an HWSD2_SMU_ID",
+        """
+        SELECT ID, HWSD2_SMU_ID, SEQUENCE, LAYER
+        FROM HWSD2_LAYERS
+        WHERE {chunk} AND HWSD2_SMU_ID IS NULL
+        """,
+    ),
+}
+
+# Rules comparing the rows of one SMU; rows without an SMU id are not grouped
+SMU_RULES = ("depth_contiguity", "share_sum")
+
+# Chunk of the rows whose HWSD2_SMU_ID is NULL
+NULL_SMU_CHUNK = None
+
+
+@dataclass
+class RuleReport:
+    """Outcome of one audit rule over the whole table."""
+
+    rule: str
+    description: str
+    violations: int = 0
+    samples: List[Dict[str, Any]] = field(default_factory=list)
+
+
+def smu_chunks(conn: duckdb.DuckDBPyConnection, n_chunks: int = AUDIT_CHUNKS) -> List[Tuple[int, int]]:
+    """
+    Split HWSD2_LAYERS into chunks of whole SMUs with similar row counts.
+
+    Args:
+        conn: Open DuckDB connection
+        n_chunks: Number of chunks
+
+    Returns:
+        Inclusive (first, last) HWSD2_SMU_ID ranges covering every SMU
+    """
+    bounds = conn.execute(f"""
+        SELECT min(HWSD2_SMU_ID), max(HWSD2_SMU_ID)
+        FROM (SELECT HWSD2_SMU_ID, ntile({int(n_chunks)}) OVER (ORDER BY HWSD2_SMU_ID) AS CHUNK FROM HWSD2_LAYERS)
+        GROUP BY CHUNK ORDER BY 1
+    """).fetchall()
+    # An SMU split across two tiles goes to the first one
+    chunks = []
+    for first, last in bounds:
+        if chunks and first <= chunks[-1][1]:
+            first = chunks[-1][1] + 1
+        if first <= last:
+            chunks.append((first, last))
+    return chunks
+
+
+def _run_rule_chunk(conn: duckdb.DuckDBPyConnection, rule: str, chunk: Optional[Tuple[int, int]],
+                    sample_size: int) -> Tuple[int, List[Dict[str, Any]]]:
+    """Count a rule's violations in one chunk (``NULL_SMU_CHUNK`` or an SMU range) and fetch up to ``sample_size``."""
+    _, query = AUDIT_RULES[rule]
+    if chunk is NULL_SMU_CHUNK:
+        condition = "HWSD2_SMU_ID IS NULL"
+    else:
+        condition = f"HWSD2_SMU_ID BETWEEN {int(chunk[0])} AND {int(chunk[1])}"
+    query = query.format(chunk=condition)
+    cursor = conn.cursor()
+    try:
+        result = cursor.execute(
+            f"SELECT *, count(*) OVER () AS _VIOLATIONS FROM ({query}) ORDER BY 1 LIMIT {max(sample_size, 1)}"
+        )
+        columns = [d[0] for d in result.description]
+        rows = [dict(zip(columns, row)) for row in result.fetchall()]
+    finally:
+        cursor.close()
+    count = rows[0].pop("_VIOLATIONS") if rows else 0
+    for row in rows[1:]:
+        row.pop("_VIOLATIONS")
+    return count, rows[:sample_size]
+
+
+def audit_hwsd2(
+    db_path: str = "hwsd2.ddb",
+    rules: Optional[Sequence[str]] = None,
+    n_chunks: int = AUDIT_CHUNKS,
+    workers: Optional[int] = None,
+    sample_size: int = SAMPLE_SIZE,
+) -> Dict[str, Any]:
+    """
+    Audit HWSD2_LAYERS for physical consistency.
+
+    Args:
+        db_path: DuckDB database built by ``load_hwsd2.py``
+        rules: Names of the rules to run (default: all of ``AUDIT_RULES``)
+        n_chunks: Number of SMU chunks the table is split into
+        workers: Number of parallel queries (default: CPU count)
+        sample_size: Sample violating rows kept per rule
+
+    Returns:
+        JSON-serializable report with one entry per rule
+
+    Examples:
+        >>> report = audit_hwsd2("hwsd2.ddb")
+        >>> {r["rule"]: r["violations"] for r in report["rules"]}
+        >>> # Only texture and depth rules
+        >>> audit_hwsd2("hwsd2.ddb", rules=["texture_sum", "depth_order"])
+    """
+    rules = list(rules or AUDIT_RULES)
+    unknown = [rule for rule in rules if rule not in AUDIT_RULES]
+    if unknown:
+        raise ValueError(f"Unknown audit rules: {', '.join(unknown)}")
+    workers = workers or AUDIT_WORKERS
+
+    start = time.perf_counter()
+    conn = duckdb.connect(str(db_path), read_only=True)
+    try:
+        n_rows = conn.execute("SELECT count(*) FROM HWSD2_LAYERS").fetchone()[0]
+        chunks: List[Optional[Tuple[int, int]]] = list(smu_chunks(conn, n_chunks))
+        if conn.execute("SELECT count(*) FROM HWSD2_LAYERS WHERE HWSD2_SMU_ID IS NULL").fetchone()[0]:
+            chunks.append(NULL_SMU_CHUNK)
+        reports = {rule: RuleReport(rule, AUDIT_RULES[rule][0]) for rule in rules}
+        tasks = [(rule, chunk) for rule in rules for chunk in chunks
+                 if not (chunk is NULL_SMU_CHUNK and rule in SMU_RULES)]
+        with ThreadPoolExecutor(max_workers=workers) as executor:
+            results = executor.map(lambda task: _run_rule_chunk(conn, *task, sample_size), tasks)
+            # Chunks are in SMU order (rows without one last), so samples are the first violations
+            for (rule, _), (count, samples) in zip(tasks, results):
+                report = reports[rule]
+                report.violations += count
+                report.samples.extend(samples[: sample_size - len(report.samples)])
+    finally:
+        conn.close()
+
+    return {
+        "database": str(db_path),
+        "table": "HWSD2_LAYERS",
+        "generated": datetime.now(timezone.utc).isoformat(timespec="seconds"),
+        "rows": n_rows,
+        "chunks": len(chunks),
+        "workers": workers,
+        "elapsed_seconds": round(time.perf_counter() - start, 3),
+        "ok": all(not r.violations for r in reports.values()),
+        "rules": [asdict(reports[rule]) for rule in rules],
+    }
+
+
+def print_report(report: Dict[str, Any]) -> None:
+    """Print a one-line-per-rule summary of an audit report."""
+    print(f"Audit of {report['table']} in {report['database']}: "
+          f"{report['rows']:,} rows, {report['chunks']} chunks, {report['elapsed_seconds']:.2f} s")
+    for rule in report["rules"]:
+        status = "OK  " if not rule["violations"] else "FAIL"
+        print(f"  {status} {rule['rule']:<18} {rule['violations']:>9,}  {rule['description']}")
+
+
+def main():
+    """Main entry point for command-line usage."""
+    db_path = sys.argv[1] if len(sys.argv) > 1 else "hwsd2.ddb"
+    output = sys.argv[2] if len(sys.argv) > 2 else None
+
+    if not Path(db_path).exists():
+        print(f"Error: database not found: {db_path}", file=sys.stderr)
+        sys.exit(1)
+
+    report = audit_hwsd2(db_path)
+    print_report(report)
+    if output:
+        with open(output, "w") as f:
+            json.dump(report, f, indent=2, default=str)
+        print(f"\nReport saved to: {output}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,385 @@
+#!/usr/bin/env python
+"""
+Chunked export of a global lat x lon x depth HWSD2 property datacube.
+
+Builds, for selected layer properties, a (depth, lat, lon) cube on the
+30-arc-second raster grid with the SEQUENCE-share-weighted value of each
+D1-D7 layer (-9 skipped, NaN where unknown), without holding the
+7 x 21600 x 43200 array in memory:
+
+1. a lookup table (65536 SMUs x 7 layers per property) is computed once
+2. the raster is cut into spatial chunks; worker threads look each chunk up,
+   the main thread writes finished chunks to the store
+3. completed chunks are recorded in ``<output>.progress.json``; a rerun after
+   a failure or interruption skips them (resume)
+
+Stores: compressed Zarr (needs ``zarr``) or NetCDF4 (needs ``netCDF4``),
+both with CF-1.8 metadata (lat/lon/depth coordinates, depth bounds, units),
+readable with ``xarray.open_zarr``/``xarray.open_dataset``; or, without
+optional dependencies, an uncompressed directory of ``.npy`` memory maps
+with the same metadata in ``attrs.json``.
+
+Usage:
+    uv run python hwsd2_cube.py <output.zarr|output.nc|output_dir> <property> [property ...]
+"""
+
+import hashlib
+import json
+import os
+import sys
+from concurrent.futures import FIRST_COMPLETED, ThreadPoolExecutor, wait
+from pathlib import Path
+from typing import Dict, List, Optional, Sequence, Tuple, Union
+
+import numpy as np
+
+from hwsd2_extractor import LOOKUP_SIZE, STANDARD_LAYERS, share_weighted_mean_sql
+
+FORMATS = ("zarr", "netcdf", "npy")
+
+DEFAULT_CHUNK = 1080
+
+# CF units and long names of common layer properties
+PROPERTY_ATTRIBUTES = {
+    "COARSE": ("percent", "coarse fragments, by volume"),
+    "SAND": ("percent", "sand content, by weight"),
+    "SILT": ("percent", "silt content, by weight"),
+    "CLAY": ("percent", "clay content, by weight"),
+    "BULK": ("g cm-3", "bulk density"),
+    "REF_BULK": ("g cm-3", "reference bulk density"),
+    "ORG_CARBON": ("percent", "organic carbon content, by weight"),
+    "PH_WATER": ("1", "pH in water"),
+    "TOTAL_N": ("g kg-1", "total nitrogen"),
+    "CN_RATIO": ("1", "carbon to nitrogen ratio"),
+    "CEC_SOIL": ("cmol kg-1", "cation exchange capacity of the soil"),
+    "TEB": ("cmol kg-1", "total exchangeable bases"),
+    "ALUM_SAT": ("percent", "aluminium saturation"),
+    "ESP": ("percent", "exchangeable sodium percentage"),
+    "TCARBON_EQ": ("percent", "calcium carbonate equivalent"),
+    "GYPSUM": ("percent", "gypsum content"),
+    "ELEC_COND": ("dS m-1", "electrical conductivity"),
+}
+
+Window = Tuple[int, int, int, int]
+
+
+def layer_lookup(conn, properties: Sequence[str], layers=STANDARD_LAYERS) -> Dict[str, np.ndarray]:
+    """
+    Per-SMU, per-layer share-weighted property values.
+
+    Args:
+        conn: Open DuckDB connection to an HWSD2 database
+        properties: HWSD2_LAYERS columns
+        layers: (name, top, bottom) layers forming the depth axis
+
+    Returns:
+        {property: (65536, n_layers) float32 array}, NaN where unknown
+    """
+    means = ", ".join(f"{share_weighted_mean_sql(p)} AS {p}" for p in properties)
+    names = [name for name, _, _ in layers]
+    rows = conn.execute(f"SELECT HWSD2_SMU_ID, LAYER, {means} FROM HWSD2_LAYERS "
+                        f"WHERE LAYER IN ({', '.join('?' * len(names))}) GROUP BY ALL", names).df()
+    ids = rows["HWSD2_SMU_ID"].to_numpy(dtype=np.int64)
+    depth = rows["LAYER"].map({name: i for i, name in enumerate(names)}).to_numpy(dtype=np.int64)
+    lookup = {}
+    for p in properties:
+        table = np.full((LOOKUP_SIZE, len(names)), np.nan, dtype=np.float32)
+        table[ids, depth] = rows[p].to_numpy(dtype=float)
+        lookup[p] = table
+    return lookup
+
+
+def chunk_windows(nrows: int, ncols: int, chunk: int) -> List[Window]:
+    """
+    Row-major (row_start, row_stop, col_start, col_stop) chunks of a grid.
+
+    Examples:
+        >>> chunk_windows(3, 5, 2)
+        [(0, 2, 0, 2), (0, 2, 2, 4), (0, 2, 4, 5), (2, 3, 0, 2), (2, 3, 2, 4), (2, 3, 4, 5)]
+    """
+    return [(r, min(r + chunk, nrows), c, min(c + chunk, ncols))
+            for r in range(0, nrows, chunk) for c in range(0, ncols, chunk)]
+
+
+def cf_metadata(extractor, properties: Sequence[str], layers=STANDARD_LAYERS):
+    """
+    Coordinates and CF attributes of the cube.
+
+    Returns:
+        (coords, attrs): coords maps lat, lon, depth, depth_bnds to
+        (dimensions, values, attributes); attrs maps each property to its
+        attributes and "global" to the dataset attributes
+    """
+    lat = extractor.uly - np.arange(extractor.nrows) * extractor.ydim
+    lon = extractor.ulx + np.arange(extractor.ncols) * extractor.xdim
+    bounds = np.array([[top, bottom] for _, top, bottom in layers], dtype=float)
+    coords = {
+        "lat": (("lat",), lat, {"standard_name": "latitude", "units": "degrees_north", "axis": "Y"}),
+        "lon": (("lon",), lon, {"standard_name": "longitude", "units": "degrees_east", "axis": "X"}),
+        "depth": (("depth",), bounds.mean(axis=1), {"standard_name": "depth", "units": "cm", "positive": "down",
+                                                   "axis": "Z", "bounds": "depth_bnds"}),
+        "depth_bnds": (("depth", "nv"), bounds, {"units": "cm"}),
+    }
+    attrs = {"global": {"Conventions": "CF-1.8", "title": "HWSD v2.0 layer properties",
+                        "source": "Harmonized World Soil Database v2.0 (FAO/IIASA)",
+                        "comment": "SEQUENCE SHARE-weighted means of the D1-D7 layers of each soil mapping unit"}}
+    for p in properties:
+        units, long_name = PROPERTY_ATTRIBUTES.get(p, ("1", p.lower().replace("_", " ")))
+        attrs[p] = {"units": units, "long_name": long_name, "cell_methods": "area: mean where land"}
+    return coords, attrs
+
+
+class _NpyStore:
+    """Directory of (depth, lat, lon) ``.npy`` memory maps with CF metadata in attrs.json."""
+
+    def __init__(self, path: Path, coords, attrs, shape, chunk, resume):
+        path.mkdir(parents=True, exist_ok=True)
+        mode = "r+" if resume else "w+"
+        self.arrays = {
+            name: np.lib.format.open_memmap(path / f"{name}.npy", mode=mode, dtype=np.float32,
+                                            shape=None if resume else shape)
+            for name in attrs if name != "global"
+        }
+        if not resume:
+            np.savez(path / "coords.npz", **{name: values for name, (_, values, _) in coords.items()})
+            meta = {"coords": {name: {"dims": dims, "attrs": a} for name, (dims, _, a) in coords.items()},
+                    "variables": {name: {"dims": ["depth", "lat", "lon"], "attrs": a}
+                                  for name, a in attrs.items() if name != "global"},
+                    "attrs": attrs["global"]}
+            (path / "attrs.json").write_text(json.dumps(meta, indent=2))
+
+    def write(self, name, window, block):
+        r0, r1, c0, c1 = window
+        self.arrays[name][:, r0:r1, c0:c1] = block
+
+    def sync(self):
+        for array in self.arrays.values():
+            array.flush()
+
+    def close(self):
+        self.sync()
+
+
+class _ZarrStore:
+    """Zarr group with xarray-compatible dimension names."""
+
+    def __init__(self, path: Path, coords, attrs, shape, chunk, resume):
+        import zarr
+
+        self.root = zarr.open_group(str(path), mode="a" if resume else "w")
+        if resume:
+            return
+        self.root.attrs.update(attrs["global"])
+        for name, (dims, values, a) in coords.items():
+            self._create(name, dims, values.shape, values.shape, values.dtype, None, a)[...] = values
+        for name, a in attrs.items():
+            if name != "global":
+                self._create(name, ("depth", "lat", "lon"), shape, (shape[0], chunk, chunk), "f4", np.nan, a)
+
+    def _create(self, name, dims, shape, chunks, dtype, fill_value, attrs):
+        if hasattr(self.root, "create_array"):          # zarr 3
+            array = self.root.create_array(name, shape=shape, chunks=chunks, dtype=dtype, fill_value=fill_value,
+                                           dimension_names=dims)
+        else:
+            array = self.root.create_dataset(name, shape=shape, chunks=chunks, dtype=dtype, fill_value=fill_value)
+            array.attrs["_ARRAY_DIMENSIONS"] = list(dims)
+        array.attrs.update(attrs)
+        return array
+
+    def write(self, name, window, block):
+        r0, r1, c0, c1 = window
+        self.root[name][:, r0:r1, c0:c1] = block
+
+    def sync(self):
+        pass
+
+    def close(self):
+        pass
+
+
+class _NetCDFStore:
+    """NetCDF4 file with zlib-compressed, chunked variables."""
+
+    def __init__(self, path: Path, coords, attrs, shape, chunk, resume):
+        import netCDF4
+
+        self.ds = netCDF4.Dataset(str(path), "a" if resume else "w", format="NETCDF4")
+        if resume:
+            return
+        self.ds.setncatts(attrs["global"])
+        self.ds.createDimension("nv", 2)
+        for name in ("depth", "lat", "lon"):
+            self.ds.createDimension(name, len(coords[name][1]))
+        for name, (dims, values, a) in coords.items():
+            variable = self.ds.createVariable(name, values.dtype, dims)
+            variable.setncatts(a)
+            variable[:] = values
+        for name, a in attrs.items():
+            if name != "global":
+                variable = self.ds.createVariable(name, "f4", ("depth", "lat", "lon"), zlib=True, complevel=4,
+                                                  chunksizes=(shape[0], min(chunk, shape[1]), min(chunk, shape[2])),
+                                                  fill_value=np.float32(np.nan))
+                variable.setncatts(a)
+
+    def write(self, name, window, block):
+        r0, r1, c0, c1 = window
+        self.ds[name][:, r0:r1, c0:c1] = block
+
+    def sync(self):
+        self.ds.sync()
+
+    def close(self):
+        self.ds.close()
+
+
+_STORES = {"zarr": _ZarrStore, "netcdf": _NetCDFStore, "npy": _NpyStore}
+
+
+def _infer_format(path: Path) -> str:
+    if path.suffix == ".zarr":
+        return "zarr"
+    if path.suffix in (".nc", ".nc4"):
+        return "netcdf"
+    return "npy"
+
+
+def progress_path(path: Union[str, Path]) -> Path:
+    """Progress file recording the completed chunks of an export."""
+    path = Path(path)
+    return path.with_name(path.name + ".progress.json")
+
+
+def _config_hash(extractor, lookup, chunk, format) -> str:
+    digest = hashlib.sha1(json.dumps([extractor.nrows, extractor.ncols, chunk, format, list(lookup)]).encode())
+    for table in lookup.values():
+        digest.update(np.ascontiguousarray(table).tobytes())
+    return digest.hexdigest()
+
+
+def _save_progress(path: Path, config: str, done) -> None:
+    temporary = path.with_name(path.name + ".tmp")
+    temporary.write_text(json.dumps({"config": config, "done": sorted(done)}))
+    os.replace(temporary, path)
+
+
+def export_cube(
+    path: Union[str, Path],
+    lookup: Dict[str, np.ndarray],
+    extractor,
+    format: Optional[str] = None,
+    chunk: int = DEFAULT_CHUNK,
+    workers: Optional[int] = None,
+    resume: bool = True,
+    layers=STANDARD_LAYERS,
+) -> Dict[str, int]:
+    """
+    Write the datacube chunk by chunk.
+
+    Args:
+        path: Output store (``.zarr`` directory, ``.nc`` file or ``.npy`` directory)
+        lookup: Per-SMU layer values from ``layer_lookup``
+        extractor: ``HWSD2Extractor`` with the SMU raster
+        format: "zarr", "netcdf" or "npy" (default: from the path suffix)
+        chunk: Chunk size in pixels (lat and lon)
+        workers: Threads computing chunks (None: default pool size, 1: serial)
+        resume: Continue a previous export of the same configuration instead
+            of starting over
+        layers: Layers forming the depth axis (must match ``lookup``)
+
+    Returns:
+        {"chunks": total, "written": this run, "skipped": already done}
+
+    Raises:
+        ValueError: If the format is unknown
+        RuntimeError: If chunks failed; completed chunks are kept, so calling
+            again resumes with the failed ones
+
+    Examples:
+        >>> lookup = layer_lookup(conn, ["SAND", "CLAY", "ORG_CARBON"])
+        >>> export_cube("hwsd2_cube.zarr", lookup, HWSD2Extractor(), workers=4)
+    """
+    path = Path(path)
+    format = format or _infer_format(path)
+    if format not in FORMATS:
+        raise ValueError(f"Unknown format {format!r}; expected one of {FORMATS}")
+    windows = chunk_windows(extractor.nrows, extractor.ncols, chunk)
+    progress = progress_path(path)
+    config = _config_hash(extractor, lookup, chunk, format)
+    done = set()
+    if resume and progress.exists() and path.exists():
+        state = json.loads(progress.read_text())
+        if state["config"] == config:
+            done = set(state["done"])
+
+    coords, attrs = cf_metadata(extractor, list(lookup), layers)
+    shape = (len(layers), extractor.nrows, extractor.ncols)
+    store = _STORES[format](path, coords, attrs, shape, chunk, resume=bool(done))
+    _save_progress(progress, config, done)
+    raster = extractor.open_raster()
+
+    def compute(index):
+        r0, r1, c0, c1 = windows[index]
+        smu = np.asarray(raster[r0:r1, c0:c1])
+        return {name: np.moveaxis(table[smu], -1, 0) for name, table in lookup.items()}
+
+    pending = [i for i in range(len(windows)) if i not in done]
+    failures = []
+    written = 0
+    max_in_flight = 2 * (workers or os.cpu_count() or 1)
+    try:
+        with ThreadPoolExecutor(max_workers=workers) as pool:
+            queue = iter(pending)
+            running = {}
+            while True:
+                while len(running) < max_in_flight:
+                    index = next(queue, None)
+                    if index is None:
+                        break
+                    running[pool.submit(compute, index)] = index
+                if not running:
+                    break
+                finished, _ = wait(running, return_when=FIRST_COMPLETED)
+                for future in finished:
+                    index = running.pop(future)
+                    try:
+                        for name, block in future.result().items():
+                            store.write(name, windows[index], block)
+                        store.sync()
+                    except Exception as error:  # keep going; the chunk is retried on resume
+                        failures.append((index, error))
+                        continue
+                    done.add(index)
+                    written += 1
+                    _save_progress(progress, config, done)
+    finally:
+        store.close()
+    if failures:
+        index, error = failures[0]
+        raise RuntimeError(f"{len(failures)} of {len(windows)} chunks failed (first: chunk {index} "
+                           f"{windows[index]}: {error}); rerun to resume") from error
+    return {"chunks": len(windows), "written": written, "skipped": len(windows) - len(pending)}
+
+
+def main():
+    """Main entry point for command-line usage."""
+    if len(sys.argv) < 3:
+        print("Usage: python hwsd2_cube.py <output.zarr|output.nc|output_dir> <property> [property ...]")
+        print("Example: python hwsd2_cube.py hwsd2_cube.zarr SAND CLAY ORG_CARBON")
+        sys.exit(1)
+
+    import duckdb
+    from hwsd2_extractor import HWSD2Extractor
+
+    output, properties = sys.argv[1], sys.argv[2:]
+    extractor = HWSD2Extractor()
+    conn = duckdb.connect(str(extractor.db_path), read_only=True)
+    try:
+        lookup = layer_lookup(conn, properties)
+    finally:
+        conn.close()
+    summary = export_cube(output, lookup, extractor)
+    print(f"Wrote {summary['written']} chunks ({summary['skipped']} already done) to {output}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,363 @@
+#!/usr/bin/env python
+"""
+Derived soil properties computed from HWSD2_LAYERS.
+
+Each property is defined once, as a formula over column arrays, and evaluated
+vectorized over whole tables:
+
+Layer properties (one value per HWSD2_LAYERS row):
+    THICKNESS    BOTDEP - TOPDEP                                        cm
+    FINE_EARTH   BULK × THICKNESS × (1 - COARSE/100) × 10                kg/m²
+    SOC_STOCK    ORG_CARBON/100 × FINE_EARTH                             kg C/m²
+    N_STOCK      TOTAL_N/1000 × FINE_EARTH                               kg N/m²
+    THETA_WP, THETA_FC, THETA_SAT, KSAT, VG_ALPHA, VG_N
+                 Saxton & Rawls hydraulic parameters (hwsd2_pedotransfer.py)
+    AWC_PTF_LAYER
+                 (THETA_FC - THETA_WP) × THICKNESS × 10 × (1 - COARSE/100)  mm
+                 (named apart from HWSD2's own AWC, the schema's awc_layer)
+
+Profile properties (one value per HWSD2_SMU_ID and SEQUENCE):
+    SOC_STOCK_30, SOC_STOCK_100, SOC_STOCK_TOTAL    kg C/m² (0-30 cm, 0-100 cm, whole profile)
+    N_STOCK_TOTAL                                    kg N/m²
+    AWC_PTF_100                                      mm (sum of AWC_PTF_LAYER, 0-100 cm)
+    AWC_PROFILE                                      mm (HWSD2's AWC for the rootable depth)
+
+Missing values (-9) propagate as NaN; the depth-limited stocks (SOC_STOCK_30,
+SOC_STOCK_100, AWC_PTF_100) are NaN unless the layers cover that whole depth
+(see ``hwsd2_harmonize.resample``). ``materialize_derived`` stores the
+results in the database (as extra HWSD2_LAYERS columns, or as the
+HWSD2_LAYERS_DERIVED table, plus HWSD2_PROFILES_DERIVED), so extraction
+returns them with no per-query computation.
+
+Usage:
+    uv run python hwsd2_derived.py <db_path> [columns|tables]
+"""
+
+import sys
+from dataclasses import dataclass
+from typing import Callable, Dict, Iterable, List, Mapping, Optional, Tuple
+
+import numpy as np
+
+from hwsd2_extractor import MISSING_VALUE
+from hwsd2_pedotransfer import saxton_rawls
+
+PROFILE_KEYS = ("HWSD2_SMU_ID", "SEQUENCE")
+
+LAYERS_DERIVED_TABLE = "HWSD2_LAYERS_DERIVED"
+PROFILES_DERIVED_TABLE = "HWSD2_PROFILES_DERIVED"
+
+MATERIALIZE_MODES = ("columns", "tables")
+
+
+@dataclass(frozen=True)
+class LayerProperty:
+    """A per-layer property: ``formula`` maps input arrays (by name) to an array."""
+
+    name: str
+    inputs: Tuple[str, ...]
+    formula: Callable[..., np.ndarray]
+    units: str
+    description: str
+
+
+@dataclass(frozen=True)
+class ProfileProperty:
+    """
+    A per-profile property aggregated from a layer column.
+
+    ``aggregate`` is "sum" (over the layers, or over 0-``depth`` cm with
+    partial layers prorated by thickness) or "first" (a value repeated on
+    every layer of the profile).
+    """
+
+    name: str
+    source: str
+    aggregate: str
+    units: str
+    description: str
+    depth: Optional[float] = None
+
+
+def _hydraulic(parameter: str) -> Callable[..., np.ndarray]:
+    """Formula for one Saxton & Rawls parameter, bulk-density adjusted."""
+    def formula(SAND, CLAY, ORG_CARBON, BULK):
+        return saxton_rawls(SAND, CLAY, ORG_CARBON, BULK)[parameter]
+    return formula
+
+
+_HYDRAULIC_INPUTS = ("SAND", "CLAY", "ORG_CARBON", "BULK")
+
+LAYER_PROPERTIES: Dict[str, LayerProperty] = {p.name: p for p in (
+    LayerProperty("THICKNESS", ("TOPDEP", "BOTDEP"),
+                  lambda TOPDEP, BOTDEP: BOTDEP - TOPDEP,
+                  "cm", "Layer thickness"),
+    LayerProperty("FINE_EARTH", ("BULK", "THICKNESS", "COARSE"),
+                  lambda BULK, THICKNESS, COARSE: BULK * THICKNESS * (1 - COARSE / 100) * 10,
+                  "kg/m²", "Fine-earth mass of the layer"),
+    LayerProperty("SOC_STOCK", ("ORG_CARBON", "FINE_EARTH"),
+                  lambda ORG_CARBON, FINE_EARTH: ORG_CARBON / 100 * FINE_EARTH,
+                  "kg C/m²", "Soil organic carbon stock of the layer"),
+    LayerProperty("N_STOCK", ("TOTAL_N", "FINE_EARTH"),
+                  lambda TOTAL_N, FINE_EARTH: TOTAL_N / 1000 * FINE_EARTH,
+                  "kg N/m²", "Total nitrogen stock of the layer"),
+    LayerProperty("THETA_WP", _HYDRAULIC_INPUTS, _hydraulic("wilting_point"),
+                  "m³/m³", "Water content at wilting point (1500 kPa)"),
+    LayerProperty("THETA_FC", _HYDRAULIC_INPUTS, _hydraulic("field_capacity"),
+                  "m³/m³", "Water content at field capacity (33 kPa)"),
+    LayerProperty("THETA_SAT", _HYDRAULIC_INPUTS, _hydraulic("saturation"),
+                  "m³/m³", "Saturated water content"),
+    LayerProperty("KSAT", _HYDRAULIC_INPUTS, _hydraulic("ksat"),
+                  "mm/h", "Saturated hydraulic conductivity"),
+    LayerProperty("VG_ALPHA", _HYDRAULIC_INPUTS, _hydraulic("vg_alpha"),
+                  "1/kPa", "van Genuchten alpha"),
+    LayerProperty("VG_N", _HYDRAULIC_INPUTS, _hydraulic("vg_n"),
+                  "1", "van Genuchten n"),
+    LayerProperty("AWC_PTF_LAYER", ("THETA_FC", "THETA_WP", "THICKNESS", "COARSE"),
+                  lambda THETA_FC, THETA_WP, THICKNESS, COARSE:
+                      (THETA_FC - THETA_WP) * THICKNESS * 10 * (1 - COARSE / 100),
+                  "mm", "Plant-available water of the layer"),
+)}
+
+PROFILE_PROPERTIES: Dict[str, ProfileProperty] = {p.name: p for p in (
+    ProfileProperty("SOC_STOCK_30", "SOC_STOCK", "sum", "kg C/m²", "SOC stock, 0-30 cm", depth=30),
+    ProfileProperty("SOC_STOCK_100", "SOC_STOCK", "sum", "kg C/m²", "SOC stock, 0-100 cm", depth=100),
+    ProfileProperty("SOC_STOCK_TOTAL", "SOC_STOCK", "sum", "kg C/m²", "SOC stock of the whole profile"),
+    ProfileProperty("N_STOCK_TOTAL", "N_STOCK", "sum", "kg N/m²", "Nitrogen stock of the whole profile"),
+    ProfileProperty("AWC_PTF_100", "AWC_PTF_LAYER", "sum", "mm", "Plant-available water, 0-100 cm", depth=100),
+    ProfileProperty("AWC_PROFILE", "AWC", "first", "mm", "Available water capacity of the rootable depth"),
+)}
+
+
+def _numeric(values) -> np.ndarray:
+    """Float array with -9, nulls and unparseable strings (e.g. VARCHAR AWC) as NaN."""
+    array = np.asarray(values)
+    if array.dtype.kind not in "biuf":
+        import pandas as pd
+
+        array = pd.to_numeric(pd.Series(values), errors="coerce").to_numpy(dtype=float, na_value=np.nan)
+    array = array.astype(float)
+    return np.where(array == MISSING_VALUE, np.nan, array)
+
+
+def layer_inputs(names: Optional[Iterable[str]] = None) -> List[str]:
+    """
+    HWSD2_LAYERS columns needed to compute the given layer properties.
+
+    Args:
+        names: Layer property names (default: all)
+
+    Returns:
+        Column names, in first-use order
+
+    Examples:
+        >>> layer_inputs(["SOC_STOCK"])
+        ['ORG_CARBON', 'BULK', 'TOPDEP', 'BOTDEP', 'COARSE']
+    """
+    columns: Dict[str, None] = {}
+
+    def visit(name):
+        for dependency in LAYER_PROPERTIES[name].inputs:
+            if dependency in LAYER_PROPERTIES:
+                visit(dependency)
+            else:
+                columns[dependency] = None
+
+    for name in LAYER_PROPERTIES if names is None else names:
+        visit(name)
+    return list(columns)
+
+
+def compute_layer_properties(
+    columns: Mapping[str, Iterable],
+    names: Optional[Iterable[str]] = None,
+) -> Dict[str, np.ndarray]:
+    """
+    Evaluate layer properties over column arrays.
+
+    Args:
+        columns: Column name to values (dict of arrays, or a DataFrame)
+        names: Layer property names (default: all); dependencies are computed too
+
+    Returns:
+        Property name to float array, for the requested properties
+
+    Raises:
+        KeyError: If a property name or an input column is unknown
+
+    Examples:
+        >>> stocks = compute_layer_properties(
+        ...     {"TOPDEP": [0, 20], "BOTDEP": [20, 40], "BULK": [1.3, -9],
+        ...      "COARSE": [10.0, 0.0], "ORG_CARBON": [1.0, 0.5]}, ["SOC_STOCK"])
+        >>> stocks["SOC_STOCK"].round(3)
+        array([2.34,  nan])
+    """
+    names = list(LAYER_PROPERTIES if names is None else names)
+    unknown = [name for name in names if name not in LAYER_PROPERTIES]
+    if unknown:
+        raise KeyError(f"Unknown layer properties: {unknown}")
+
+    values: Dict[str, np.ndarray] = {}
+
+    def evaluate(name):
+        if name not in values:
+            prop = LAYER_PROPERTIES[name]
+            arguments = {}
+            for dependency in prop.inputs:
+                if dependency in LAYER_PROPERTIES:
+                    arguments[dependency] = evaluate(dependency)
+                else:
+                    arguments[dependency] = _numeric(columns[dependency])
+            values[name] = prop.formula(**arguments)
+        return values[name]
+
+    return {name: evaluate(name) for name in names}
+
+
+def derive_layers(layers, names: Optional[Iterable[str]] = None):
+    """
+    Add layer properties as columns of a copy of an HWSD2_LAYERS DataFrame.
+
+    Args:
+        layers: pandas DataFrame with the input columns
+        names: Layer property names (default: all)
+
+    Returns:
+        DataFrame with the property columns added (or replaced)
+    """
+    result = layers.copy()
+    for name, values in compute_layer_properties(layers, names).items():
+        result[name] = values
+    return result
+
+
+def derive_profiles(
+    layers,
+    names: Optional[Iterable[str]] = None,
+    profile_keys: Iterable[str] = PROFILE_KEYS,
+):
+    """
+    Aggregate profile properties from an HWSD2_LAYERS DataFrame.
+
+    Args:
+        layers: pandas DataFrame of layers (layer properties are computed if
+            absent)
+        names: Profile property names (default: all)
+        profile_keys: Columns identifying a profile
+
+    Returns:
+        DataFrame with one row per profile: the keys and the properties
+
+    Raises:
+        KeyError: If a property name is unknown
+    """
+    import pandas as pd
+    from hwsd2_harmonize import harmonize_layers
+
+    names = list(PROFILE_PROPERTIES if names is None else names)
+    unknown = [name for name in names if name not in PROFILE_PROPERTIES]
+    if unknown:
+        raise KeyError(f"Unknown profile properties: {unknown}")
+    keys = [k for k in profile_keys if k in layers.columns]
+    properties = [PROFILE_PROPERTIES[name] for name in names]
+
+    missing = [p.source for p in properties if p.source not in layers.columns and p.source in LAYER_PROPERTIES]
+    if missing:
+        layers = derive_layers(layers, dict.fromkeys(missing))
+    frame = layers[keys + ["TOPDEP", "BOTDEP"]].copy()
+    for source in dict.fromkeys(p.source for p in properties):
+        frame[source] = _numeric(layers[source])
+
+    grouped = frame.groupby(keys, sort=True)
+    result = grouped.size().index.to_frame(index=False)
+    for prop in properties:
+        if prop.aggregate == "first":
+            result[prop.name] = grouped[prop.source].first().to_numpy()
+        elif prop.depth is None:
+            result[prop.name] = grouped[prop.source].sum(min_count=1).to_numpy()
+        else:
+            # Prorate partial layers by thickness (mass-conserving resampling)
+            within = harmonize_layers(frame, [0, prop.depth], intensive=[], extensive=[prop.source],
+                                      profile_keys=keys)
+            result[prop.name] = result[keys].merge(within, on=keys, how="left")[prop.source].to_numpy()
+    return pd.DataFrame(result)
+
+
+def materialize_derived(conn, mode: str = "columns") -> Dict[str, int]:
+    """
+    Compute all derived properties over HWSD2_LAYERS and store them.
+
+    Args:
+        conn: Open DuckDB connection to an HWSD2 database
+        mode: "columns" adds the layer properties as HWSD2_LAYERS columns
+            (``SELECT *`` and the extractor return them); "tables" writes them
+            to HWSD2_LAYERS_DERIVED (ID and properties) instead. Profile
+            properties always go to HWSD2_PROFILES_DERIVED.
+
+    Returns:
+        Row counts: {"layers": ..., "profiles": ...}
+
+    Raises:
+        ValueError: If the mode is unknown
+
+    Examples:
+        >>> import duckdb
+        >>> conn = duckdb.connect("hwsd2.ddb")
+        >>> materialize_derived(conn)
+    """
+    if mode not in MATERIALIZE_MODES:
+        raise ValueError(f"Unknown mode {mode!r}; expected one of {MATERIALIZE_MODES}")
+    names = [name for name in LAYER_PROPERTIES]
+    existing = {row[0] for row in conn.execute(
+        "SELECT column_name FROM information_schema.columns WHERE table_name = 'HWSD2_LAYERS'").fetchall()}
+    inputs = [c for c in dict.fromkeys(["ID", *PROFILE_KEYS, *layer_inputs(names), "AWC"]) if c not in names]
+    missing = [c for c in inputs if c not in existing]
+    if missing:
+        raise ValueError(f"HWSD2_LAYERS lacks input columns: {missing}")
+
+    layers = conn.execute(f"SELECT {', '.join(inputs)} FROM HWSD2_LAYERS").df()
+    derived = layers[["ID"]].copy()
+    for name, values in compute_layer_properties(layers, names).items():
+        derived[name] = values
+    profiles = derive_profiles(layers.join(derived.drop(columns="ID")))
+
+    conn.register("_derived_layers", derived)
+    conn.register("_derived_profiles", profiles)
+    try:
+        if mode == "columns":
+            for name in names:
+                conn.execute(f"ALTER TABLE HWSD2_LAYERS ADD COLUMN IF NOT EXISTS {name} DOUBLE")
+            assignments = ", ".join(f"{name} = d.{name}" for name in names)
+            conn.execute(f"UPDATE HWSD2_LAYERS SET {assignments} FROM _derived_layers d "
+                         f"WHERE HWSD2_LAYERS.ID = d.ID")
+        else:
+            conn.execute(f"CREATE OR REPLACE TABLE {LAYERS_DERIVED_TABLE} AS SELECT * FROM _derived_layers")
+        conn.execute(f"CREATE OR REPLACE TABLE {PROFILES_DERIVED_TABLE} AS SELECT * FROM _derived_profiles")
+    finally:
+        conn.unregister("_derived_layers")
+        conn.unregister("_derived_profiles")
+    return {"layers": len(derived), "profiles": len(profiles)}
+
+
+def main():
+    """Main entry point for command-line usage."""
+    if len(sys.argv) < 2:
+        print("Usage: python hwsd2_derived.py <db_path> [columns|tables]")
+        sys.exit(1)
+
+    import duckdb
+
+    mode = sys.argv[2] if len(sys.argv) > 2 else "columns"
+    conn = duckdb.connect(sys.argv[1])
+    try:
+        counts = materialize_derived(conn, mode)
+    except ValueError as e:
+        print(f"Error: {e}", file=sys.stderr)
+        sys.exit(1)
+    finally:
+        conn.close()
+    print(f"Derived properties: {counts['layers']:,} layers, {counts['profiles']:,} profiles")
+
+
+if __name__ == "__main__":
+    main()
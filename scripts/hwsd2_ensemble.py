@@ -0,0 +1,258 @@
+#!/usr/bin/env python
+"""
+Monte Carlo sequence sampling for soil uncertainty ensembles.
+
+Each HWSD2 soil mapping unit is a mixture of SEQUENCEs with SHARE
+percentages; a single extracted profile hides that uncertainty. This module
+draws, for every point, N ensemble members: each member is one sequence of
+the point's SMU, picked with probability SHARE, optionally with its
+properties perturbed.
+
+All draws are vectorized over points and members:
+
+1. ``SequenceTable`` holds every (SMU, SEQUENCE) profile in memory as a
+   (n_sequences, n_layers, n_properties) array, with per-SMU cumulative
+   shares laid end to end (SMU rank + cumulative share within the SMU)
+2. one ``searchsorted`` of (SMU rank + uniform draw) into those keys picks
+   the sequences of all points x members at once
+3. perturbations add one normal draw per (point, member, property), applied
+   to every layer of the drawn profile (fully depth-correlated)
+
+Draws are reproducible: the same seed, points and members give the same
+ensemble. Drawing 1000 members for 10,000 points takes under a second; the
+value gather is bounded by the output size (n_points x n_members x 7
+float32 per property).
+
+Usage:
+    uv run python hwsd2_ensemble.py <lat> <lon> [n_members] [seed]
+"""
+
+import sys
+from dataclasses import dataclass, field
+from typing import Dict, Optional, Sequence, Tuple
+
+import numpy as np
+
+from hwsd2_extractor import LOOKUP_SIZE, MISSING_VALUE, STANDARD_LAYERS
+
+DEFAULT_PROPERTIES = ("SAND", "SILT", "CLAY", "ORG_CARBON", "BULK", "PH_WATER")
+
+
+@dataclass
+class SequenceTable:
+    """
+    In-memory profiles of every (SMU, SEQUENCE), sorted by SMU then SEQUENCE.
+
+    Attributes:
+        smu: (n_sequences,) HWSD2_SMU_ID
+        sequence: (n_sequences,) SEQUENCE
+        share: (n_sequences,) SHARE (%)
+        values: (n_sequences, n_layers, n_properties) float32, NaN where missing
+        properties: Property names
+        layers: (name, top, bottom) layers
+    """
+
+    smu: np.ndarray
+    sequence: np.ndarray
+    share: np.ndarray
+    values: np.ndarray
+    properties: Tuple[str, ...]
+    layers: Tuple[Tuple[str, int, int], ...] = STANDARD_LAYERS
+    _keys: np.ndarray = field(init=False, repr=False)
+    _rank: np.ndarray = field(init=False, repr=False)
+    _columns: np.ndarray = field(init=False, repr=False)
+
+    def __post_init__(self):
+        self.smu = np.asarray(self.smu, dtype=np.int64)
+        if not len(self.smu):
+            raise ValueError("SequenceTable needs at least one sequence")
+        starts = np.flatnonzero(np.r_[True, self.smu[1:] != self.smu[:-1]])
+        counts = np.diff(np.r_[starts, len(self.smu)])
+        ranks = np.repeat(np.arange(len(starts)), counts)
+        share = np.clip(np.asarray(self.share, dtype=float), 0, None)
+        # SMUs without shares fall back to equal weights
+        share = np.where(np.repeat(np.add.reduceat(share, starts), counts) > 0, share, 1.0)
+        totals = np.add.reduceat(share, starts)
+        cumulative = np.cumsum(share) - np.repeat(np.cumsum(totals) - totals, counts)
+        within = cumulative / np.repeat(totals, counts)
+        within[starts + counts - 1] = 1.0  # exact upper bound, so a draw never leaves its SMU
+        self._keys = ranks + within
+        self._rank = np.full(LOOKUP_SIZE, -1, dtype=np.int64)
+        self._rank[self.smu[starts]] = np.arange(len(starts))
+        # Contiguous (n_properties, n_sequences + 1, n_layers) copy for gathers; the extra row is all NaN
+        values = np.asarray(self.values, dtype=np.float32)
+        self._columns = np.full((values.shape[2], len(values) + 1, values.shape[1]), np.nan, dtype=np.float32)
+        self._columns[:, :-1] = np.moveaxis(values, -1, 0)
+
+    def __len__(self) -> int:
+        return len(self.smu)
+
+    @classmethod
+    def from_frame(cls, layers, properties: Sequence[str] = DEFAULT_PROPERTIES, layers_axis=STANDARD_LAYERS):
+        """
+        Build from an HWSD2_LAYERS DataFrame.
+
+        Args:
+            layers: DataFrame with HWSD2_SMU_ID, SEQUENCE, SHARE, LAYER and the
+                properties (-9 is missing)
+            properties: Property columns
+            layers_axis: (name, top, bottom) layers forming the depth axis
+
+        Returns:
+            SequenceTable
+        """
+        properties = tuple(properties)
+        names = [name for name, _, _ in layers_axis]
+        frame = layers[layers["LAYER"].isin(names)]
+        keys = frame[["HWSD2_SMU_ID", "SEQUENCE"]].to_numpy(dtype=np.int64)
+        unique, row = np.unique(keys, axis=0, return_inverse=True)
+        row = row.reshape(-1)
+        depth = frame["LAYER"].map({name: i for i, name in enumerate(names)}).to_numpy(dtype=np.int64)
+        values = np.full((len(unique), len(names), len(properties)), np.nan, dtype=np.float32)
+        for k, name in enumerate(properties):
+            column = frame[name].to_numpy(dtype=float)
+            values[row, depth, k] = np.where(column == MISSING_VALUE, np.nan, column)
+        share = np.zeros(len(unique))
+        share[row] = frame["SHARE"].to_numpy(dtype=float)
+        return cls(unique[:, 0], unique[:, 1], share, values, properties, tuple(layers_axis))
+
+    @classmethod
+    def from_duckdb(cls, conn, properties: Sequence[str] = DEFAULT_PROPERTIES, layers_axis=STANDARD_LAYERS):
+        """Build from HWSD2_LAYERS of an open DuckDB connection (see ``from_frame``)."""
+        columns = ", ".join(["HWSD2_SMU_ID", "SEQUENCE", "SHARE", "LAYER", *properties])
+        return cls.from_frame(conn.execute(f"SELECT {columns} FROM HWSD2_LAYERS").df(), properties, layers_axis)
+
+    def draw(self, smu_ids, n_members: int, seed=None) -> np.ndarray:
+        """
+        Sequence rows for every point and member, drawn with probability SHARE.
+
+        Args:
+            smu_ids: (n_points,) HWSD2_SMU_IDs (unknown ids and nodata give -1)
+            n_members: Ensemble size
+            seed: Seed or ``numpy.random.Generator``
+
+        Returns:
+            (n_points, n_members) int64 rows into the table, -1 where the SMU is unknown
+        """
+        rng = np.random.default_rng(seed)
+        rank = self._rank[np.asarray(smu_ids, dtype=np.int64) % LOOKUP_SIZE]
+        uniform = rng.random((len(rank), n_members))
+        rows = np.searchsorted(self._keys, rank[:, None] + uniform, side="right")
+        return np.where(rank[:, None] >= 0, rows, -1)
+
+    def sample(
+        self,
+        smu_ids,
+        n_members: int,
+        seed=None,
+        perturb: Optional[Dict[str, float]] = None,
+        clip_negative: bool = True,
+    ) -> Dict[str, np.ndarray]:
+        """
+        Draw an ensemble of profiles for every point.
+
+        Args:
+            smu_ids: (n_points,) HWSD2_SMU_IDs
+            n_members: Ensemble size
+            seed: Seed or ``numpy.random.Generator``
+            perturb: Standard deviation (in property units) of normal noise per
+                property, e.g. {"SAND": 5.0, "ORG_CARBON": 0.2}
+            clip_negative: Clip perturbed values at 0
+
+        Returns:
+            Dictionary with SMU and SEQUENCE (n_points, n_members), 0 where
+            unknown, and one (n_points, n_members, n_layers) float32 array per
+            property
+
+        Raises:
+            KeyError: If a perturbed property is not in the table
+
+        Examples:
+            >>> table = SequenceTable.from_duckdb(conn, ["SAND", "CLAY"])
+            >>> ensemble = table.sample(smu_ids, n_members=1000, seed=42, perturb={"SAND": 5.0})
+            >>> ensemble["SAND"].shape                 # (n_points, 1000, 7)
+        """
+        perturb = dict(perturb or {})
+        unknown = [name for name in perturb if name not in self.properties]
+        if unknown:
+            raise KeyError(f"Cannot perturb properties not in the table: {unknown}")
+        rng = np.random.default_rng(seed)
+        rows = self.draw(smu_ids, n_members, rng)
+        missing = rows < 0
+        safe = np.where(missing, 0, rows)
+        result = {
+            "SMU": np.where(missing, 0, self.smu[safe]),
+            "SEQUENCE": np.where(missing, 0, np.asarray(self.sequence)[safe]),
+        }
+        rows = np.where(missing, len(self), rows)  # the NaN row
+        for k, name in enumerate(self.properties):
+            values = self._columns[k][rows]
+            if name in perturb:
+                noise = rng.standard_normal(rows.shape, dtype=np.float32)
+                values += np.float32(perturb[name]) * noise[..., None]
+                if clip_negative:
+                    np.maximum(values, 0, out=values)
+            result[name] = values
+        return result
+
+
+def points_to_smu(extractor, lats, lons) -> np.ndarray:
+    """
+    HWSD2_SMU_IDs of many points at once (nodata where there is no soil).
+
+    Each point takes the pixel whose centre is nearest
+    (``HWSD2Extractor.pixel_index``), as ``latlon_to_rowcol`` and
+    ``hwsd2_lazy`` scalar ``sel`` do; points on the outer edge of the grid
+    take the edge pixel.
+
+    Args:
+        extractor: ``HWSD2Extractor``
+        lats: Latitudes (degrees)
+        lons: Longitudes (degrees)
+
+    Returns:
+        (n_points,) SMU ids in the raster dtype, nodata for points outside the grid
+    """
+    lats, lons = np.asarray(lats, dtype=float), np.asarray(lons, dtype=float)
+    north, west = extractor.uly + extractor.ydim / 2, extractor.ulx - extractor.xdim / 2
+    south, east = north - extractor.nrows * extractor.ydim, west + extractor.ncols * extractor.xdim
+    # NaN coordinates fail every comparison and count as outside
+    inside = (lats <= north) & (lats >= south) & (lons >= west) & (lons <= east)
+    rows, cols = extractor.pixel_index(lats[inside], lons[inside])
+    raster = extractor.open_raster()
+    smu = np.full(inside.shape, extractor.nodata, dtype=raster.dtype)
+    smu[inside] = raster[np.clip(rows, 0, extractor.nrows - 1).astype(np.int64),
+                         np.clip(cols, 0, extractor.ncols - 1).astype(np.int64)]
+    return smu
+
+
+def main():
+    """Main entry point for command-line usage."""
+    if len(sys.argv) < 3:
+        print("Usage: python hwsd2_ensemble.py <lat> <lon> [n_members] [seed]")
+        print("Example: python hwsd2_ensemble.py 40.0 -105.0 1000 42")
+        sys.exit(1)
+
+    import duckdb
+    from hwsd2_extractor import HWSD2Extractor
+
+    lat, lon = float(sys.argv[1]), float(sys.argv[2])
+    n_members = int(sys.argv[3]) if len(sys.argv) > 3 else 100
+    seed = int(sys.argv[4]) if len(sys.argv) > 4 else None
+    extractor = HWSD2Extractor()
+    smu = points_to_smu(extractor, [lat], [lon])
+    conn = duckdb.connect(str(extractor.db_path), read_only=True)
+    try:
+        table = SequenceTable.from_duckdb(conn)
+    finally:
+        conn.close()
+    ensemble = table.sample(smu, n_members, seed)
+    sequences, counts = np.unique(ensemble["SEQUENCE"][0], return_counts=True)
+    print(f"SMU {int(smu[0])}: " + ", ".join(f"sequence {s}: {c} members" for s, c in zip(sequences, counts)))
+    for name in table.properties:
+        top = ensemble[name][0, :, 0]
+        print(f"  {name:<12} D1 mean {np.nanmean(top):8.3f}  sd {np.nanstd(top):8.3f}")
+
+
+if __name__ == "__main__":
+    main()
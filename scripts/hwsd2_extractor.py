@@ -16,11 +16,127 @@ Functions:
     - get_soil_profile: Combined function to get profile from lat/lon
 """
 
+import importlib
 from pathlib import Path
-from typing import Dict, List, Optional, Tuple
+from typing import Dict, List, Optional, Tuple, Union
 import struct
-import duckdb
-import pandas as pd
+
+# Raster values are uint16 HWSD2_SMU_IDs; 65535 marks pixels without soil data
+NODATA = 65535
+
+# Size of a lookup table indexed by raster value
+LOOKUP_SIZE = 1 << 16
+
+# HWSD2 marks missing numeric values with -9
+MISSING_VALUE = -9
+
+# Standard HWSD2 depth layers: (LAYER, TOPDEP, BOTDEP) in cm
+STANDARD_LAYERS = (
+    ("D1", 0, 20), ("D2", 20, 40), ("D3", 40, 60), ("D4", 60, 80),
+    ("D5", 80, 100), ("D6", 100, 150), ("D7", 150, 200),
+)
+
+# D1-D7 depth edges (cm)
+LAYER_EDGES = (0, 20, 40, 60, 80, 100, 150, 200)
+
+# Mean Earth radius (km)
+EARTH_RADIUS_KM = 6371.0088
+
+# struct/numpy pixel codes of BIL rasters, by (PIXELTYPE, NBITS) and BYTEORDER
+_BIL_PIXEL_CODES = {
+    ("UNSIGNEDINT", 8): "B", ("UNSIGNEDINT", 16): "H", ("UNSIGNEDINT", 32): "I",
+    ("SIGNEDINT", 8): "b", ("SIGNEDINT", 16): "h", ("SIGNEDINT", 32): "i",
+    ("FLOAT", 32): "f", ("FLOAT", 64): "d",
+}
+_BIL_BYTE_ORDERS = {"I": "<", "LSBFIRST": "<", "M": ">", "MSBFIRST": ">"}
+
+# duckdb and pandas take most of the import time and are only needed for
+# database queries, so they are imported on first use; ``get_smu_id`` and
+# other raster-only calls never load them
+_LAZY_MODULES = {"duckdb": "duckdb", "pd": "pandas"}
+
+
+def __getattr__(name):
+    # Keep ``hwsd2_extractor.duckdb`` / ``hwsd2_extractor.pd`` working (PEP 562)
+    if name in _LAZY_MODULES:
+        return importlib.import_module(_LAZY_MODULES[name])
+    raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
+
+
+def parse_bil_header(text: str) -> Dict[str, str]:
+    """Parse an ESRI BIL ``.hdr`` file into a dictionary of upper-case keys."""
+    header = {}
+    for line in text.splitlines():
+        parts = line.split(None, 1)
+        if len(parts) == 2:
+            header[parts[0].upper()] = parts[1].strip()
+    return header
+
+
+def bil_pixel_format(header: Dict[str, str]) -> str:
+    """
+    Pixel format of a single-band BIL raster, as a struct (and numpy dtype) code.
+
+    Args:
+        header: Parsed ``.hdr`` file (see ``parse_bil_header``)
+
+    Returns:
+        Byte order and type code, e.g. "<H" for little-endian uint16
+
+    Raises:
+        ValueError: If the layout, band count, byte order or pixel type is not supported
+
+    Examples:
+        >>> bil_pixel_format({"NBITS": "16", "BYTEORDER": "I"})
+        '<H'
+    """
+    layout, nbands = header.get("LAYOUT", "BIL").upper(), int(header.get("NBANDS", 1))
+    if layout != "BIL" or nbands != 1 or int(header.get("SKIPBYTES", 0)):
+        raise ValueError(f"Only single-band BIL rasters without skip bytes are supported, "
+                         f"not {layout} with {nbands} bands")
+    byteorder = header.get("BYTEORDER", "I").upper()
+    pixel = (header.get("PIXELTYPE", "UNSIGNEDINT").upper(), int(header.get("NBITS", 8)))
+    if byteorder not in _BIL_BYTE_ORDERS or pixel not in _BIL_PIXEL_CODES:
+        raise ValueError(f"Unsupported BIL pixel layout: BYTEORDER {byteorder}, PIXELTYPE {pixel[0]}, "
+                         f"NBITS {pixel[1]}")
+    return _BIL_BYTE_ORDERS[byteorder] + _BIL_PIXEL_CODES[pixel]
+
+
+def share_weighted_mean_sql(column: str, share: str = "SHARE", missing: Optional[float] = MISSING_VALUE) -> str:
+    """
+    SQL aggregate of the SHARE-weighted mean of a column over the sequences of an SMU.
+
+    Sequences where the value is NULL (or ``missing``) are left out of both
+    sums, so the mean is over the sequences with a value, and NULL when none
+    has one.
+
+    Args:
+        column: Column or SQL expression to average
+        share: SHARE column or expression
+        missing: Sentinel treated as NULL, or None
+
+    Returns:
+        SQL expression for use with GROUP BY
+
+    Examples:
+        >>> share_weighted_mean_sql("SAND")
+        'SUM(SHARE * NULLIF(SAND, -9)) / SUM(CASE WHEN NULLIF(SAND, -9) IS NOT NULL THEN SHARE END)'
+    """
+    value = column if missing is None else f"NULLIF({column}, {missing})"
+    return f"SUM({share} * {value}) / SUM(CASE WHEN {value} IS NOT NULL THEN {share} END)"
+
+
+def file_fingerprint(path: Union[str, Path]):
+    """
+    (size, modification time in ns) of a file, to tell whether a cache built from it is stale.
+
+    Returns:
+        int64 numpy array of two values
+    """
+    import numpy as np
+
+    stat = Path(path).stat()
+    return np.array([stat.st_size, stat.st_mtime_ns], dtype=np.int64)
 
 
 class HWSD2Extractor:
@@ -28,7 +144,7 @@ class HWSD2Extractor:
     Extract soil data from HWSD2 gridded database.
 
     Attributes:
-        raster_path: Path to HWSD2.bil raster file
+        raster_path: Path to HWSD2.bil raster file (or a .npy array converted from it)
         db_path: Path to DuckDB database with soil properties
         ncols: Number of columns in raster (43200)
         nrows: Number of rows in raster (21600)
@@ -37,6 +153,7 @@ class HWSD2Extractor:
         ulx: Upper left X coordinate (-179.995833)
         uly: Upper left Y coordinate (89.995833)
         nodata: NODATA value (65535)
+        pixel_format: struct/numpy code of ``.bil`` pixels ("<H")
 
     Examples:
         >>> extractor = HWSD2Extractor()
@@ -53,7 +170,9 @@ class HWSD2Extractor:
         Initialize HWSD2 extractor.
 
         Args:
-            raster_path: Path to HWSD2.bil file. If None, looks in HWSD2_RASTER/
+            raster_path: Path to HWSD2.bil file, or to the memory-mappable HWSD2.npy
+                written by ``HWSDFetcher.extract_zip(..., raster_format="npy")``.
+                If None, looks in HWSD2_RASTER/
             db_path: Path to DuckDB database. If None, looks for hwsd2.db
         """
         # Set default paths relative to this file
@@ -61,7 +180,10 @@ class HWSD2Extractor:
 
         if raster_path is None:
             raster_path = base_dir / "HWSD2_RASTER" / "HWSD2.bil"
+            if not raster_path.exists() and raster_path.with_suffix(".npy").exists():
+                raster_path = raster_path.with_suffix(".npy")
         self.raster_path = Path(raster_path)
+        self._raster = None
 
         if db_path is None:
             db_path = base_dir / "hwsd2.db"
@@ -74,15 +196,96 @@ class HWSD2Extractor:
         self.ydim = 0.00833333333333333
         self.ulx = -179.995833333333
         self.uly = 89.9958333333333
-        self.nodata = 65535
+        self.nodata = NODATA
+        self.pixel_format = "<H"
 
         # Validate files exist
         if not self.raster_path.exists():
             raise FileNotFoundError(f"Raster file not found: {self.raster_path}")
 
+        # Prefer the metadata shipped with the raster when it is available
+        header_path = self.raster_path.with_suffix(".hdr")
+        if header_path.exists():
+            self._read_header(header_path)
+
+    def _read_header(self, header_path: Path) -> None:
+        """Read raster dimensions, georeferencing and (for .bil) pixel format from an ESRI .hdr file."""
+        header = parse_bil_header(header_path.read_text())
+        if self.raster_path.suffix != ".npy":
+            self.pixel_format = bil_pixel_format(header)
+        self.ncols = int(header.get("NCOLS", self.ncols))
+        self.nrows = int(header.get("NROWS", self.nrows))
+        self.xdim = float(header.get("XDIM", self.xdim))
+        self.ydim = float(header.get("YDIM", self.ydim))
+        self.ulx = float(header.get("ULXMAP", self.ulx))
+        self.uly = float(header.get("ULYMAP", self.uly))
+        self.nodata = int(header.get("NODATA", self.nodata))
+
+    def open_raster(self):
+        """
+        Open the SMU raster as a read-only memory-mapped array.
+
+        Returns:
+            numpy array of shape (nrows, ncols) backed by the raster file;
+            only the pages that are indexed are read from disk
+
+        Examples:
+            >>> extractor = HWSD2Extractor()
+            >>> raster = extractor.open_raster()
+            >>> raster.shape
+            (21600, 43200)
+        """
+        if self._raster is None:
+            import numpy as np
+
+            if self.raster_path.suffix == ".npy":
+                self._raster = np.load(self.raster_path, mmap_mode="r")
+            else:
+                self._raster = np.memmap(self.raster_path, dtype=self.pixel_format, mode="r",
+                                         shape=(self.nrows, self.ncols))
+        return self._raster
+
+    def pixel_index(self, lat, lon):
+        """
+        Unclamped (row, col) of the pixel whose centre is nearest, for scalars or numpy arrays.
+
+        ``ulx``/``uly`` are pixel centres, so the offset from them is rounded
+        to the nearest whole pixel (``floor(offset + 0.5)``). Points on the
+        outer edge of the grid give ``nrows``/``ncols``; points off the grid
+        give indices outside [0, nrows) x [0, ncols).
+
+        Returns:
+            (row, col) as floats, or float arrays for array input
+        """
+        return ((self.uly - lat) / self.ydim + 0.5) // 1, ((lon - self.ulx) / self.xdim + 0.5) // 1
+
+    def row_areas(self, rows: Optional[Tuple[int, int]] = None):
+        """
+        Pixel area (km²) of each raster row, on a sphere.
+
+        ``ulx``/``uly`` are pixel centres, so row ``i`` spans latitudes
+        ``uly - (i ± 0.5) * ydim``.
+
+        Args:
+            rows: (start, stop) row range; default all rows
+
+        Returns:
+            numpy array of per-row pixel areas
+        """
+        import numpy as np
+
+        start, stop = rows or (0, self.nrows)
+        top = self.uly + self.ydim / 2 - np.arange(start, stop) * self.ydim
+        bottom = top - self.ydim
+        top, bottom = np.clip(top, -90, 90), np.clip(bottom, -90, 90)
+        return (EARTH_RADIUS_KM ** 2 * np.deg2rad(self.xdim)
+                * (np.sin(np.deg2rad(top)) - np.sin(np.deg2rad(bottom))))
+
     def latlon_to_rowcol(self, lat: float, lon: float) -> Tuple[int, int]:
         """
-        Convert latitude/longitude to raster row/column indices.
+        Convert latitude/longitude to the row/column of the nearest pixel centre.
+
+        Uses ``pixel_index``, as the vectorized point lookups do.
 
         Args:
             lat: Latitude in decimal degrees (-90 to 90)
@@ -105,12 +308,10 @@ class HWSD2Extractor:
         if not (-180 <= lon <= 180):
             raise ValueError(f"Longitude {lon} out of range [-180, 180]")
 
-        # Calculate row and column
-        # Row increases from north to south
-        col = int((lon - self.ulx) / self.xdim)
-        row = int((self.uly - lat) / self.ydim)
+        # Nearest pixel centre; row increases from north to south
+        row, col = (int(index) for index in self.pixel_index(lat, lon))
 
-        # Clamp to valid range
+        # Clamp points on the outer edge of the grid
         row = max(0, min(self.nrows - 1, row))
         col = max(0, min(self.ncols - 1, col))
 
@@ -139,19 +340,21 @@ class HWSD2Extractor:
         if not (0 <= col < self.ncols):
             raise ValueError(f"Column {col} out of range [0, {self.ncols})")
 
+        if self.raster_path.suffix == ".npy":
+            return int(self.open_raster()[row, col])
+
         # Calculate byte offset
-        # BIL format: Band Interleaved by Line
-        # Each pixel is 2 bytes (unsigned 16-bit integer)
-        offset = (row * self.ncols + col) * 2
+        # BIL format: Band Interleaved by Line, pixels as described by the header
+        size = struct.calcsize(self.pixel_format)
+        offset = (row * self.ncols + col) * size
 
         with open(self.raster_path, 'rb') as f:
             f.seek(offset)
-            data = f.read(2)
-            if len(data) != 2:
+            data = f.read(size)
+            if len(data) != size:
                 return self.nodata
 
-            # Little-endian unsigned short
-            value = struct.unpack('<H', data)[0]
+            value = struct.unpack(self.pixel_format, data)[0]
             return value
 
     def latlon_to_smu_id(self, lat: float, lon: float) -> Optional[int]:
@@ -215,6 +418,8 @@ class HWSD2Extractor:
                 f"Run load_hwsd2.py to create it first."
             )
 
+        import duckdb
+
         conn = duckdb.connect(str(self.db_path))
 
         result = {
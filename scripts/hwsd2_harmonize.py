@@ -0,0 +1,284 @@
+#!/usr/bin/env python
+"""
+Resample HWSD2 layer profiles onto arbitrary target depth grids.
+
+Every model wants its own depth discretization (EcoSIM, CENTURY, DayCENT,
+SoilGrids' 0-5-15-30-60-100-200 cm, ...). Instead of re-interpolating the
+D1-D7 layers profile by profile, this module resamples many profiles at
+once with a matrix of layer overlaps:
+
+    W[t, s] = thickness of source layer s that lies within target layer t (cm)
+
+- intensive properties (concentrations, fractions, pH, bulk density) are
+  depth-weighted averages: ``sum_s W[t, s] * x[s] / sum_s W[t, s]``, over
+  the source layers where the value is not missing
+- extensive properties (stocks or amounts per layer, e.g. mm of water or
+  kg C/m2) are redistributed in proportion to overlap, so totals are
+  conserved: ``sum_s W[t, s] / thickness[s] * x[s]``. A target layer is
+  NaN unless non-missing source layers cover its whole thickness, so a
+  missing layer or a profile ending above the target bottom never gives a
+  silently low total
+
+Profiles sharing a source layout (nearly all of HWSD2 uses the standard
+D1-D7 depths) are resampled with one matrix product, and the overlap
+weights are cached per (source layout, target grid).
+
+Usage:
+    uv run python hwsd2_harmonize.py <latitude> <longitude> [edge ...]
+
+Default edges: 0 5 15 30 60 100 200 (cm)
+"""
+
+import sys
+from functools import lru_cache
+from typing import Dict, Iterable, List, Optional, Sequence, Tuple
+
+import numpy as np
+
+from hwsd2_extractor import MISSING_VALUE
+
+# Depth edges (cm) of the GlobalSoilMap / SoilGrids standard layers
+SOILGRIDS_EDGES = (0, 5, 15, 30, 60, 100, 200)
+
+PROFILE_KEYS = ("HWSD2_SMU_ID", "SEQUENCE")
+
+# Numeric HWSD2_LAYERS properties that are averaged by depth by default
+INTENSIVE_PROPERTIES = (
+    "COARSE", "SAND", "SILT", "CLAY", "BULK", "REF_BULK", "ORG_CARBON", "PH_WATER",
+    "TOTAL_N", "CN_RATIO", "CEC_SOIL", "CEC_CLAY", "CEC_EFF", "TEB", "BSAT", "ALUM_SAT",
+    "ESP", "TCARBON_EQ", "GYPSUM", "ELEC_COND",
+)
+
+
+@lru_cache(maxsize=256)
+def overlap_weights(
+    source_tops: Tuple[float, ...],
+    source_bottoms: Tuple[float, ...],
+    target_edges: Tuple[float, ...],
+) -> np.ndarray:
+    """
+    Overlap thickness of every (target, source) layer pair, cached per layout.
+
+    Args:
+        source_tops: Top depth of each source layer (cm)
+        source_bottoms: Bottom depth of each source layer (cm)
+        target_edges: Increasing target layer edges (cm); n + 1 edges for n layers
+
+    Returns:
+        Read-only array of shape (n_target, n_source), in cm
+    """
+    edges = np.asarray(target_edges, dtype=float)
+    if edges.ndim != 1 or len(edges) < 2 or np.any(np.diff(edges) <= 0):
+        raise ValueError(f"Target edges must be increasing, with at least two edges: {target_edges}")
+    tops = np.asarray(source_tops, dtype=float)
+    bottoms = np.asarray(source_bottoms, dtype=float)
+    weights = np.minimum(edges[1:, None], bottoms[None, :]) - np.maximum(edges[:-1, None], tops[None, :])
+    weights = np.clip(weights, 0, None)
+    weights[:, ~(bottoms > tops)] = 0  # nan or empty source layers
+    weights.setflags(write=False)
+    return weights
+
+
+def resample(
+    values: np.ndarray,
+    source_tops: Sequence[float],
+    source_bottoms: Sequence[float],
+    target_edges: Sequence[float],
+    kind: str = "intensive",
+) -> np.ndarray:
+    """
+    Resample profiles with a common source layout onto a target grid.
+
+    Args:
+        values: Array of shape (n_source,) for one profile, or
+            (n_profiles, n_source) or (n_profiles, n_source, n_properties);
+            NaN marks missing values
+        source_tops: Top depth of each source layer (cm)
+        source_bottoms: Bottom depth of each source layer (cm)
+        target_edges: Increasing target layer edges (cm)
+        kind: "intensive" (depth-weighted mean) or "extensive" (mass-conserving sum)
+
+    Returns:
+        Array with the source-layer axis replaced by n_target layers. Target
+        layers with no (non-missing) source coverage are NaN; for extensive
+        properties, so are target layers only partly covered.
+
+    Examples:
+        >>> resample([10.0, 20.0], [0, 20], [20, 40], [0, 30])
+        array([13.33333333])
+        >>> resample([100.0, 100.0], [0, 20], [20, 40], [0, 10, 40], kind="extensive")
+        array([ 50., 150.])
+        >>> resample([100.0, 100.0], [0, 20], [20, 40], [0, 10, 50], kind="extensive")
+        array([50., nan])
+    """
+    if kind not in ("intensive", "extensive"):
+        raise ValueError(f"kind must be 'intensive' or 'extensive', not {kind!r}")
+    weights = overlap_weights(tuple(map(float, source_tops)), tuple(map(float, source_bottoms)),
+                              tuple(map(float, target_edges)))
+    values = np.asarray(values, dtype=float)
+    single = values.ndim == 1
+    if single:
+        values = values[None, :]
+    # Move the layer axis last: (..., n_source)
+    stacked = np.moveaxis(values, 1, -1)
+    valid = ~np.isnan(stacked)
+    filled = np.where(valid, stacked, 0.0)
+
+    if kind == "intensive":
+        total = filled @ weights.T
+        coverage = valid.astype(float) @ weights.T
+        with np.errstate(invalid="ignore", divide="ignore"):
+            result = np.where(coverage > 0, total / coverage, np.nan)
+    else:
+        thickness = np.asarray(source_bottoms, dtype=float) - np.asarray(source_tops, dtype=float)
+        with np.errstate(invalid="ignore", divide="ignore"):
+            fractions = np.where(thickness > 0, weights / thickness, 0.0)
+        result = filled @ fractions.T
+        # Partial totals are indistinguishable from small ones, so only fully covered layers count
+        edges = np.asarray(target_edges, dtype=float)
+        covered = valid.astype(float) @ weights.T >= np.diff(edges) - 1e-9
+        result = np.where(covered, result, np.nan)
+
+    result = np.moveaxis(result, -1, 1)
+    return result[0] if single else result
+
+
+def harmonize_layers(
+    layers,
+    target_edges: Sequence[float] = SOILGRIDS_EDGES,
+    intensive: Optional[Iterable[str]] = None,
+    extensive: Iterable[str] = (),
+    profile_keys: Sequence[str] = PROFILE_KEYS,
+):
+    """
+    Resample a table of HWSD2 layers, profile by profile, onto a target grid.
+
+    Args:
+        layers: pandas DataFrame of layers with TOPDEP and BOTDEP, e.g. the
+            ``'layers'`` of ``HWSD2Extractor.get_smu_properties`` or a query
+            over HWSD2_LAYERS for many SMUs
+        target_edges: Increasing target layer edges (cm)
+        intensive: Columns to depth-average (default: the numeric
+            ``INTENSIVE_PROPERTIES`` present in ``layers``)
+        extensive: Columns to redistribute conserving totals
+        profile_keys: Columns identifying a profile (those present are used)
+
+    Returns:
+        DataFrame with one row per (profile, target layer): the profile keys,
+        LAYER (T1, T2, ...), TOPDEP, BOTDEP and the resampled columns.
+        HWSD2 missing values (-9) are treated as missing.
+
+    Examples:
+        >>> from hwsd2_extractor import HWSD2Extractor
+        >>> layers = HWSD2Extractor().get_smu_properties(4726)["layers"]
+        >>> harmonize_layers(layers, [0, 30, 100])
+    """
+    import pandas as pd
+
+    extensive = [c for c in extensive]
+    if intensive is None:
+        intensive = [c for c in INTENSIVE_PROPERTIES if c in layers.columns and c not in extensive]
+    intensive = [c for c in intensive]
+    properties = intensive + extensive
+    keys = [k for k in profile_keys if k in layers.columns]
+    edges = np.asarray(target_edges, dtype=float)
+    n_target = len(edges) - 1
+
+    frame = layers.sort_values(keys + ["TOPDEP", "BOTDEP"]) if keys else layers.sort_values(["TOPDEP", "BOTDEP"])
+    if keys:
+        grouped = frame.groupby(keys, sort=False)
+        profile = grouped.ngroup().to_numpy()
+        position = grouped.cumcount().to_numpy()
+        profile_index = grouped.size().index
+    else:
+        profile = np.zeros(len(frame), dtype=int)
+        position = np.arange(len(frame))
+        profile_index = None
+    n_profiles = int(profile.max()) + 1 if len(frame) else 0
+    n_layers = int(position.max()) + 1 if len(frame) else 0
+
+    # Pivot to (profile, layer) arrays; absent layers are NaN
+    tops = np.full((n_profiles, n_layers), np.nan)
+    bottoms = np.full((n_profiles, n_layers), np.nan)
+    tops[profile, position] = frame["TOPDEP"].to_numpy(dtype=float)
+    bottoms[profile, position] = frame["BOTDEP"].to_numpy(dtype=float)
+    values = np.full((n_profiles, n_layers, len(properties)), np.nan)
+    for k, column in enumerate(properties):
+        column_values = frame[column].to_numpy(dtype=float, na_value=np.nan)
+        values[profile, position, k] = np.where(column_values == MISSING_VALUE, np.nan, column_values)
+
+    # One matrix product per distinct source layout
+    result = np.full((n_profiles, n_target, len(properties)), np.nan)
+    layouts = np.concatenate([np.nan_to_num(tops, nan=-1), np.nan_to_num(bottoms, nan=-1)], axis=1)
+    # Most profiles share the first layout; np.unique sorts only the others
+    common = (layouts == layouts[0]).all(axis=1) if n_profiles else np.zeros(0, dtype=bool)
+    groups = [(layouts[0], np.flatnonzero(common))] if n_profiles else []
+    rest = np.flatnonzero(~common)
+    if len(rest):
+        unique_layouts, layout_of = np.unique(layouts[rest], axis=0, return_inverse=True)
+        layout_of = layout_of.reshape(-1)
+        groups += [(layout, rest[layout_of == index]) for index, layout in enumerate(unique_layouts)]
+    for layout, members in groups:
+        layout_tops = tuple(np.where(layout[:n_layers] < 0, np.nan, layout[:n_layers]))
+        layout_bottoms = tuple(np.where(layout[n_layers:] < 0, np.nan, layout[n_layers:]))
+        for kind, columns in (("intensive", intensive), ("extensive", extensive)):
+            if not columns:
+                continue
+            slots = [properties.index(c) for c in columns]
+            result[np.ix_(members, np.arange(n_target), slots)] = resample(
+                values[np.ix_(members, np.arange(n_layers), slots)],
+                layout_tops, layout_bottoms, edges, kind,
+            )
+
+    output: Dict[str, np.ndarray] = {}
+    if keys:
+        key_frame = profile_index.to_frame(index=False)
+        for key in keys:
+            output[key] = np.repeat(key_frame[key].to_numpy(), n_target)
+    output["LAYER"] = np.tile([f"T{i + 1}" for i in range(n_target)], n_profiles)
+    output["TOPDEP"] = np.tile(edges[:-1], n_profiles)
+    output["BOTDEP"] = np.tile(edges[1:], n_profiles)
+    for k, column in enumerate(properties):
+        output[column] = result[:, :, k].reshape(-1)
+    return pd.DataFrame(output)
+
+
+def harmonize_profile(profile: Dict, target_edges: Sequence[float] = SOILGRIDS_EDGES, **kwargs):
+    """
+    Resample the layers of an extractor profile (``get_soil_profile`` output).
+
+    Args:
+        profile: Dictionary with a ``'layers'`` DataFrame
+        target_edges: Increasing target layer edges (cm)
+        **kwargs: Passed to ``harmonize_layers``
+
+    Returns:
+        DataFrame of resampled layers per sequence
+    """
+    return harmonize_layers(profile["layers"], target_edges, **kwargs)
+
+
+def main():
+    """Main entry point for command-line usage."""
+    if len(sys.argv) < 3:
+        print("Usage: python hwsd2_harmonize.py <latitude> <longitude> [edge ...]")
+        print("Example: python hwsd2_harmonize.py 40.0 -105.0 0 10 30 100")
+        sys.exit(1)
+
+    from hwsd2_extractor import HWSD2Extractor
+
+    lat, lon = float(sys.argv[1]), float(sys.argv[2])
+    edges: List[float] = [float(e) for e in sys.argv[3:]] or list(SOILGRIDS_EDGES)
+    profile = HWSD2Extractor().get_soil_profile(lat, lon)
+    if profile is None:
+        print("No soil data at this location (ocean or missing data)")
+        sys.exit(1)
+
+    harmonized = harmonize_profile(profile, edges)
+    columns = [c for c in ("SEQUENCE", "LAYER", "TOPDEP", "BOTDEP", "SAND", "SILT", "CLAY",
+                           "ORG_CARBON", "PH_WATER", "BULK") if c in harmonized.columns]
+    print(harmonized[columns].to_string(index=False))
+
+
+if __name__ == "__main__":
+    main()
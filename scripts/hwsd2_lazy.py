@@ -0,0 +1,414 @@
+#!/usr/bin/env python
+"""
+Lazy, xarray-style view of HWSD2 layer properties on the raster grid.
+
+``open_dataset()`` returns a ``SoilDataset`` that looks like an xarray
+Dataset with (depth, lat, lon) variables (ORG_CARBON, CLAY, ... for the
+D1-D7 layers) plus the (lat, lon) HWSD2_SMU_ID, but holds no data:
+
+- ``sel``/``isel`` only narrow an index window (cheap, no I/O)
+- ``.values`` reads just that window from the memory-mapped raster and
+  decodes it through an SMU -> layer-value lookup table (65536 x 7, SEQUENCE
+  SHARE-weighted, loaded per property on first use)
+
+so selecting a region returns arrays in milliseconds while global memory use
+stays at the lookup tables. ``to_xarray()`` converts a selection to a real
+``xarray.Dataset``/``DataArray`` (needs xarray).
+
+Selection semantics follow xarray, with soil conventions for depth:
+- lat/lon slices may be given in either order; bounds are inclusive
+- scalar lat/lon select the nearest pixel and drop the dimension
+- ``depth=25`` selects the layer containing 25 cm; ``depth=slice(0, 30)``
+  the layers overlapping 0-30 cm; ``layer="D1"`` selects by name
+
+Usage:
+    uv run python hwsd2_lazy.py <property> <north> <south> <west> <east> [layer]
+"""
+
+import sys
+from typing import Dict, Optional, Sequence, Tuple
+
+import numpy as np
+
+from hwsd2_cube import cf_metadata, layer_lookup
+from hwsd2_extractor import STANDARD_LAYERS
+
+DIMS = ("depth", "lat", "lon")
+
+SMU_VARIABLE = "HWSD2_SMU_ID"
+
+# HWSD2_LAYERS columns that are keys or geometry rather than properties
+NON_PROPERTY_COLUMNS = ("ID", "HWSD2_SMU_ID", "WISE30s_SMU_ID", "HWSD1_SMU_ID", "COVERAGE", "SEQUENCE",
+                        "SHARE", "LAYER", "TOPDEP", "BOTDEP")
+
+# Integer codes into D_* tables; a SHARE-weighted mean of codes means nothing
+CODED_COLUMNS = ("ROOT_DEPTH", "PHASE1", "PHASE2", "ROOTS", "IL", "SWR", "DRAINAGE", "ADD_PROP", "TEXTURE_USDA")
+
+NUMERIC_TYPES = ("TINYINT", "SMALLINT", "INTEGER", "BIGINT", "FLOAT", "DOUBLE", "REAL")
+
+
+class _Source:
+    """Shared state of a dataset: the raster, the layers and the lookup tables loaded so far."""
+
+    def __init__(self, extractor, properties: Sequence[str], layers):
+        self.extractor = extractor
+        self.properties = tuple(properties)
+        self.layers = tuple(layers)
+        self.lookups: Dict[str, np.ndarray] = {}
+        self._raster = None
+        self.bounds = np.array([[top, bottom] for _, top, bottom in self.layers], dtype=float)
+        _, self.attrs = cf_metadata(extractor, self.properties, self.layers)
+
+    @property
+    def raster(self):
+        if self._raster is None:
+            self._raster = self.extractor.open_raster()
+        return self._raster
+
+    def lookup(self, name: str) -> np.ndarray:
+        if name not in self.lookups:
+            import duckdb
+
+            conn = duckdb.connect(str(self.extractor.db_path), read_only=True)
+            try:
+                self.lookups.update(layer_lookup(conn, [name], self.layers))
+            finally:
+                conn.close()
+        return self.lookups[name]
+
+
+class _Window:
+    """Index window: depth layer indices and (start, stop) lat/lon ranges, with dimensions to drop."""
+
+    def __init__(self, depth: np.ndarray, lat: Tuple[int, int], lon: Tuple[int, int], dropped=frozenset()):
+        self.depth, self.lat, self.lon, self.dropped = depth, lat, lon, frozenset(dropped)
+
+    def replace(self, **changes) -> "_Window":
+        state = {"depth": self.depth, "lat": self.lat, "lon": self.lon, "dropped": self.dropped}
+        state.update(changes)
+        return _Window(**state)
+
+    def isel(self, **indexers) -> "_Window":
+        window = self
+        for dim, indexer in indexers.items():
+            if dim not in DIMS:
+                raise ValueError(f"Unknown dimension {dim!r}; expected one of {DIMS}")
+            if dim in window.dropped:
+                raise ValueError(f"Dimension {dim!r} has already been selected away")
+            scalar = np.ndim(indexer) == 0 and not isinstance(indexer, slice)
+            if dim == "depth":
+                depth = window.depth[indexer]
+                window = window.replace(depth=np.atleast_1d(depth),
+                                        dropped=window.dropped | {"depth"} if scalar else window.dropped)
+                continue
+            start, stop = getattr(window, dim)
+            positions = range(start, stop)
+            if scalar:
+                index = positions[int(indexer)]
+                window = window.replace(**{dim: (index, index + 1)}, dropped=window.dropped | {dim})
+            else:
+                selected = positions[indexer]
+                if selected.step != 1:
+                    raise ValueError("Only contiguous lat/lon slices are supported")
+                window = window.replace(**{dim: (selected.start, max(selected.start, selected.stop))})
+        return window
+
+
+class LazyVariable:
+    """One lazily decoded variable of a ``SoilDataset``."""
+
+    def __init__(self, source: _Source, name: str, window: _Window):
+        self._source, self.name, self._window = source, name, window
+
+    @property
+    def dims(self) -> Tuple[str, ...]:
+        dims = ("lat", "lon") if self.name == SMU_VARIABLE else DIMS
+        return tuple(d for d in dims if d not in self._window.dropped)
+
+    @property
+    def shape(self) -> Tuple[int, ...]:
+        sizes = _sizes(self._window)
+        return tuple(sizes[d] for d in self.dims)
+
+    @property
+    def attrs(self) -> dict:
+        if self.name == SMU_VARIABLE:
+            return {"long_name": "HWSD2 soil mapping unit", "_FillValue": self._source.extractor.nodata}
+        return self._source.attrs[self.name]
+
+    @property
+    def coords(self) -> Dict[str, np.ndarray]:
+        names = ("lat", "lon") if self.name == SMU_VARIABLE else ("depth", "lat", "lon", "layer")
+        return {d: c for d, c in _coords(self._source, self._window).items() if d in names}
+
+    def isel(self, **indexers) -> "LazyVariable":
+        """Select by position (see ``SoilDataset.isel``)."""
+        return LazyVariable(self._source, self.name, self._window.isel(**indexers))
+
+    def sel(self, method: Optional[str] = None, **indexers) -> "LazyVariable":
+        """Select by coordinate label (see ``SoilDataset.sel``)."""
+        return LazyVariable(self._source, self.name, _sel(self._source, self._window, indexers))
+
+    @property
+    def values(self) -> np.ndarray:
+        """Read and decode the selected window."""
+        window = self._window
+        smu = np.asarray(self._source.raster[window.lat[0]:window.lat[1], window.lon[0]:window.lon[1]])
+        if self.name == SMU_VARIABLE:
+            data = smu
+        else:
+            table = self._source.lookup(self.name)[:, window.depth]
+            data = np.moveaxis(table[smu], -1, 0)
+        axes = tuple(i for i, d in enumerate(("depth", "lat", "lon") if data.ndim == 3 else ("lat", "lon"))
+                     if d in window.dropped)
+        return data.squeeze(axis=axes) if axes else data
+
+    def to_numpy(self) -> np.ndarray:
+        return self.values
+
+    def __array__(self, dtype=None, copy=None):
+        values = self.values
+        return values if dtype is None else values.astype(dtype)
+
+    def to_xarray(self):
+        """The selection as an ``xarray.DataArray`` (reads the data)."""
+        import xarray
+
+        coords = self.coords
+        if "depth" in self.dims:
+            coords["layer"] = ("depth", self.coords["layer"])
+        return xarray.DataArray(self.values, dims=self.dims, coords=coords, name=self.name, attrs=self.attrs)
+
+    def __repr__(self) -> str:
+        shape = ", ".join(f"{d}: {n}" for d, n in zip(self.dims, self.shape))
+        return f"<hwsd2_lazy.LazyVariable {self.name!r} ({shape})>"
+
+
+class SoilDataset:
+    """
+    xarray-style dataset of HWSD2 layer properties; data is read on access.
+
+    Examples:
+        >>> ds = open_dataset()
+        >>> carbon = ds["ORG_CARBON"].sel(lat=slice(50, 45), lon=slice(5, 10), depth=10)
+        >>> carbon.values.shape
+        (600, 600)
+    """
+
+    def __init__(self, source: _Source, window: _Window):
+        self._source, self._window = source, window
+
+    @property
+    def data_vars(self) -> Tuple[str, ...]:
+        return self._source.properties + (SMU_VARIABLE,)
+
+    @property
+    def sizes(self) -> Dict[str, int]:
+        sizes = _sizes(self._window)
+        return {d: n for d, n in sizes.items() if d not in self._window.dropped}
+
+    dims = sizes
+
+    @property
+    def coords(self) -> Dict[str, np.ndarray]:
+        return _coords(self._source, self._window)
+
+    @property
+    def attrs(self) -> dict:
+        return self._source.attrs["global"]
+
+    def __getitem__(self, name: str) -> LazyVariable:
+        if name not in self.data_vars:
+            raise KeyError(f"No variable named {name!r}")
+        return LazyVariable(self._source, name, self._window)
+
+    def __getattr__(self, name: str) -> LazyVariable:
+        if name.startswith("_"):
+            raise AttributeError(name)
+        try:
+            return self[name]
+        except KeyError:
+            raise AttributeError(name) from None
+
+    def __contains__(self, name: str) -> bool:
+        return name in self.data_vars
+
+    def __iter__(self):
+        return iter(self.data_vars)
+
+    def isel(self, **indexers) -> "SoilDataset":
+        """
+        Select by position along depth, lat and lon (int, slice; depth also index lists).
+
+        Raises:
+            ValueError: For unknown dimensions or strided lat/lon slices
+        """
+        return SoilDataset(self._source, self._window.isel(**indexers))
+
+    def sel(self, method: Optional[str] = None, **indexers) -> "SoilDataset":
+        """
+        Select by coordinate: lat/lon in degrees, depth in cm, or layer names.
+
+        Args:
+            method: Accepted for xarray compatibility; scalars always select
+                the nearest pixel / the containing layer
+            **indexers: lat, lon, depth (scalars or slices) and layer (name or
+                list of names)
+
+        Raises:
+            KeyError: If a scalar falls outside the current selection
+        """
+        return SoilDataset(self._source, _sel(self._source, self._window, indexers))
+
+    def load(self) -> Dict[str, np.ndarray]:
+        """Read every variable of the selection into numpy arrays."""
+        return {name: self[name].values for name in self.data_vars}
+
+    def to_xarray(self):
+        """The selection as an ``xarray.Dataset`` (reads the data)."""
+        import xarray
+
+        return xarray.Dataset({name: self[name].to_xarray() for name in self.data_vars}, attrs=self.attrs)
+
+    def __repr__(self) -> str:
+        sizes = ", ".join(f"{d}: {n}" for d, n in self.sizes.items())
+        lines = [f"<hwsd2_lazy.SoilDataset> ({sizes})", "Data variables:"]
+        lines += [f"    {name:<12} {self[name].dims}" for name in self.data_vars]
+        return "\n".join(lines)
+
+
+def _sizes(window: _Window) -> Dict[str, int]:
+    return {"depth": len(window.depth), "lat": window.lat[1] - window.lat[0], "lon": window.lon[1] - window.lon[0]}
+
+
+def _coords(source: _Source, window: _Window) -> Dict[str, np.ndarray]:
+    extractor = source.extractor
+    coords = {
+        "depth": source.bounds[window.depth].mean(axis=1),
+        "lat": extractor.uly - np.arange(*window.lat) * extractor.ydim,
+        "lon": extractor.ulx + np.arange(*window.lon) * extractor.xdim,
+        "layer": np.array([source.layers[i][0] for i in window.depth]),
+    }
+    if "depth" in window.dropped:
+        coords["depth"], coords["layer"] = coords["depth"][0], coords["layer"][0]
+    for dim in ("lat", "lon"):
+        if dim in window.dropped:
+            coords[dim] = coords[dim][0]
+    return coords
+
+
+def _label_range(value, origin: float, step: float, size: int):
+    """Absolute index (scalar) or (start, stop) range (slice) of labels on a regular axis."""
+    if not isinstance(value, slice):
+        return int(np.floor((value - origin) / step + 0.5))
+    if value.step is not None:
+        raise ValueError("Strided label slices are not supported")
+    first = None if value.start is None else (value.start - origin) / step
+    last = None if value.stop is None else (value.stop - origin) / step
+    if first is not None and last is not None:
+        first, last = min(first, last), max(first, last)
+    # Open ends run to the end of the axis in storage order, as in xarray
+    first = 0 if first is None else first
+    last = size - 1 if last is None else last
+    start = max(int(np.ceil(first - 1e-9)), 0)
+    stop = min(int(np.floor(last + 1e-9)) + 1, size)
+    return start, max(start, stop)
+
+
+def _sel(source: _Source, window: _Window, indexers) -> _Window:
+    extractor = source.extractor
+    positional = {}
+    for dim, value in indexers.items():
+        if dim in ("lat", "lon"):
+            origin, step, size = ((extractor.uly, -extractor.ydim, extractor.nrows) if dim == "lat"
+                                  else (extractor.ulx, extractor.xdim, extractor.ncols))
+            start, stop = getattr(window, dim)
+            found = _label_range(value, origin, step, size)
+            if isinstance(found, tuple):
+                low, high = max(found[0], start), min(found[1], stop)
+                positional[dim] = slice(low - start, max(low, high) - start)
+            elif start <= found < stop:
+                positional[dim] = found - start
+            else:
+                raise KeyError(f"{dim}={value} is outside the selection")
+        elif dim in ("depth", "layer"):
+            bounds = source.bounds[window.depth]
+            if dim == "layer":
+                names = [source.layers[i][0] for i in window.depth]
+                wanted = [value] if isinstance(value, str) else list(value)
+                missing = [name for name in wanted if name not in names]
+                if missing:
+                    raise KeyError(f"Layers {missing} are not in the selection")
+                positional["depth"] = names.index(value) if isinstance(value, str) else [names.index(n) for n in wanted]
+            elif isinstance(value, slice):
+                top = -np.inf if value.start is None else value.start
+                bottom = np.inf if value.stop is None else value.stop
+                positional["depth"] = np.flatnonzero((bounds[:, 0] < bottom) & (bounds[:, 1] > top))
+            else:
+                inside = np.flatnonzero((bounds[:, 0] <= value) & ((value < bounds[:, 1]) | (value == bounds[-1, 1])))
+                if not len(inside):
+                    raise KeyError(f"depth={value} is outside the selected layers")
+                positional["depth"] = int(inside[0])
+        else:
+            raise ValueError(f"Unknown coordinate {dim!r}; expected lat, lon, depth or layer")
+    return window.isel(**positional)
+
+
+def open_dataset(extractor=None, properties: Optional[Sequence[str]] = None, layers=STANDARD_LAYERS) -> SoilDataset:
+    """
+    Lazy dataset over the SMU raster and HWSD2_LAYERS.
+
+    Args:
+        extractor: ``HWSD2Extractor`` (default: the standard data paths)
+        properties: Layer properties to expose (default: every numeric
+            HWSD2_LAYERS property column that is not a D_* code)
+        layers: (name, top, bottom) layers forming the depth axis
+
+    Returns:
+        SoilDataset covering the whole grid
+
+    Raises:
+        ValueError: If a property is a coded column (``CODED_COLUMNS``)
+    """
+    if extractor is None:
+        from hwsd2_extractor import HWSD2Extractor
+
+        extractor = HWSD2Extractor()
+    if properties is None:
+        import duckdb
+
+        conn = duckdb.connect(str(extractor.db_path), read_only=True)
+        try:
+            rows = conn.execute("SELECT column_name, data_type FROM information_schema.columns "
+                                "WHERE table_name = 'HWSD2_LAYERS' ORDER BY ordinal_position").fetchall()
+        finally:
+            conn.close()
+        properties = [name for name, data_type in rows
+                      if name not in NON_PROPERTY_COLUMNS + CODED_COLUMNS
+                      and data_type.split("(")[0] in NUMERIC_TYPES + ("DECIMAL",)]
+    coded = [name for name in properties if name in CODED_COLUMNS]
+    if coded:
+        raise ValueError(f"{coded} are D_* codes and cannot be averaged over sequences")
+    source = _Source(extractor, properties, layers)
+    window = _Window(np.arange(len(layers)), (0, extractor.nrows), (0, extractor.ncols))
+    return SoilDataset(source, window)
+
+
+def main():
+    """Main entry point for command-line usage."""
+    if len(sys.argv) < 6:
+        print("Usage: python hwsd2_lazy.py <property> <north> <south> <west> <east> [layer]")
+        print("Example: python hwsd2_lazy.py ORG_CARBON 50 45 5 10 D1")
+        sys.exit(1)
+
+    name = sys.argv[1]
+    north, south, west, east = (float(v) for v in sys.argv[2:6])
+    layer = sys.argv[6] if len(sys.argv) > 6 else "D1"
+    ds = open_dataset(properties=[name])
+    values = ds[name].sel(lat=slice(north, south), lon=slice(west, east), layer=layer).values
+    print(f"{name} {layer}: {values.shape[0]}x{values.shape[1]} pixels, "
+          f"mean {np.nanmean(values):.3f}, min {np.nanmin(values):.3f}, max {np.nanmax(values):.3f}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,317 @@
+#!/usr/bin/env python
+"""
+Attribute-predicate to raster mask queries over HWSD2.
+
+Answers questions like "where is D1 pH < 5 and clay > 40 %" in two
+vectorized steps:
+
+1. the predicate is evaluated once over HWSD2_LAYERS (SQL, with -9 read as
+   NULL so missing values never match) into a lookup array indexed by
+   HWSD2_SMU_ID: a bitmap, or the share of the SMU that qualifies
+2. the lookup is applied to the SMU raster tile by tile (``lookup[tile]``),
+   optionally on several threads, to produce a mask, area totals or
+   bounding boxes, without a per-pixel comparison against an SMU list
+
+The raster is read through ``HWSD2Extractor.open_raster`` (memory-mapped
+HWSD2.bil or HWSD2.npy).
+
+Usage:
+    uv run python hwsd2_mask.py "<predicate>" [layer] [db_path] [raster_path]
+
+Example:
+    uv run python hwsd2_mask.py "PH_WATER < 5 AND CLAY > 40" D1
+"""
+
+import sys
+from concurrent.futures import ThreadPoolExecutor
+from typing import Dict, List, Optional, Tuple, Union
+
+import numpy as np
+
+from hwsd2_extractor import LOOKUP_SIZE, MISSING_VALUE
+
+DEFAULT_TILE_ROWS = 1024
+
+AGGREGATES = ("any", "dominant", "share")
+
+Window = Tuple[int, int, int, int]  # row_start, row_stop, col_start, col_stop
+
+
+def _layers_view(conn) -> str:
+    """SELECT over HWSD2_LAYERS with -9 in numeric columns read as NULL."""
+    columns = conn.execute(
+        "SELECT column_name, data_type FROM information_schema.columns "
+        "WHERE table_name = 'HWSD2_LAYERS' ORDER BY ordinal_position"
+    ).fetchall()
+    numeric = ("INTEGER", "BIGINT", "SMALLINT", "DOUBLE", "FLOAT", "REAL")
+    expressions = []
+    for name, data_type in columns:
+        if data_type.upper() in numeric or data_type.upper().startswith("DECIMAL"):
+            expressions.append(f"NULLIF({name}, {MISSING_VALUE}) AS {name}")
+        else:
+            expressions.append(name)
+    return f"SELECT {', '.join(expressions)} FROM HWSD2_LAYERS"
+
+
+def smu_lookup(
+    conn,
+    predicate: str,
+    layer: Optional[str] = "D1",
+    aggregate: str = "any",
+) -> np.ndarray:
+    """
+    Evaluate a predicate over HWSD2_LAYERS into a lookup indexed by SMU id.
+
+    Args:
+        conn: Open DuckDB connection to an HWSD2 database
+        predicate: SQL boolean expression over HWSD2_LAYERS columns, e.g.
+            "PH_WATER < 5 AND CLAY > 40"; missing values (-9) are NULL
+        layer: Layer the predicate applies to (e.g. "D1"); None for any layer
+        aggregate: How sequences combine into an SMU:
+            - "any": the SMU qualifies if any sequence does
+            - "dominant": only the first sequence is tested
+            - "share": fraction (0-1) of the SMU area, from SHARE, that qualifies
+
+    Returns:
+        Array of length 65536: bool for "any"/"dominant", float32 for "share"
+
+    Raises:
+        ValueError: If the aggregate is unknown
+
+    Examples:
+        >>> import duckdb
+        >>> lookup = smu_lookup(duckdb.connect("hwsd2.ddb"), "PH_WATER < 5 AND CLAY > 40")
+        >>> int(lookup.sum())
+    """
+    if aggregate not in AGGREGATES:
+        raise ValueError(f"Unknown aggregate {aggregate!r}; expected one of {AGGREGATES}")
+    conditions = [f"({predicate})"]
+    parameters = []
+    if layer is not None:
+        conditions.append("LAYER = ?")
+        parameters.append(layer)
+    if aggregate == "dominant":
+        conditions.append("SEQUENCE = 1")
+    where = " AND ".join(conditions)
+
+    if aggregate == "share":
+        # One SHARE per qualifying sequence (any of its layers, if layer is None)
+        rows = conn.execute(f"""
+            SELECT HWSD2_SMU_ID, SUM(SHARE) / 100 FROM (
+                SELECT DISTINCT HWSD2_SMU_ID, SEQUENCE, SHARE FROM ({_layers_view(conn)}) WHERE {where}
+            ) GROUP BY HWSD2_SMU_ID
+        """, parameters).fetchall()
+        lookup = np.zeros(LOOKUP_SIZE, dtype=np.float32)
+    else:
+        rows = conn.execute(
+            f"SELECT DISTINCT HWSD2_SMU_ID, TRUE FROM ({_layers_view(conn)}) WHERE {where}", parameters
+        ).fetchall()
+        lookup = np.zeros(LOOKUP_SIZE, dtype=bool)
+    if rows:
+        ids, values = zip(*rows)
+        ids = np.asarray(ids, dtype=np.int64)
+        valid = (ids >= 0) & (ids < LOOKUP_SIZE)
+        lookup[ids[valid]] = np.minimum(np.asarray(values, dtype=float)[valid], 1)
+    return lookup
+
+
+def _tiles(window: Window, tile_rows: int) -> List[Tuple[int, int]]:
+    row_start, row_stop = window[0], window[1]
+    return [(r, min(r + tile_rows, row_stop)) for r in range(row_start, row_stop, tile_rows)]
+
+
+def _run(function, tiles, workers: Optional[int]):
+    if workers == 1 or len(tiles) == 1:
+        return [function(tile) for tile in tiles]
+    with ThreadPoolExecutor(max_workers=workers) as pool:
+        return list(pool.map(function, tiles))
+
+
+def _full_window(extractor, window: Optional[Window]) -> Window:
+    return window or (0, extractor.nrows, 0, extractor.ncols)
+
+
+def apply_mask(
+    extractor,
+    lookup: np.ndarray,
+    window: Optional[Window] = None,
+    tile_rows: int = DEFAULT_TILE_ROWS,
+    workers: Optional[int] = None,
+    out: Union[str, np.ndarray, None] = None,
+) -> np.ndarray:
+    """
+    Apply an SMU lookup to the raster, tile by tile.
+
+    Args:
+        extractor: ``HWSD2Extractor`` with the SMU raster
+        lookup: Array from ``smu_lookup`` (nodata pixels map to its last entry,
+            which is never set)
+        window: (row_start, row_stop, col_start, col_stop); default whole raster
+        tile_rows: Raster rows per tile
+        workers: Threads (None: default pool size, 1: serial)
+        out: Optional output array, or a ``.npy`` path written as a memory map
+            (a global mask is ~0.9 GB)
+
+    Returns:
+        Mask of shape (rows, cols) with the lookup's dtype
+    """
+    raster = extractor.open_raster()
+    window = _full_window(extractor, window)
+    shape = (window[1] - window[0], window[3] - window[2])
+    if isinstance(out, str):
+        out = np.lib.format.open_memmap(out, mode="w+", dtype=lookup.dtype, shape=shape)
+    elif out is None:
+        out = np.empty(shape, dtype=lookup.dtype)
+
+    def tile(rows):
+        start, stop = rows
+        block = raster[start:stop, window[2]:window[3]]
+        np.take(lookup, block, out=out[start - window[0]:stop - window[0]])
+
+    _run(tile, _tiles(window, tile_rows), workers)
+    return out
+
+
+def mask_summary(
+    extractor,
+    lookup: np.ndarray,
+    window: Optional[Window] = None,
+    tile_rows: int = DEFAULT_TILE_ROWS,
+    tile_cols: Optional[int] = None,
+    workers: Optional[int] = None,
+) -> Dict:
+    """
+    Area totals and bounding boxes of a mask, without materializing it.
+
+    Args:
+        extractor: ``HWSD2Extractor`` with the SMU raster
+        lookup: Array from ``smu_lookup``; "share" lookups weight the area
+        window: (row_start, row_stop, col_start, col_stop); default whole raster
+        tile_rows: Raster rows per tile
+        tile_cols: If given, also report the bounding box of the matches in
+            each (tile_rows × tile_cols) block
+        workers: Threads (None: default pool size, 1: serial)
+
+    Returns:
+        Dictionary with:
+            - pixels: number of pixels with a non-zero lookup value
+            - area_km2: area of those pixels, weighted by the lookup value
+            - bbox: (west, south, east, north) in degrees, or None
+            - blocks: list of (west, south, east, north) per block with
+              matches (only if ``tile_cols`` is given)
+    """
+    raster = extractor.open_raster()
+    window = _full_window(extractor, window)
+    west_edge = extractor.ulx - extractor.xdim / 2
+    north_edge = extractor.uly + extractor.ydim / 2
+
+    def bounds(row0, row1, col0, col1):
+        return (west_edge + col0 * extractor.xdim, north_edge - (row1 + 1) * extractor.ydim,
+                west_edge + (col1 + 1) * extractor.xdim, north_edge - row0 * extractor.ydim)
+
+    def summarize(rows):
+        start, stop = rows
+        values = np.take(lookup, raster[start:stop, window[2]:window[3]])
+        if values.dtype == bool:
+            hits = values
+            per_row = np.count_nonzero(values, axis=1)
+        else:
+            hits = values != 0
+            per_row = values.sum(axis=1, dtype=float)
+        row_hits = per_row != 0
+        if not row_hits.any():
+            return 0, 0.0, None, []
+        area = float((per_row * extractor.row_areas(rows)).sum())
+        col_hits = hits.any(axis=0)
+        hit_rows, hit_cols = np.flatnonzero(row_hits), np.flatnonzero(col_hits)
+        extent = (start + hit_rows[0], start + hit_rows[-1],
+                  window[2] + hit_cols[0], window[2] + hit_cols[-1])
+        blocks = []
+        if tile_cols:
+            for col in range(0, hits.shape[1], tile_cols):
+                block = hits[:, col:col + tile_cols]
+                if block.any():
+                    r, c = np.flatnonzero(block.any(axis=1)), np.flatnonzero(block.any(axis=0))
+                    blocks.append(bounds(start + r[0], start + r[-1],
+                                         window[2] + col + c[0], window[2] + col + c[-1]))
+        return int(hits.sum()), area, extent, blocks
+
+    results = _run(summarize, _tiles(window, tile_rows), workers)
+    extents = [r[2] for r in results if r[2] is not None]
+    bbox = None
+    if extents:
+        extents = np.array(extents)
+        bbox = bounds(extents[:, 0].min(), extents[:, 1].max(), extents[:, 2].min(), extents[:, 3].max())
+    summary = {
+        "pixels": sum(r[0] for r in results),
+        "area_km2": sum(r[1] for r in results),
+        "bbox": bbox,
+    }
+    if tile_cols:
+        summary["blocks"] = [block for r in results for block in r[3]]
+    return summary
+
+
+def query_mask(
+    predicate: str,
+    layer: Optional[str] = "D1",
+    aggregate: str = "any",
+    output: str = "summary",
+    extractor=None,
+    **kwargs,
+):
+    """
+    Evaluate a predicate and return a mask or its summary.
+
+    Args:
+        predicate: SQL boolean expression over HWSD2_LAYERS columns
+        layer: Layer the predicate applies to; None for any layer
+        aggregate: "any", "dominant" or "share" (see ``smu_lookup``)
+        output: "mask" (``apply_mask``) or "summary" (``mask_summary``)
+        extractor: ``HWSD2Extractor``; default paths if None
+        **kwargs: Passed to ``apply_mask`` / ``mask_summary``
+
+    Returns:
+        Mask array or summary dictionary
+
+    Examples:
+        >>> query_mask("PH_WATER < 5 AND CLAY > 40")["area_km2"]
+    """
+    import duckdb
+    from hwsd2_extractor import HWSD2Extractor
+
+    extractor = extractor or HWSD2Extractor()
+    conn = duckdb.connect(str(extractor.db_path), read_only=True)
+    try:
+        lookup = smu_lookup(conn, predicate, layer, aggregate)
+    finally:
+        conn.close()
+    if output == "mask":
+        return apply_mask(extractor, lookup, **kwargs)
+    if output == "summary":
+        return mask_summary(extractor, lookup, **kwargs)
+    raise ValueError(f"Unknown output {output!r}; expected 'mask' or 'summary'")
+
+
+def main():
+    """Main entry point for command-line usage."""
+    if len(sys.argv) < 2:
+        print('Usage: python hwsd2_mask.py "<predicate>" [layer] [db_path] [raster_path]')
+        print('Example: python hwsd2_mask.py "PH_WATER < 5 AND CLAY > 40" D1')
+        sys.exit(1)
+
+    from hwsd2_extractor import HWSD2Extractor
+
+    predicate = sys.argv[1]
+    layer = sys.argv[2] if len(sys.argv) > 2 else "D1"
+    db_path = sys.argv[3] if len(sys.argv) > 3 else None
+    raster_path = sys.argv[4] if len(sys.argv) > 4 else None
+    extractor = HWSD2Extractor(raster_path=raster_path, db_path=db_path)
+    summary = query_mask(predicate, None if layer.lower() == "any" else layer, extractor=extractor)
+    print(f"Pixels:   {summary['pixels']:,}")
+    print(f"Area:     {summary['area_km2']:,.0f} km²")
+    print(f"Bounds:   {summary['bbox']}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,190 @@
+#!/usr/bin/env python
+"""
+Pedotransfer functions for soil hydraulic parameters.
+
+Water retention and conductivity parameters from texture, organic matter and
+bulk density, following Saxton & Rawls (2006, Soil Sci. Soc. Am. J. 70:1569):
+
+- wilting point (θ at 1500 kPa), field capacity (θ at 33 kPa) and
+  saturation, with the bulk-density adjustment when BULK is known
+- saturated conductivity Ksat (mm/h) and the Brooks-Corey slope λ and air
+  entry tension ψe (kPa)
+- van Genuchten parameters from the Brooks-Corey curve by the simple
+  direct mapping θr = 0, n = 1 + λ, α = 1/ψe (not a fitted conversion)
+
+All functions are elementwise numpy expressions, so inputs can be columns of
+a layer table or property cubes of any (broadcastable) shape. Inputs are
+HWSD2 units: SAND and CLAY in % weight, ORG_CARBON in % weight, BULK in
+g/cm³; -9 is treated as missing. The parameters are registered as derived
+layer properties (see hwsd2_derived.py), so ``load_hwsd2.py --derived``
+precomputes them per SMU, sequence and layer.
+
+Usage:
+    uv run python hwsd2_pedotransfer.py <sand_%> <clay_%> <org_carbon_%> [bulk_g_cm3]
+"""
+
+import sys
+from typing import Dict, Optional
+
+import numpy as np
+
+from hwsd2_extractor import MISSING_VALUE
+
+# Van Bemmelen factor: organic matter = 1.724 × organic carbon
+ORGANIC_MATTER_FACTOR = 1.724
+
+# Particle density (g/cm³) used by Saxton & Rawls
+PARTICLE_DENSITY = 2.65
+
+# Saxton & Rawls fitted OM up to 8 %; larger values are clipped
+MAX_ORGANIC_MATTER = 8.0
+
+# Floor for the air entry tension (kPa); the regression goes to zero for sands
+MIN_AIR_ENTRY = 0.1
+
+HYDRAULIC_PARAMETERS = (
+    "wilting_point", "field_capacity", "saturation", "available_water",
+    "ksat", "lambda", "air_entry", "vg_theta_r", "vg_theta_s", "vg_alpha", "vg_n",
+)
+
+
+def _input(values) -> np.ndarray:
+    array = np.asarray(values, dtype=float)
+    return np.where(array == MISSING_VALUE, np.nan, array)
+
+
+def saxton_rawls(sand, clay, org_carbon, bulk=None) -> Dict[str, np.ndarray]:
+    """
+    Saxton & Rawls (2006) hydraulic parameters, vectorized.
+
+    Args:
+        sand: Sand content (% weight)
+        clay: Clay content (% weight)
+        org_carbon: Organic carbon (% weight); converted to organic matter
+        bulk: Bulk density (g/cm³); if given, saturation, field capacity and
+            Ksat are adjusted for compaction (density factor clipped to 0.9-1.3)
+
+    Returns:
+        Dictionary of arrays (broadcast shape of the inputs):
+            - wilting_point, field_capacity, saturation, available_water (m³/m³)
+            - ksat: saturated hydraulic conductivity (mm/h)
+            - lambda: Brooks-Corey pore-size distribution index
+            - air_entry: air entry tension (kPa, at least ``MIN_AIR_ENTRY``)
+            - vg_theta_r, vg_theta_s, vg_alpha (1/kPa), vg_n: van Genuchten
+        Invalid combinations (and missing inputs) give NaN.
+
+    Examples:
+        >>> loam = saxton_rawls(40, 20, 2.5 / 1.724)
+        >>> [round(float(loam[k]), 3) for k in ("wilting_point", "field_capacity", "saturation")]
+        [0.137, 0.28, 0.459]
+        >>> round(float(loam["ksat"]), 1)
+        15.5
+    """
+    S = _input(sand) / 100
+    C = _input(clay) / 100
+    OM = np.minimum(_input(org_carbon) * ORGANIC_MATTER_FACTOR, MAX_ORGANIC_MATTER)
+
+    with np.errstate(invalid="ignore", divide="ignore"):
+        t1500 = -0.024 * S + 0.487 * C + 0.006 * OM + 0.005 * S * OM - 0.013 * C * OM + 0.068 * S * C + 0.031
+        theta_1500 = t1500 + (0.14 * t1500 - 0.02)
+        t33 = -0.251 * S + 0.195 * C + 0.011 * OM + 0.006 * S * OM - 0.027 * C * OM + 0.452 * S * C + 0.299
+        theta_33 = t33 + (1.283 * t33 ** 2 - 0.374 * t33 - 0.015)
+        ts33 = 0.278 * S + 0.034 * C + 0.022 * OM - 0.018 * S * OM - 0.027 * C * OM - 0.584 * S * C + 0.078
+        theta_s33 = ts33 + (0.636 * ts33 - 0.107)
+        theta_s = theta_33 + theta_s33 - 0.097 * S + 0.043
+
+        if bulk is not None:
+            normal_density = (1 - theta_s) * PARTICLE_DENSITY
+            density = _input(bulk)
+            density = np.where(np.isnan(density), normal_density,
+                               np.clip(density, 0.9 * normal_density, 1.3 * normal_density))
+            theta_s_df = 1 - density / PARTICLE_DENSITY
+            theta_33 = theta_33 - 0.2 * (theta_s - theta_s_df)
+            theta_s33 = theta_s_df - theta_33
+            theta_s = theta_s_df
+
+        psi_et = (-21.67 * S - 27.93 * C - 81.97 * theta_s33 + 71.12 * S * theta_s33
+                  + 8.29 * C * theta_s33 + 14.05 * S * C + 27.16)
+        air_entry = np.maximum(psi_et + (0.02 * psi_et ** 2 - 0.113 * psi_et - 0.70), MIN_AIR_ENTRY)
+
+        valid = (theta_1500 > 0) & (theta_33 > theta_1500) & (theta_s > theta_33)
+        B = (np.log(1500) - np.log(33)) / (np.log(theta_33) - np.log(theta_1500))
+        lam = np.where(valid, 1 / B, np.nan)
+        ksat = 1930 * np.clip(theta_s - theta_33, 0, None) ** (3 - lam)
+        alpha = 1 / air_entry
+
+    def masked(values):
+        return np.where(valid, values, np.nan)
+
+    return {
+        "wilting_point": masked(theta_1500),
+        "field_capacity": masked(theta_33),
+        "saturation": masked(theta_s),
+        "available_water": masked(theta_33 - theta_1500),
+        "ksat": masked(ksat),
+        "lambda": lam,
+        "air_entry": masked(air_entry),
+        "vg_theta_r": masked(np.zeros_like(theta_s)),
+        "vg_theta_s": masked(theta_s),
+        "vg_alpha": masked(alpha),
+        "vg_n": lam + 1,
+    }
+
+
+def van_genuchten_theta(tension, theta_r, theta_s, alpha, n):
+    """
+    Water content at a tension from van Genuchten parameters (m = 1 - 1/n).
+
+    Args:
+        tension: Matric tension (kPa, positive); broadcast against the parameters
+        theta_r: Residual water content (m³/m³)
+        theta_s: Saturated water content (m³/m³)
+        alpha: Inverse air entry (1/kPa)
+        n: Shape parameter (> 1)
+
+    Returns:
+        Volumetric water content (m³/m³)
+
+    Examples:
+        >>> round(float(van_genuchten_theta(0, 0.05, 0.45, 0.1, 1.5)), 2)
+        0.45
+    """
+    tension = np.asarray(tension, dtype=float)
+    n = np.asarray(n, dtype=float)
+    m = 1 - 1 / n
+    return theta_r + (theta_s - theta_r) / (1 + (alpha * tension) ** n) ** m
+
+
+def hydraulic_table(layers, bulk_adjusted: bool = True):
+    """
+    Hydraulic parameters for every row of an HWSD2_LAYERS DataFrame.
+
+    Args:
+        layers: pandas DataFrame with SAND, CLAY, ORG_CARBON (and BULK)
+        bulk_adjusted: Apply the bulk-density adjustment using BULK
+
+    Returns:
+        DataFrame (same index) with one column per ``HYDRAULIC_PARAMETERS`` entry
+    """
+    import pandas as pd
+
+    bulk = layers["BULK"] if bulk_adjusted and "BULK" in layers.columns else None
+    parameters = saxton_rawls(layers["SAND"], layers["CLAY"], layers["ORG_CARBON"], bulk)
+    return pd.DataFrame(parameters, index=layers.index)
+
+
+def main():
+    """Main entry point for command-line usage."""
+    if len(sys.argv) < 4:
+        print("Usage: python hwsd2_pedotransfer.py <sand_%> <clay_%> <org_carbon_%> [bulk_g_cm3]")
+        print("Example: python hwsd2_pedotransfer.py 40 20 1.5 1.4")
+        sys.exit(1)
+
+    sand, clay, org_carbon = (float(arg) for arg in sys.argv[1:4])
+    bulk: Optional[float] = float(sys.argv[4]) if len(sys.argv) > 4 else None
+    for name, value in saxton_rawls(sand, clay, org_carbon, bulk).items():
+        print(f"{name:16s} {float(value):.4f}")
+
+
+if __name__ == "__main__":
+    main()
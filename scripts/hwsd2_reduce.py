@@ -0,0 +1,298 @@
+#!/usr/bin/env python
+"""
+Grouped global reductions of HWSD2 by classification or climate zone.
+
+Answers reporting questions such as "area of each WRB2 reference group" or
+"total SOC stock 0-100 cm per Köppen zone" without a pixel pass per question:
+
+1. the area of every SMU (km², on a sphere) is counted once from the raster
+   and cached next to the database (``hwsd2.smu_areas.npz``)
+2. per-SMU (or per-sequence) quantities come from HWSD2_LAYERS, the derived
+   profile properties of hwsd2_derived.py, or HWSD2_PROFILES_DERIVED
+3. areas and quantities are joined and grouped in DuckDB
+
+Grouping is by an HWSD2_SMU column (``level="smu"``: KOPPEN, COVERAGE, the
+dominant WRB2/FAO90, ...) or by an HWSD2_LAYERS column, splitting each SMU
+area by SEQUENCE SHARE (``level="sequence"``). Results are cached in
+``hwsd2.reductions.json`` under the dataset version (raster and database
+fingerprints), so repeat reports return instantly and any change to the
+data invalidates them.
+
+Usage:
+    uv run python hwsd2_reduce.py <by> [quantity] [layer] [level] [db_path] [raster_path]
+"""
+
+import hashlib
+import json
+import sys
+from concurrent.futures import ThreadPoolExecutor
+from pathlib import Path
+from typing import Optional
+
+import numpy as np
+
+from hwsd2_derived import PROFILE_KEYS, PROFILE_PROPERTIES, PROFILES_DERIVED_TABLE, derive_profiles, layer_inputs
+from hwsd2_extractor import LOOKUP_SIZE, MISSING_VALUE, file_fingerprint, share_weighted_mean_sql
+from hwsd2_mask import DEFAULT_TILE_ROWS
+
+LEVELS = ("smu", "sequence")
+
+AREAS_SUFFIX = ".smu_areas.npz"
+CACHE_SUFFIX = ".reductions.json"
+
+# km² to m², so TOTAL of a per-m² quantity (e.g. kg C/m²) is in its numerator unit (kg C)
+M2_PER_KM2 = 1e6
+
+
+def dataset_version(extractor) -> str:
+    """
+    Version of the (raster, database) pair: changes whenever either file does.
+
+    Returns:
+        Hex digest
+    """
+    digest = hashlib.sha1()
+    for path in (extractor.raster_path, extractor.db_path):
+        digest.update(file_fingerprint(path).tobytes())
+    return digest.hexdigest()[:16]
+
+
+def smu_areas(extractor, tile_rows: int = DEFAULT_TILE_ROWS, workers: Optional[int] = None) -> np.ndarray:
+    """
+    Area (km²) of every SMU in the raster, from one pass over its rows.
+
+    Args:
+        extractor: ``HWSD2Extractor`` with the SMU raster
+        tile_rows: Rows per tile
+        workers: Threads (None: default pool size, 1: serial)
+
+    Returns:
+        Array of 65536 areas indexed by HWSD2_SMU_ID (nodata is 0)
+    """
+    raster = extractor.open_raster()
+    areas = extractor.row_areas()
+
+    def tile(start):
+        total = np.zeros(LOOKUP_SIZE)
+        block = np.asarray(raster[start:start + tile_rows])
+        for row, area in zip(block, areas[start:start + tile_rows]):
+            total += np.bincount(row.reshape(-1), minlength=LOOKUP_SIZE) * area
+        return total
+
+    starts = range(0, extractor.nrows, tile_rows)
+    if workers == 1 or len(starts) == 1:
+        partials = [tile(start) for start in starts]
+    else:
+        with ThreadPoolExecutor(max_workers=workers) as pool:
+            partials = list(pool.map(tile, starts))
+    total = np.sum(partials, axis=0)
+    total[extractor.nodata % LOOKUP_SIZE] = 0
+    return total
+
+
+def load_smu_areas(extractor, rebuild: bool = False, **kwargs) -> np.ndarray:
+    """
+    SMU areas cached next to the database, recounted when the raster changes.
+
+    Args:
+        extractor: ``HWSD2Extractor``
+        rebuild: Recount even if cached areas are up to date
+        **kwargs: Passed to ``smu_areas``
+
+    Returns:
+        Array of 65536 areas (km²)
+    """
+    db_path = Path(extractor.db_path)
+    path = db_path.with_name(db_path.stem + AREAS_SUFFIX)
+    fingerprint = file_fingerprint(extractor.raster_path)
+    if path.exists() and not rebuild:
+        with np.load(path) as data:
+            if np.array_equal(data["fingerprint"], fingerprint):
+                return data["areas"]
+    areas = smu_areas(extractor, **kwargs)
+    np.savez(path, areas=areas, fingerprint=fingerprint)
+    return areas
+
+
+def _columns(conn, table: str) -> set:
+    return {row[0] for row in conn.execute(
+        "SELECT column_name FROM information_schema.columns WHERE table_name = ?", [table]).fetchall()}
+
+
+def sequence_values(conn, quantity: str, layer: str = "D1"):
+    """
+    Per-sequence values of a quantity.
+
+    Args:
+        conn: Open DuckDB connection to an HWSD2 database
+        quantity: A profile property of hwsd2_derived.py (e.g. "SOC_STOCK_100",
+            read from HWSD2_PROFILES_DERIVED when materialized) or a numeric
+            HWSD2_LAYERS column (taken from ``layer``)
+        layer: Layer for HWSD2_LAYERS columns
+
+    Returns:
+        DataFrame with HWSD2_SMU_ID, SEQUENCE and VALUE (NaN where missing)
+
+    Raises:
+        KeyError: If the quantity is neither
+    """
+    layer_columns = _columns(conn, "HWSD2_LAYERS")
+    if quantity in PROFILE_PROPERTIES:
+        if quantity in _columns(conn, PROFILES_DERIVED_TABLE):
+            return conn.execute(f"SELECT HWSD2_SMU_ID, SEQUENCE, {quantity} AS VALUE "
+                                f"FROM {PROFILES_DERIVED_TABLE}").df()
+        source = PROFILE_PROPERTIES[quantity].source
+        needed = [source] if source in layer_columns else layer_inputs([source])
+        columns = ", ".join(dict.fromkeys([*PROFILE_KEYS, "TOPDEP", "BOTDEP", *needed]))
+        layers = conn.execute(f"SELECT {columns} FROM HWSD2_LAYERS").df()
+        return derive_profiles(layers, [quantity]).rename(columns={quantity: "VALUE"})
+    if quantity not in layer_columns:
+        raise KeyError(f"Unknown quantity {quantity!r}: not a derived profile property or HWSD2_LAYERS column")
+    return conn.execute(f"SELECT HWSD2_SMU_ID, SEQUENCE, NULLIF({quantity}, {MISSING_VALUE}) AS VALUE "
+                        f"FROM HWSD2_LAYERS WHERE LAYER = ?", [layer]).df()
+
+
+def grouped_totals(conn, areas: np.ndarray, by: str, quantity: str = "AREA", layer: str = "D1",
+                   level: str = "smu"):
+    """
+    Join SMU areas with quantities and group them.
+
+    Args:
+        conn: Open DuckDB connection to an HWSD2 database
+        areas: SMU areas from ``smu_areas``
+        by: Grouping column (of HWSD2_SMU for level "smu", HWSD2_LAYERS for "sequence")
+        quantity: "AREA" or a quantity for ``sequence_values``
+        layer: Layer for HWSD2_LAYERS quantities
+        level: "smu" (one group per SMU, sequence values SHARE-averaged) or
+            "sequence" (SMU area split over sequences by SHARE)
+
+    Returns:
+        DataFrame with the group column, LABEL (when a D_<by> table exists),
+        AREA_KM2 and AREA_SHARE; for quantities also COVERED_KM2 (area with a
+        value), MEAN (area-weighted) and TOTAL (MEAN x COVERED area in m²)
+
+    Raises:
+        ValueError: If the level is unknown
+    """
+    import pandas as pd
+
+    if level not in LEVELS:
+        raise ValueError(f"Unknown level {level!r}; expected one of {LEVELS}")
+    ids = np.flatnonzero(areas)
+    conn.register("_smu_area", pd.DataFrame({"HWSD2_SMU_ID": ids, "AREA_KM2": areas[ids]}))
+    if quantity == "AREA":
+        values = pd.DataFrame({"HWSD2_SMU_ID": pd.Series(dtype=int), "SEQUENCE": pd.Series(dtype=int),
+                               "VALUE": pd.Series(dtype=float)})
+    else:
+        values = sequence_values(conn, quantity, layer)
+    conn.register("_values", values)
+
+    sequences = "(SELECT DISTINCT HWSD2_SMU_ID, SEQUENCE, SHARE, {by} FROM HWSD2_LAYERS)"
+    if level == "smu":
+        groups = f"SELECT HWSD2_SMU_ID, CAST({by} AS VARCHAR) AS GRP, NULL AS SEQUENCE, 1.0 AS FRACTION FROM HWSD2_SMU"
+        value_join = f"""LEFT JOIN (
+            SELECT v.HWSD2_SMU_ID, {share_weighted_mean_sql("v.VALUE", "s.SHARE", missing=None)} AS VALUE
+            FROM _values v JOIN (SELECT DISTINCT HWSD2_SMU_ID, SEQUENCE, SHARE FROM HWSD2_LAYERS) s
+            USING (HWSD2_SMU_ID, SEQUENCE) GROUP BY v.HWSD2_SMU_ID
+        ) v ON v.HWSD2_SMU_ID = a.HWSD2_SMU_ID"""
+    else:
+        groups = (f"SELECT HWSD2_SMU_ID, CAST({by} AS VARCHAR) AS GRP, SEQUENCE, "
+                  f"SHARE / SUM(SHARE) OVER (PARTITION BY HWSD2_SMU_ID) AS FRACTION FROM {sequences.format(by=by)}")
+        value_join = "LEFT JOIN _values v ON v.HWSD2_SMU_ID = a.HWSD2_SMU_ID AND v.SEQUENCE = g.SEQUENCE"
+    has_labels = conn.execute("SELECT COUNT(*) FROM information_schema.tables WHERE table_name = ?",
+                              [f"D_{by}"]).fetchone()[0]
+    label = f"(SELECT ANY_VALUE(CAST(VALUE AS VARCHAR)) FROM D_{by} d WHERE CAST(d.CODE AS VARCHAR) = r.GRP)"
+
+    try:
+        result = conn.execute(f"""
+            SELECT r.GRP AS {by}, {label if has_labels else "NULL"} AS LABEL, r.* EXCLUDE (GRP) FROM (
+                SELECT g.GRP,
+                       SUM(a.AREA_KM2 * COALESCE(g.FRACTION, 1)) AS AREA_KM2,
+                       SUM(CASE WHEN v.VALUE IS NOT NULL THEN a.AREA_KM2 * COALESCE(g.FRACTION, 1) END) AS COVERED_KM2,
+                       SUM(a.AREA_KM2 * COALESCE(g.FRACTION, 1) * v.VALUE) * {M2_PER_KM2} AS TOTAL
+                FROM _smu_area a
+                LEFT JOIN ({groups}) g ON g.HWSD2_SMU_ID = a.HWSD2_SMU_ID
+                {value_join}
+                GROUP BY g.GRP
+            ) r ORDER BY r.AREA_KM2 DESC
+        """).df()
+    finally:
+        conn.unregister("_smu_area")
+        conn.unregister("_values")
+    result["AREA_SHARE"] = result["AREA_KM2"] / result["AREA_KM2"].sum()
+    if quantity == "AREA":
+        return result[[by, "LABEL", "AREA_KM2", "AREA_SHARE"]]
+    result["MEAN"] = result["TOTAL"] / M2_PER_KM2 / result["COVERED_KM2"]
+    return result[[by, "LABEL", "AREA_KM2", "AREA_SHARE", "COVERED_KM2", "MEAN", "TOTAL"]]
+
+
+def reduce_by(by: str, quantity: str = "AREA", layer: str = "D1", level: str = "smu", extractor=None,
+              cache: bool = True):
+    """
+    Grouped reduction with cached SMU areas and results.
+
+    Args:
+        by: Grouping column, e.g. "KOPPEN", "WRB2", "FAO90", "COVERAGE"
+        quantity: "AREA" or a quantity for ``sequence_values`` (e.g. "SOC_STOCK_100")
+        layer: Layer for HWSD2_LAYERS quantities
+        level: "smu" or "sequence" (see ``grouped_totals``)
+        extractor: ``HWSD2Extractor`` (default: the standard data paths)
+        cache: Use and update ``hwsd2.reductions.json`` next to the database
+
+    Returns:
+        DataFrame from ``grouped_totals``
+
+    Examples:
+        >>> reduce_by("WRB2")                                 # area per reference group
+        >>> reduce_by("KOPPEN", "SOC_STOCK_100")["TOTAL"] / 1e12   # Pg C per climate zone
+    """
+    import duckdb
+    import pandas as pd
+
+    if extractor is None:
+        from hwsd2_extractor import HWSD2Extractor
+
+        extractor = HWSD2Extractor()
+    db_path = Path(extractor.db_path)
+    path = db_path.with_name(db_path.stem + CACHE_SUFFIX)
+    version = dataset_version(extractor)
+    key = "|".join([by, quantity, layer if quantity != "AREA" else "", level])
+
+    stored = {"version": version, "results": {}}
+    if cache and path.exists():
+        loaded = json.loads(path.read_text())
+        if loaded.get("version") == version:
+            stored = loaded
+            if key in stored["results"]:
+                return pd.DataFrame(**stored["results"][key])
+
+    areas = load_smu_areas(extractor) if cache else smu_areas(extractor)
+    conn = duckdb.connect(str(db_path), read_only=True)
+    try:
+        result = grouped_totals(conn, areas, by, quantity, layer, level)
+    finally:
+        conn.close()
+    if cache:
+        stored["results"][key] = result.to_dict(orient="split", index=False)
+        path.write_text(json.dumps(stored))
+    return result
+
+
+def main():
+    """Main entry point for command-line usage."""
+    if len(sys.argv) < 2:
+        print("Usage: python hwsd2_reduce.py <by> [quantity] [layer] [level] [db_path] [raster_path]")
+        print("Example: python hwsd2_reduce.py KOPPEN SOC_STOCK_100")
+        sys.exit(1)
+
+    from hwsd2_extractor import HWSD2Extractor
+
+    args = sys.argv[1:] + [None] * 6
+    by, quantity, layer, level, db_path, raster_path = args[:6]
+    extractor = HWSD2Extractor(raster_path=raster_path, db_path=db_path)
+    result = reduce_by(by, quantity or "AREA", layer or "D1", level or "smu", extractor=extractor)
+    print(result.to_string(index=False))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,390 @@
+#!/usr/bin/env python
+"""
+Regridding of HWSD2 onto arbitrary model domains.
+
+Target domains are lists of cell polygons: corner arrays as in an ELM/CLM
+domain file (``xv``/``yv`` of shape (nj, ni, nv)), explicit polygons, or
+lat/lon bounds. The geometry pass runs once per (raster, domain):
+
+1. every HWSD2 pixel whose centre falls inside a cell polygon is assigned to
+   that cell, weighted by its spherical area
+2. pixels are collapsed to a sparse (n_cells x 65536) matrix of SMU area
+   (km²) per cell, stored in CSR form
+
+Any per-SMU lookup (``hwsd2_upscale.smu_tables``, ``hwsd2_mask.smu_lookup``)
+is then projected onto the domain with one sparse matrix product, so new
+variables or attribute releases cost a multiply instead of a geometry pass.
+Weights are cached as ``.npz`` keyed by raster and domain fingerprints.
+scipy.sparse is used for the products when installed, numpy otherwise.
+
+Usage:
+    uv run python hwsd2_regrid.py <domain.nc|domain.npz> <output.npz> [db_path] [raster_path]
+"""
+
+import hashlib
+import sys
+from dataclasses import dataclass
+from pathlib import Path
+from typing import Optional, Sequence, Tuple, Union
+
+import numpy as np
+
+from hwsd2_extractor import LOOKUP_SIZE, file_fingerprint
+
+# Pixel runs gathered before they are collapsed to (cell, SMU) areas
+FLUSH_RUNS = 1 << 22
+
+
+@dataclass
+class Domain:
+    """
+    Target cells as polygons in lon/lat degrees.
+
+    Attributes:
+        xv: (n_cells, n_vertices) vertex longitudes
+        yv: (n_cells, n_vertices) vertex latitudes
+        mask: (n_cells,) cells to regrid (others get no weights)
+        shape: Grid shape of the cells, for reshaping results
+    """
+
+    xv: np.ndarray
+    yv: np.ndarray
+    mask: np.ndarray
+    shape: Tuple[int, ...]
+
+    def __len__(self) -> int:
+        return len(self.xv)
+
+    @classmethod
+    def from_corners(cls, xv, yv, mask=None) -> "Domain":
+        """
+        Domain from corner arrays of shape (..., n_vertices), as in ELM domain files.
+
+        Examples:
+            >>> domain = Domain.from_corners(xv, yv, mask)   # xv: (nj, ni, 4)
+        """
+        xv, yv = np.asarray(xv, dtype=float), np.asarray(yv, dtype=float)
+        shape = xv.shape[:-1]
+        mask = np.ones(shape, dtype=bool) if mask is None else np.asarray(mask).astype(bool)
+        return cls(xv.reshape(-1, xv.shape[-1]), yv.reshape(-1, yv.shape[-1]), mask.reshape(-1), shape)
+
+    @classmethod
+    def from_polygons(cls, polygons: Sequence) -> "Domain":
+        """
+        Domain from a list of (n_vertices, 2) lon/lat polygons of any size.
+
+        Shorter polygons are padded by repeating their last vertex.
+        """
+        polygons = [np.asarray(p, dtype=float).reshape(-1, 2) for p in polygons]
+        n_vertices = max(len(p) for p in polygons)
+        padded = np.stack([np.vstack([p, np.repeat(p[-1:], n_vertices - len(p), axis=0)]) for p in polygons])
+        return cls.from_corners(padded[..., 0], padded[..., 1])
+
+    @classmethod
+    def from_bounds(cls, west, south, east, north) -> "Domain":
+        """Domain of lon/lat rectangles (arrays of equal shape)."""
+        west, south, east, north = np.broadcast_arrays(*(np.asarray(a, dtype=float) for a in (west, south, east, north)))
+        return cls.from_corners(np.stack([west, east, east, west], axis=-1),
+                                np.stack([south, south, north, north], axis=-1))
+
+    def fingerprint(self) -> str:
+        """Hash of the cell geometry and mask."""
+        digest = hashlib.sha1()
+        for array in (self.xv, self.yv, self.mask):
+            digest.update(np.ascontiguousarray(array).tobytes())
+        digest.update(repr(self.shape).encode())
+        return digest.hexdigest()
+
+
+def load_domain(path: Union[str, Path]) -> Domain:
+    """
+    Read a domain from an ``.npz`` or a NetCDF domain file (xv, yv, optional mask).
+
+    NetCDF needs xarray or netCDF4.
+    """
+    path = Path(path)
+    if path.suffix == ".npz":
+        with np.load(path) as data:
+            return Domain.from_corners(data["xv"], data["yv"], data["mask"] if "mask" in data else None)
+    try:
+        import xarray
+    except ImportError:
+        try:
+            import netCDF4
+        except ImportError:
+            raise ImportError("Reading NetCDF domain files requires xarray or netCDF4") from None
+        with netCDF4.Dataset(path) as ds:
+            mask = ds.variables["mask"][:] if "mask" in ds.variables else None
+            return Domain.from_corners(ds.variables["xv"][:], ds.variables["yv"][:], mask)
+    with xarray.open_dataset(path) as ds:
+        mask = ds["mask"].values if "mask" in ds else None
+        return Domain.from_corners(ds["xv"].values, ds["yv"].values, mask)
+
+
+def _inside(lon: np.ndarray, lat: np.ndarray, xv: np.ndarray, yv: np.ndarray) -> np.ndarray:
+    """Even-odd point-in-polygon test for points against one polygon."""
+    inside = np.zeros(np.broadcast(lon, lat).shape, dtype=bool)
+    for (x0, y0), (x1, y1) in zip(zip(xv, yv), zip(np.roll(xv, -1), np.roll(yv, -1))):
+        if y0 == y1:
+            continue
+        crosses = (y0 > lat) != (y1 > lat)
+        inside ^= crosses & (lon < x0 + (lat - y0) * (x1 - x0) / (y1 - y0))
+    return inside
+
+
+def _is_rectangle(xv: np.ndarray, yv: np.ndarray) -> bool:
+    """True for an axis-aligned rectangle (its four corners, possibly repeated)."""
+    corners = {(x, y) for x in (xv.min(), xv.max()) for y in (yv.min(), yv.max())}
+    return set(zip(xv.tolist(), yv.tolist())) == corners
+
+
+class RegridWeights:
+    """
+    Sparse SMU-area weights of a domain: row i holds the km² of each SMU in cell i.
+
+    Build with ``RegridWeights.build``; persist with ``save``/``load`` (or use
+    ``load_weights``).
+    """
+
+    def __init__(self, indptr, indices, data, cell_area, shape, fingerprint=None):
+        self.indptr = np.asarray(indptr, dtype=np.int64)
+        self.indices = np.asarray(indices, dtype=np.int64)
+        self.data = np.asarray(data, dtype=float)
+        self.cell_area = np.asarray(cell_area, dtype=float)
+        self.shape = tuple(int(n) for n in shape)
+        self.fingerprint = fingerprint
+        self._rows = np.repeat(np.arange(len(self.cell_area)), np.diff(self.indptr))
+        self._matrix = None
+
+    def __len__(self) -> int:
+        return len(self.cell_area)
+
+    @classmethod
+    def build(cls, extractor, domain: Domain) -> "RegridWeights":
+        """
+        Geometry pass: SMU areas of every domain cell.
+
+        Args:
+            extractor: ``HWSD2Extractor`` with the SMU raster
+            domain: Target cells
+
+        Returns:
+            RegridWeights
+        """
+        raster = extractor.open_raster()
+        areas = extractor.row_areas()
+        north, west = extractor.uly + extractor.ydim / 2, extractor.ulx - extractor.xdim / 2
+        wraps = abs(extractor.ncols * extractor.xdim - 360) < 1e-6
+        # Vertex longitudes continuous around each cell's first vertex, which lies in [west, west + 360)
+        first = domain.xv[:, :1]
+        xv = (first - west) % 360 + west + (domain.xv - first + 180) % 360 - 180
+
+        n_cells = len(domain)
+        cell_area = np.zeros(n_cells)
+        cells, smus, pixel_areas = [], [], []
+        pending = 0
+        triples = []
+
+        def flush():
+            if cells:
+                key, inverse = np.unique(np.concatenate(cells) * LOOKUP_SIZE + np.concatenate(smus),
+                                         return_inverse=True)
+                triples.append((key, np.bincount(inverse.reshape(-1), weights=np.concatenate(pixel_areas))))
+                cells.clear(), smus.clear(), pixel_areas.clear()
+
+        for i in np.flatnonzero(domain.mask):
+            x, y = xv[i], domain.yv[i]
+            r0 = max(int(np.floor((north - y.max()) / extractor.ydim)), 0)
+            r1 = min(int(np.ceil((north - y.min()) / extractor.ydim)), extractor.nrows)
+            c0 = int(np.floor((x.min() - west) / extractor.xdim))
+            c1 = int(np.ceil((x.max() - west) / extractor.xdim))
+            if not wraps:
+                c0, c1 = max(c0, 0), min(c1, extractor.ncols)
+            if r0 >= r1 or c0 >= c1:
+                continue
+            lat = (north - (np.arange(r0, r1) + 0.5) * extractor.ydim)[:, None]
+            lon = (west + (np.arange(c0, c1) + 0.5) * extractor.xdim)[None, :]
+            inside = (lon >= x.min()) & (lon < x.max()) & (lat >= y.min()) & (lat < y.max())
+            if not _is_rectangle(x, y):
+                inside &= _inside(lon, lat, x, y)
+            if 0 <= c0 and c1 <= extractor.ncols:
+                block = np.asarray(raster[r0:r1, c0:c1])
+            else:
+                block = np.take(np.asarray(raster[r0:r1]), np.arange(c0, c1), axis=1, mode="wrap")
+            area = np.broadcast_to(areas[r0:r1, None], inside.shape)[inside]
+            cell_area[i] = area.sum()
+            smu = block[inside].astype(np.int64)
+            land = smu != extractor.nodata
+            smu, area = smu[land], area[land]
+            if not len(smu):
+                continue
+            # Collapse runs of equal SMU before the sort in flush()
+            starts = np.flatnonzero(np.r_[True, smu[1:] != smu[:-1]])
+            cells.append(np.full(len(starts), i, dtype=np.int64))
+            smus.append(smu[starts])
+            pixel_areas.append(np.add.reduceat(area, starts))
+            pending += len(starts)
+            if pending >= FLUSH_RUNS:
+                flush()
+                pending = 0
+        flush()
+
+        if triples:
+            # Cells are visited in order and never split across flushes: keys are already sorted
+            key = np.concatenate([k for k, _ in triples])
+            area = np.concatenate([a for _, a in triples])
+        else:
+            key, area = np.zeros(0, dtype=np.int64), np.zeros(0)
+        rows, indices = np.divmod(key, LOOKUP_SIZE)
+        indptr = np.concatenate([[0], np.cumsum(np.bincount(rows, minlength=n_cells))])
+        return cls(indptr, indices, area, cell_area, domain.shape,
+                   {"raster": file_fingerprint(extractor.raster_path), "domain": domain.fingerprint()})
+
+    def save(self, path: Union[str, Path]) -> Path:
+        """Write the weights to an ``.npz`` file."""
+        fingerprint = self.fingerprint or {"raster": np.zeros(2, dtype=np.int64), "domain": ""}
+        np.savez(path, indptr=self.indptr, indices=self.indices, data=self.data, cell_area=self.cell_area,
+                 shape=np.array(self.shape), raster=fingerprint["raster"], domain=np.array(fingerprint["domain"]))
+        return Path(path)
+
+    @classmethod
+    def load(cls, path: Union[str, Path]) -> "RegridWeights":
+        """Read weights written by ``save``."""
+        with np.load(path) as data:
+            return cls(data["indptr"], data["indices"], data["data"], data["cell_area"], data["shape"],
+                       {"raster": data["raster"], "domain": str(data["domain"])})
+
+    def _product(self, values: np.ndarray) -> np.ndarray:
+        """W @ values for (65536,) or (65536, k) values."""
+        try:
+            import scipy.sparse
+        except ImportError:
+            weighted = self.data.reshape((-1,) + (1,) * (values.ndim - 1)) * values[self.indices]
+            flat = weighted.reshape(len(weighted), -1)
+            out = np.stack([np.bincount(self._rows, weights=flat[:, j], minlength=len(self))
+                            for j in range(flat.shape[1])], axis=1)
+            return out.reshape((len(self),) + values.shape[1:])
+        if self._matrix is None:
+            self._matrix = scipy.sparse.csr_matrix((self.data, self.indices, self.indptr),
+                                                   shape=(len(self), LOOKUP_SIZE))
+        return np.asarray(self._matrix @ values)
+
+    def _grid(self, values: np.ndarray) -> np.ndarray:
+        return values.reshape(self.shape + values.shape[1:])
+
+    def land_fraction(self) -> np.ndarray:
+        """Share of each cell's area covered by SMUs (NaN for cells without pixels)."""
+        land = np.bincount(self._rows, weights=self.data, minlength=len(self))
+        with np.errstate(invalid="ignore", divide="ignore"):
+            return self._grid(np.where(self.cell_area > 0, land / self.cell_area, np.nan))
+
+    def project(self, lookup: np.ndarray) -> np.ndarray:
+        """
+        Area-weighted mean of a per-SMU lookup in every cell.
+
+        Args:
+            lookup: (65536,) or (65536, k) values indexed by HWSD2_SMU_ID; NaN
+                (unknown SMU or missing value) is left out of the mean
+
+        Returns:
+            Array of the domain shape (plus k); NaN where nothing is known
+
+        Examples:
+            >>> weights.project(tables.values)         # all properties at once
+            >>> weights.project(smu_lookup(conn, "PH_WATER < 5", aggregate="share"))
+        """
+        lookup = np.asarray(lookup, dtype=float)
+        valid = ~np.isnan(lookup)
+        total = self._product(np.where(valid, lookup, 0.0))
+        weight = self._product(valid.astype(float))
+        with np.errstate(invalid="ignore", divide="ignore"):
+            return self._grid(np.where(weight > 0, total / weight, np.nan))
+
+    def dominant_smu(self) -> Tuple[np.ndarray, np.ndarray]:
+        """
+        Largest SMU of every cell and its share of the cell's land area.
+
+        Returns:
+            (smu ids, 0 where none; fractions)
+        """
+        dominant = np.zeros(len(self), dtype=np.uint16)
+        fraction = np.zeros(len(self))
+        if len(self.data):
+            order = np.lexsort((self.data, self._rows))
+            last = order[np.r_[self._rows[order][1:] != self._rows[order][:-1], True]]
+            land = np.bincount(self._rows, weights=self.data, minlength=len(self))
+            dominant[self._rows[last]] = self.indices[last]
+            fraction[self._rows[last]] = self.data[last] / land[self._rows[last]]
+        return self._grid(dominant), self._grid(fraction)
+
+
+def weights_path(domain_path: Union[str, Path]) -> Path:
+    """
+    Path of the weights cached next to a domain file.
+
+    Examples:
+        >>> weights_path("domain.lnd.r05.nc").as_posix()
+        'domain.lnd.r05.hwsd2_weights.npz'
+    """
+    domain_path = Path(domain_path)
+    return domain_path.with_name(domain_path.stem + ".hwsd2_weights.npz")
+
+
+def load_weights(extractor, domain: Domain, path: Union[str, Path], rebuild: bool = False) -> RegridWeights:
+    """
+    Load cached weights, building them if missing or stale.
+
+    Args:
+        extractor: ``HWSD2Extractor`` with the SMU raster
+        domain: Target cells
+        path: Cache file (``.npz``)
+        rebuild: Build even if up-to-date weights exist
+
+    Returns:
+        RegridWeights
+    """
+    path = Path(path)
+    if path.exists() and not rebuild:
+        weights = RegridWeights.load(path)
+        if (weights.fingerprint["domain"] == domain.fingerprint()
+                and np.array_equal(weights.fingerprint["raster"], file_fingerprint(extractor.raster_path))):
+            return weights
+    weights = RegridWeights.build(extractor, domain)
+    weights.save(path)
+    return weights
+
+
+def main():
+    """Main entry point for command-line usage."""
+    if len(sys.argv) < 3:
+        print("Usage: python hwsd2_regrid.py <domain.nc|domain.npz> <output.npz> [db_path] [raster_path]")
+        sys.exit(1)
+
+    import duckdb
+    from hwsd2_extractor import HWSD2Extractor
+    from hwsd2_upscale import smu_tables
+
+    domain_path, output_path = sys.argv[1], sys.argv[2]
+    db_path = sys.argv[3] if len(sys.argv) > 3 else None
+    raster_path = sys.argv[4] if len(sys.argv) > 4 else None
+    extractor = HWSD2Extractor(raster_path=raster_path, db_path=db_path)
+    domain = load_domain(domain_path)
+    weights = load_weights(extractor, domain, weights_path(domain_path))
+    conn = duckdb.connect(str(extractor.db_path), read_only=True)
+    try:
+        tables = smu_tables(conn)
+    finally:
+        conn.close()
+    values = weights.project(tables.values)
+    grids = {name: values[..., k] for k, name in enumerate(tables.properties)}
+    grids["land_fraction"] = weights.land_fraction()
+    grids["dominant_smu"], grids["dominant_smu_fraction"] = weights.dominant_smu()
+    if tables.class_codes:
+        grids["class_codes"] = np.array(tables.class_codes)
+        grids["class_fractions"] = np.moveaxis(weights.project(tables.class_shares), -1, 0)
+    np.savez_compressed(output_path, **grids)
+    print(f"Wrote {len(domain)} cells to {output_path}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,262 @@
+#!/usr/bin/env python
+"""
+Vectorized USDA and SOTER texture classification.
+
+Classifies whole columns (or arrays of any shape) of sand/silt/clay at once.
+The texture triangle is encoded as half-plane tests on (sand, silt, clay),
+evaluated as boolean masks; the USDA rules partition the triangle, so every
+valid composition gets exactly one class.
+
+- USDA: the 13 ``D_TEXTURE_USDA`` codes (clay split at 60 % into heavy and
+  light, as in HWSD)
+- SOTER: the ``D_TEXTURE_SOTER`` codes C, M, Z, F, V
+
+Compositions are normalized to 100 % (SILT defaults to 100 - SAND - CLAY);
+missing values (-9, NaN) give code 0 for USDA and "" for SOTER.
+
+``classify_layers`` runs over HWSD2_LAYERS in the database to fill missing
+codes, or to count (or overwrite) codes that disagree with the fractions;
+``load_hwsd2.py --texture`` does this while loading.
+
+Usage:
+    uv run python hwsd2_texture.py <sand_%> <clay_%> [silt_%]
+    uv run python hwsd2_texture.py --db <db_path> [check|fill|overwrite]
+"""
+
+import sys
+from typing import Dict, Optional
+
+import numpy as np
+
+from hwsd2_extractor import MISSING_VALUE
+
+# D_TEXTURE_USDA
+USDA_CLASSES = {
+    1: "Clay (heavy)",
+    2: "Silty clay",
+    3: "Clay (light)",
+    4: "Silty clay loam",
+    5: "Clay loam",
+    6: "Silt",
+    7: "Silt loam",
+    8: "Sandy clay",
+    9: "Loam",
+    10: "Sandy clay loam",
+    11: "Sandy loam",
+    12: "Loamy sand",
+    13: "Sand",
+}
+
+# D_TEXTURE_SOTER
+SOTER_CLASSES = {
+    "C": "Coarse",
+    "M": "Medium",
+    "Z": "Medium Fine",
+    "F": "Fine",
+    "V": "Very Fine",
+}
+
+# Clay content (%) separating heavy from light clay
+HEAVY_CLAY = 60.0
+
+TEXTURE_MODES = ("check", "fill", "overwrite")
+
+
+def _fractions(sand, clay, silt=None):
+    """Normalized (sand, silt, clay) percentages and a validity mask."""
+    sand = np.asarray(sand, dtype=float)
+    clay = np.asarray(clay, dtype=float)
+    silt = 100 - sand - clay if silt is None else np.asarray(silt, dtype=float)
+    sand, silt, clay = np.broadcast_arrays(sand, silt, clay)
+    total = sand + silt + clay
+    valid = ((sand != MISSING_VALUE) & (silt != MISSING_VALUE) & (clay != MISSING_VALUE)
+             & (sand >= 0) & (silt >= 0) & (clay >= 0) & (total > 0))
+    with np.errstate(invalid="ignore", divide="ignore"):
+        scale = np.where(valid, 100 / total, np.nan)
+    return sand * scale, silt * scale, clay * scale, valid
+
+
+def classify_usda(sand, clay, silt=None) -> np.ndarray:
+    """
+    USDA texture class codes (``D_TEXTURE_USDA``) for arrays of fractions.
+
+    Args:
+        sand: Sand content (% weight), any shape
+        clay: Clay content (% weight), broadcast against ``sand``
+        silt: Silt content (% weight); defaults to 100 - sand - clay
+
+    Returns:
+        int16 array of codes 1-13; 0 where a fraction is missing
+
+    Examples:
+        >>> classify_usda([40, 90, 10, 5], [20, 5, 65, 10], [40, 5, 25, 85])
+        array([ 9, 13,  1,  6], dtype=int16)
+        >>> classify_usda(-9, 20)
+        array(0, dtype=int16)
+    """
+    s, si, c, valid = _fractions(sand, clay, silt)
+    with np.errstate(invalid="ignore"):
+        conditions = [
+            si + 1.5 * c < 15,                                                          # sand
+            (si + 1.5 * c >= 15) & (si + 2 * c < 30),                                   # loamy sand
+            ((c >= 7) & (c < 20) & (s > 52) & (si + 2 * c >= 30))
+            | ((c < 7) & (si < 50) & (si + 2 * c >= 30)),                               # sandy loam
+            (c >= 7) & (c < 27) & (si >= 28) & (si < 50) & (s <= 52),                   # loam
+            ((si >= 50) & (c >= 12) & (c < 27)) | ((si >= 50) & (si < 80) & (c < 12)),  # silt loam
+            (si >= 80) & (c < 12),                                                      # silt
+            (c >= 20) & (c < 35) & (si < 28) & (s > 45),                                # sandy clay loam
+            (c >= 27) & (c < 40) & (s > 20) & (s <= 45),                                # clay loam
+            (c >= 27) & (c < 40) & (s <= 20),                                           # silty clay loam
+            (c >= 35) & (s > 45),                                                       # sandy clay
+            (c >= 40) & (si >= 40),                                                     # silty clay
+            (c > HEAVY_CLAY) & (s <= 45) & (si < 40),                                   # clay (heavy)
+            (c >= 40) & (s <= 45) & (si < 40),                                          # clay (light)
+        ]
+    codes = np.select([valid & condition for condition in conditions],
+                      [13, 12, 11, 9, 7, 6, 10, 5, 4, 8, 2, 1, 3], default=0)
+    return codes.astype(np.int16)
+
+
+def classify_soter(sand, clay, silt=None) -> np.ndarray:
+    """
+    SOTER texture class codes (``D_TEXTURE_SOTER``) for arrays of fractions.
+
+    Coarse: clay < 18 % and sand > 65 %; Very fine: clay > 60 %; Fine:
+    clay >= 35 %; Medium fine: clay < 35 % and sand < 15 %; otherwise Medium.
+
+    Args:
+        sand: Sand content (% weight), any shape
+        clay: Clay content (% weight), broadcast against ``sand``
+        silt: Silt content (% weight); defaults to 100 - sand - clay
+
+    Returns:
+        Array of one-letter codes; "" where a fraction is missing
+
+    Examples:
+        >>> classify_soter([90, 40, 10, 5], [5, 20, 65, 20])
+        array(['C', 'M', 'V', 'Z'], dtype='<U1')
+    """
+    s, _, c, valid = _fractions(sand, clay, silt)
+    with np.errstate(invalid="ignore"):
+        index = np.select(
+            [~valid, c > 60, c >= 35, s < 15, (c < 18) & (s > 65)],
+            [0, 5, 4, 3, 1], default=2,
+        )
+    return np.array(["", "C", "M", "Z", "F", "V"])[index]
+
+
+def usda_names(codes) -> np.ndarray:
+    """
+    ``D_TEXTURE_USDA`` names for an array of codes ("" for 0 or unknown codes).
+
+    Examples:
+        >>> usda_names([9, 0])
+        array(['Loam', ''], dtype='<U15')
+    """
+    lookup = np.array([""] + [USDA_CLASSES[code] for code in range(1, 14)])
+    codes = np.asarray(codes, dtype=np.int64)
+    return lookup[np.where((codes >= 1) & (codes <= 13), codes, 0)]
+
+
+def classify_layers(conn, mode: str = "check", table: str = "HWSD2_LAYERS") -> Dict[str, Dict[str, int]]:
+    """
+    Classify every layer in the database and check or fill its texture codes.
+
+    Args:
+        conn: Open DuckDB connection
+        mode: "check" only counts; "fill" sets missing codes (NULL, -9, 0 or
+            ""); "overwrite" also replaces codes that disagree with the fractions
+        table: Layer table with ID, SAND, SILT, CLAY, TEXTURE_USDA and TEXTURE_SOTER
+
+    Returns:
+        Counts per column: {"TEXTURE_USDA": {"missing", "mismatched",
+        "unclassified", "updated"}, "TEXTURE_SOTER": {...}}
+
+    Raises:
+        ValueError: If the mode is unknown
+
+    Examples:
+        >>> import duckdb
+        >>> classify_layers(duckdb.connect("hwsd2.ddb"), "check")
+    """
+    if mode not in TEXTURE_MODES:
+        raise ValueError(f"Unknown mode {mode!r}; expected one of {TEXTURE_MODES}")
+    layers = conn.execute(f"SELECT ID, SAND, SILT, CLAY, TEXTURE_USDA, TEXTURE_SOTER FROM {table}").df()
+
+    def column(name):
+        return layers[name].to_numpy(dtype=float, na_value=np.nan)
+
+    sand, silt, clay = column("SAND"), column("SILT"), column("CLAY")
+    silt = np.where(np.isnan(silt), 100 - sand - clay, silt)
+    classified = {
+        "TEXTURE_USDA": classify_usda(sand, clay, silt),
+        "TEXTURE_SOTER": classify_soter(sand, clay, silt),
+    }
+    usda = layers["TEXTURE_USDA"].to_numpy(dtype=float, na_value=np.nan)
+    soter = layers["TEXTURE_SOTER"].astype("string").fillna("").to_numpy(dtype=str)
+    current = {
+        "TEXTURE_USDA": (np.where(np.isnan(usda) | (usda <= 0), 0, usda).astype(np.int16),
+                         np.isnan(usda) | (usda <= 0)),
+        "TEXTURE_SOTER": (soter, ~np.isin(soter, list(SOTER_CLASSES))),
+    }
+
+    counts: Dict[str, Dict[str, int]] = {}
+    for name, new in classified.items():
+        old, missing = current[name]
+        known = new != (0 if name == "TEXTURE_USDA" else "")
+        mismatched = known & ~missing & (old != new)
+        update = known & missing
+        if mode == "overwrite":
+            update |= mismatched
+        counts[name] = {
+            "missing": int(missing.sum()),
+            "mismatched": int(mismatched.sum()),
+            "unclassified": int((~known).sum()),
+            "updated": int(update.sum()) if mode != "check" else 0,
+        }
+        if mode != "check" and update.any():
+            import pandas as pd
+
+            updates = pd.DataFrame({"ID": layers["ID"].to_numpy()[update], "CODE": new[update]})
+            conn.register("_texture_updates", updates)
+            try:
+                conn.execute(f"UPDATE {table} SET {name} = u.CODE FROM _texture_updates u "
+                             f"WHERE {table}.ID = u.ID")
+            finally:
+                conn.unregister("_texture_updates")
+    return counts
+
+
+def main():
+    """Main entry point for command-line usage."""
+    if len(sys.argv) >= 3 and sys.argv[1] == "--db":
+        import duckdb
+
+        mode = sys.argv[3] if len(sys.argv) > 3 else "check"
+        conn = duckdb.connect(sys.argv[2])
+        try:
+            counts = classify_layers(conn, mode)
+        except ValueError as e:
+            print(f"Error: {e}", file=sys.stderr)
+            sys.exit(1)
+        finally:
+            conn.close()
+        for name, column_counts in counts.items():
+            print(f"{name}: " + ", ".join(f"{key} {value:,}" for key, value in column_counts.items()))
+        return
+
+    if len(sys.argv) < 3:
+        print("Usage: python hwsd2_texture.py <sand_%> <clay_%> [silt_%]")
+        print("       python hwsd2_texture.py --db <db_path> [check|fill|overwrite]")
+        sys.exit(1)
+
+    sand, clay = float(sys.argv[1]), float(sys.argv[2])
+    silt: Optional[float] = float(sys.argv[3]) if len(sys.argv) > 3 else None
+    code = int(classify_usda(sand, clay, silt))
+    print(f"USDA:  {code} ({USDA_CLASSES.get(code, 'unclassified')})")
+    soter = str(classify_soter(sand, clay, silt))
+    print(f"SOTER: {soter} ({SOTER_CLASSES.get(soter, 'unclassified')})")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,329 @@
+#!/usr/bin/env python
+"""
+Area-weighted upscaling of HWSD2 to coarse model grids.
+
+Aggregates the 30-arc-second SMU raster to 0.25°, 0.5°, 1° (any integer
+multiple of the pixel size) grids:
+
+- land fraction, dominant SMU and its area fraction per cell
+- area-weighted means of layer properties (e.g. D1 SAND, ORG_CARBON)
+- class-fraction tables (e.g. WRB2), dominant class and its fraction
+
+The raster is streamed in bands of whole coarse rows. Each band is
+run-length encoded (runs broken at cell edges) and reduced to
+(cell, SMU, area) triples, with pixel areas from the latitude of each row.
+Properties and classes are joined through precomputed per-SMU lookup tables
+(``SMUTables``: SEQUENCE-share-weighted values per SMU), so memory is bounded
+by one band plus the coarse outputs.
+
+Usage:
+    uv run python hwsd2_upscale.py <resolution_deg> <output.npz> [db_path] [raster_path]
+"""
+
+import sys
+from concurrent.futures import ThreadPoolExecutor
+from dataclasses import dataclass
+from pathlib import Path
+from typing import Dict, Optional, Sequence, Tuple, Union
+
+import numpy as np
+
+from hwsd2_extractor import LOOKUP_SIZE, share_weighted_mean_sql
+
+DEFAULT_PROPERTIES = ("SAND", "SILT", "CLAY", "ORG_CARBON", "PH_WATER", "BULK")
+
+
+@dataclass
+class SMUTables:
+    """
+    Per-SMU lookup tables, indexed by HWSD2_SMU_ID (length 65536).
+
+    Attributes:
+        properties: Names of the property columns
+        values: (65536, n_properties) float32 SHARE-weighted means over the
+            SMU's sequences; NaN where unknown
+        class_column: Name of the classification column (or None)
+        class_codes: Class codes, in ``class_shares`` column order
+        class_shares: (65536, n_classes) float32 fraction of each SMU in each class
+        known: Boolean mask of SMU ids present in the database
+    """
+
+    properties: Tuple[str, ...]
+    values: np.ndarray
+    class_column: Optional[str]
+    class_codes: Tuple[str, ...]
+    class_shares: np.ndarray
+    known: np.ndarray
+
+    def save(self, path: Union[str, Path]) -> Path:
+        """Write the tables to an ``.npz`` file."""
+        np.savez(path, properties=np.array(self.properties, dtype=str), values=self.values,
+                 class_column=np.array([self.class_column or ""]), class_codes=np.array(self.class_codes, dtype=str),
+                 class_shares=self.class_shares, known=self.known)
+        return Path(path)
+
+    @classmethod
+    def load(cls, path: Union[str, Path]) -> "SMUTables":
+        """Read tables written by ``save``."""
+        with np.load(path) as data:
+            return cls(tuple(data["properties"].tolist()), data["values"], str(data["class_column"][0]) or None,
+                       tuple(data["class_codes"].tolist()), data["class_shares"], data["known"])
+
+
+def smu_tables(
+    conn,
+    properties: Sequence[str] = DEFAULT_PROPERTIES,
+    layer: str = "D1",
+    class_column: Optional[str] = "WRB2",
+) -> SMUTables:
+    """
+    Precompute per-SMU lookup tables from HWSD2_LAYERS.
+
+    Args:
+        conn: Open DuckDB connection to an HWSD2 database
+        properties: Layer properties to average
+        layer: Layer the properties come from (e.g. "D1")
+        class_column: Per-sequence classification column for class fractions
+            (e.g. "WRB2", "FAO90"), or None
+
+    Returns:
+        SMUTables
+
+    Examples:
+        >>> import duckdb
+        >>> tables = smu_tables(duckdb.connect("hwsd2.ddb"), ["SAND", "CLAY"], layer="D1")
+        >>> tables.save("smu_tables_d1.npz")
+    """
+    import pandas as pd
+
+    properties = tuple(properties)
+    values = np.full((LOOKUP_SIZE, len(properties)), np.nan, dtype=np.float32)
+    known = np.zeros(LOOKUP_SIZE, dtype=bool)
+    if properties:
+        means = ", ".join(share_weighted_mean_sql(p) for p in properties)
+        rows = conn.execute(f"SELECT HWSD2_SMU_ID, {means} FROM HWSD2_LAYERS WHERE LAYER = ? "
+                            f"GROUP BY HWSD2_SMU_ID", [layer]).fetchnumpy()
+        ids = np.asarray(rows["HWSD2_SMU_ID"], dtype=np.int64)
+        for k, column in enumerate(list(rows)[1:]):
+            values[ids, k] = np.asarray(rows[column], dtype=float)
+        known[ids] = True
+
+    codes: Tuple[str, ...] = ()
+    shares = np.zeros((LOOKUP_SIZE, 0), dtype=np.float32)
+    if class_column:
+        rows = conn.execute(f"""
+            SELECT HWSD2_SMU_ID, CAST({class_column} AS VARCHAR) AS CLASS, SUM(SHARE) AS SHARE FROM (
+                SELECT DISTINCT HWSD2_SMU_ID, SEQUENCE, SHARE, {class_column} FROM HWSD2_LAYERS
+            ) WHERE {class_column} IS NOT NULL GROUP BY ALL
+        """).df()
+        codes_index, uniques = pd.factorize(rows["CLASS"], sort=True)
+        codes = tuple(str(code) for code in uniques)
+        shares = np.zeros((LOOKUP_SIZE, len(codes)), dtype=np.float32)
+        ids = rows["HWSD2_SMU_ID"].to_numpy(dtype=np.int64)
+        np.add.at(shares, (ids, codes_index), rows["SHARE"].to_numpy(dtype=float))
+        totals = shares.sum(axis=1, keepdims=True)
+        np.divide(shares, totals, out=shares, where=totals > 0)
+        known[ids] = True
+    return SMUTables(properties, values, class_column, codes, shares, known)
+
+
+def _factor(extractor, resolution: float) -> int:
+    factor = resolution / extractor.xdim
+    if abs(factor - round(factor)) > 1e-6 or round(factor) < 1:
+        raise ValueError(f"Resolution {resolution}° is not a multiple of the pixel size {extractor.xdim}°")
+    factor = int(round(factor))
+    if extractor.nrows % factor or extractor.ncols % factor:
+        raise ValueError(f"A {resolution}° grid does not tile the {extractor.nrows}x{extractor.ncols} raster")
+    return factor
+
+
+def grid_coordinates(extractor, resolution: float) -> Tuple[np.ndarray, np.ndarray]:
+    """
+    Cell-center latitudes (north to south) and longitudes of a coarse grid.
+
+    Returns:
+        (lat, lon) arrays
+    """
+    factor = _factor(extractor, resolution)
+    north = extractor.uly + extractor.ydim / 2
+    west = extractor.ulx - extractor.xdim / 2
+    lat = north - (np.arange(extractor.nrows // factor) + 0.5) * factor * extractor.ydim
+    lon = west + (np.arange(extractor.ncols // factor) + 0.5) * factor * extractor.xdim
+    return lat, lon
+
+
+def band_triples(band: np.ndarray, areas: np.ndarray, factor: int, known: np.ndarray):
+    """
+    Reduce a band of whole coarse rows to (cell, SMU, area) triples.
+
+    Args:
+        band: (rows, cols) SMU ids; rows a multiple of ``factor``
+        areas: Pixel area (km²) of each band row
+        factor: Pixels per coarse cell side
+        known: Boolean lookup of SMU ids to keep (nodata and unknown dropped)
+
+    Returns:
+        (cell, smu, area) arrays sorted by cell then SMU; cell indexes the
+        band's coarse cells in row-major order
+    """
+    rows, cols = band.shape
+    flat = band.reshape(-1)
+    breaks = np.empty(flat.shape, dtype=bool)
+    breaks[0] = True
+    np.not_equal(flat[1:], flat[:-1], out=breaks[1:])
+    breaks.reshape(rows, cols)[:, ::factor] = True  # runs never cross a cell edge
+    starts = np.flatnonzero(breaks)
+    lengths = np.diff(np.append(starts, flat.size))
+    smu = flat[starts].astype(np.int64)
+    keep = known[smu]
+    starts, lengths, smu = starts[keep], lengths[keep], smu[keep]
+    row, col = np.divmod(starts, cols)
+    cell = (row // factor) * (cols // factor) + col // factor
+    key, inverse = np.unique(cell * LOOKUP_SIZE + smu, return_inverse=True)
+    area = np.bincount(inverse.reshape(-1), weights=lengths * areas[row], minlength=len(key))
+    return key // LOOKUP_SIZE, key % LOOKUP_SIZE, area
+
+
+def _reduce(cell, values, n_cells):
+    """Sum rows of ``values`` per (sorted) cell into an (n_cells, ...) array."""
+    out = np.zeros((n_cells,) + values.shape[1:])
+    if len(cell):
+        boundaries = np.flatnonzero(np.r_[True, cell[1:] != cell[:-1]])
+        out[cell[boundaries]] = np.add.reduceat(values, boundaries, axis=0)
+    return out
+
+
+def _dominant(cell, candidates, area, n_cells):
+    """Candidate with the largest area per cell (-1 where none)."""
+    dominant = np.full(n_cells, -1, dtype=np.int64)
+    dominant_area = np.zeros(n_cells)
+    if len(cell):
+        order = np.lexsort((area, cell))
+        last = np.r_[cell[order][1:] != cell[order][:-1], True]
+        winners = order[last]
+        dominant[cell[winners]] = candidates[winners]
+        dominant_area[cell[winners]] = area[winners]
+    return dominant, dominant_area
+
+
+def upscale(
+    extractor,
+    tables: SMUTables,
+    resolution: float = 0.5,
+    band_cells: int = 1,
+    workers: Optional[int] = None,
+) -> Dict[str, np.ndarray]:
+    """
+    Aggregate the SMU raster to a coarse grid, weighted by pixel area.
+
+    Args:
+        extractor: ``HWSD2Extractor`` with the SMU raster
+        tables: Per-SMU lookups from ``smu_tables``
+        resolution: Cell size in degrees (a multiple of the pixel size)
+        band_cells: Coarse rows per streamed band
+        workers: Threads (None: default pool size, 1: serial)
+
+    Returns:
+        Dictionary of (n_lat, n_lon) arrays unless noted:
+            - lat, lon: cell centers (1-D)
+            - land_fraction: share of the cell area covered by known SMUs
+            - dominant_smu (0 where none) and dominant_smu_fraction (of land)
+            - one area-weighted mean per property (NaN where unknown)
+            - class_codes (1-D), class_fractions (n_classes, n_lat, n_lon),
+              dominant_class (index into class_codes, -1 where none) and
+              dominant_class_fraction, if ``tables`` has classes
+    """
+    factor = _factor(extractor, resolution)
+    raster = extractor.open_raster()
+    n_lat, n_lon = extractor.nrows // factor, extractor.ncols // factor
+    known = tables.known.copy()
+    known[extractor.nodata % LOOKUP_SIZE] = False
+    n_properties, n_classes = len(tables.properties), len(tables.class_codes)
+
+    def band(index):
+        start = index * band_cells * factor
+        stop = min(start + band_cells * factor, extractor.nrows)
+        areas = extractor.row_areas((start, stop))
+        cell, smu, area = band_triples(np.asarray(raster[start:stop]), areas, factor, known)
+        n_cells = (stop - start) // factor * n_lon
+        cell_area = np.add.reduceat(areas, np.arange(0, stop - start, factor)) * factor
+        land = _reduce(cell, area, n_cells)
+        dominant_smu, dominant_smu_area = _dominant(cell, smu, area, n_cells)
+        result = {
+            "land_fraction": land / np.repeat(cell_area, n_lon),
+            "dominant_smu": np.maximum(dominant_smu, 0),
+            "dominant_smu_fraction": np.divide(dominant_smu_area, land, out=np.zeros(n_cells), where=land > 0),
+        }
+        if n_properties:
+            values = tables.values[smu].astype(float)
+            valid = ~np.isnan(values)
+            weight = _reduce(cell, valid * area[:, None], n_cells)
+            total = _reduce(cell, np.where(valid, values, 0) * area[:, None], n_cells)
+            with np.errstate(invalid="ignore", divide="ignore"):
+                result["properties"] = np.where(weight > 0, total / weight, np.nan)
+        if n_classes:
+            class_area = _reduce(cell, tables.class_shares[smu] * area[:, None], n_cells)
+            result["class_fractions"] = np.divide(class_area, land[:, None], out=np.zeros_like(class_area),
+                                                  where=land[:, None] > 0)
+            best = class_area.argmax(axis=1)
+            best_fraction = np.take_along_axis(result["class_fractions"], best[:, None], axis=1)[:, 0]
+            result["dominant_class"] = np.where(best_fraction > 0, best, -1)
+            result["dominant_class_fraction"] = best_fraction
+        return result
+
+    n_bands = -(-n_lat // band_cells)
+    if workers == 1 or n_bands == 1:
+        bands = [band(i) for i in range(n_bands)]
+    else:
+        with ThreadPoolExecutor(max_workers=workers) as pool:
+            bands = list(pool.map(band, range(n_bands)))
+
+    def stack(name):
+        return np.concatenate([b[name] for b in bands])
+
+    lat, lon = grid_coordinates(extractor, resolution)
+    output = {
+        "lat": lat,
+        "lon": lon,
+        "land_fraction": stack("land_fraction").reshape(n_lat, n_lon),
+        "dominant_smu": stack("dominant_smu").astype(np.uint16).reshape(n_lat, n_lon),
+        "dominant_smu_fraction": stack("dominant_smu_fraction").reshape(n_lat, n_lon),
+    }
+    if n_properties:
+        values = stack("properties").reshape(n_lat, n_lon, n_properties)
+        for k, name in enumerate(tables.properties):
+            output[name] = values[:, :, k]
+    if n_classes:
+        output["class_codes"] = np.array(tables.class_codes)
+        output["class_fractions"] = np.moveaxis(stack("class_fractions").reshape(n_lat, n_lon, n_classes), 2, 0)
+        output["dominant_class"] = stack("dominant_class").astype(np.int16).reshape(n_lat, n_lon)
+        output["dominant_class_fraction"] = stack("dominant_class_fraction").reshape(n_lat, n_lon)
+    return output
+
+
+def main():
+    """Main entry point for command-line usage."""
+    if len(sys.argv) < 3:
+        print("Usage: python hwsd2_upscale.py <resolution_deg> <output.npz> [db_path] [raster_path]")
+        print("Example: python hwsd2_upscale.py 0.5 hwsd2_05deg.npz")
+        sys.exit(1)
+
+    import duckdb
+    from hwsd2_extractor import HWSD2Extractor
+
+    resolution, output_path = float(sys.argv[1]), sys.argv[2]
+    db_path = sys.argv[3] if len(sys.argv) > 3 else None
+    raster_path = sys.argv[4] if len(sys.argv) > 4 else None
+    extractor = HWSD2Extractor(raster_path=raster_path, db_path=db_path)
+    conn = duckdb.connect(str(extractor.db_path), read_only=True)
+    try:
+        tables = smu_tables(conn)
+    finally:
+        conn.close()
+    grids = upscale(extractor, tables, resolution)
+    np.savez_compressed(output_path, **grids)
+    print(f"Wrote {len(grids['lat'])}x{len(grids['lon'])} grids to {output_path}")
+
+
+if __name__ == "__main__":
+    main()
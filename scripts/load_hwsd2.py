@@ -6,29 +6,49 @@ This script creates a DuckDB database from the HWSD2 CSV files using the
 schema defined in hwsd2_duckdb_schema.sql.
 
 Usage:
-    uv run python load_hwsd2.py [output_db_path]
+    uv run python load_hwsd2.py [output_db_path] [--texture[=check|fill|overwrite]]
+                                [--derived[=columns|tables]]
 
 Default output: hwsd2.db
+
+With --texture, TEXTURE_USDA/TEXTURE_SOTER codes are checked against the
+sand/silt/clay fractions and missing codes filled (see hwsd2_texture.py).
+With --derived, derived properties (SOC and N stocks, ...; see
+hwsd2_derived.py) are computed once and stored in the database.
 """
 
 import sys
 from pathlib import Path
+from typing import Optional
+
 import duckdb
 
 
-def load_hwsd2(db_path: str = "hwsd2.db", csv_dir: str = "HWSD2_csv") -> None:
+def load_hwsd2(
+    db_path: str = "hwsd2.db",
+    csv_dir: str = "HWSD2_csv",
+    derived: Optional[str] = None,
+    texture: Optional[str] = None,
+) -> None:
     """
     Load HWSD2 CSV files into a DuckDB database.
 
     Args:
         db_path: Path to output DuckDB database file
         csv_dir: Path to directory containing CSV files
+        derived: Materialize derived properties: "columns" (extra
+            HWSD2_LAYERS columns) or "tables" (HWSD2_LAYERS_DERIVED); None
+            to skip. Profile properties go to HWSD2_PROFILES_DERIVED.
+        texture: Classify layer textures: "check" (report mismatches),
+            "fill" (fill missing codes) or "overwrite"; None to skip
 
     Examples:
         >>> # This will create hwsd2.db in current directory
         >>> load_hwsd2()
         >>> # Use custom paths
         >>> load_hwsd2("my_hwsd.db", "data/HWSD2_csv")
+        >>> # Store SOC/N stocks as HWSD2_LAYERS columns
+        >>> load_hwsd2("hwsd2.db", derived="columns")
     """
     csv_path = Path(csv_dir)
     if not csv_path.exists():
@@ -112,6 +132,20 @@ def load_hwsd2(db_path: str = "hwsd2.db", csv_dir: str = "HWSD2_csv") -> None:
     domain_count = conn.execute("SELECT COUNT(*) FROM information_schema.tables WHERE table_name LIKE 'D_%'").fetchone()[0]
     print(f"  Domain tables: {domain_count}")
 
+    if texture:
+        from hwsd2_texture import classify_layers
+
+        print(f"\nClassifying layer textures ({texture})...")
+        for name, counts in classify_layers(conn, texture).items():
+            print(f"  {name}: " + ", ".join(f"{key} {value:,}" for key, value in counts.items()))
+
+    if derived:
+        from hwsd2_derived import materialize_derived
+
+        print(f"\nMaterializing derived properties ({derived})...")
+        counts = materialize_derived(conn, derived)
+        print(f"  Layers: {counts['layers']:,}, profiles: {counts['profiles']:,}")
+
     # Show a sample query
     print("\nSample data from HWSD2_LAYERS:")
     result = conn.execute("""
@@ -136,7 +170,18 @@ def load_hwsd2(db_path: str = "hwsd2.db", csv_dir: str = "HWSD2_csv") -> None:
 
 def main():
     """Main entry point for command-line usage."""
-    db_path = sys.argv[1] if len(sys.argv) > 1 else "hwsd2.ddb"
+    args = [arg for arg in sys.argv[1:] if not arg.startswith("--")]
+    db_path = args[0] if args else "hwsd2.ddb"
+    derived = texture = None
+    for arg in sys.argv[1:]:
+        if arg == "--derived":
+            derived = "columns"
+        elif arg.startswith("--derived="):
+            derived = arg.split("=", 1)[1]
+        elif arg == "--texture":
+            texture = "fill"
+        elif arg.startswith("--texture="):
+            texture = arg.split("=", 1)[1]
 
     # Determine CSV directory relative to this script
     script_dir = Path(__file__).parent
@@ -154,7 +199,7 @@ def main():
         csv_dir = Path.cwd() / "HWSD2_csv"
 
     try:
-        load_hwsd2(str(db_path), str(csv_dir))
+        load_hwsd2(str(db_path), str(csv_dir), derived, texture)
     except Exception as e:
         print(f"Error: {e}", file=sys.stderr)
         sys.exit(1)
@@ -3,3 +3,19 @@ try:
 except ImportError:  # pragma: no cover
     __version__ = "0.0.0"
     __version_tuple__ = (0, 0, 0)
+
+# Submodules are imported on first attribute access (PEP 562), so
+# ``import fao_soils`` stays cheap for short-lived CLI calls
+_SUBMODULES = ("bulk", "columnar", "datamodel", "fastpath", "serialize", "streaming", "validation")
+
+
+def __getattr__(name):
+    if name in _SUBMODULES:
+        import importlib
+
+        return importlib.import_module(f"{__name__}.{name}")
+    raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
+
+
+def __dir__():
+    return sorted(set(globals()) | set(_SUBMODULES))
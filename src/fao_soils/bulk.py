@@ -0,0 +1,229 @@
+"""
+Bulk construction of LinkML datamodel objects from columnar data.
+
+The generated dataclasses in ``fao_soils.datamodel.fao_soils`` check and
+coerce every slot in ``__post_init__``, once per object. For a whole table
+(e.g. the 408,835 rows of HWSD2_LAYERS) that per-row work dominates loading
+time. The functions here do the same coercions once per column instead:
+
+- each column is converted to Python values in one call (``to_pylist`` for
+  Arrow, ``tolist`` for NumPy/pandas)
+- enum slots map each distinct code to a single shared (interned) instance
+- required slots and unknown columns are checked once for the whole batch
+
+Objects are then created without running ``__post_init__``. They compare
+equal to, and serialize the same as, objects built with the constructor from
+the same values, with None, null and NaN all treated as a missing value.
+
+Examples:
+    >>> from fao_soils.bulk import build_objects
+    >>> from fao_soils.datamodel.fao_soils import SoilLayer
+    >>> layers = build_objects(SoilLayer, {
+    ...     "id": [1, 2],
+    ...     "hwsd2_smu_id": [4828, 4828],
+    ...     "layer": ["D1", "D2"],
+    ...     "drainage": ["MW", "MW"],
+    ... })
+    >>> layers[0] == SoilLayer(id=1, hwsd2_smu_id=4828, layer="D1", drainage="MW")
+    True
+    >>> layers[0].drainage is layers[1].drainage
+    True
+"""
+
+import dataclasses
+import sys
+import typing
+from functools import lru_cache
+from typing import Any, Callable, Dict, List, Mapping, Optional, Tuple
+
+from linkml_runtime.utils.enumerations import EnumDefinitionImpl
+
+# Interned enum instances, keyed by (enum class, code)
+_ENUM_CACHE: Dict[Tuple[type, Any], EnumDefinitionImpl] = {}
+
+
+def intern_enum(enum_class: type, code: Any) -> EnumDefinitionImpl:
+    """
+    Return the shared instance of ``enum_class`` for ``code``.
+
+    Args:
+        enum_class: Generated ``EnumDefinitionImpl`` subclass (e.g. DrainageEnum)
+        code: Permissible value text, or an existing instance
+
+    Returns:
+        An instance equal to ``enum_class(code)``
+
+    Raises:
+        ValueError: If ``code`` is not a permissible value of ``enum_class``
+    """
+    if isinstance(code, enum_class):
+        return code
+    key = (enum_class, code)
+    instance = _ENUM_CACHE.get(key)
+    if instance is None:
+        instance = _ENUM_CACHE[key] = enum_class(code)
+    return instance
+
+
+def _is_missing(value: Any) -> bool:
+    # NaN is the only value not equal to itself
+    return value is None or (isinstance(value, float) and value != value)
+
+
+def _column_values(values: Any) -> List[Any]:
+    """Convert an Arrow, NumPy, pandas or plain sequence column to a list of Python values."""
+    if hasattr(values, "to_pylist"):
+        return values.to_pylist()
+    if hasattr(values, "isna") and hasattr(values, "to_numpy"):
+        return values.to_numpy(dtype=object, na_value=None).tolist()
+    if hasattr(values, "tolist"):
+        return values.tolist()
+    return list(values)
+
+
+@lru_cache(maxsize=None)
+def _coercion_plan(cls: type) -> Tuple[Tuple[str, bool, Callable[[List[Any]], List[Any]]], ...]:
+    """
+    Derive per-slot coercions from a generated class's type annotations.
+
+    pythongen annotates required slots without ``Optional`` and ranges as the
+    Python type (``int``, ``float``, ``str``), the identifier class, or
+    ``Union[str, <Enum>]``; ``__post_init__`` coerces to exactly that type.
+
+    Returns:
+        Tuples of (slot name, required, column coercion) in field order
+    """
+    module = sys.modules[cls.__module__]
+    hints = typing.get_type_hints(cls, vars(module))
+    plan = []
+    for field in dataclasses.fields(cls):
+        hint = hints[field.name]
+        args = [a for a in typing.get_args(hint) if a is not type(None)]
+        required = type(None) not in typing.get_args(hint)
+        members = args or [hint]
+
+        enum_types = [a for a in members if isinstance(a, type) and issubclass(a, EnumDefinitionImpl)]
+        if enum_types:
+            enum_class = enum_types[0]
+
+            def coerce_column(values, enum_class=enum_class):
+                instances = {}
+                result = []
+                for value in values:
+                    if _is_missing(value):
+                        result.append(None)
+                        continue
+                    instance = instances.get(value)
+                    if instance is None:
+                        instance = instances[value] = intern_enum(enum_class, value)
+                    result.append(instance)
+                return result
+        else:
+            # Identifier classes (e.g. SoilLayerId) subclass the plain range type
+            target = max((a for a in members if isinstance(a, type)), key=lambda t: len(t.__mro__))
+
+            def coerce_column(values, target=target):
+                return [
+                    value if type(value) is target and value == value
+                    else None if _is_missing(value)
+                    else value if isinstance(value, target)
+                    else target(value)
+                    for value in values
+                ]
+
+        plan.append((field.name, required, coerce_column))
+    return tuple(plan)
+
+
+def build_objects(cls: type, columns: Any, column_map: Optional[Mapping[str, str]] = None) -> list:
+    """
+    Build datamodel objects from columnar data.
+
+    Args:
+        cls: Generated datamodel class (e.g. SoilLayer, SoilMappingUnit)
+        columns: Mapping of column name to column values (list, NumPy array,
+            pandas Series, Arrow Array/ChunkedArray), or a pandas DataFrame or
+            Arrow Table. Column names are matched to slot names
+            case-insensitively, so DuckDB names like ``TOPDEP`` work directly.
+        column_map: Optional explicit mapping of column name to slot name for
+            columns whose names differ from the slot (e.g. ``{"AWC": "awc_layer"}``)
+
+    Returns:
+        List of ``cls`` instances, one per row
+
+    Raises:
+        ValueError: If a column does not match a slot, columns differ in
+            length, a required slot is missing, or a value cannot be coerced
+
+    Examples:
+        >>> import duckdb
+        >>> table = duckdb.connect("hwsd2.db").execute(
+        ...     "SELECT ID, HWSD2_SMU_ID, LAYER, TOPDEP, BOTDEP, SAND, CLAY FROM HWSD2_LAYERS"
+        ... ).arrow()
+        >>> layers = build_objects(SoilLayer, table)
+    """
+    if hasattr(columns, "column_names"):
+        columns = {name: columns.column(name) for name in columns.column_names}
+    elif hasattr(columns, "columns") and hasattr(columns, "iloc"):
+        columns = {name: columns[name] for name in columns.columns}
+
+    plan = _coercion_plan(cls)
+    slot_names = {name for name, _, _ in plan}
+    column_map = dict(column_map or {})
+
+    slot_values: Dict[str, List[Any]] = {}
+    for column, values in columns.items():
+        slot = column_map.get(column, str(column).lower())
+        if slot not in slot_names:
+            raise ValueError(f"Column {column!r} does not match a slot of {cls.__name__}")
+        slot_values[slot] = _column_values(values)
+
+    lengths = {len(values) for values in slot_values.values()}
+    if len(lengths) > 1:
+        raise ValueError(f"Columns have different lengths: {sorted(lengths)}")
+    n_rows = lengths.pop() if lengths else 0
+
+    # Slots without a column stay None; only supplied columns are set per row
+    template = {}
+    names = []
+    coerced = []
+    for name, required, coerce_column in plan:
+        template[name] = None
+        values = slot_values.get(name)
+        if values is None:
+            if required and n_rows:
+                raise ValueError(f"{name} must be supplied")
+            continue
+        values = coerce_column(values)
+        if required and None in values:
+            missing = sum(1 for v in values if v is None)
+            raise ValueError(f"{name} must be supplied ({missing} of {n_rows} rows missing)")
+        names.append(name)
+        coerced.append(values)
+
+    new = cls.__new__
+    copy = template.copy
+    # YAMLRoot.__setattr__ would wrap the dict, so bypass it
+    set_attribute = object.__setattr__
+    objects = []
+    for row in zip(*coerced):
+        obj = new(cls)
+        values = copy()
+        values.update(zip(names, row))
+        set_attribute(obj, "__dict__", values)
+        objects.append(obj)
+    return objects
+
+
+def build_soil_layers(columns: Any, column_map: Optional[Mapping[str, str]] = None) -> list:
+    """Build ``SoilLayer`` objects from columnar data (see ``build_objects``)."""
+    from fao_soils.datamodel.fao_soils import SoilLayer
+
+    return build_objects(SoilLayer, columns, column_map)
+
+
+def build_soil_mapping_units(columns: Any, column_map: Optional[Mapping[str, str]] = None) -> list:
+    """Build ``SoilMappingUnit`` objects from columnar data (see ``build_objects``)."""
+    from fao_soils.datamodel.fao_soils import SoilMappingUnit
+
+    return build_objects(SoilMappingUnit, columns, column_map)
@@ -0,0 +1,401 @@
+"""
+Columnar (struct-of-arrays) containers for datamodel classes.
+
+A batch holds one typed Arrow column per slot of a schema class instead of
+one Python object per row, so the 408,835 rows of HWSD2_LAYERS take a few
+tens of MB rather than several GB. The column layout is generated from the
+LinkML schema (``fao_soils.yaml``):
+
+- ``integer`` slots become ``int64``, ``float``/``double`` slots ``float64``,
+  ``boolean`` slots ``bool`` and all other ranges ``string``
+- enum slots are dictionary-encoded against the enum's permissible values,
+  so codes are stable across batches
+- ``required``, ``minimum_value``/``maximum_value`` and enum membership are
+  checked once per column when a batch is built
+
+Rows are exposed through lightweight views; ``SoilLayer`` objects are only
+created when a view (or ``to_objects``) asks for them.
+
+Requires ``pyarrow`` and ``numpy`` (the ``columnar`` extra).
+
+Examples:
+    >>> from fao_soils.columnar import SoilLayerBatch
+    >>> batch = SoilLayerBatch.from_columns({
+    ...     "ID": [1, 2],
+    ...     "HWSD2_SMU_ID": [4828, 4828],
+    ...     "LAYER": ["D1", "D2"],
+    ...     "DRAINAGE": ["MW", "MW"],
+    ...     "SAND": [28.0, None],
+    ... })
+    >>> len(batch), batch[0].layer, batch[1].sand
+    (2, 'D1', None)
+    >>> batch.column("drainage").type
+    DictionaryType(dictionary<values=string, indices=int16, ordered=0>)
+    >>> batch[0].to_object().drainage
+    DrainageEnum(text='MW', description='Moderately well drained')
+"""
+
+import dataclasses
+from functools import lru_cache
+from typing import Any, Dict, Iterator, List, Mapping, Optional, Tuple
+
+try:
+    import pyarrow as pa
+    import pyarrow.compute as pc
+except ImportError as e:  # pragma: no cover
+    raise ImportError("fao_soils.columnar requires pyarrow: pip install 'fao_soils[columnar]'") from e
+
+# Arrow type for each LinkML built-in type; anything else is stored as string
+_ARROW_TYPES = {
+    "integer": pa.int64(),
+    "float": pa.float64(),
+    "double": pa.float64(),
+    "decimal": pa.float64(),
+    "boolean": pa.bool_(),
+}
+_ENUM_INDEX_TYPE = pa.int16()
+
+
+@dataclasses.dataclass(frozen=True)
+class ColumnSpec:
+    """
+    Layout and constraints of one slot, derived from the schema.
+
+    Attributes:
+        name: Slot name
+        range: Slot range (LinkML type or enum name)
+        arrow_type: Arrow storage type
+        required: Whether the slot is required
+        minimum_value: Inclusive lower bound, if any
+        maximum_value: Inclusive upper bound, if any
+        permissible_values: Enum permissible values, or None for non-enum slots
+    """
+
+    name: str
+    range: str
+    arrow_type: pa.DataType
+    required: bool = False
+    minimum_value: Optional[float] = None
+    maximum_value: Optional[float] = None
+    permissible_values: Optional[Tuple[str, ...]] = None
+
+
+@lru_cache(maxsize=None)
+def _schema_view(schema_path: Optional[str] = None):
+    from linkml_runtime.utils.schemaview import SchemaView
+
+    if schema_path is None:
+        from fao_soils.datamodel import MAIN_SCHEMA_PATH
+
+        schema_path = str(MAIN_SCHEMA_PATH)
+    return SchemaView(schema_path)
+
+
+@lru_cache(maxsize=None)
+def schema_columns(class_name: str, schema_path: Optional[str] = None) -> Tuple[ColumnSpec, ...]:
+    """
+    Derive the column layout of a schema class.
+
+    Args:
+        class_name: Schema class name (e.g. "SoilLayer")
+        schema_path: LinkML schema file (defaults to ``fao_soils.yaml``)
+
+    Returns:
+        One ``ColumnSpec`` per induced slot, in slot order
+    """
+    view = _schema_view(schema_path)
+    enums = view.all_enums()
+    specs = []
+    for slot in view.class_induced_slots(class_name):
+        slot_range = slot.range or view.schema.default_range or "string"
+        permissible_values = None
+        if slot_range in enums:
+            permissible_values = tuple(view.get_enum(slot_range).permissible_values)
+            arrow_type = pa.dictionary(_ENUM_INDEX_TYPE, pa.string())
+        else:
+            arrow_type = _ARROW_TYPES.get(slot_range, pa.string())
+        specs.append(ColumnSpec(
+            name=slot.name,
+            range=slot_range,
+            arrow_type=arrow_type,
+            required=bool(slot.required or slot.identifier),
+            minimum_value=slot.minimum_value,
+            maximum_value=slot.maximum_value,
+            permissible_values=permissible_values,
+        ))
+    return tuple(specs)
+
+
+def _to_arrow(values: Any) -> pa.Array:
+    """Convert a column (Arrow, NumPy, pandas or sequence) to a single Arrow array."""
+    if isinstance(values, pa.ChunkedArray):
+        return values.combine_chunks()
+    if isinstance(values, pa.Array):
+        return values
+    if hasattr(values, "isna") and hasattr(values, "to_numpy"):
+        return pa.array(values.to_numpy(dtype=object, na_value=None), from_pandas=True)
+    return pa.array(values, from_pandas=True)
+
+
+def _conform_column(spec: ColumnSpec, values: pa.Array) -> pa.Array:
+    """Cast a column to the spec's storage type and check its constraints."""
+    if pa.types.is_dictionary(values.type):
+        values = values.dictionary_decode()
+
+    if spec.permissible_values is not None:
+        values = values.cast(pa.string())
+        dictionary = pa.array(spec.permissible_values, pa.string())
+        indices = pc.index_in(values, value_set=dictionary)
+        if indices.null_count != values.null_count:
+            unknown = pc.filter(values, pc.and_(pc.is_null(indices), pc.is_valid(values)))
+            raise ValueError(
+                f"{spec.name}: {len(unknown)} values are not permissible values of {spec.range}, "
+                f"e.g. {unknown[0].as_py()!r}"
+            )
+        values = pa.DictionaryArray.from_arrays(indices.cast(_ENUM_INDEX_TYPE), dictionary)
+    else:
+        try:
+            values = values.cast(spec.arrow_type)
+        except (pa.ArrowInvalid, pa.ArrowNotImplementedError) as e:
+            raise ValueError(f"{spec.name}: cannot convert to {spec.range}: {e}") from e
+
+    if spec.required and values.null_count:
+        raise ValueError(f"{spec.name} must be supplied ({values.null_count} of {len(values)} rows missing)")
+    for bound, compare, word in (
+        (spec.minimum_value, pc.less, "below minimum"),
+        (spec.maximum_value, pc.greater, "above maximum"),
+    ):
+        if bound is not None and len(values):
+            out_of_range = pc.sum(compare(values, bound)).as_py() or 0
+            if out_of_range:
+                raise ValueError(f"{spec.name}: {out_of_range} values {word} {bound}")
+    return values
+
+
+class RowView:
+    """
+    A single row of a batch, read lazily from its columns.
+
+    Slot values are available as attributes; ``to_object`` builds the
+    datamodel object for the row.
+    """
+
+    __slots__ = ("_batch", "_index")
+
+    def __init__(self, batch: "ColumnarBatch", index: int):
+        self._batch = batch
+        self._index = index
+
+    def __getattr__(self, name: str) -> Any:
+        try:
+            column = self._batch._columns[name]
+        except KeyError:
+            raise AttributeError(f"{type(self._batch).__name__} has no column {name!r}") from None
+        return column[self._index].as_py()
+
+    def to_dict(self, exclude_none: bool = True) -> Dict[str, Any]:
+        """Return the row as a dict of slot name to value."""
+        values = {name: column[self._index].as_py() for name, column in self._batch._columns.items()}
+        if exclude_none:
+            values = {name: value for name, value in values.items() if value is not None}
+        return values
+
+    def to_object(self):
+        """Materialize the datamodel object (e.g. ``SoilLayer``) for this row."""
+        return self._batch.row_class()(**self.to_dict())
+
+    def __repr__(self) -> str:
+        return f"{type(self).__name__}({self._index}, {self.to_dict()!r})"
+
+
+class ColumnarBatch:
+    """
+    Struct-of-arrays container for rows of one schema class.
+
+    Subclasses are created by ``batch_class`` and set ``class_name`` and
+    ``specs``; use ``from_columns`` or ``from_arrow`` to build a batch.
+    """
+
+    class_name: str = ""
+    specs: Tuple[ColumnSpec, ...] = ()
+
+    def __init__(self, columns: Mapping[str, pa.Array]):
+        """
+        Wrap already-conformed columns (one per spec, equal lengths).
+
+        Use ``from_columns`` or ``from_arrow`` to build a batch from raw data.
+        """
+        self._columns: Dict[str, pa.Array] = {spec.name: columns[spec.name] for spec in self.specs}
+        self._length = len(next(iter(self._columns.values()))) if self._columns else 0
+
+    @classmethod
+    def from_columns(cls, columns: Any, column_map: Optional[Mapping[str, str]] = None) -> "ColumnarBatch":
+        """
+        Build a batch from columnar data, checking it against the schema.
+
+        Args:
+            columns: Mapping of column name to values (list, NumPy array,
+                pandas Series, Arrow Array/ChunkedArray), a pandas DataFrame
+                or an Arrow Table. Names are matched to slots
+                case-insensitively; slots without a column are all null.
+            column_map: Optional mapping of column name to slot name for
+                columns whose names differ from the slot
+
+        Returns:
+            A batch of this class
+
+        Raises:
+            ValueError: If a column does not match a slot, columns differ in
+                length, or a value violates the slot's type, enum, range or
+                required constraint
+        """
+        if isinstance(columns, pa.Table):
+            columns = {name: columns.column(name) for name in columns.column_names}
+        elif hasattr(columns, "columns") and hasattr(columns, "iloc"):
+            columns = {name: columns[name] for name in columns.columns}
+
+        specs = {spec.name: spec for spec in cls.specs}
+        column_map = dict(column_map or {})
+        arrays: Dict[str, pa.Array] = {}
+        for column, values in columns.items():
+            slot = column_map.get(column, str(column).lower())
+            if slot not in specs:
+                raise ValueError(f"Column {column!r} does not match a slot of {cls.class_name}")
+            arrays[slot] = _to_arrow(values)
+
+        lengths = {len(values) for values in arrays.values()}
+        if len(lengths) > 1:
+            raise ValueError(f"Columns have different lengths: {sorted(lengths)}")
+        n_rows = lengths.pop() if lengths else 0
+
+        conformed = {}
+        for name, spec in specs.items():
+            values = arrays.get(name)
+            if values is None:
+                values = pa.nulls(n_rows, pa.string() if spec.permissible_values else spec.arrow_type)
+            conformed[name] = _conform_column(spec, values)
+        return cls(conformed)
+
+    @classmethod
+    def from_arrow(cls, table: pa.Table) -> "ColumnarBatch":
+        """
+        Build a batch from an Arrow table (see ``from_columns``).
+
+        Raises:
+            ValueError: If the table was written by ``to_arrow`` of a
+                different schema class
+        """
+        metadata = table.schema.metadata or {}
+        written_as = metadata.get(b"linkml_class")
+        if written_as is not None and written_as.decode() != cls.class_name:
+            raise ValueError(f"Table holds {written_as.decode()} rows, not {cls.class_name}")
+        return cls.from_columns(table)
+
+    def to_arrow(self) -> pa.Table:
+        """
+        Return the batch as an Arrow table.
+
+        Enum columns stay dictionary-encoded, and the schema class name is
+        recorded in the table metadata, which ``from_arrow`` checks.
+        """
+        return pa.table(self._columns, metadata={"linkml_class": self.class_name})
+
+    @classmethod
+    def row_class(cls) -> type:
+        """The datamodel class (``fao_soils.datamodel.fao_soils``) of the rows."""
+        from fao_soils.datamodel import fao_soils
+
+        return getattr(fao_soils, cls.class_name)
+
+    def __len__(self) -> int:
+        return self._length
+
+    def __iter__(self) -> Iterator[RowView]:
+        return (RowView(self, i) for i in range(self._length))
+
+    def __getitem__(self, key):
+        """Return a ``RowView`` for an integer index, or a zero-copy sub-batch for a slice."""
+        if isinstance(key, slice):
+            start, stop, step = key.indices(self._length)
+            if step != 1:
+                return self.take(list(range(start, stop, step)))
+            return type(self)({name: column.slice(start, stop - start) for name, column in self._columns.items()})
+        index = key + self._length if key < 0 else key
+        if not 0 <= index < self._length:
+            raise IndexError(f"row index {key} out of range for batch of {self._length}")
+        return RowView(self, index)
+
+    @property
+    def column_names(self) -> List[str]:
+        return list(self._columns)
+
+    def column(self, name: str) -> pa.Array:
+        """Return the Arrow column for a slot."""
+        return self._columns[name]
+
+    def to_numpy(self, name: str):
+        """
+        Return a slot as a NumPy array.
+
+        Numeric columns without nulls are zero-copy; integer columns with
+        nulls become float with NaN. Enum columns return their
+        dictionary codes (int16, -1 for null), indexing ``categories(name)``.
+        """
+        column = self._columns[name]
+        if pa.types.is_dictionary(column.type):
+            return column.indices.fill_null(-1).to_numpy()
+        return column.to_numpy(zero_copy_only=False)
+
+    def categories(self, name: str) -> List[str]:
+        """Return the permissible values an enum column's codes index into."""
+        return self._columns[name].dictionary.to_pylist()
+
+    def take(self, indices: Any) -> "ColumnarBatch":
+        """Return a new batch with the given rows."""
+        indices = _to_arrow(indices)
+        return type(self)({name: column.take(indices) for name, column in self._columns.items()})
+
+    def filter(self, mask: Any) -> "ColumnarBatch":
+        """Return a new batch with the rows where ``mask`` is true."""
+        mask = _to_arrow(mask)
+        return type(self)({name: column.filter(mask) for name, column in self._columns.items()})
+
+    def to_objects(self) -> list:
+        """Materialize every row as a datamodel object (see ``fao_soils.bulk``)."""
+        from fao_soils.bulk import build_objects
+
+        columns = {name: column for name, column in self._columns.items() if column.null_count < len(column)}
+        return build_objects(self.row_class(), columns)
+
+    def __repr__(self) -> str:
+        return f"{type(self).__name__}({self._length} rows, {len(self._columns)} columns)"
+
+
+@lru_cache(maxsize=None)
+def batch_class(class_name: str, schema_path: Optional[str] = None) -> type:
+    """
+    Generate the batch class for a schema class.
+
+    Args:
+        class_name: Schema class name (e.g. "SoilLayer")
+        schema_path: LinkML schema file (defaults to ``fao_soils.yaml``)
+
+    Returns:
+        A ``ColumnarBatch`` subclass named ``<class_name>Batch``
+    """
+    return type(f"{class_name}Batch", (ColumnarBatch,), {
+        "class_name": class_name,
+        "specs": schema_columns(class_name, schema_path),
+        "__doc__": f"Columnar batch of {class_name} rows, generated from the schema.",
+        "__module__": __name__,
+    })
+
+
+def __getattr__(name: str) -> type:
+    # SoilLayerBatch etc. are generated on first access, so importing this
+    # module does not parse the schema
+    if name.endswith("Batch") and name != "ColumnarBatch":
+        class_name = name[: -len("Batch")]
+        if class_name in _schema_view().all_classes():
+            return batch_class(class_name)
+    raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
@@ -1,7 +1,34 @@
+import importlib
 from pathlib import Path
-from .fao_soils import *
 
 THIS_PATH = Path(__file__).parent
 
 SCHEMA_DIRECTORY = THIS_PATH.parent / "schema"
 MAIN_SCHEMA_PATH = SCHEMA_DIRECTORY / "fao_soils.yaml"
+
+
+def _datamodel():
+    # importlib rather than ``from . import``, which would recurse into __getattr__
+    return importlib.import_module(f"{__name__}.fao_soils")
+
+
+def _public_names():
+    """Names ``from fao_soils.datamodel import *`` exports: the package constants and the generated module."""
+    generated = {name for name in vars(_datamodel()) if not name.startswith("_")}
+    return sorted(generated | {"THIS_PATH", "SCHEMA_DIRECTORY", "MAIN_SCHEMA_PATH"})
+
+
+def __getattr__(name):
+    # The generated classes pull in the whole linkml_runtime stack, so they
+    # are imported on first use (PEP 562) rather than with the package.
+    # ``__all__`` is resolved here too, so star imports still see them.
+    if name == "__all__":
+        return _public_names()
+    try:
+        return getattr(_datamodel(), name)
+    except AttributeError:
+        raise AttributeError(f"module {__name__!r} has no attribute {name!r}") from None
+
+
+def __dir__():
+    return sorted(set(globals()) | set(_public_names()))
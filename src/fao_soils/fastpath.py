@@ -0,0 +1,163 @@
+"""
+Fast path for the pydantic datamodel when the data is already trusted.
+
+``ConfiguredBaseModel`` in ``fao_soils.datamodel.fao_soils_pydantic`` enables
+``validate_assignment`` and ``validate_default``, and its wrap
+``model_serializer`` copies each instance whenever ``exclude_none`` is set.
+That is the right default for untrusted input, but rows read back from our own
+``hwsd2.ddb`` have already been checked against the schema, and paying for
+validation and copies on every one of several hundred thousand layers is
+wasted work.
+
+Use this module only for such trusted data:
+
+- ``construct_many`` builds models without any validation
+- ``validate_many`` validates a whole list in one call through a cached
+  ``TypeAdapter`` (for data that still needs checking, but in bulk)
+- ``dump_many`` serializes models to dicts without per-instance copies,
+  giving the same output as ``model_dump(exclude_none=...)``
+
+``scripts/benchmark_datamodel.py`` compares these with the default path.
+
+Examples:
+    >>> from fao_soils.datamodel.fao_soils_pydantic import SoilLayer
+    >>> from fao_soils.fastpath import construct_many, dump_many
+    >>> rows = [{"id": 1, "hwsd2_smu_id": 4828, "layer": "D1", "drainage": "MW"}]
+    >>> layers = construct_many(SoilLayer, rows)
+    >>> dump_many(layers)
+    [{'id': 1, 'hwsd2_smu_id': 4828, 'drainage': 'MW', 'layer': 'D1'}]
+"""
+
+import typing
+from functools import lru_cache
+from typing import Any, Dict, Iterable, List, Mapping, Optional, Tuple, Type, TypeVar
+
+from pydantic import BaseModel, TypeAdapter
+
+ModelT = TypeVar("ModelT", bound=BaseModel)
+
+
+@lru_cache(maxsize=None)
+def list_adapter(model_class: Type[ModelT]) -> TypeAdapter:
+    """
+    Return the cached ``TypeAdapter`` for ``list[model_class]``.
+
+    Building a ``TypeAdapter`` compiles a validator, so it is done once per
+    model class.
+    """
+    return TypeAdapter(List[model_class])
+
+
+@lru_cache(maxsize=None)
+def _list_fields(model_class: Type[BaseModel]) -> Tuple[str, ...]:
+    """Names of optional list-valued fields, which the wrap serializer turns from [] into None."""
+    names = []
+    for name, field in model_class.model_fields.items():
+        annotation = field.annotation
+        args = typing.get_args(annotation) or (annotation,)
+        if not field.is_required() and any(typing.get_origin(a) is list or a is list for a in args):
+            names.append(name)
+    return tuple(names)
+
+
+@lru_cache(maxsize=None)
+def _defaults(model_class: Type[BaseModel]) -> Optional[Dict[str, Any]]:
+    """Field defaults of ``model_class``, or None if a field uses a default factory."""
+    defaults = {}
+    for name, field in model_class.model_fields.items():
+        if field.default_factory is not None:
+            return None
+        defaults[name] = None if field.is_required() else field.default
+    return defaults
+
+
+def construct_many(model_class: Type[ModelT], rows: Iterable[Mapping[str, Any]]) -> List[ModelT]:
+    """
+    Build models from trusted rows without validation.
+
+    Values are stored as given, so they must already have the types the
+    model declares (enum slots hold the enum's string value, as with
+    ``use_enum_values``). Missing optional fields get their defaults.
+
+    This sets the same instance state as ``model_construct`` but skips its
+    per-field default and alias handling, which makes ``model_construct``
+    slower than validating for these flat models.
+
+    Args:
+        model_class: Generated pydantic model (e.g. SoilLayer)
+        rows: Mappings of field name to value
+
+    Returns:
+        List of models, one per row
+    """
+    defaults = _defaults(model_class)
+    if defaults is None or model_class.__pydantic_post_init__ is not None:
+        construct = model_class.model_construct
+        return [construct(**row) for row in rows]
+
+    new = model_class.__new__
+    copy = defaults.copy
+    # BaseModel.__setattr__ would validate the assignment, so bypass it
+    set_attribute = object.__setattr__
+    models = []
+    for row in rows:
+        model = new(model_class)
+        values = copy()
+        values.update(row)
+        set_attribute(model, "__dict__", values)
+        set_attribute(model, "__pydantic_fields_set__", set(row))
+        set_attribute(model, "__pydantic_extra__", None)
+        set_attribute(model, "__pydantic_private__", None)
+        models.append(model)
+    return models
+
+
+def validate_many(model_class: Type[ModelT], rows: List[Mapping[str, Any]]) -> List[ModelT]:
+    """
+    Validate a list of rows in a single call.
+
+    Equivalent to ``[model_class(**row) for row in rows]`` but runs the whole
+    list through one cached validator.
+
+    Args:
+        model_class: Generated pydantic model (e.g. SoilLayer)
+        rows: Mappings of field name to value
+
+    Returns:
+        List of validated models
+
+    Raises:
+        pydantic.ValidationError: If any row is invalid (errors are located
+            by row index)
+    """
+    return list_adapter(model_class).validate_python(rows)
+
+
+def dump_many(models: Iterable[BaseModel], exclude_none: bool = True) -> List[Dict[str, Any]]:
+    """
+    Serialize trusted models to dicts without per-instance copies.
+
+    The datamodel has scalar slots only (enum values are stored as strings),
+    so a model's serialized form is its field dict; the wrap serializer's
+    empty-list handling is applied in place on the output dict instead of
+    on a copy of the model.
+
+    Args:
+        models: Models built by ``construct_many``, ``validate_many`` or the
+            normal constructor
+        exclude_none: Drop fields whose value is None
+
+    Returns:
+        List of dicts matching what the generated serializer produces for
+        ``model.model_dump(exclude_none=exclude_none)``
+    """
+    result = []
+    for model in models:
+        values = dict(model.__dict__)
+        if exclude_none:
+            for name in _list_fields(type(model)):
+                if values.get(name) == []:
+                    values[name] = None
+            values = {name: value for name, value in values.items() if value is not None}
+        result.append(values)
+    return result
@@ -0,0 +1,371 @@
+"""
+Streaming serialization of soil profiles to JSON Lines and YAML.
+
+A profile is one soil mapping unit with its layers, in the form of
+``examples/hwsd2_soil_profile.yaml``::
+
+    {"soil_mapping_unit": {...SoilMappingUnit slots...},
+     "soil_layers": [{...SoilLayer slots...}, ...]}
+
+Profiles are built straight from columnar data (Arrow tables, DuckDB query
+results, pandas DataFrames or ``ColumnarBatch``) without creating
+datamodel objects:
+
+- columns are matched to slots case-insensitively, cast once to the slot's
+  type, and columns that are not slots (e.g. joined ``*_NAME`` lookups) are
+  dropped
+- missing values are omitted, as with the LinkML dumpers
+- enum slots stored as ``D_*`` lookup codes are translated with
+  ``code_maps`` (built from the lookup tables by ``export_profiles``), and
+  enum values that are still not permissible are left out and counted, so
+  every written profile conforms to the schema
+- JSON is encoded with ``orjson`` when it is installed (falling back to
+  ``json``), YAML with the libyaml ``CSafeDumper`` when available
+
+``export_profiles`` streams a whole DuckDB database in chunks of SMUs and
+reports throughput in rows/s.
+
+Examples:
+    >>> from fao_soils.serialize import iter_profiles
+    >>> smus = {"ID": [1], "HWSD2_SMU_ID": [4726], "DRAINAGE": ["MW"], "WRB4_NAME": ["Haplic Phaeozem"]}
+    >>> layers = {"ID": [2, 1], "HWSD2_SMU_ID": [4726, 4726], "SEQUENCE": [1, 1],
+    ...           "LAYER": ["D2", "D1"], "SAND": [28.0, None]}
+    >>> profile = next(iter_profiles(smus, layers))
+    >>> profile["soil_mapping_unit"]
+    {'id': 1, 'hwsd2_smu_id': 4726, 'drainage': 'MW'}
+    >>> [layer["layer"] for layer in profile["soil_layers"]], profile["soil_layers"][0]
+    (['D1', 'D2'], {'id': 1, 'hwsd2_smu_id': 4726, 'sequence': 1, 'layer': 'D1'})
+"""
+
+import json
+import time
+from dataclasses import dataclass, field
+from pathlib import Path
+from typing import IO, Any, Dict, Iterable, Iterator, List, Mapping, Optional, Sequence, Tuple, Union
+
+try:
+    import pyarrow as pa
+    import pyarrow.compute as pc
+except ImportError as e:  # pragma: no cover
+    raise ImportError("fao_soils.serialize requires pyarrow: pip install 'fao_soils[columnar]'") from e
+
+from fao_soils.columnar import ColumnarBatch, _to_arrow, schema_columns
+from fao_soils.validation import HWSD2_COLUMN_MAPS, _apply_code_map, hwsd2_code_maps
+
+PROFILE_FORMATS = ("jsonl", "yaml")
+DEFAULT_CHUNK_SMUS = 2000
+
+Profile = Dict[str, Any]
+
+
+@dataclass
+class SerializationStats:
+    """
+    Counts and throughput of a serialization run.
+
+    Attributes:
+        profiles: Profiles written
+        rows: SMU and layer rows written
+        seconds: Elapsed time
+        omitted: Per slot, enum values left out because they are not
+            permissible values (e.g. lookup codes the schema has no value for)
+    """
+
+    profiles: int = 0
+    rows: int = 0
+    seconds: float = 0.0
+    omitted: Dict[str, int] = field(default_factory=dict)
+
+    @property
+    def rows_per_second(self) -> float:
+        return self.rows / self.seconds if self.seconds else 0.0
+
+    def __str__(self) -> str:
+        text = (f"{self.profiles:,} profiles, {self.rows:,} rows in {self.seconds:.2f} s "
+                f"({self.rows_per_second:,.0f} rows/s)")
+        if self.omitted:
+            text += "; omitted non-permissible " + ", ".join(
+                f"{slot} ({count:,})" for slot, count in sorted(self.omitted.items()))
+        return text
+
+
+def _as_table(source: Any) -> pa.Table:
+    if isinstance(source, pa.Table):
+        return source
+    if isinstance(source, ColumnarBatch):
+        return source.to_arrow()
+    if hasattr(source, "columns") and hasattr(source, "iloc"):
+        return pa.Table.from_pandas(source, preserve_index=False)
+    return pa.table({name: _to_arrow(values) for name, values in source.items()})
+
+
+def _slot_columns(
+    table: pa.Table,
+    class_name: str,
+    column_map: Optional[Mapping[str, str]],
+    code_maps: Optional[Mapping[str, Mapping[Any, str]]],
+    omitted: Optional[Dict[str, int]] = None,
+) -> List[Tuple[str, list]]:
+    """
+    Cast the slot columns of a table to their schema types and return them as Python lists.
+
+    Enum values that are not permissible become null and are tallied per
+    slot in ``omitted``.
+    """
+    specs = {spec.name: spec for spec in schema_columns(class_name)}
+    column_map = dict(column_map or {})
+    code_maps = code_maps or {}
+    columns = []
+    for name in table.column_names:
+        slot = column_map.get(name, name.lower())
+        spec = specs.get(slot)
+        values = table.column(name)
+        if spec is None or values.null_count == len(values):
+            continue
+        values = values.combine_chunks()
+        if pa.types.is_dictionary(values.type):
+            values = values.dictionary_decode()
+        if slot in code_maps:
+            values = _apply_code_map(values, code_maps[slot])
+        target = pa.string() if spec.permissible_values is not None else spec.arrow_type
+        if spec.permissible_values is not None:
+            values = values.cast(target)
+            permitted = pc.is_in(values, value_set=pa.array(spec.permissible_values, pa.string()))
+            rejected = len(values) - values.null_count - pc.sum(permitted).as_py()
+            if rejected:
+                if omitted is not None:
+                    omitted[slot] = omitted.get(slot, 0) + rejected
+                values = pc.if_else(permitted, values, None)
+        elif pa.types.is_floating(target):
+            # NaN is a missing value, like null
+            values = values.cast(target)
+            values = pc.if_else(pc.is_nan(values), None, values)
+        else:
+            values = values.cast(target)
+        columns.append((slot, values.to_pylist()))
+    return columns
+
+
+def _rows(columns: List[Tuple[str, list]]) -> List[Dict[str, Any]]:
+    """Build one dict per row in slot order, omitting missing values."""
+    if not columns:
+        return []
+    return [
+        {slot: value for (slot, _), value in zip(columns, row) if value is not None}
+        for row in zip(*(values for _, values in columns))
+    ]
+
+
+def iter_profiles(
+    smus: Any,
+    layers: Any,
+    smu_column_map: Optional[Mapping[str, str]] = None,
+    layer_column_map: Optional[Mapping[str, str]] = None,
+    code_maps: Optional[Mapping[str, Mapping[Any, str]]] = None,
+    stats: Optional[SerializationStats] = None,
+) -> Iterator[Profile]:
+    """
+    Build profile documents from columnar SMU and layer data.
+
+    Enum values that are not permissible values of their slot, after
+    ``code_maps`` is applied, are left out of the profiles.
+
+    Args:
+        smus: SMU rows (Arrow Table, pandas DataFrame, ColumnarBatch or mapping
+            of column name to values), one profile per row
+        layers: Layer rows of the same SMUs, in any order; they are grouped by
+            HWSD2_SMU_ID and sorted by SEQUENCE and LAYER
+        smu_column_map: Column renames for SMU columns
+        layer_column_map: Column renames for layer columns; defaults to the
+            HWSD2_LAYERS renames (AWC, ROOT_DEPTH)
+        code_maps: Optional mapping of slot name to {code: permissible value}
+            for enum slots stored as codes (see
+            ``fao_soils.validation.hwsd2_code_maps``)
+        stats: Optional stats whose ``omitted`` counts are updated
+
+    Yields:
+        ``{"soil_mapping_unit": {...}, "soil_layers": [...]}`` dicts;
+        ``soil_layers`` is omitted for SMUs without layers
+    """
+    if layer_column_map is None:
+        layer_column_map = HWSD2_COLUMN_MAPS["HWSD2_LAYERS"]
+    layer_table = _as_table(layers)
+    slot_names = {layer_column_map.get(name, name.lower()): name for name in layer_table.column_names}
+    sort_keys = [(slot_names[slot], "ascending") for slot in ("hwsd2_smu_id", "sequence", "layer") if slot in slot_names]
+    if sort_keys:
+        layer_table = layer_table.sort_by(sort_keys)
+
+    omitted = stats.omitted if stats is not None else None
+    smu_columns = _slot_columns(_as_table(smus), "SoilMappingUnit", smu_column_map, code_maps, omitted)
+    layer_columns = _slot_columns(layer_table, "SoilLayer", layer_column_map, code_maps, omitted)
+    layer_rows = _rows(layer_columns)
+    layer_ids = dict(layer_columns).get("hwsd2_smu_id", [])
+
+    # Layer rows are sorted by SMU, so each SMU's layers are one contiguous run
+    runs: Dict[Any, Tuple[int, int]] = {}
+    start = 0
+    for end in range(1, len(layer_ids) + 1):
+        if end == len(layer_ids) or layer_ids[end] != layer_ids[start]:
+            runs[layer_ids[start]] = (start, end)
+            start = end
+
+    for smu in _rows(smu_columns):
+        profile: Profile = {"soil_mapping_unit": smu}
+        run = runs.get(smu.get("hwsd2_smu_id"))
+        if run:
+            profile["soil_layers"] = layer_rows[run[0]:run[1]]
+        yield profile
+
+
+def _profile_rows(profile: Profile) -> int:
+    return 1 + len(profile.get("soil_layers", ()))
+
+
+class ProfileWriter:
+    """
+    Write profile documents to a stream as JSON Lines or YAML.
+
+    JSON Lines puts one profile per line; YAML writes one ``---`` document
+    per profile. Use as a context manager, or call ``close``.
+    """
+
+    def __init__(self, output: Union[str, Path, IO[bytes]], format: str = "jsonl"):
+        if format not in PROFILE_FORMATS:
+            raise ValueError(f"Unknown profile format {format!r}; expected one of {PROFILE_FORMATS}")
+        self.format = format
+        self._owns_file = isinstance(output, (str, Path))
+        self._file = open(output, "wb") if self._owns_file else output
+        self.stats = SerializationStats()
+        self._start = time.perf_counter()
+        self._encode = self._jsonl_encoder() if format == "jsonl" else self._yaml_encoder()
+
+    @staticmethod
+    def _jsonl_encoder():
+        try:
+            import orjson
+        except ImportError:
+            return lambda profile: (json.dumps(profile, separators=(",", ":"), ensure_ascii=False) + "\n").encode()
+        return lambda profile, dumps=orjson.dumps, option=orjson.OPT_APPEND_NEWLINE: dumps(profile, option=option)
+
+    @staticmethod
+    def _yaml_encoder():
+        import yaml
+
+        dumper = getattr(yaml, "CSafeDumper", yaml.SafeDumper)
+        return lambda profile: yaml.dump(profile, Dumper=dumper, sort_keys=False, explicit_start=True,
+                                         allow_unicode=True).encode()
+
+    def write(self, profile: Profile) -> None:
+        """Write one profile."""
+        self._file.write(self._encode(profile))
+        self.stats.profiles += 1
+        self.stats.rows += _profile_rows(profile)
+
+    def write_all(self, profiles: Iterable[Profile]) -> SerializationStats:
+        """Write every profile of an iterable and return the running stats."""
+        encode = self._encode
+        write = self._file.write
+        stats = self.stats
+        for profile in profiles:
+            write(encode(profile))
+            stats.profiles += 1
+            stats.rows += _profile_rows(profile)
+        stats.seconds = time.perf_counter() - self._start
+        return stats
+
+    def close(self) -> SerializationStats:
+        """Flush the output (closing it if opened here) and return the final stats."""
+        self.stats.seconds = time.perf_counter() - self._start
+        if self._owns_file:
+            self._file.close()
+        else:
+            self._file.flush()
+        return self.stats
+
+    def __enter__(self) -> "ProfileWriter":
+        return self
+
+    def __exit__(self, *exc_info) -> None:
+        self.close()
+
+
+def write_profiles(profiles: Iterable[Profile], output: Union[str, Path, IO[bytes]],
+                   format: str = "jsonl") -> SerializationStats:
+    """
+    Write profiles to a file as JSON Lines or YAML.
+
+    Args:
+        profiles: Profile dicts (e.g. from ``iter_profiles``)
+        output: Output path, or binary file object
+        format: "jsonl" or "yaml"
+
+    Returns:
+        SerializationStats with profile and row counts and rows/s
+    """
+    with ProfileWriter(output, format) as writer:
+        writer.write_all(profiles)
+    return writer.stats
+
+
+def _fetch_table(result) -> pa.Table:
+    # to_arrow_table replaced fetch_arrow_table in duckdb 1.4
+    fetch = getattr(result, "to_arrow_table", None) or result.fetch_arrow_table
+    return fetch()
+
+
+def export_profiles(
+    database: Any,
+    output: Union[str, Path, IO[bytes]],
+    smu_ids: Optional[Sequence[int]] = None,
+    format: str = "jsonl",
+    chunk_smus: int = DEFAULT_CHUNK_SMUS,
+    code_maps: Optional[Mapping[str, Mapping[Any, str]]] = None,
+) -> SerializationStats:
+    """
+    Stream SMU profiles from an HWSD2 DuckDB database to JSON Lines or YAML.
+
+    SMUs are read in chunks of ``chunk_smus`` with their layers, so memory
+    use is bounded by the chunk size rather than the database size.
+
+    Args:
+        database: Path to the DuckDB database (e.g. hwsd2.ddb), or an open connection
+        output: Output path, or binary file object
+        smu_ids: HWSD2_SMU_IDs to export (default: every SMU in HWSD2_SMU)
+        format: "jsonl" or "yaml"
+        chunk_smus: SMUs per query
+        code_maps: Mapping of slot name to {code: permissible value}; defaults
+            to ``hwsd2_code_maps`` built from the database's ``D_*`` tables
+
+    Returns:
+        SerializationStats with profile and row counts, rows/s and the
+        number of omitted non-permissible enum values
+
+    Examples:
+        >>> stats = export_profiles("export/hwsd2.ddb", "profiles.jsonl")
+        >>> print(stats)
+    """
+    try:
+        import duckdb
+    except ImportError as e:  # pragma: no cover
+        raise ImportError("Reading hwsd2.ddb requires duckdb: pip install 'fao_soils[duckdb]'") from e
+
+    con = duckdb.connect(str(database), read_only=True) if not hasattr(database, "execute") else database
+    try:
+        if code_maps is None:
+            code_maps = hwsd2_code_maps(con)
+        if smu_ids is None:
+            smu_ids = [row[0] for row in con.execute(
+                "SELECT DISTINCT HWSD2_SMU_ID FROM HWSD2_SMU ORDER BY HWSD2_SMU_ID").fetchall()]
+        with ProfileWriter(output, format) as writer:
+            for start in range(0, len(smu_ids), chunk_smus):
+                chunk = [int(smu_id) for smu_id in smu_ids[start:start + chunk_smus]]
+                smus = _fetch_table(con.execute(
+                    "SELECT * FROM HWSD2_SMU WHERE HWSD2_SMU_ID IN (SELECT unnest(?)) ORDER BY HWSD2_SMU_ID",
+                    [chunk]))
+                layers = _fetch_table(con.execute(
+                    "SELECT * FROM HWSD2_LAYERS WHERE HWSD2_SMU_ID IN (SELECT unnest(?))", [chunk]))
+                writer.write_all(iter_profiles(smus, layers, code_maps=code_maps, stats=writer.stats))
+        return writer.stats
+    finally:
+        if con is not database:
+            con.close()
@@ -0,0 +1,305 @@
+"""
+Incremental loading of large SoilLayer / SoilMappingUnit collections.
+
+``linkml_runtime``'s ``yaml_loader.load`` parses a whole document before
+building any object, so a multi-hundred-MB collection needs several times
+its size in memory. The functions here parse the input as a stream and hand
+out records as soon as they are complete:
+
+- JSON Lines (``.jsonl``/``.ndjson``): one record per line, decoded with
+  ``orjson`` when installed
+- YAML (``.yaml``/``.yml``) and JSON (``.json``): parsed as a YAML event
+  stream (with libyaml when available); only the record being read is held
+  in memory
+
+Records are either the items of the document's top-level list, the items
+under ``key`` (e.g. ``soil_layers``) of a top-level mapping, or, for
+multi-document YAML and JSON Lines, each document. Records are then turned
+into validated objects or columnar batches ``batch_size`` at a time, so
+memory depends on the batch size and not the file size.
+
+Examples:
+    >>> import io
+    >>> from fao_soils.streaming import iter_batches, iter_objects, iter_records
+    >>> text = "soil_layers:\\n  - {id: 1, hwsd2_smu_id: 4828, layer: D1}\\n  - {id: 2, hwsd2_smu_id: 4828, layer: D2}\\n"
+    >>> [r["layer"] for r in iter_records(io.StringIO(text), format="yaml", key="soil_layers")]
+    ['D1', 'D2']
+    >>> from fao_soils.datamodel.fao_soils import SoilLayer
+    >>> [layer.layer for layer in iter_objects(io.StringIO(text), SoilLayer, key="soil_layers", format="yaml")]
+    ['D1', 'D2']
+    >>> [len(b) for b in iter_batches(io.StringIO(text), "SoilLayer", key="soil_layers", batch_size=1, format="yaml")]
+    [1, 1]
+"""
+
+import json
+from contextlib import contextmanager
+from itertools import islice
+from pathlib import Path
+from typing import IO, Any, Dict, Iterator, List, Optional, Union
+
+DEFAULT_BATCH_SIZE = 10_000
+
+# File suffix to stream format
+STREAM_FORMATS = {
+    ".jsonl": "jsonl",
+    ".ndjson": "jsonl",
+    ".json": "yaml",  # JSON is parsed by the YAML event parser
+    ".yaml": "yaml",
+    ".yml": "yaml",
+}
+
+Source = Union[str, Path, IO]
+
+
+@contextmanager
+def _open(source: Source, binary: bool):
+    if isinstance(source, (str, Path)):
+        with open(source, "rb" if binary else "r", encoding=None if binary else "utf-8") as f:
+            yield f
+    else:
+        yield source
+
+
+def _stream_format(source: Source, format: Optional[str]) -> str:
+    if format is not None:
+        if format not in ("jsonl", "yaml", "json"):
+            raise ValueError(f"Unknown stream format {format!r}; expected 'jsonl', 'yaml' or 'json'")
+        return "yaml" if format == "json" else format
+    if isinstance(source, (str, Path)):
+        stream_format = STREAM_FORMATS.get(Path(source).suffix.lower())
+        if stream_format:
+            return stream_format
+    raise ValueError(f"Cannot infer the stream format of {source!r}; pass format='jsonl' or 'yaml'")
+
+
+def _select(record: Any, key: Optional[str]) -> Iterator[Dict[str, Any]]:
+    """Yield the record, or the items under ``key`` of a mapping record."""
+    if key is None or not isinstance(record, dict):
+        yield record
+        return
+    value = record.get(key)
+    if isinstance(value, list):
+        yield from value
+    elif value is not None:
+        yield value
+
+
+def _iter_jsonl(source: Source, key: Optional[str]) -> Iterator[Dict[str, Any]]:
+    try:
+        from orjson import loads
+    except ImportError:
+        loads = json.loads
+    with _open(source, binary=True) as f:
+        for line in f:
+            if line.strip():
+                yield from _select(loads(line), key)
+
+
+class _EventComposer:
+    """Build plain Python values from YAML parse events, one record at a time."""
+
+    def __init__(self):
+        import yaml
+
+        self.yaml = yaml
+        # A SafeLoader is used only for its tag resolver and constructor
+        self.loader = yaml.SafeLoader("")
+
+    def compose(self, event, events) -> Any:
+        """Construct the value starting at ``event``, consuming its events."""
+        return self.loader.construct_document(self._node(event, events))
+
+    def _node(self, event, events):
+        yaml = self.yaml
+        if isinstance(event, yaml.ScalarEvent):
+            tag = event.tag
+            if tag is None or tag == "!":
+                tag = self.loader.resolve(yaml.ScalarNode, event.value, event.implicit)
+            return yaml.ScalarNode(tag, event.value, style=event.style)
+        if isinstance(event, yaml.SequenceStartEvent):
+            tag = event.tag or self.loader.resolve(yaml.SequenceNode, None, event.implicit)
+            items = []
+            for child in events:
+                if isinstance(child, yaml.SequenceEndEvent):
+                    return yaml.SequenceNode(tag, items)
+                items.append(self._node(child, events))
+        if isinstance(event, yaml.MappingStartEvent):
+            tag = event.tag or self.loader.resolve(yaml.MappingNode, None, event.implicit)
+            pairs = []
+            for child in events:
+                if isinstance(child, yaml.MappingEndEvent):
+                    return yaml.MappingNode(tag, pairs)
+                pairs.append((self._node(child, events), self._node(next(events), events)))
+        if isinstance(event, yaml.AliasEvent):
+            raise ValueError("YAML aliases are not supported by the streaming loader")
+        raise ValueError(f"Unexpected YAML event {event!r}")
+
+    def skip(self, event, events) -> None:
+        """Consume the events of a value without building it."""
+        yaml = self.yaml
+        if not isinstance(event, (yaml.SequenceStartEvent, yaml.MappingStartEvent)):
+            return
+        depth = 1
+        for child in events:
+            if isinstance(child, (yaml.SequenceStartEvent, yaml.MappingStartEvent)):
+                depth += 1
+            elif isinstance(child, (yaml.SequenceEndEvent, yaml.MappingEndEvent)):
+                depth -= 1
+                if not depth:
+                    return
+
+    def sequence_items(self, events) -> Iterator[Any]:
+        """Yield the items of a sequence whose start event was just consumed."""
+        for event in events:
+            if isinstance(event, self.yaml.SequenceEndEvent):
+                return
+            yield self.compose(event, events)
+
+
+def _iter_yaml(source: Source, key: Optional[str]) -> Iterator[Dict[str, Any]]:
+    import yaml
+
+    loader_class = getattr(yaml, "CSafeLoader", yaml.SafeLoader)
+    composer = _EventComposer()
+    with _open(source, binary=False) as f:
+        events = yaml.parse(f, Loader=loader_class)
+        for event in events:
+            if not isinstance(event, yaml.DocumentStartEvent):
+                continue
+            root = next(events)
+            if isinstance(root, yaml.SequenceStartEvent):
+                yield from composer.sequence_items(events)
+            elif isinstance(root, yaml.MappingStartEvent) and key is not None:
+                # Stream the items under ``key``; skip the other entries
+                for name_event in events:
+                    if isinstance(name_event, yaml.MappingEndEvent):
+                        break
+                    value_event = next(events)
+                    if not (isinstance(name_event, yaml.ScalarEvent) and name_event.value == key):
+                        composer.skip(value_event, events)
+                    elif isinstance(value_event, yaml.SequenceStartEvent):
+                        yield from composer.sequence_items(events)
+                    else:
+                        yield from _select({key: composer.compose(value_event, events)}, key)
+            else:
+                yield composer.compose(root, events)
+
+
+def iter_records(source: Source, format: Optional[str] = None, key: Optional[str] = None) -> Iterator[Dict[str, Any]]:
+    """
+    Stream records from a JSON Lines, YAML or JSON collection.
+
+    Args:
+        source: Path, or text/binary file object (binary for JSON Lines,
+            text for YAML)
+        format: "jsonl", "yaml" or "json"; inferred from the file suffix if omitted
+        key: Collection key (e.g. "soil_layers") whose items are the records
+            when a document is a mapping
+
+    Yields:
+        Records as dicts, in file order
+
+    Raises:
+        ValueError: If the format is unknown or cannot be inferred
+    """
+    if _stream_format(source, format) == "jsonl":
+        return _iter_jsonl(source, key)
+    return _iter_yaml(source, key)
+
+
+def _chunks(records: Iterator[Dict[str, Any]], batch_size: int) -> Iterator[List[Dict[str, Any]]]:
+    while True:
+        chunk = list(islice(records, batch_size))
+        if not chunk:
+            return
+        yield chunk
+
+
+def _columns(records: List[Dict[str, Any]]) -> Dict[str, List[Any]]:
+    names = {}
+    for record in records:
+        names.update(dict.fromkeys(record))
+    return {name: [record.get(name) for record in records] for name in names}
+
+
+def iter_object_batches(
+    source: Source,
+    target_class: type,
+    key: Optional[str] = None,
+    batch_size: int = DEFAULT_BATCH_SIZE,
+    format: Optional[str] = None,
+) -> Iterator[list]:
+    """
+    Stream validated datamodel objects, ``batch_size`` at a time.
+
+    Args:
+        source: Path or file object (see ``iter_records``)
+        target_class: Generated class: a ``fao_soils.datamodel.fao_soils``
+            dataclass (built with ``fao_soils.bulk``) or a
+            ``fao_soils_pydantic`` model (validated with one TypeAdapter call
+            per batch)
+        key: Collection key (e.g. "soil_layers")
+        batch_size: Records per batch
+        format: "jsonl", "yaml" or "json"; inferred from the suffix if omitted
+
+    Yields:
+        Lists of up to ``batch_size`` objects
+
+    Raises:
+        ValueError: If a record does not match the class (dataclasses)
+        pydantic.ValidationError: If a record is invalid (pydantic models)
+    """
+    records = iter_records(source, format, key)
+    if hasattr(target_class, "model_validate"):
+        from fao_soils.fastpath import validate_many
+
+        for chunk in _chunks(records, batch_size):
+            yield validate_many(target_class, chunk)
+    else:
+        from fao_soils.bulk import build_objects
+
+        for chunk in _chunks(records, batch_size):
+            yield build_objects(target_class, _columns(chunk))
+
+
+def iter_objects(
+    source: Source,
+    target_class: type,
+    key: Optional[str] = None,
+    batch_size: int = DEFAULT_BATCH_SIZE,
+    format: Optional[str] = None,
+) -> Iterator[Any]:
+    """Stream validated datamodel objects one at a time (see ``iter_object_batches``)."""
+    for batch in iter_object_batches(source, target_class, key, batch_size, format):
+        yield from batch
+
+
+def iter_batches(
+    source: Source,
+    class_name: str,
+    key: Optional[str] = None,
+    batch_size: int = DEFAULT_BATCH_SIZE,
+    format: Optional[str] = None,
+):
+    """
+    Stream records into columnar batches (see ``fao_soils.columnar``).
+
+    Args:
+        source: Path or file object (see ``iter_records``)
+        class_name: Schema class name (e.g. "SoilLayer")
+        key: Collection key (e.g. "soil_layers")
+        batch_size: Rows per batch
+        format: "jsonl", "yaml" or "json"; inferred from the suffix if omitted
+
+    Yields:
+        ``<class_name>Batch`` instances of up to ``batch_size`` rows, checked
+        against the schema
+
+    Raises:
+        ValueError: If a record violates the schema
+    """
+    from fao_soils.columnar import batch_class
+
+    cls = batch_class(class_name)
+    for chunk in _chunks(iter_records(source, format, key), batch_size):
+        yield cls.from_columns(_columns(chunk))
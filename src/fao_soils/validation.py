@@ -0,0 +1,438 @@
+"""
+Vectorized validation of whole tables against the LinkML schema.
+
+Validating HWSD2_LAYERS by building one datamodel object per row takes
+hours; this module compiles the schema's slot constraints into column
+checks instead and runs them over Arrow record batches:
+
+- ``required``: slot is required (or an identifier) and the value is null
+- ``type``: value cannot be read as the slot's range (e.g. ``12.5`` or
+  ``"abc"`` for an ``integer`` slot)
+- ``enum``: value is not a permissible value of the slot's enum
+- ``minimum`` / ``maximum``: value is outside ``minimum_value`` /
+  ``maximum_value``
+
+Tables are streamed in chunks (DuckDB query results, Arrow tables or
+readers, pandas DataFrames), so memory stays bounded, and the report gives
+per-rule violation counts with a few sample rows for each rule.
+
+Some HWSD2 columns store enum slots as integer codes into the ``D_*``
+lookup tables (e.g. COVERAGE ``3`` for ``SOTWIS``); pass ``code_maps`` to
+translate them before the enum check. ``hwsd2_code_maps`` builds them from
+the lookup tables, and ``validate_duckdb`` does so by default.
+
+Examples:
+    >>> from fao_soils.validation import validate_table
+    >>> report = validate_table({
+    ...     "ID": [1, 2, 3],
+    ...     "HWSD2_SMU_ID": [4828, 4828, None],
+    ...     "DRAINAGE": ["MW", "XX", "W"],
+    ...     "SAND": [28.0, 120.0, -9.0],
+    ... }, "SoilLayer")
+    >>> report.ok
+    False
+    >>> {r.rule_id: r.violations for r in report.failed()}
+    {'hwsd2_smu_id.required': 1, 'drainage.enum': 1, 'sand.minimum': 1, 'sand.maximum': 1}
+    >>> report.failed()[1].samples[0]["value"]
+    'XX'
+"""
+
+import dataclasses
+import re
+import time
+from typing import Any, Callable, Dict, Iterator, List, Mapping, Optional
+
+try:
+    import pyarrow as pa
+    import pyarrow.compute as pc
+except ImportError as e:  # pragma: no cover
+    raise ImportError("fao_soils.validation requires pyarrow: pip install 'fao_soils[columnar]'") from e
+
+from fao_soils.columnar import ColumnSpec, _schema_view, _to_arrow, schema_columns
+
+DEFAULT_CHUNK_SIZE = 100_000
+DEFAULT_SAMPLE_SIZE = 5
+
+# Schema class and column renames for the HWSD2 DuckDB tables
+HWSD2_TABLE_CLASSES = {
+    "HWSD2_LAYERS": "SoilLayer",
+    "HWSD2_SMU": "SoilMappingUnit",
+}
+HWSD2_COLUMN_MAPS = {
+    "HWSD2_LAYERS": {"AWC": "awc_layer", "ROOT_DEPTH": "root_depth_layer"},
+    "HWSD2_SMU": {},
+}
+
+# Enum slots that HWSD2 stores as integer codes of a D_* lookup table
+HWSD2_CODE_TABLES = {
+    "coverage": "D_COVERAGE",
+    "phase1": "D_PHASE",
+    "phase2": "D_PHASE",
+    "roots": "D_ROOTS",
+    "il": "D_IL",
+    "swr": "D_SWR",
+    "add_prop": "D_ADD_PROP",
+    "texture_usda": "D_TEXTURE_USDA",
+    "root_depth": "D_ROOT_DEPTH",
+}
+
+_INTEGER_PATTERN = r"^[+-]?\d+$"
+_FLOAT_PATTERN = r"^[+-]?(\d+\.?\d*|\.\d+)([eE][+-]?\d+)?$"
+
+
+@dataclasses.dataclass(frozen=True)
+class Rule:
+    """
+    A single compiled constraint on one slot.
+
+    Attributes:
+        rule_id: Unique id, ``<slot>.<kind>``
+        slot: Slot name
+        kind: One of "required", "type", "enum", "minimum", "maximum"
+        description: Human-readable statement of the constraint
+        check: Function of (original column, typed column, type-violation
+            mask) returning a boolean mask of violating rows
+    """
+
+    rule_id: str
+    slot: str
+    kind: str
+    description: str
+    check: Callable[[pa.Array, pa.Array, Optional[pa.Array]], pa.Array] = dataclasses.field(repr=False, compare=False)
+
+
+@dataclasses.dataclass
+class RuleResult:
+    """Violations of one rule: total count and up to ``sample_size`` sample rows."""
+
+    rule_id: str
+    slot: str
+    kind: str
+    description: str
+    violations: int = 0
+    samples: List[Dict[str, Any]] = dataclasses.field(default_factory=list)
+
+
+@dataclasses.dataclass
+class ValidationReport:
+    """
+    Result of validating a table against a schema class.
+
+    Attributes:
+        class_name: Schema class validated against
+        rows: Number of rows checked
+        results: One result per compiled rule, in slot order
+        unknown_columns: Columns that do not match any slot of the class
+        elapsed_seconds: Wall-clock validation time
+    """
+
+    class_name: str
+    rows: int = 0
+    results: List[RuleResult] = dataclasses.field(default_factory=list)
+    unknown_columns: List[str] = dataclasses.field(default_factory=list)
+    elapsed_seconds: float = 0.0
+
+    @property
+    def ok(self) -> bool:
+        """True if no rule was violated."""
+        return not self.failed()
+
+    def failed(self) -> List[RuleResult]:
+        """Results of the rules with at least one violation."""
+        return [result for result in self.results if result.violations]
+
+    def to_dict(self) -> Dict[str, Any]:
+        """Return the report as JSON-serializable data."""
+        return dataclasses.asdict(self)
+
+    def summary(self) -> str:
+        """Return a short text summary, one line per violated rule."""
+        lines = [f"{self.class_name}: {self.rows:,} rows, {len(self.failed())} of {len(self.results)} rules violated "
+                 f"({self.elapsed_seconds:.2f} s)"]
+        for result in self.failed():
+            lines.append(f"  {result.rule_id:<28} {result.violations:>10,}  {result.description}")
+        if self.unknown_columns:
+            lines.append(f"  unknown columns: {', '.join(self.unknown_columns)}")
+        return "\n".join(lines)
+
+
+def _typed_column(spec: ColumnSpec, values: pa.Array):
+    """
+    Read a column as the slot's range.
+
+    Returns:
+        (typed column, type-violation mask or None). Values that violate the
+        type are null in the typed column.
+    """
+    if pa.types.is_dictionary(values.type):
+        values = values.dictionary_decode()
+    if spec.permissible_values is not None or spec.arrow_type == pa.string():
+        return (values if pa.types.is_null(values.type) else values.cast(pa.string())), None
+
+    target = spec.arrow_type
+    source = values.type
+    if pa.types.is_null(source) or pa.types.is_integer(source) or pa.types.is_boolean(source):
+        return values.cast(target), None
+    if pa.types.is_floating(source) or pa.types.is_decimal(source):
+        if pa.types.is_floating(target):
+            return values.cast(target), None
+        floats = values.cast(pa.float64())
+        bad = pc.fill_null(pc.invert(pc.equal(floats, pc.floor(floats))), False)
+        return pc.if_else(bad, None, floats).cast(target, safe=False), bad
+    if pa.types.is_string(source) or pa.types.is_large_string(source):
+        text = pc.utf8_trim_whitespace(values)
+        pattern = _INTEGER_PATTERN if pa.types.is_integer(target) else _FLOAT_PATTERN
+        good = pc.match_substring_regex(text, pattern)
+        bad = pc.fill_null(pc.invert(good), False)
+        return pc.if_else(good, text, None).cast(target), bad
+    try:
+        return values.cast(target), None
+    except (pa.ArrowInvalid, pa.ArrowNotImplementedError):
+        return pa.nulls(len(values), target), pc.is_valid(values)
+
+
+def compile_rules(class_name: str, schema_path: Optional[str] = None) -> List[Rule]:
+    """
+    Compile the constraints of a schema class into vectorized rules.
+
+    Args:
+        class_name: Schema class name (e.g. "SoilLayer")
+        schema_path: LinkML schema file (defaults to ``fao_soils.yaml``)
+
+    Returns:
+        Rules in slot order
+    """
+    rules = []
+    for spec in schema_columns(class_name, schema_path):
+        def add(kind, description, check, slot=spec.name):
+            rules.append(Rule(f"{slot}.{kind}", slot, kind, description, check))
+
+        if spec.required:
+            add("required", f"{spec.name} must be supplied", lambda values, typed, bad: pc.is_null(values))
+        if spec.permissible_values is None and spec.arrow_type != pa.string():
+            # The mask is None when the column's type can only hold valid values
+            add("type", f"{spec.name} must be {spec.range}", lambda values, typed, bad: bad)
+        if spec.permissible_values is not None:
+            value_set = pa.array(spec.permissible_values, pa.string())
+            add("enum", f"{spec.name} must be a permissible value of {spec.range}",
+                lambda values, typed, bad, value_set=value_set: pc.and_(
+                    pc.is_valid(typed), pc.invert(pc.is_in(typed, value_set=value_set))))
+        if spec.minimum_value is not None:
+            add("minimum", f"{spec.name} >= {spec.minimum_value}",
+                lambda values, typed, bad, bound=spec.minimum_value: pc.fill_null(pc.less(typed, bound), False))
+        if spec.maximum_value is not None:
+            add("maximum", f"{spec.name} <= {spec.maximum_value}",
+                lambda values, typed, bad, bound=spec.maximum_value: pc.fill_null(pc.greater(typed, bound), False))
+    return rules
+
+
+def _record_batches(source: Any, chunk_size: int) -> Iterator[pa.RecordBatch]:
+    """Iterate a table-like source as record batches of at most ``chunk_size`` rows."""
+    if hasattr(source, "to_arrow_reader"):
+        source = source.to_arrow_reader(chunk_size)
+    elif hasattr(source, "fetch_record_batch"):
+        source = source.fetch_record_batch(chunk_size)
+    elif hasattr(source, "columns") and hasattr(source, "iloc"):
+        source = pa.Table.from_pandas(source, preserve_index=False)
+    elif isinstance(source, Mapping):
+        source = pa.table({name: _to_arrow(values) for name, values in source.items()})
+
+    if isinstance(source, pa.RecordBatch):
+        source = [source]
+    elif isinstance(source, pa.Table):
+        source = source.to_batches(max_chunksize=chunk_size)
+    for batch in source:
+        if isinstance(batch, pa.RecordBatch) and batch.num_rows > chunk_size:
+            yield from pa.Table.from_batches([batch]).to_batches(max_chunksize=chunk_size)
+        else:
+            yield batch
+
+
+def _apply_code_map(values: pa.Array, code_map: Mapping[Any, str]) -> pa.Array:
+    """Replace codes with the mapped values; unmapped codes are kept as text."""
+    if pa.types.is_dictionary(values.type):
+        values = values.dictionary_decode()
+    text = values.cast(pa.string())
+    codes = pa.array([str(code) for code in code_map], pa.string())
+    mapped = pa.array(list(code_map.values()), pa.string())
+    indices = pc.index_in(text, value_set=codes)
+    return pc.coalesce(pc.take(mapped, indices), text)
+
+
+def _label_key(text: str) -> str:
+    """Comparable form of a lookup label or permissible value ("> 150" and "GT_150" both give "gt150")."""
+    return re.sub(r"[^0-9a-z]", "", str(text).lower().replace(">", "gt").replace("<", "lt"))
+
+
+def hwsd2_code_maps(con: Any) -> Dict[str, Dict[int, str]]:
+    """
+    Build code maps for the HWSD2 enum columns from the ``D_*`` lookup tables.
+
+    Each lookup VALUE is matched to the permissible value of the slot's enum
+    whose name or description gives the same label, ignoring case, spacing
+    and punctuation; "-" means ``NONE``. Codes whose label has no
+    permissible value (e.g. D_PHASE ``Saline``) are left out of the map.
+
+    Args:
+        con: Open DuckDB connection to an HWSD2 database
+
+    Returns:
+        Mapping of slot name to {code: permissible value}, for the slots of
+        ``HWSD2_CODE_TABLES`` whose lookup table exists
+    """
+    tables = {row[0].upper() for row in con.execute("SELECT table_name FROM information_schema.tables").fetchall()}
+    ranges = {spec.name: spec.range for class_name in HWSD2_TABLE_CLASSES.values()
+              for spec in schema_columns(class_name) if spec.permissible_values is not None}
+    view = _schema_view()
+    code_maps = {}
+    for slot, table in HWSD2_CODE_TABLES.items():
+        if table not in tables or slot not in ranges:
+            continue
+        labels = {}
+        for name, value in view.get_enum(ranges[slot]).permissible_values.items():
+            labels.setdefault(_label_key(value.description or ""), name)
+            labels[_label_key(name)] = name
+        if "NONE" in labels.values():
+            labels[""] = "NONE"
+        code_map = {}
+        for code, value in con.execute(f'SELECT CODE, VALUE FROM "{table}"').fetchall():
+            permissible = labels.get(_label_key(value))
+            if permissible is not None:
+                code_map[code] = permissible
+        code_maps[slot] = code_map
+    return code_maps
+
+
+def validate_table(
+    source: Any,
+    class_name: str,
+    column_map: Optional[Mapping[str, str]] = None,
+    code_maps: Optional[Mapping[str, Mapping[Any, str]]] = None,
+    chunk_size: int = DEFAULT_CHUNK_SIZE,
+    sample_size: int = DEFAULT_SAMPLE_SIZE,
+    schema_path: Optional[str] = None,
+) -> ValidationReport:
+    """
+    Validate a table against a schema class.
+
+    Args:
+        source: Arrow Table/RecordBatch/RecordBatchReader, DuckDB relation or
+            query result, pandas DataFrame, or mapping of column name to values.
+            Column names are matched to slots case-insensitively.
+        class_name: Schema class name (e.g. "SoilLayer")
+        column_map: Optional mapping of column name to slot name for columns
+            whose names differ from the slot
+        code_maps: Optional mapping of slot name to {code: permissible value},
+            applied before the enum check
+        chunk_size: Rows per record batch
+        sample_size: Sample rows kept per rule
+        schema_path: LinkML schema file (defaults to ``fao_soils.yaml``)
+
+    Returns:
+        ValidationReport with one result per rule
+    """
+    start = time.perf_counter()
+    specs = {spec.name: spec for spec in schema_columns(class_name, schema_path)}
+    rules = compile_rules(class_name, schema_path)
+    results = {rule.rule_id: RuleResult(rule.rule_id, rule.slot, rule.kind, rule.description) for rule in rules}
+    report = ValidationReport(class_name, results=list(results.values()))
+    column_map = dict(column_map or {})
+    code_maps = dict(code_maps or {})
+
+    offset = 0
+    for batch in _record_batches(source, chunk_size):
+        n_rows = batch.num_rows
+        slot_columns: Dict[str, str] = {}
+        for column in batch.schema.names:
+            slot = column_map.get(column, column.lower())
+            if slot in specs:
+                slot_columns[slot] = column
+            elif column not in report.unknown_columns:
+                report.unknown_columns.append(column)
+
+        prepared = {}
+        for rule in rules:
+            result = results[rule.rule_id]
+            column = slot_columns.get(rule.slot)
+            if column is None:
+                if rule.kind != "required":
+                    continue
+                values = pa.nulls(n_rows)
+                typed, bad = values, None
+            else:
+                if rule.slot not in prepared:
+                    values = batch.column(column)
+                    if rule.slot in code_maps:
+                        values = _apply_code_map(values, code_maps[rule.slot])
+                    prepared[rule.slot] = (values,) + _typed_column(specs[rule.slot], values)
+                values, typed, bad = prepared[rule.slot]
+
+            mask = rule.check(values, typed, bad)
+            if mask is None:
+                continue
+            count = pc.sum(mask).as_py() or 0
+            if not count:
+                continue
+            result.violations += count
+            needed = sample_size - len(result.samples)
+            if needed > 0:
+                indices = pc.indices_nonzero(mask)[:needed]
+                records = batch.take(indices).to_pylist()
+                for index, record in zip(indices.to_pylist(), records):
+                    value = record.get(column) if column is not None else None
+                    result.samples.append({"row": offset + index, "value": value, "record": record})
+        offset += n_rows
+
+    report.rows = offset
+    report.elapsed_seconds = time.perf_counter() - start
+    return report
+
+
+def validate_duckdb(
+    database: Any,
+    table: str,
+    class_name: Optional[str] = None,
+    column_map: Optional[Mapping[str, str]] = None,
+    code_maps: Optional[Mapping[str, Mapping[Any, str]]] = None,
+    chunk_size: int = DEFAULT_CHUNK_SIZE,
+    sample_size: int = DEFAULT_SAMPLE_SIZE,
+) -> ValidationReport:
+    """
+    Validate a table of a DuckDB database, streaming it in chunks.
+
+    Args:
+        database: Path to a DuckDB database file, or an open connection
+        table: Table name (e.g. "HWSD2_LAYERS")
+        class_name: Schema class; defaults to ``HWSD2_TABLE_CLASSES[table]``
+        column_map: Column renames; defaults to ``HWSD2_COLUMN_MAPS[table]``
+        code_maps: Mapping of slot name to {code: permissible value}; defaults
+            to ``hwsd2_code_maps`` of the database
+        chunk_size: Rows per record batch
+        sample_size: Sample rows kept per rule
+
+    Returns:
+        ValidationReport
+
+    Examples:
+        >>> report = validate_duckdb("export/hwsd2.ddb", "HWSD2_LAYERS")
+        >>> print(report.summary())
+    """
+    try:
+        import duckdb
+    except ImportError as e:  # pragma: no cover
+        raise ImportError("Reading hwsd2.ddb requires duckdb: pip install 'fao_soils[duckdb]'") from e
+
+    if class_name is None:
+        class_name = HWSD2_TABLE_CLASSES[table.upper()]
+    if column_map is None:
+        column_map = HWSD2_COLUMN_MAPS.get(table.upper(), {})
+
+    con = duckdb.connect(str(database), read_only=True) if not hasattr(database, "execute") else database
+    try:
+        if code_maps is None:
+            code_maps = hwsd2_code_maps(con)
+        result = con.execute(f'SELECT * FROM "{table}"')
+        return validate_table(result, class_name, column_map, code_maps, chunk_size, sample_size)
+    finally:
+        if con is not database:
+            con.close()
@@ -0,0 +1,104 @@
+"""Shared test configuration."""
+import random
+import sys
+from pathlib import Path
+
+import pytest
+
+# The HWSD2 tools in scripts/ are standalone modules rather than a package
+SCRIPTS_DIR = Path(__file__).parent.parent / "scripts"
+sys.path.insert(0, str(SCRIPTS_DIR))
+
+from hwsd2_extractor import NODATA, STANDARD_LAYERS, HWSD2Extractor  # noqa: E402
+
+# Three HWSD2_LAYERS rows as columns, with missing values and nullable slots
+LAYER_COLUMNS = {
+    "ID": [1, 2, 3],
+    "HWSD2_SMU_ID": [4828, 4828, 4829],
+    "WISE30s_SMU_ID": ["WD10012707", None, "WD30011825"],
+    "SEQUENCE": [1, 1, 2],
+    "SHARE": [60, 60, 40.5],
+    "DRAINAGE": ["MW", "MW", "W"],
+    "COVERAGE": ["SOTWIS", None, "ESDB"],
+    "LAYER": ["D1", "D2", "D1"],
+    "TOPDEP": [0, 20, 0],
+    "BOTDEP": [20, 40, 20],
+    "SAND": [28.0, None, 41.0],
+    "CLAY": [26.0, 27.0, None],
+}
+
+
+@pytest.fixture
+def layer_columns():
+    """``LAYER_COLUMNS``, copied so a test can modify it."""
+    return {name: list(values) for name, values in LAYER_COLUMNS.items()}
+
+
+@pytest.fixture
+def layer_rows(layer_columns):
+    """``layer_columns`` as one dict per row, keyed by slot name."""
+    names = [name.lower() for name in layer_columns]
+    return [dict(zip(names, values)) for values in zip(*layer_columns.values())]
+
+
+@pytest.fixture
+def make_extractor(tmp_path):
+    """
+    Factory for an ``HWSD2Extractor`` over a synthetic global raster.
+
+    ``make(raster, tables)`` saves ``raster`` as HWSD2.npy with a header that
+    spreads it over the globe (18 × 36 gives 10° pixels), creates each
+    ``{name: (column_ddl, rows)}`` table in hwsd2.ddb, and returns the extractor.
+    """
+
+    def make(raster, tables=None):
+        import duckdb
+        import numpy as np
+
+        raster_path = tmp_path / "HWSD2.npy"
+        np.save(raster_path, raster)
+        nrows, ncols = raster.shape
+        xdim, ydim = 360 / ncols, 180 / nrows
+        raster_path.with_suffix(".hdr").write_text(
+            f"NROWS {nrows}\nNCOLS {ncols}\nXDIM {xdim:g}\nYDIM {ydim:g}\n"
+            f"ULXMAP {-180 + xdim / 2:g}\nULYMAP {90 - ydim / 2:g}\nNODATA {NODATA}\n"
+        )
+
+        db_path = tmp_path / "hwsd2.ddb"
+        if tables:
+            conn = duckdb.connect(str(db_path))
+            try:
+                for name, (columns, rows) in tables.items():
+                    conn.execute(f"CREATE TABLE {name} ({columns})")
+                    if rows:
+                        placeholders = ", ".join("?" * len(rows[0]))
+                        conn.executemany(f"INSERT INTO {name} VALUES ({placeholders})", rows)
+            finally:
+                conn.close()
+        return HWSD2Extractor(raster_path=str(raster_path), db_path=str(db_path))
+
+    return make
+
+
+@pytest.fixture
+def soil_layer_rows():
+    """Factory for synthetic SoilLayer rows (dicts keyed by slot name) shaped like HWSD2_LAYERS."""
+
+    def make(n_rows, seed=0):
+        rng = random.Random(seed)
+        rows = []
+        for i in range(n_rows):
+            layer, topdep, botdep = STANDARD_LAYERS[i % len(STANDARD_LAYERS)]
+            sand = round(rng.uniform(0, 80), 1)
+            clay = round(rng.uniform(0, 100 - sand), 1)
+            rows.append({
+                "id": i + 1, "hwsd2_smu_id": 1 + i // 70, "sequence": 1 + (i // 7) % 10, "share": 10.0,
+                "drainage": "MW", "layer": layer, "topdep": topdep, "botdep": botdep,
+                "sand": sand, "silt": round(100 - sand - clay, 1), "clay": clay,
+                "texture_usda": rng.choice(["CLAY_HEAVY", "SILTY_CLAY", "CLAY_LOAM", "SILT_LOAM", "LOAM"]),
+                "bulk": round(rng.uniform(1.0, 1.8), 2), "org_carbon": round(rng.uniform(0, 5), 2),
+                "ph_water": round(rng.uniform(4, 9), 1),
+            })
+        return rows
+
+    return make
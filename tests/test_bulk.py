@@ -0,0 +1,35 @@
+"""Tests for bulk construction of datamodel objects."""
+import pytest
+
+from fao_soils.bulk import build_objects, build_soil_layers
+from fao_soils.datamodel.fao_soils import SoilLayer, SoilMappingUnit
+
+
+def test_bulk_objects_match_constructor(layer_columns, layer_rows):
+    layers = build_soil_layers(layer_columns)
+    expected = [SoilLayer(**row) for row in layer_rows]
+    assert layers == expected
+    for built, constructed in zip(layers, expected):
+        assert vars(built) == vars(constructed)
+        assert type(built.id) is type(constructed.id)
+    # Enum instances are shared between rows
+    assert layers[0].drainage is layers[1].drainage
+
+
+def test_bulk_objects_from_arrow_and_numpy(layer_columns):
+    pa = pytest.importorskip("pyarrow")
+    np = pytest.importorskip("numpy")
+    table = pa.table({k: v for k, v in layer_columns.items() if k not in ("SAND", "CLAY")})
+    columns = dict(zip(table.column_names, table.columns))
+    columns["SAND"] = np.array([28.0, np.nan, 41.0])
+    columns["CLAY"] = np.array([26.0, 27.0, np.nan])
+    assert build_soil_layers(columns) == build_soil_layers(layer_columns)
+
+
+def test_bulk_validation_is_per_batch():
+    with pytest.raises(ValueError, match="hwsd2_smu_id must be supplied"):
+        build_objects(SoilMappingUnit, {"id": [1, 2], "hwsd2_smu_id": [10, None]})
+    with pytest.raises(ValueError, match="does not match a slot"):
+        build_objects(SoilMappingUnit, {"id": [1], "hwsd2_smu_id": [10], "colour": ["red"]})
+    with pytest.raises(ValueError, match="Unknown DrainageEnum"):
+        build_objects(SoilMappingUnit, {"id": [1], "hwsd2_smu_id": [10], "drainage": ["XX"]})
@@ -0,0 +1,54 @@
+"""Tests for columnar batches generated from the schema."""
+import numpy as np
+import pyarrow as pa
+import pytest
+
+from fao_soils.columnar import SoilLayerBatch, SoilMappingUnitBatch, batch_class, schema_columns
+from fao_soils.datamodel.fao_soils import SoilLayer
+
+
+def test_layout_follows_schema():
+    specs = {spec.name: spec for spec in schema_columns("SoilLayer")}
+    assert specs["id"].required and specs["id"].arrow_type == pa.int64()
+    assert specs["sand"].arrow_type == pa.float64()
+    assert (specs["sand"].minimum_value, specs["sand"].maximum_value) == (0, 100)
+    assert "MW" in specs["drainage"].permissible_values
+    assert SoilLayerBatch is batch_class("SoilLayer")
+    assert SoilMappingUnitBatch.class_name == "SoilMappingUnit"
+
+
+def test_batch_round_trip_and_views(layer_columns, layer_rows):
+    batch = SoilLayerBatch.from_columns(layer_columns)
+    assert len(batch) == 3
+    assert batch[2].drainage == "W" and batch[1].sand is None
+
+    # Enum columns are dictionary-encoded against the permissible values
+    codes = batch.to_numpy("drainage")
+    assert [batch.categories("drainage")[c] for c in codes] == ["MW", "MW", "W"]
+    assert batch.to_numpy("coverage")[1] == -1
+    np.testing.assert_array_equal(batch.to_numpy("topdep"), [0, 20, 0])
+
+    table = batch.to_arrow()
+    assert table.schema.metadata[b"linkml_class"] == b"SoilLayer"
+    assert SoilLayerBatch.from_arrow(table).to_arrow().equals(table)
+    with pytest.raises(ValueError, match="holds SoilLayer rows, not SoilMappingUnit"):
+        SoilMappingUnitBatch.from_arrow(table)
+
+    expected = [SoilLayer(**row) for row in layer_rows]
+    assert [row.to_object() for row in batch] == expected
+    assert batch.to_objects() == expected
+    assert batch[1:].to_objects() == expected[1:]
+    assert batch.filter([True, False, True]).to_objects() == [expected[0], expected[2]]
+
+
+@pytest.mark.parametrize("column, values, message", [
+    ("DRAINAGE", ["MW", "MW", "XX"], "not permissible"),
+    ("SAND", [28.0, 101.0, 41.0], "above maximum"),
+    ("ID", [1, None, 3], "must be supplied"),
+    ("TOPDEP", ["a", "b", "c"], "cannot convert"),
+    ("NOT_A_SLOT", [1, 2, 3], "does not match"),
+])
+def test_batch_rejects_invalid_columns(layer_columns, column, values, message):
+    columns = dict(layer_columns, **{column: values})
+    with pytest.raises(ValueError, match=message):
+        SoilLayerBatch.from_columns(columns)
@@ -0,0 +1,37 @@
+"""Tests for the trusted-source pydantic fast path."""
+
+import pytest
+from pydantic import ValidationError
+
+from fao_soils.datamodel.fao_soils_pydantic import SoilLayer, SoilMappingUnit
+from fao_soils.fastpath import construct_many, dump_many, list_adapter, validate_many
+
+
+@pytest.mark.parametrize("model_class", [SoilLayer, SoilMappingUnit])
+def test_fast_path_matches_default_path(model_class, soil_layer_rows):
+    """construct_many/validate_many/dump_many agree with the constructor and model_dump."""
+    rows = soil_layer_rows(50)
+    if model_class is SoilMappingUnit:
+        rows = [{"id": r["id"], "hwsd2_smu_id": r["hwsd2_smu_id"], "drainage": r["drainage"], "share": r["share"]}
+                for r in rows]
+    expected = [model_class(**row) for row in rows]
+
+    assert construct_many(model_class, rows) == expected
+    assert validate_many(model_class, rows) == expected
+    fields = [{name: getattr(m, name) for name in model_class.model_fields} for m in expected]
+    assert dump_many(expected, exclude_none=False) == fields
+    dumped = dump_many(construct_many(model_class, rows))
+    assert dumped == [{k: v for k, v in f.items() if v is not None} for f in fields]
+    assert validate_many(model_class, dumped) == expected
+    constructed = construct_many(model_class, rows)
+    assert [m.model_fields_set for m in constructed] == [m.model_fields_set for m in expected]
+    assert list_adapter(model_class) is list_adapter(model_class)
+
+
+def test_validate_many_reports_bad_rows(soil_layer_rows):
+    """Batch validation still rejects invalid rows."""
+    rows = soil_layer_rows(3)
+    rows[2]["sand"] = 150.0
+    with pytest.raises(ValidationError) as excinfo:
+        validate_many(SoilLayer, rows)
+    assert excinfo.value.errors()[0]["loc"][:2] == (2, "sand")
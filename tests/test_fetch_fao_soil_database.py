@@ -0,0 +1,344 @@
+"""Tests for the HWSD fetcher conversion pipeline."""
+import hashlib
+import http.client
+import logging
+import os
+import sqlite3
+import stat
+import threading
+import zipfile
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from pathlib import Path
+
+import pytest
+
+import fetch_fao_soil_database
+from fetch_fao_soil_database import HWSDFetcher
+
+# Stand-ins for mdb-tools: the ".mdb" fixture is a directory of <table>.csv files
+FAKE_MDB_TOOLS = {
+    "mdb-ver": "#!/bin/sh\nexit 0\n",
+    "mdb-tables": "#!/bin/sh\nfor f in \"$2\"/*.csv; do basename \"$f\" .csv; done\n",
+    "mdb-export": "#!/bin/sh\ncat \"$1/$2.csv\"\n",
+    "mdb-count": "#!/bin/sh\necho $(( $(wc -l < \"$1/$2.csv\") - 1 ))\n",
+}
+
+TABLES = {
+    "D_DRAINAGE": 'SYMBOL,CODE,VALUE\n1,"E","Excessively drained"\n3,"W","Well drained"\n',
+    # SHARE only holds whole numbers in the first chunk and BULK is empty there
+    "HWSD2_LAYERS": (
+        "ID,HWSD2_SMU_ID,SHARE,BULK,LAYER\n"
+        "1,100,40,,D1\n"
+        "2,100,40,,D2\n"
+        "3,100,60,1.35,D1\n"
+        "4,101,37.5,1.4,D1\n"
+        "5,101,62.5,1.2,D1\n"
+    ),
+}
+
+
+@pytest.fixture
+def mdb_fixture(tmp_path, monkeypatch):
+    """Create a fake Access database and put fake mdb-tools on the PATH."""
+    bin_dir = tmp_path / "bin"
+    bin_dir.mkdir()
+    for name, script in FAKE_MDB_TOOLS.items():
+        tool = bin_dir / name
+        tool.write_text(script)
+        tool.chmod(tool.stat().st_mode | stat.S_IEXEC)
+    monkeypatch.setenv("PATH", f"{bin_dir}{os.pathsep}{os.environ['PATH']}")
+
+    mdb_path = tmp_path / "HWSD2.mdb"
+    mdb_path.mkdir()
+    for table_name, content in TABLES.items():
+        (mdb_path / f"{table_name}.csv").write_text(content)
+    return mdb_path
+
+
+def test_convert_mdb_to_sqlite_streams_in_chunks(mdb_fixture, tmp_path):
+    """Chunked conversion yields the same rows as a single read."""
+    fetcher = HWSDFetcher(data_dir=tmp_path / "data")
+    sqlite_path = fetcher.convert_mdb_to_sqlite(mdb_fixture, tmp_path / "out.db", chunksize=2)
+
+    conn = sqlite3.connect(sqlite_path)
+    rows = conn.execute("SELECT ID, SHARE, BULK FROM HWSD2_LAYERS ORDER BY ID").fetchall()
+    conn.close()
+    assert rows == [(1, 40, None), (2, 40, None), (3, 60, 1.35), (4, 37.5, 1.4), (5, 62.5, 1.2)]
+
+
+def test_convert_mdb_to_duckdb_widens_column_types(mdb_fixture, tmp_path):
+    """Columns are widened when a later chunk needs a broader type."""
+    duckdb = pytest.importorskip("duckdb")
+    fetcher = HWSDFetcher(data_dir=tmp_path / "data")
+    duckdb_path = fetcher.convert_mdb_to_duckdb(mdb_fixture, tmp_path / "out.ddb", chunksize=2)
+
+    conn = duckdb.connect(str(duckdb_path))
+    shares = conn.execute("SELECT SHARE FROM HWSD2_LAYERS ORDER BY ID").fetchall()
+    drainage = conn.execute("SELECT CODE FROM D_DRAINAGE ORDER BY SYMBOL").fetchall()
+    conn.close()
+    assert [s for (s,) in shares] == [40, 40, 60, 37.5, 62.5]
+    assert drainage == [("E",), ("W",)]
+
+
+def test_export_mdb_single_pass_to_all_formats(mdb_fixture, tmp_path):
+    """One export per table feeds every sink, with CSVs copied verbatim."""
+    pytest.importorskip("duckdb")
+    pq = pytest.importorskip("pyarrow.parquet")
+    fetcher = HWSDFetcher(data_dir=tmp_path / "data")
+    outputs = fetcher.export_mdb(
+        mdb_fixture, formats=("sqlite", "duckdb", "csv", "parquet"), chunksize=2
+    )
+
+    for table_name, content in TABLES.items():
+        assert (outputs["csv"] / f"{table_name}.csv").read_text() == content
+    layers = pq.read_table(outputs["parquet"] / "HWSD2_LAYERS.parquet")
+    assert layers.column("SHARE").to_pylist() == [40, 40, 60, 37.5, 62.5]
+    assert layers.column("BULK").to_pylist() == [None, None, 1.35, 1.4, 1.2]
+    assert outputs["sqlite"].exists() and outputs["duckdb"].exists()
+
+
+def test_export_mdb_rejects_unknown_format(mdb_fixture, tmp_path):
+    fetcher = HWSDFetcher(data_dir=tmp_path / "data")
+    with pytest.raises(ValueError):
+        fetcher.export_mdb(mdb_fixture, formats=("xlsx",))
+
+
+def test_estimate_table_sizes(mdb_fixture, tmp_path):
+    fetcher = HWSDFetcher(data_dir=tmp_path / "data")
+    sizes = fetcher.estimate_table_sizes(mdb_fixture, list(TABLES))
+    assert sizes == {"D_DRAINAGE": 2, "HWSD2_LAYERS": 5}
+
+
+def test_parallel_export_is_deterministic(mdb_fixture, tmp_path, caplog):
+    """A worker pool gives the same outputs and log order as one worker."""
+    pq = pytest.importorskip("pyarrow.parquet")
+    fetcher = HWSDFetcher(data_dir=tmp_path / "data")
+    logs = {}
+    for workers in (1, 4):
+        caplog.clear()
+        with caplog.at_level(logging.INFO):
+            outputs = fetcher.export_mdb(
+                mdb_fixture, formats=("csv", "parquet"), chunksize=2, workers=workers
+            )
+        logs[workers] = [r.getMessage() for r in caplog.records if "table:" in r.getMessage() or "rows to" in r.getMessage()]
+        for table_name, content in TABLES.items():
+            assert (outputs["csv"] / f"{table_name}.csv").read_text() == content
+            assert pq.read_table(outputs["parquet"] / f"{table_name}.parquet").num_rows == content.count("\n") - 1
+    assert logs[1] == logs[4]
+    assert logs[4] == [
+        "Converting table: D_DRAINAGE",
+        "✓ Imported 2 rows to table D_DRAINAGE",
+        "Converting table: HWSD2_LAYERS",
+        "✓ Imported 5 rows to table HWSD2_LAYERS",
+    ]
+
+
+PAYLOAD = bytes(range(256)) * 4096  # 1 MiB
+
+
+class RangeRequestHandler(BaseHTTPRequestHandler):
+    """Minimal stand-in for the FAO download server with Range support."""
+
+    payload = PAYLOAD
+    etag = '"v1"'
+    requests = []
+
+    def log_message(self, format, *args):
+        pass
+
+    def _send_headers(self, status, body_length, start=0):
+        self.send_response(status)
+        self.send_header("Content-Length", str(body_length))
+        self.send_header("ETag", self.etag)
+        if status == 206:
+            end = len(self.payload) - 1
+            self.send_header("Content-Range", f"bytes {start}-{end}/{len(self.payload)}")
+        self.end_headers()
+
+    def do_HEAD(self):
+        type(self).requests.append(("HEAD", None))
+        self._send_headers(200, len(self.payload))
+
+    def do_GET(self):
+        range_header = self.headers.get("Range")
+        type(self).requests.append(("GET", range_header))
+        if range_header and self.headers.get("If-Range", self.etag) == self.etag:
+            start = int(range_header.split("=")[1].rstrip("-"))
+            body = self.payload[start:]
+            self._send_headers(206, len(body), start)
+        else:
+            body = self.payload
+            self._send_headers(200, len(body))
+        self.wfile.write(body)
+
+
+@pytest.fixture
+def http_server():
+    RangeRequestHandler.requests = []
+    RangeRequestHandler.etag = '"v1"'
+    server = ThreadingHTTPServer(("127.0.0.1", 0), RangeRequestHandler)
+    thread = threading.Thread(target=server.serve_forever, daemon=True)
+    thread.start()
+    yield f"http://127.0.0.1:{server.server_address[1]}/HWSD2_DB.zip"
+    server.shutdown()
+    server.server_close()
+
+
+def test_download_records_checksum_in_manifest(http_server, tmp_path):
+    fetcher = HWSDFetcher(data_dir=tmp_path)
+    path = fetcher.download_file(http_server)
+
+    assert path.read_bytes() == PAYLOAD
+    entry = fetcher.load_manifest()["HWSD2_DB.zip"]
+    assert entry["sha256"] == hashlib.sha256(PAYLOAD).hexdigest()
+    assert entry["etag"] == '"v1"'
+    assert not path.with_name("HWSD2_DB.zip.part").exists()
+    assert fetcher.verify_checksum(path, hashlib.sha256(PAYLOAD).hexdigest())
+
+
+def test_download_skips_unchanged_file(http_server, tmp_path):
+    fetcher = HWSDFetcher(data_dir=tmp_path)
+    fetcher.download_file(http_server)
+    RangeRequestHandler.requests = []
+
+    fetcher.download_file(http_server)
+    assert RangeRequestHandler.requests == [("HEAD", None)]
+
+    # A new release on the server is downloaded again
+    RangeRequestHandler.etag = '"v2"'
+    fetcher.download_file(http_server)
+    assert ("GET", None) in RangeRequestHandler.requests
+
+
+def test_download_resumes_partial_file(http_server, tmp_path):
+    fetcher = HWSDFetcher(data_dir=tmp_path)
+    # A truncated file left behind by a non-resumable download
+    (tmp_path / "HWSD2_DB.zip").write_bytes(PAYLOAD[:300_000])
+
+    path = fetcher.download_file(http_server)
+    assert ("GET", "bytes=300000-") in RangeRequestHandler.requests
+    assert path.read_bytes() == PAYLOAD
+    assert fetcher.load_manifest()["HWSD2_DB.zip"]["sha256"] == hashlib.sha256(PAYLOAD).hexdigest()
+
+
+def test_download_adopts_existing_file_without_manifest(http_server, tmp_path):
+    fetcher = HWSDFetcher(data_dir=tmp_path)
+    # A complete file from a download made before the manifest existed
+    (tmp_path / "HWSD2_DB.zip").write_bytes(PAYLOAD)
+
+    path = fetcher.download_file(http_server)
+    assert RangeRequestHandler.requests == [("HEAD", None)]
+    assert fetcher.load_manifest()["HWSD2_DB.zip"]["sha256"] == hashlib.sha256(PAYLOAD).hexdigest()
+
+    # Offline, an unrecorded file on disk is used as it is
+    (tmp_path / "HWSD2_RASTER.zip").write_bytes(PAYLOAD[:1000])
+    offline = "http://127.0.0.1:1/HWSD2_RASTER.zip"
+    assert fetcher.download_file(offline).read_bytes() == PAYLOAD[:1000]
+    assert fetcher.load_manifest()["HWSD2_RASTER.zip"]["size"] == 1000
+    assert path.read_bytes() == PAYLOAD
+
+
+def test_download_keeps_partial_file_when_connection_drops(http_server, tmp_path, monkeypatch):
+    real_urlopen = fetch_fao_soil_database.urlopen
+
+    def dropping_urlopen(request, *args, **kwargs):
+        response = real_urlopen(request, *args, **kwargs)
+        if request.get_method() == "GET":
+            chunks = iter([response.read(300_000)])
+
+            def read(size=-1):
+                for chunk in chunks:
+                    return chunk
+                raise http.client.IncompleteRead(b"")
+
+            response.read = read
+        return response
+
+    fetcher = HWSDFetcher(data_dir=tmp_path)
+    monkeypatch.setattr(fetch_fao_soil_database, "urlopen", dropping_urlopen)
+    with pytest.raises(RuntimeError, match="Failed to download"):
+        fetcher.download_file(http_server)
+    assert (tmp_path / "HWSD2_DB.zip.part").stat().st_size == 300_000
+
+    monkeypatch.setattr(fetch_fao_soil_database, "urlopen", real_urlopen)
+    assert fetcher.download_file(http_server).read_bytes() == PAYLOAD
+    assert ("GET", "bytes=300000-") in RangeRequestHandler.requests
+
+
+def test_download_rejects_checksum_mismatch(http_server, tmp_path):
+    fetcher = HWSDFetcher(data_dir=tmp_path)
+    with pytest.raises(RuntimeError, match="Checksum mismatch"):
+        fetcher.download_file(http_server, expected_checksum="0" * 64)
+    assert not (tmp_path / "HWSD2_DB.zip").exists()
+
+
+RASTER_HEADER = """BYTEORDER      I
+LAYOUT         BIL
+NROWS          5
+NCOLS          4
+NBANDS         1
+NBITS          16
+NODATA         65535
+ULXMAP         -179.5
+ULYMAP         89.5
+XDIM           1.0
+YDIM           1.0
+"""
+
+
+@pytest.fixture
+def raster_zip(tmp_path):
+    """A miniature HWSD2_RASTER.zip with a 5 x 4 SMU raster."""
+    np = pytest.importorskip("numpy")
+    values = np.arange(20, dtype="<u2").reshape(5, 4)
+    values[0, 0] = 65535
+    zip_path = tmp_path / "HWSD2_RASTER.zip"
+    with zipfile.ZipFile(zip_path, "w", zipfile.ZIP_DEFLATED) as zf:
+        zf.writestr("HWSD2.bil", values.tobytes())
+        zf.writestr("HWSD2.hdr", RASTER_HEADER)
+        zf.writestr("docs/readme.txt", "HWSD2 raster")
+    return zip_path, values
+
+
+def test_extract_zip_selects_members(raster_zip, tmp_path):
+    zip_path, _ = raster_zip
+    fetcher = HWSDFetcher(data_dir=tmp_path / "data")
+    out = fetcher.extract_zip(zip_path, members=["*.hdr", "docs/*"], workers=2)
+
+    assert sorted(str(p.relative_to(out)) for p in out.rglob("*") if p.is_file()) == [
+        "HWSD2.hdr", "docs/readme.txt"
+    ]
+
+
+def test_extract_zip_streams_raster_to_npy(raster_zip, tmp_path, monkeypatch):
+    """The BIL member is converted block by block without being written out."""
+    np = pytest.importorskip("numpy")
+    from hwsd2_extractor import HWSD2Extractor
+
+    monkeypatch.setattr(fetch_fao_soil_database, "RASTER_BLOCK_ROWS", 2)
+    zip_path, values = raster_zip
+    fetcher = HWSDFetcher(data_dir=tmp_path / "data")
+    out = fetcher.extract_zip(zip_path, members=["HWSD2.*"], raster_format="npy")
+
+    assert not (out / "HWSD2.bil").exists()
+    np.testing.assert_array_equal(np.load(out / "HWSD2.npy"), values)
+
+    extractor = HWSD2Extractor(raster_path=out / "HWSD2.npy")
+    assert (extractor.nrows, extractor.ncols) == (5, 4)
+    assert extractor.latlon_to_smu_id(87.5, -177.5) == values[2, 2]
+    assert extractor.latlon_to_smu_id(89.9, -179.9) is None
+
+
+@pytest.mark.parametrize("raster_format", [None, "npy"])
+def test_extract_zip_rejects_path_traversal(tmp_path, raster_format):
+    zip_path = tmp_path / "evil.zip"
+    with zipfile.ZipFile(zip_path, "w") as zf:
+        zf.writestr("ok.txt", "fine")
+        zf.writestr("../escaped.bil", b"\x00\x00")
+        zf.writestr("../escaped.hdr", RASTER_HEADER)
+    fetcher = HWSDFetcher(data_dir=tmp_path / "data")
+
+    with pytest.raises(ValueError, match="outside"):
+        fetcher.extract_zip(zip_path, extract_to=tmp_path / "data" / "out", raster_format=raster_format)
+    assert not list((tmp_path / "data").rglob("escaped*"))
+    assert not (tmp_path / "data" / "out" / "ok.txt").exists()
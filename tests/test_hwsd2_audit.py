@@ -0,0 +1,104 @@
+"""Tests for the HWSD2_LAYERS physical-consistency audit."""
+import json
+
+import duckdb
+import pytest
+
+import hwsd2_audit
+from hwsd2_audit import audit_hwsd2, smu_chunks
+from hwsd2_extractor import STANDARD_LAYERS
+
+
+@pytest.fixture
+def layers_db(tmp_path):
+    """30 SMUs of two sequences (60 / 40 %) with 7 standard layers, plus a few planted errors."""
+    rows = []
+    for smu in range(1, 31):
+        for sequence, share in ((1, 60.0), (2, 40.0)):
+            for layer, top, bottom in STANDARD_LAYERS:
+                rows.append([len(rows) + 1, smu, sequence, share, layer, top, bottom,
+                             30.0, 40.0, 30.0, 1.2, 1.0, 12.0, 1.4, 1.5])
+    columns = ["ID", "HWSD2_SMU_ID", "SEQUENCE", "SHARE", "LAYER", "TOPDEP", "BOTDEP",
+               "SAND", "SILT", "CLAY", "ORG_CARBON", "TOTAL_N", "CN_RATIO", "BULK", "REF_BULK"]
+    by_id = {row[0]: dict(zip(columns, row)) for row in rows}
+
+    by_id[3]["SAND"] = 50.0                      # texture sum 120
+    by_id[4]["SAND"] = -9.0                      # missing value, not a violation
+    by_id[20]["TOPDEP"] = 45                     # D6 starts at 45: order ok, depths and contiguity not
+    by_id[30]["CN_RATIO"] = 30.0                 # expected 12
+    by_id[40]["BULK"] = 3.1                      # impossible density
+    for row in by_id.values():                   # SMU 7: shares 60 + 50
+        if row["HWSD2_SMU_ID"] == 7 and row["SEQUENCE"] == 2:
+            row["SHARE"] = 50.0
+    by_id[50]["BOTDEP"] = by_id[50]["TOPDEP"]    # zero-thickness layer
+
+    db_path = tmp_path / "hwsd2.ddb"
+    conn = duckdb.connect(str(db_path))
+    conn.execute("CREATE TABLE HWSD2_LAYERS (ID INTEGER, HWSD2_SMU_ID INTEGER, SEQUENCE INTEGER, "
+                 "SHARE DECIMAL(5,2), LAYER VARCHAR, TOPDEP INTEGER, BOTDEP INTEGER, SAND DOUBLE, "
+                 "SILT DOUBLE, CLAY DOUBLE, ORG_CARBON DOUBLE, TOTAL_N DOUBLE, CN_RATIO DOUBLE, "
+                 "BULK DOUBLE, REF_BULK DOUBLE)")
+    conn.executemany(f"INSERT INTO HWSD2_LAYERS VALUES ({', '.join('?' * len(columns))})",
+                     [[row[c] for c in columns] for row in by_id.values()])
+    conn.close()
+    return db_path
+
+
+def test_chunks_cover_whole_smus(layers_db):
+    conn = duckdb.connect(str(layers_db), read_only=True)
+    chunks = smu_chunks(conn, 7)
+    conn.close()
+    covered = [smu for first, last in chunks for smu in range(first, last + 1)]
+    assert covered == list(range(1, 31))
+
+
+def test_audit_reports_planted_violations(layers_db, tmp_path):
+    report = audit_hwsd2(layers_db, n_chunks=5, workers=4)
+    violations = {rule["rule"]: rule["violations"] for rule in report["rules"]}
+    assert violations == {
+        "texture_sum": 1,
+        "depth_order": 1,
+        "standard_depths": 2,
+        # ID 20 starts late; the layer below ID 50 starts 20 cm after it ends
+        "depth_contiguity": 2,
+        "share_sum": 1,
+        "cn_ratio": 1,
+        "bulk_density": 1,
+        "smu_id": 0,
+    }
+    assert not report["ok"] and report["rows"] == 30 * 2 * 7
+    rules = {rule["rule"]: rule for rule in report["rules"]}
+    assert rules["texture_sum"]["samples"][0]["ID"] == 3
+    assert rules["share_sum"]["samples"][0]["HWSD2_SMU_ID"] == 7
+
+    # Same result regardless of chunking and parallelism
+    serial = audit_hwsd2(layers_db, n_chunks=1, workers=1)
+    assert [r["violations"] for r in serial["rules"]] == [r["violations"] for r in report["rules"]]
+    json.dumps(report, default=str)
+
+
+def test_audit_checks_rows_without_smu_id(layers_db):
+    conn = duckdb.connect(str(layers_db))
+    conn.execute("INSERT INTO HWSD2_LAYERS (ID, HWSD2_SMU_ID, SEQUENCE, SHARE, LAYER, TOPDEP, BOTDEP, SAND, SILT, CLAY) "
+                 "VALUES (1001, NULL, 1, 100, 'D1', 0, 20, 30, 40, 30), (1002, NULL, 1, 100, 'D2', 20, 20, 90, 40, 30)")
+    conn.close()
+
+    report = audit_hwsd2(layers_db, n_chunks=5, workers=4)
+    rules = {rule["rule"]: rule for rule in report["rules"]}
+    assert rules["smu_id"]["violations"] == 2 and rules["smu_id"]["samples"][0]["ID"] == 1001
+    # Row-level rules see them; per-SMU rules do not group them into a fake SMU
+    assert rules["texture_sum"]["violations"] == 2 and rules["texture_sum"]["samples"][-1]["ID"] == 1002
+    assert rules["depth_order"]["violations"] == 2
+    assert rules["share_sum"]["violations"] == 1 and rules["depth_contiguity"]["violations"] == 2
+    assert report["chunks"] == 6 and report["rows"] == 30 * 2 * 7 + 2
+
+
+def test_audit_cli_writes_report(layers_db, tmp_path, monkeypatch, capsys):
+    output = tmp_path / "audit.json"
+    monkeypatch.setattr("sys.argv", ["hwsd2_audit.py", str(layers_db), str(output)])
+    hwsd2_audit.main()
+    assert "FAIL texture_sum" in capsys.readouterr().out
+    assert json.loads(output.read_text())["table"] == "HWSD2_LAYERS"
+
+    with pytest.raises(ValueError, match="Unknown audit rules"):
+        audit_hwsd2(layers_db, rules=["no_such_rule"])
@@ -0,0 +1,92 @@
+"""Tests for the chunked datacube export."""
+import json
+
+import duckdb
+import numpy as np
+import pytest
+
+import hwsd2_cube
+from hwsd2_cube import chunk_windows, export_cube, layer_lookup, progress_path
+from hwsd2_extractor import NODATA
+
+
+@pytest.fixture
+def extractor(make_extractor):
+    """A 10° raster of 18 × 36 pixels with SMUs 1-2 and ocean."""
+    rng = np.random.default_rng(2)
+    raster = rng.choice(np.array([1, 2, NODATA], dtype=np.uint16), size=(18, 36))
+    return make_extractor(raster, {"HWSD2_LAYERS": (
+        "HWSD2_SMU_ID INTEGER, SEQUENCE INTEGER, SHARE DECIMAL(5,2), LAYER VARCHAR, SAND DOUBLE, CLAY DOUBLE", [
+            (1, 1, 100, "D1", 40.0, 20.0), (1, 1, 100, "D2", 30.0, 30.0),
+            (2, 1, 50, "D1", 20.0, 40.0), (2, 2, 50, "D1", 60.0, -9),
+        ])})
+
+
+@pytest.fixture
+def lookup(extractor):
+    conn = duckdb.connect(str(extractor.db_path), read_only=True)
+    try:
+        return layer_lookup(conn, ["SAND", "CLAY"])
+    finally:
+        conn.close()
+
+
+def test_layer_lookup(lookup):
+    assert lookup["SAND"].shape == (1 << 16, 7)
+    np.testing.assert_allclose(lookup["SAND"][1, :2], [40, 30])
+    np.testing.assert_allclose(lookup["SAND"][2, 0], 40)
+    assert lookup["CLAY"][2, 0] == 40 and np.isnan(lookup["CLAY"][2, 1:]).all()
+
+
+def test_npy_cube_matches_lookup(extractor, lookup, tmp_path):
+    out = tmp_path / "cube"
+    summary = export_cube(out, lookup, extractor, chunk=7, workers=2)
+    assert summary == {"chunks": 18, "written": 18, "skipped": 0}
+    assert len(chunk_windows(18, 36, 7)) == 18
+
+    raster = extractor.open_raster()
+    cube = np.load(out / "SAND.npy", mmap_mode="r")
+    assert cube.shape == (7, 18, 36)
+    np.testing.assert_array_equal(cube, np.moveaxis(lookup["SAND"][raster], -1, 0))
+    meta = json.loads((out / "attrs.json").read_text())
+    assert meta["attrs"]["Conventions"] == "CF-1.8"
+    assert meta["variables"]["CLAY"]["attrs"]["units"] == "percent"
+    coords = np.load(out / "coords.npz")
+    assert coords["lat"][0] == 85 and coords["lon"][-1] == 175
+    assert coords["depth_bnds"][-1].tolist() == [150, 200]
+
+
+def test_failed_chunks_resume(extractor, lookup, tmp_path, monkeypatch):
+    out = tmp_path / "cube"
+    write = hwsd2_cube._NpyStore.write
+
+    def flaky(self, name, window, block):
+        if window[0] == 7:
+            raise OSError("disk hiccup")
+        write(self, name, window, block)
+
+    monkeypatch.setattr(hwsd2_cube._NpyStore, "write", flaky)
+    with pytest.raises(RuntimeError, match="6 of 18 chunks failed"):
+        export_cube(out, lookup, extractor, chunk=7, workers=1)
+    assert len(json.loads(progress_path(out).read_text())["done"]) == 12
+
+    monkeypatch.setattr(hwsd2_cube._NpyStore, "write", write)
+    assert export_cube(out, lookup, extractor, chunk=7) == {"chunks": 18, "written": 6, "skipped": 12}
+    raster = extractor.open_raster()
+    np.testing.assert_array_equal(np.load(out / "CLAY.npy"), np.moveaxis(lookup["CLAY"][raster], -1, 0))
+
+    # A different chunking starts over
+    assert export_cube(out, lookup, extractor, chunk=9)["written"] == 8
+    with pytest.raises(ValueError, match="Unknown format"):
+        export_cube(out, lookup, extractor, format="tiff")
+
+
+@pytest.mark.parametrize("module, name", [("zarr", "cube.zarr"), ("netCDF4", "cube.nc")])
+def test_optional_stores(extractor, lookup, tmp_path, module, name):
+    pytest.importorskip(module)
+    xarray = pytest.importorskip("xarray")
+    export_cube(tmp_path / name, lookup, extractor, chunk=7)
+    opened = xarray.open_zarr(tmp_path / name) if module == "zarr" else xarray.open_dataset(tmp_path / name)
+    raster = extractor.open_raster()
+    np.testing.assert_array_equal(opened["SAND"].values, np.moveaxis(lookup["SAND"][raster], -1, 0))
+    assert opened["depth"].attrs["positive"] == "down"
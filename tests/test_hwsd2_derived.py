@@ -0,0 +1,87 @@
+"""Tests for derived HWSD2 layer and profile properties."""
+import duckdb
+import numpy as np
+import pandas as pd
+import pytest
+
+from hwsd2_derived import (
+    LAYER_PROPERTIES, PROFILES_DERIVED_TABLE, compute_layer_properties, derive_profiles,
+    layer_inputs, materialize_derived,
+)
+from hwsd2_extractor import STANDARD_LAYERS
+
+
+def _layers():
+    """Two SMUs with one 7-layer sequence each; 1 % OC, 1 g/kg N, BULK 1.5, no coarse fragments."""
+    rows = []
+    for smu in (1, 2):
+        for layer, top, bottom in STANDARD_LAYERS:
+            rows.append({"ID": len(rows) + 1, "HWSD2_SMU_ID": smu, "SEQUENCE": 1, "LAYER": layer,
+                         "TOPDEP": top, "BOTDEP": bottom, "BULK": 1.5, "COARSE": 0.0,
+                         "ORG_CARBON": 1.0, "TOTAL_N": 1.0, "SAND": 40.0, "CLAY": 20.0, "AWC": "125"})
+    layers = pd.DataFrame(rows)
+    layers.loc[7, "COARSE"] = 50.0          # SMU 2 D1: half coarse fragments
+    layers.loc[13, "ORG_CARBON"] = -9.0     # SMU 2 D7: missing
+    return layers
+
+
+def test_layer_formulas():
+    values = compute_layer_properties(_layers())
+    assert set(values) == set(LAYER_PROPERTIES)
+    np.testing.assert_allclose(values["THICKNESS"][:7], [20, 20, 20, 20, 20, 50, 50])
+    np.testing.assert_allclose(values["SOC_STOCK"][:2], [1.5 * 20 / 10] * 2)   # 3 kg C/m²
+    np.testing.assert_allclose(values["N_STOCK"][0], 0.3)
+    assert values["SOC_STOCK"][7] == pytest.approx(1.5) and np.isnan(values["SOC_STOCK"][13])
+    assert layer_inputs(["THICKNESS"]) == ["TOPDEP", "BOTDEP"]
+    with pytest.raises(KeyError, match="Unknown layer properties"):
+        compute_layer_properties(_layers(), ["NOPE"])
+
+
+def test_profile_properties():
+    profiles = derive_profiles(_layers())
+    assert profiles["HWSD2_SMU_ID"].tolist() == [1, 2]
+    first, second = profiles.iloc[0], profiles.iloc[1]
+    assert first["SOC_STOCK_30"] == pytest.approx(4.5)
+    assert first["SOC_STOCK_100"] == pytest.approx(15)
+    assert first["SOC_STOCK_TOTAL"] == pytest.approx(30)
+    assert first["N_STOCK_TOTAL"] == pytest.approx(3)
+    assert first["AWC_PROFILE"] == 125
+    assert second["SOC_STOCK_30"] == pytest.approx(3)
+    assert second["SOC_STOCK_TOTAL"] == pytest.approx(30 - 1.5 - 7.5)   # the missing layer is skipped
+
+
+@pytest.mark.parametrize("mode", ["columns", "tables"])
+def test_materialize_derived(mode):
+    conn = duckdb.connect()
+    layers = _layers()
+    conn.register("source", layers)
+    conn.execute("CREATE TABLE HWSD2_LAYERS AS SELECT * FROM source")
+    conn.execute("CREATE INDEX idx_layers_smu ON HWSD2_LAYERS(HWSD2_SMU_ID)")
+
+    assert materialize_derived(conn, mode) == {"layers": 14, "profiles": 2}
+    table = "HWSD2_LAYERS" if mode == "columns" else "HWSD2_LAYERS_DERIVED"
+    stocks = [row[0] for row in conn.execute(f"SELECT SOC_STOCK FROM {table} ORDER BY ID").fetchall()]
+    assert stocks[0] == pytest.approx(3) and stocks[13] is None     # NaN is stored as NULL
+    total = conn.execute(f"SELECT SOC_STOCK_TOTAL FROM {PROFILES_DERIVED_TABLE} WHERE HWSD2_SMU_ID = 1").fetchone()
+    assert total[0] == pytest.approx(30)
+
+    # Idempotent
+    assert materialize_derived(conn, mode)["layers"] == 14
+    with pytest.raises(ValueError, match="Unknown mode"):
+        materialize_derived(conn, "views")
+
+
+def test_derived_columns_do_not_shadow_schema_slots():
+    """After a --derived load, HWSD2_LAYERS still validates with one column per schema slot."""
+    from fao_soils.validation import validate_duckdb
+
+    conn = duckdb.connect()
+    layers = _layers()
+    layers.loc[13, "ORG_CARBON"] = None     # -9 would fail the schema's minimum
+    conn.register("source", layers)
+    conn.execute("CREATE TABLE HWSD2_LAYERS AS SELECT * FROM source")
+    materialize_derived(conn, "columns")
+
+    report = validate_duckdb(conn, "HWSD2_LAYERS")
+    assert report.ok, report.summary()
+    assert set(report.unknown_columns) == set(LAYER_PROPERTIES)
@@ -0,0 +1,93 @@
+"""Tests for Monte Carlo sequence sampling."""
+import duckdb
+import numpy as np
+import pandas as pd
+import pytest
+
+from hwsd2_ensemble import SequenceTable, points_to_smu
+from hwsd2_extractor import NODATA
+from hwsd2_lazy import SMU_VARIABLE, open_dataset
+
+
+def _layers():
+    rows = []
+    for smu, sequence, share, sand in [(5, 1, 60, 10.0), (5, 2, 30, 50.0), (5, 3, 10, 90.0), (9, 1, 100, 30.0)]:
+        for d, layer in enumerate(["D1", "D2"]):
+            rows.append({"HWSD2_SMU_ID": smu, "SEQUENCE": sequence, "SHARE": share, "LAYER": layer,
+                         "SAND": sand + d, "CLAY": -9 if sequence == 3 else 20.0})
+    return pd.DataFrame(rows)
+
+
+@pytest.fixture
+def table():
+    return SequenceTable.from_frame(_layers(), ["SAND", "CLAY"])
+
+
+def test_draws_follow_shares(table):
+    assert len(table) == 4 and table.values.shape == (4, 7, 2)
+    rows = table.draw(np.array([5, 9, 7, NODATA]), 100_000, seed=0)
+    counts = np.bincount(rows[0], minlength=4) / 100_000
+    np.testing.assert_allclose(counts[:3], [0.6, 0.3, 0.1], atol=0.01)
+    assert (rows[1] == 3).all() and (rows[2] == -1).all() and (rows[3] == -1).all()
+
+
+def test_sample_values_and_reproducibility(table):
+    points = np.array([5, 9, NODATA])
+    ensemble = table.sample(points, 500, seed=42)
+    assert ensemble["SAND"].shape == (3, 500, 7) and ensemble["SAND"].dtype == np.float32
+    sequence = ensemble["SEQUENCE"][0]
+    np.testing.assert_array_equal(ensemble["SAND"][0, :, 0], np.select([sequence == 1, sequence == 2], [10, 50], 90))
+    np.testing.assert_array_equal(ensemble["SAND"][0, :, 1] - ensemble["SAND"][0, :, 0], 1)
+    assert np.isnan(ensemble["CLAY"][0, sequence == 3, 0]).all()
+    assert np.isnan(ensemble["SAND"][0, :, 2:]).all()
+    assert (ensemble["SMU"][1] == 9).all() and (ensemble["SEQUENCE"][2] == 0).all()
+    assert np.isnan(ensemble["SAND"][2]).all()
+
+    again = table.sample(points, 500, seed=42)
+    np.testing.assert_array_equal(again["SEQUENCE"], ensemble["SEQUENCE"])
+    assert not np.array_equal(table.sample(points, 500, seed=43)["SEQUENCE"], ensemble["SEQUENCE"])
+
+
+def test_perturbation(table):
+    ensemble = table.sample(np.full(10, 9), 2000, seed=1, perturb={"SAND": 5.0})
+    sand = ensemble["SAND"][..., 0]
+    assert sand.mean() == pytest.approx(30, abs=0.1) and sand.std() == pytest.approx(5, rel=0.05)
+    # One draw per member, shared by all layers of the profile
+    np.testing.assert_allclose(ensemble["SAND"][..., 1] - ensemble["SAND"][..., 0], 1, rtol=1e-5)
+    np.testing.assert_array_equal(ensemble["CLAY"][..., 0], 20)
+
+    clipped = table.sample(np.full(10, 9), 2000, seed=1, perturb={"SAND": 50.0})
+    assert np.nanmin(clipped["SAND"]) == 0
+    with pytest.raises(KeyError, match="not in the table"):
+        table.sample([9], 10, perturb={"BULK": 0.1})
+
+
+def test_zero_shares_and_duckdb(tmp_path):
+    layers = _layers()
+    layers.loc[layers["HWSD2_SMU_ID"] == 5, "SHARE"] = 0
+    rows = SequenceTable.from_frame(layers, ["SAND"]).draw([5], 30_000, seed=0)
+    np.testing.assert_allclose(np.bincount(rows[0]) / 30_000, [1 / 3] * 3, atol=0.015)
+
+    conn = duckdb.connect(str(tmp_path / "hwsd2.ddb"))
+    conn.register("source", _layers())
+    conn.execute("CREATE TABLE HWSD2_LAYERS AS SELECT * FROM source")
+    from_db = SequenceTable.from_duckdb(conn, ["SAND", "CLAY"])
+    conn.close()
+    np.testing.assert_array_equal(from_db.values, SequenceTable.from_frame(_layers(), ["SAND", "CLAY"]).values)
+
+
+def test_points_to_smu(make_extractor):
+    extractor = make_extractor(np.arange(18 * 36, dtype=np.uint16).reshape(18, 36))
+    lats, lons = np.array([40.0, 44.9, -60.0, 89.9, -89.9]), np.array([-105.0, -100.1, 20.0, -179.9, 179.9])
+    # Nearest pixel centre: (40, -105) sits on the corner shared by rows 4-5 and columns 6-7
+    assert points_to_smu(extractor, lats, lons).tolist() == [5 * 36 + 7, 4 * 36 + 7, 15 * 36 + 20, 0, 17 * 36 + 35]
+    smu = open_dataset(extractor, properties=[])[SMU_VARIABLE]
+    assert points_to_smu(extractor, lats, lons).tolist() == [int(smu.sel(lat=lat, lon=lon).values)
+                                                             for lat, lon in zip(lats, lons)]
+    # The extractor's scalar lookup picks the same pixels, including on the outer edge
+    lats, lons = np.append(lats, [-90.0, 90.0]), np.append(lons, [180.0, -180.0])
+    expected = [extractor.read_raster_value(*extractor.latlon_to_rowcol(lat, lon)) for lat, lon in zip(lats, lons)]
+    assert points_to_smu(extractor, lats, lons).tolist() == expected
+    assert expected[-2:] == [17 * 36 + 35, 0]
+    # Points off the grid are nodata rather than clamped to the edge
+    assert points_to_smu(extractor, [95.0, 0.0, -91.0, np.nan], [0.0, 185.0, 0.0, 0.0]).tolist() == [NODATA] * 4
@@ -0,0 +1,62 @@
+"""Tests for the HWSD2 raster extractor."""
+import os
+
+import duckdb
+import numpy as np
+import pytest
+
+from hwsd2_extractor import (
+    HWSD2Extractor, bil_pixel_format, file_fingerprint, parse_bil_header, share_weighted_mean_sql,
+)
+
+BIL_HEADER = "BYTEORDER M\nLAYOUT BIL\nNROWS 18\nNCOLS 36\nNBANDS 1\nNBITS 16\nPIXELTYPE SIGNEDINT\n" \
+             "XDIM 10\nYDIM 10\nULXMAP -175\nULYMAP 85\nNODATA -1\n"
+
+
+def test_bil_pixel_layout_follows_header(tmp_path):
+    raster = np.arange(-300, 18 * 36 - 300, dtype=">i2").reshape(18, 36)
+    raster_path = tmp_path / "HWSD2.bil"
+    raster_path.write_bytes(raster.tobytes())
+    raster_path.with_suffix(".hdr").write_text(BIL_HEADER)
+
+    extractor = HWSD2Extractor(raster_path=str(raster_path), db_path=str(tmp_path / "hwsd2.ddb"))
+    assert extractor.pixel_format == ">h" and extractor.nodata == -1
+    np.testing.assert_array_equal(extractor.open_raster(), raster)
+    assert extractor.read_raster_value(3, 4) == raster[3, 4] == -300 + 3 * 36 + 4
+
+
+@pytest.mark.parametrize("line, message", [
+    ("NBANDS 3", "single-band"),
+    ("LAYOUT BIP", "single-band"),
+    ("NBITS 12", "NBITS 12"),
+    ("BYTEORDER X", "BYTEORDER X"),
+])
+def test_unsupported_bil_layouts_raise(tmp_path, line, message):
+    header = parse_bil_header(BIL_HEADER + line)
+    with pytest.raises(ValueError, match=message):
+        bil_pixel_format(header)
+
+    raster_path = tmp_path / "HWSD2.bil"
+    raster_path.write_bytes(b"")
+    raster_path.with_suffix(".hdr").write_text(BIL_HEADER + line)
+    with pytest.raises(ValueError, match=message):
+        HWSD2Extractor(raster_path=str(raster_path), db_path=str(tmp_path / "hwsd2.ddb"))
+
+
+def test_share_weighted_mean_skips_missing_sequences():
+    conn = duckdb.connect()
+    conn.execute("CREATE TABLE HWSD2_LAYERS AS SELECT * FROM (VALUES (1, 60, 10.0), (1, 30, 40.0), (1, 10, -9), "
+                 "(2, 50, NULL), (2, 50, -9)) t(HWSD2_SMU_ID, SHARE, SAND)")
+    rows = conn.execute(f"SELECT HWSD2_SMU_ID, {share_weighted_mean_sql('SAND')} FROM HWSD2_LAYERS "
+                        "GROUP BY ALL ORDER BY 1").fetchall()
+    assert rows == [(1, pytest.approx(20.0)), (2, None)]
+
+
+def test_file_fingerprint_changes_with_the_file(tmp_path):
+    path = tmp_path / "hwsd2.ddb"
+    path.write_bytes(b"v1")
+    before = file_fingerprint(path)
+    assert np.array_equal(before, file_fingerprint(path))
+    path.write_bytes(b"v2")
+    os.utime(path, ns=(0, int(before[1]) + 1))
+    assert not np.array_equal(before, file_fingerprint(path))
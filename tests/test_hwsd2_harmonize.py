@@ -0,0 +1,79 @@
+"""Tests for depth harmonization of HWSD2 layer profiles."""
+import numpy as np
+import pandas as pd
+import pytest
+
+from hwsd2_extractor import STANDARD_LAYERS
+from hwsd2_harmonize import harmonize_layers, overlap_weights, resample
+
+TOPS = [top for _, top, _ in STANDARD_LAYERS]
+BOTTOMS = [bottom for _, _, bottom in STANDARD_LAYERS]
+
+
+def _layers(n_smus):
+    rows = []
+    for smu in range(1, n_smus + 1):
+        for sequence in (1, 2):
+            for d, (layer, top, bottom) in enumerate(STANDARD_LAYERS):
+                rows.append({"HWSD2_SMU_ID": smu, "SEQUENCE": sequence, "LAYER": layer,
+                             "TOPDEP": top, "BOTDEP": bottom, "SAND": 10.0 * (d + 1),
+                             "ORG_CARBON": float(smu), "STOCK": 7.0})
+    return pd.DataFrame(rows).sample(frac=1, random_state=0)
+
+
+def test_overlap_weights_are_cached_and_clipped():
+    weights = overlap_weights(tuple(TOPS), tuple(BOTTOMS), (0.0, 30.0, 250.0))
+    assert weights is overlap_weights(tuple(TOPS), tuple(BOTTOMS), (0.0, 30.0, 250.0))
+    np.testing.assert_array_equal(weights[0], [20, 10, 0, 0, 0, 0, 0])
+    assert weights[1].sum() == 170
+    with pytest.raises(ValueError, match="increasing"):
+        overlap_weights((0.0,), (10.0,), (10.0, 0.0))
+
+
+def test_intensive_and_extensive_resampling():
+    values = np.array([[10.0, 20, 30, 40, 50, 60, 70], [1, 1, 1, 1, np.nan, 1, 1]])
+    result = resample(values, TOPS, BOTTOMS, [0, 30, 100, 300])
+    np.testing.assert_allclose(result[0, :2], [40 / 3, (10 * 20 + 20 * 30 + 20 * 40 + 20 * 50) / 70])
+    np.testing.assert_allclose(result[1, :2], [1, 1])           # the missing layer is skipped
+    np.testing.assert_allclose(result[:, 2], [65, 1])           # partial coverage of 100-300
+
+    stocks = resample(values, TOPS, BOTTOMS, [0, 30, 100, 200], kind="extensive")
+    np.testing.assert_allclose(stocks[0].sum(), 280)            # totals are conserved
+    np.testing.assert_allclose(stocks[0, 0], 10 + 10)
+    # A missing source layer leaves its target layer NaN rather than a partial total
+    np.testing.assert_allclose(stocks[1], [1.5, np.nan, 2])
+    # So does a target reaching below the profile
+    assert np.isnan(resample(values, TOPS, BOTTOMS, [100, 300], kind="extensive")).all()
+
+    assert np.isnan(resample([1.0], [0], [20], [50, 60])).all()
+    with pytest.raises(ValueError, match="kind"):
+        resample(values, TOPS, BOTTOMS, [0, 30], kind="mean")
+
+
+def test_harmonize_layers_per_profile():
+    layers = _layers(3)
+    layers.loc[(layers["HWSD2_SMU_ID"] == 2) & (layers["LAYER"] == "D1"), "SAND"] = -9
+    # SMU 3 sequence 2 only has the topsoil layers
+    layers = layers[~((layers["HWSD2_SMU_ID"] == 3) & (layers["SEQUENCE"] == 2) & (layers["TOPDEP"] >= 40))]
+
+    result = harmonize_layers(layers, [0, 10, 30, 60], intensive=["SAND", "ORG_CARBON"], extensive=["STOCK"])
+    assert len(result) == 3 * 2 * 3
+    assert list(result.columns) == ["HWSD2_SMU_ID", "SEQUENCE", "LAYER", "TOPDEP", "BOTDEP",
+                                    "SAND", "ORG_CARBON", "STOCK"]
+    first = result[(result["HWSD2_SMU_ID"] == 1) & (result["SEQUENCE"] == 1)]
+    assert first["LAYER"].tolist() == ["T1", "T2", "T3"]
+    np.testing.assert_allclose(first["SAND"], [10, 15, 80 / 3])
+    np.testing.assert_allclose(first["STOCK"], [3.5, 7, 10.5])
+
+    missing = result[(result["HWSD2_SMU_ID"] == 2) & (result["SEQUENCE"] == 1)]
+    assert np.isnan(missing["SAND"].iloc[0]) and missing["SAND"].iloc[1] == 20
+
+    shallow = result[(result["HWSD2_SMU_ID"] == 3) & (result["SEQUENCE"] == 2)]
+    np.testing.assert_allclose(shallow["ORG_CARBON"], [3, 3, 3])
+    np.testing.assert_allclose(shallow["STOCK"], [3.5, 7, np.nan])     # 30-60 cm is only covered to 40 cm
+
+
+def test_harmonize_defaults_to_known_intensive_columns():
+    result = harmonize_layers(_layers(1))
+    assert {"SAND", "ORG_CARBON"} <= set(result.columns) and "STOCK" not in result.columns
+    assert result["BOTDEP"].tolist() == [5, 15, 30, 60, 100, 200] * 2
@@ -0,0 +1,84 @@
+"""Tests for the lazy xarray-style dataset."""
+import numpy as np
+import pytest
+
+from hwsd2_extractor import NODATA
+from hwsd2_lazy import SMU_VARIABLE, open_dataset
+
+
+@pytest.fixture
+def extractor(make_extractor):
+    """A 10° raster of 18 × 36 pixels with SMUs 1-2 and ocean."""
+    rng = np.random.default_rng(3)
+    raster = rng.choice(np.array([1, 2, NODATA], dtype=np.uint16), size=(18, 36))
+    return make_extractor(raster, {"HWSD2_LAYERS": (
+        "ID INTEGER, HWSD2_SMU_ID INTEGER, SEQUENCE INTEGER, SHARE DECIMAL(5,2), LAYER VARCHAR, "
+        "TOPDEP INTEGER, BOTDEP INTEGER, ORG_CARBON DOUBLE, CLAY INTEGER, TEXTURE_USDA INTEGER, "
+        "TEXTURE_SOTER VARCHAR", [
+            (1, 1, 1, 100, "D1", 0, 20, 2.0, 20, 9, "M"), (2, 1, 1, 100, "D2", 20, 40, 1.0, 25, 9, "M"),
+            (3, 2, 1, 100, "D1", 0, 20, 0.5, 40, 3, "F"),
+        ])})
+
+
+def test_dataset_structure_without_reading(extractor):
+    ds = open_dataset(extractor)
+    assert ds.data_vars == ("ORG_CARBON", "CLAY", SMU_VARIABLE)
+    assert ds.sizes == {"depth": 7, "lat": 18, "lon": 36}
+    assert ds["CLAY"].dims == ("depth", "lat", "lon") and ds.CLAY.shape == (7, 18, 36)
+    assert ds[SMU_VARIABLE].dims == ("lat", "lon")
+    assert ds.coords["depth"].tolist() == [10, 30, 50, 70, 90, 125, 175]
+    assert ds.ORG_CARBON.attrs["units"] == "percent"
+    assert ds._source.lookups == {} and ds._source._raster is None
+    with pytest.raises(KeyError):
+        ds["SAND"]
+    # Coded columns are not properties
+    with pytest.raises(ValueError, match="TEXTURE_USDA"):
+        open_dataset(extractor, properties=["CLAY", "TEXTURE_USDA"])
+
+
+def test_sel_decodes_only_the_window(extractor):
+    raster = extractor.open_raster()
+    ds = open_dataset(extractor, properties=["ORG_CARBON", "CLAY"])
+    region = ds.sel(lat=slice(60, 30), lon=slice(-170, -140))
+    assert region.sizes == {"depth": 7, "lat": 3, "lon": 3}
+    assert region.coords["lat"].tolist() == [55, 45, 35] and region.coords["lon"].tolist() == [-165, -155, -145]
+
+    carbon = region["ORG_CARBON"].sel(depth=10)
+    assert carbon.dims == ("lat", "lon")
+    expected = np.select([raster == 1, raster == 2], [2.0, 0.5], np.nan)
+    np.testing.assert_array_equal(carbon.values, expected[3:6, 1:4])
+    assert list(ds._source.lookups) == ["ORG_CARBON"]
+
+    # Slice order does not matter; scalars drop dimensions; layer names select depth
+    np.testing.assert_array_equal(ds.ORG_CARBON.sel(lat=slice(30, 60), lon=slice(-170, -140), layer="D1").values,
+                                  carbon.values)
+    column = ds.CLAY.sel(lat=44, lon=-101)
+    assert column.dims == ("depth",) and column.coords["lat"] == 45 and column.coords["lon"] == -105
+    clay = np.full((1 << 16, 7), np.nan)
+    clay[1, :2], clay[2, 0] = [20, 25], 40
+    np.testing.assert_array_equal(np.asarray(column), clay[raster[4, 7]])
+    assert ds.CLAY.sel(depth=slice(0, 30)).shape == (2, 18, 36)
+    assert ds.sel(layer=["D2", "D1"]).coords["layer"].tolist() == ["D2", "D1"]
+    np.testing.assert_array_equal(ds[SMU_VARIABLE].isel(lat=slice(2, 5), lon=3).values, raster[2:5, 3])
+
+
+def test_selection_errors(extractor):
+    ds = open_dataset(extractor, properties=["CLAY"])
+    with pytest.raises(KeyError, match="outside"):
+        ds.sel(lat=slice(60, 30)).sel(lat=0)
+    with pytest.raises(KeyError, match="outside"):
+        ds.sel(depth=500)
+    with pytest.raises(ValueError, match="Unknown coordinate"):
+        ds.sel(time=0)
+    with pytest.raises(ValueError, match="contiguous"):
+        ds.isel(lat=slice(0, 10, 2))
+    with pytest.raises(ValueError, match="already been selected"):
+        ds.isel(lat=0).isel(lat=0)
+
+
+def test_to_xarray(extractor):
+    pytest.importorskip("xarray")
+    region = open_dataset(extractor, properties=["CLAY"]).sel(lat=slice(60, 30), lon=slice(-170, -140))
+    converted = region.to_xarray()
+    assert converted["CLAY"].dims == ("depth", "lat", "lon")
+    np.testing.assert_array_equal(converted["CLAY"].values, region.CLAY.values)
@@ -0,0 +1,70 @@
+"""Tests for predicate-to-raster mask queries."""
+import duckdb
+import numpy as np
+import pytest
+
+from hwsd2_extractor import NODATA
+from hwsd2_mask import apply_mask, mask_summary, query_mask, smu_lookup
+
+
+@pytest.fixture
+def extractor(make_extractor):
+    """A 10° raster of 18 × 36 pixels: SMU 1 everywhere, SMU 2 and 3 in blocks, ocean rows."""
+    raster = np.full((18, 36), 1, dtype=np.uint16)
+    raster[2:4, 5:10] = 2
+    raster[10:12, 30:33] = 3
+    raster[0] = NODATA
+    return make_extractor(raster, {"HWSD2_LAYERS": (
+        "HWSD2_SMU_ID INTEGER, SEQUENCE INTEGER, SHARE DECIMAL(5,2), LAYER VARCHAR, PH_WATER DOUBLE, CLAY DOUBLE", [
+            (1, 1, 100, "D1", 6.5, 20.0), (1, 1, 100, "D2", 4.5, 45.0),
+            (2, 1, 70, "D1", 4.5, 45.0), (2, 2, 30, "D1", 7.0, 45.0),
+            (3, 1, 60, "D1", -9, -9), (3, 2, 40, "D1", 4.8, 50.0),
+        ])})
+
+
+def test_lookup_aggregates(extractor):
+    conn = duckdb.connect(str(extractor.db_path), read_only=True)
+    predicate = "PH_WATER < 5 AND CLAY > 40"
+    assert np.flatnonzero(smu_lookup(conn, predicate)).tolist() == [2, 3]
+    assert np.flatnonzero(smu_lookup(conn, predicate, aggregate="dominant")).tolist() == [2]  # -9 never matches
+    assert np.flatnonzero(smu_lookup(conn, predicate, layer=None)).tolist() == [1, 2, 3]
+    share = smu_lookup(conn, predicate, aggregate="share")
+    assert share.dtype == np.float32 and share[[1, 2, 3]].tolist() == pytest.approx([0, 0.7, 0.4])
+    with pytest.raises(ValueError, match="Unknown aggregate"):
+        smu_lookup(conn, predicate, aggregate="all")
+
+
+def test_mask_tiles_match_direct_lookup(extractor, tmp_path):
+    lookup = np.zeros(1 << 16, dtype=bool)
+    lookup[[2, 3]] = True
+    raster = extractor.open_raster()
+    expected = np.isin(raster, [2, 3])
+    for workers in (1, 4):
+        np.testing.assert_array_equal(apply_mask(extractor, lookup, tile_rows=5, workers=workers), expected)
+
+    window = apply_mask(extractor, lookup, window=(2, 12, 4, 34), tile_rows=3)
+    np.testing.assert_array_equal(window, expected[2:12, 4:34])
+    written = apply_mask(extractor, lookup, out=str(tmp_path / "mask.npy"), tile_rows=4)
+    np.testing.assert_array_equal(np.load(tmp_path / "mask.npy"), expected)
+    assert written.sum() == 16
+
+
+def test_summary_areas_and_boxes(extractor):
+    everything = np.ones(1 << 16, dtype=bool)
+    everything[NODATA] = False
+    total = mask_summary(extractor, everything, tile_rows=4)
+    # Rows 1-17 cover 80°N to 90°S
+    sphere = 4 * np.pi * 6371.0088 ** 2
+    assert total["area_km2"] == pytest.approx(sphere * (1 + np.sin(np.deg2rad(80))) / 2)
+    assert total["pixels"] == 17 * 36
+    assert extractor.row_areas().sum() * 36 == pytest.approx(sphere)
+
+    summary = query_mask("PH_WATER < 5 AND CLAY > 40", extractor=extractor, tile_rows=5, tile_cols=12)
+    assert summary["pixels"] == 10 + 6
+    assert summary["bbox"] == pytest.approx((-130, -30, 150, 70))
+    assert sorted(summary["blocks"]) == [pytest.approx((-130, 50, -80, 70)), pytest.approx((120, -30, 150, -10))]
+
+    share = query_mask("PH_WATER < 5 AND CLAY > 40", aggregate="share", extractor=extractor)
+    assert share["pixels"] == 16 and share["area_km2"] < summary["area_km2"]
+    with pytest.raises(ValueError, match="Unknown output"):
+        query_mask("CLAY > 0", output="tiff", extractor=extractor)
@@ -0,0 +1,58 @@
+"""Tests for the vectorized pedotransfer functions."""
+import numpy as np
+import pandas as pd
+import pytest
+
+from hwsd2_derived import compute_layer_properties, derive_profiles
+from hwsd2_pedotransfer import HYDRAULIC_PARAMETERS, hydraulic_table, saxton_rawls, van_genuchten_theta
+
+
+def test_saxton_rawls_orders_textures():
+    # sand, loam, clay
+    params = saxton_rawls([90, 40, 10], [5, 20, 60], [0.5, 1.5, 1.0])
+    assert set(params) == set(HYDRAULIC_PARAMETERS)
+    wp, fc, sat = params["wilting_point"], params["field_capacity"], params["saturation"]
+    assert np.all((0 < wp) & (wp < fc) & (fc < sat) & (sat < 1))
+    assert np.all(np.diff(wp) > 0) and np.all(np.diff(params["ksat"]) < 0)
+    np.testing.assert_allclose(params["available_water"], fc - wp)
+    assert np.all(params["vg_n"] > 1) and np.all(np.isfinite(params["vg_alpha"]))
+
+
+def test_bulk_density_adjustment_and_missing_values():
+    loose, dense = saxton_rawls(40, 20, 1.5, [1.2, 1.6])["saturation"]
+    assert loose > dense
+    unadjusted = saxton_rawls(40, 20, 1.5)
+    missing_bulk = saxton_rawls(40, 20, 1.5, -9)
+    assert missing_bulk["saturation"] == pytest.approx(unadjusted["saturation"])
+    assert np.isnan(saxton_rawls(-9, 20, 1.5)["field_capacity"])
+
+
+def test_cubes_broadcast():
+    sand = np.full((4, 3, 7), 40.0)
+    clay = np.linspace(10, 40, 7)                    # varies with depth only
+    params = saxton_rawls(sand, clay, 1.0)
+    assert params["ksat"].shape == (4, 3, 7)
+    assert np.all(np.diff(params["wilting_point"][0, 0]) > 0)
+
+
+def test_van_genuchten_curve_matches_retention_points():
+    params = saxton_rawls(40, 20, 1.5)
+    curve = van_genuchten_theta([0, 33, 1500], params["vg_theta_r"], params["vg_theta_s"],
+                                params["vg_alpha"], params["vg_n"])
+    assert curve[0] == pytest.approx(params["saturation"])
+    assert np.all(np.diff(curve) < 0)
+
+
+def test_hydraulic_columns_are_derived_properties():
+    layers = pd.DataFrame({"SAND": [40.0, 40.0], "CLAY": [20.0, 20.0], "ORG_CARBON": [1.5, 1.5],
+                           "BULK": [1.4, 1.4], "COARSE": [0.0, 50.0], "TOPDEP": [0, 20],
+                           "BOTDEP": [20, 100], "HWSD2_SMU_ID": [1, 1], "SEQUENCE": [1, 1]})
+    table = hydraulic_table(layers)
+    values = compute_layer_properties(layers, ["THETA_FC", "KSAT", "AWC_PTF_LAYER"])
+    np.testing.assert_allclose(values["THETA_FC"], table["field_capacity"])
+    np.testing.assert_allclose(values["KSAT"], table["ksat"])
+    # THICKNESS × 10 × (1 - COARSE/100); the layers cover 0-100 cm, as AWC_PTF_100 requires
+    expected = table["available_water"].to_numpy() * np.array([200, 800]) * np.array([1, 0.5])
+    np.testing.assert_allclose(values["AWC_PTF_LAYER"], expected)
+    profile = derive_profiles(layers, ["AWC_PTF_100"])
+    assert profile["AWC_PTF_100"].iloc[0] == pytest.approx(expected.sum())
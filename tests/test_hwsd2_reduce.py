@@ -0,0 +1,86 @@
+"""Tests for grouped reductions with cached SMU areas."""
+import duckdb
+import numpy as np
+import pytest
+
+from hwsd2_extractor import NODATA
+from hwsd2_reduce import dataset_version, grouped_totals, load_smu_areas, reduce_by, smu_areas
+
+
+@pytest.fixture
+def extractor(make_extractor):
+    """A 10° raster of 18 × 36 pixels: SMU 1 in the north, 2 in the south, an SMU 3 block."""
+    raster = np.full((18, 36), 1, dtype=np.uint16)
+    raster[9:] = 2
+    raster[12:14, :10] = 3
+    raster[0] = NODATA
+    return make_extractor(raster, {
+        "HWSD2_SMU": ("HWSD2_SMU_ID INTEGER, KOPPEN INTEGER, WRB2 VARCHAR", [(1, 1, "CM"), (2, 2, "LV"), (3, 2, "CM")]),
+        "D_KOPPEN": ("CODE INTEGER, VALUE VARCHAR", [(1, "Cfb"), (2, "Aw")]),
+        "HWSD2_LAYERS": (
+            "HWSD2_SMU_ID INTEGER, SEQUENCE INTEGER, SHARE DECIMAL(5,2), LAYER VARCHAR, WRB2 VARCHAR, "
+            "TOPDEP INTEGER, BOTDEP INTEGER, ORG_CARBON DOUBLE, BULK DOUBLE, COARSE DOUBLE", [
+                (1, 1, 100, "D1", "CM", 0, 20, 1.0, 1.5, 0),
+                (2, 1, 50, "D1", "LV", 0, 20, 2.0, 1.0, 0),
+                (2, 2, 50, "D1", "CM", 0, 20, -9, 1.0, 0),
+                (3, 1, 100, "D1", "CM", 0, 20, 4.0, 1.0, 0),
+            ]),
+    })
+
+
+def test_smu_areas(extractor):
+    areas = smu_areas(extractor, tile_rows=4)
+    per_row = extractor.row_areas()
+    assert areas[1] == pytest.approx(per_row[1:9].sum() * 36)
+    assert areas[3] == pytest.approx(per_row[12:14].sum() * 10)
+    assert areas[NODATA] == 0 and np.count_nonzero(areas) == 3
+    np.testing.assert_allclose(smu_areas(extractor, tile_rows=5, workers=2), areas)
+
+
+def test_grouped_totals(extractor):
+    areas = smu_areas(extractor)
+    conn = duckdb.connect(str(extractor.db_path), read_only=True)
+    koppen = grouped_totals(conn, areas, "KOPPEN").set_index("KOPPEN")
+    assert koppen.loc["1", "AREA_KM2"] == pytest.approx(areas[1])
+    assert koppen.loc["2", "AREA_KM2"] == pytest.approx(areas[2] + areas[3])
+    assert koppen.loc["2", "LABEL"] == "Aw" and koppen["AREA_SHARE"].sum() == pytest.approx(1)
+
+    # Layer quantity: SMU 2 averages only its sequence with data
+    carbon = grouped_totals(conn, areas, "WRB2", "ORG_CARBON").set_index("WRB2")
+    assert carbon.loc["LV", "MEAN"] == pytest.approx(2.0)
+    assert carbon.loc["CM", "MEAN"] == pytest.approx((areas[1] * 1.0 + areas[3] * 4.0) / (areas[1] + areas[3]))
+
+    # Sequence level splits SMU 2 between LV and CM; its CM half has no carbon
+    split = grouped_totals(conn, areas, "WRB2", "ORG_CARBON", level="sequence").set_index("WRB2")
+    assert split.loc["LV", "AREA_KM2"] == pytest.approx(areas[2] / 2)
+    assert split.loc["CM", "COVERED_KM2"] == pytest.approx(areas[1] + areas[3])
+
+    # Derived profile property: SOC stock (kg/m²) x area
+    stock = grouped_totals(conn, areas, "KOPPEN", "SOC_STOCK_TOTAL").set_index("KOPPEN")
+    assert stock.loc["1", "MEAN"] == pytest.approx(1.0 / 100 * 1.5 * 1000 * 0.2)
+    assert stock.loc["1", "TOTAL"] == pytest.approx(stock.loc["1", "MEAN"] * areas[1] * 1e6)
+    with pytest.raises(ValueError, match="Unknown level"):
+        grouped_totals(conn, areas, "KOPPEN", level="layer")
+    with pytest.raises(KeyError, match="Unknown quantity"):
+        grouped_totals(conn, areas, "KOPPEN", "NOT_A_COLUMN")
+    conn.close()
+
+
+def test_results_cached_by_dataset_version(extractor, tmp_path):
+    first = reduce_by("KOPPEN", extractor=extractor)
+    assert (tmp_path / "hwsd2.smu_areas.npz").exists() and (tmp_path / "hwsd2.reductions.json").exists()
+    version = dataset_version(extractor)
+    cached = reduce_by("KOPPEN", extractor=extractor)
+    assert cached["KOPPEN"].tolist() == first["KOPPEN"].tolist()
+    np.testing.assert_allclose(cached["AREA_KM2"], first["AREA_KM2"])
+
+    # Changing the database invalidates the cached results
+    conn = duckdb.connect(str(extractor.db_path))
+    conn.execute("UPDATE HWSD2_SMU SET KOPPEN = 1")
+    conn.close()
+    assert dataset_version(extractor) != version
+    updated = reduce_by("KOPPEN", extractor=extractor)
+    assert len(first) == 2 and len(updated) == 1
+    assert reduce_by("KOPPEN", extractor=extractor, cache=False)["AREA_KM2"].tolist() == \
+        updated["AREA_KM2"].tolist()
+    np.testing.assert_allclose(load_smu_areas(extractor), smu_areas(extractor))
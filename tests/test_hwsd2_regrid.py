@@ -0,0 +1,78 @@
+"""Tests for sparse-weight regridding onto model domains."""
+import numpy as np
+import pytest
+
+from hwsd2_extractor import NODATA
+from hwsd2_regrid import Domain, RegridWeights, load_domain, load_weights, weights_path
+
+
+@pytest.fixture
+def extractor(make_extractor):
+    """A 10° raster of 18 × 36 pixels with random SMUs 1-3 and ocean."""
+    rng = np.random.default_rng(1)
+    return make_extractor(rng.choice(np.array([1, 2, 3, NODATA], dtype=np.uint16), size=(18, 36)))
+
+
+def _regular_domain(size=30):
+    """A global lat/lon grid (north to south) of ``size``° cells."""
+    lon = np.arange(-180, 180, size)
+    lat = np.arange(90, -90, -size)
+    west, north = np.meshgrid(lon, lat)
+    return Domain.from_bounds(west, north - size, west + size, north)
+
+
+def test_rectangles_match_block_reduction(extractor):
+    raster = extractor.open_raster()
+    weights = RegridWeights.build(extractor, _regular_domain())
+    lookup = np.full(1 << 16, np.nan)
+    lookup[[1, 2, 3]] = [10.0, 20.0, np.nan]
+
+    area = np.broadcast_to(extractor.row_areas()[:, None], raster.shape)
+    values = lookup[raster]
+    known = ~np.isnan(values)
+    blocks = lambda a: a.reshape(6, 3, 12, 3).sum(axis=(1, 3))
+    with np.errstate(invalid="ignore"):
+        expected = blocks(area * np.nan_to_num(values)) / blocks(area * known)
+    np.testing.assert_allclose(weights.project(lookup), expected)
+    np.testing.assert_allclose(weights.land_fraction(), blocks(area * (raster != NODATA)) / blocks(area))
+    assert weights.cell_area.sum() == pytest.approx(extractor.row_areas().sum() * 36)
+
+    # Several variables in one product
+    stacked = weights.project(np.stack([lookup, 2 * lookup], axis=1))
+    assert stacked.shape == (6, 12, 2)
+    np.testing.assert_allclose(stacked[..., 1], 2 * expected)
+
+    smu, fraction = weights.dominant_smu()
+    assert smu.dtype == np.uint16 and ((fraction > 0) & (fraction <= 1)).all()
+
+
+def test_polygons_dateline_and_mask(extractor):
+    raster = extractor.open_raster()
+    # A triangle over pixels (row 1, cols 0-1) and a cell across the dateline in 0-360 longitudes
+    triangle = [(-180, 60), (-160, 60), (-180, 80)]
+    dateline = [(170, 0), (190, 0), (190, 10), (170, 10)]
+    weights = RegridWeights.build(extractor, Domain.from_polygons([triangle, dateline]))
+    assert weights.indices[weights._rows == 0].tolist() == sorted({int(raster[2, 0])} - {NODATA})
+    assert set(weights.indices[weights._rows == 1]) == {int(raster[8, 35]), int(raster[8, 0])} - {NODATA}
+
+    masked = Domain.from_corners(*(np.array(a, dtype=float)[None] for a in zip(*dateline)), mask=[False])
+    assert RegridWeights.build(extractor, masked).cell_area.tolist() == [0]
+
+
+def test_weights_cached_and_invalidated(extractor, tmp_path):
+    domain = _regular_domain()
+    np.savez(tmp_path / "domain.npz", xv=domain.xv.reshape(6, 12, 4), yv=domain.yv.reshape(6, 12, 4))
+    loaded = load_domain(tmp_path / "domain.npz")
+    assert loaded.fingerprint() == domain.fingerprint()
+
+    path = weights_path(tmp_path / "domain.npz")
+    assert path.name == "domain.hwsd2_weights.npz"
+    weights = load_weights(extractor, loaded, path)
+    assert path.exists()
+    cached = load_weights(extractor, loaded, path)
+    np.testing.assert_array_equal(cached.data, weights.data)
+    assert cached.shape == (6, 12)
+
+    # A different domain rebuilds the weights
+    other = load_weights(extractor, _regular_domain(60), path)
+    assert other.shape == (3, 6)
@@ -0,0 +1,96 @@
+"""Tests for the profile similarity index."""
+import os
+
+import duckdb
+import numpy as np
+import pandas as pd
+import pytest
+
+from hwsd2_extractor import STANDARD_LAYERS
+from hwsd2_similarity import ProfileIndex, depth_weights, index_path, load_index
+
+PROPERTIES = ["SAND", "CLAY", "ORG_CARBON"]
+
+
+def _layers(n_smus=50, seed=0):
+    rng = np.random.default_rng(seed)
+    rows = []
+    for smu in range(1, n_smus + 1):
+        sand, clay, carbon = rng.uniform(10, 80), rng.uniform(5, 50), rng.uniform(0.5, 4)
+        for sequence in (1, 2):
+            for d, (layer, top, bottom) in enumerate(STANDARD_LAYERS):
+                rows.append({"HWSD2_SMU_ID": smu, "SEQUENCE": sequence, "TOPDEP": top, "BOTDEP": bottom,
+                             "SAND": sand + sequence, "CLAY": clay + d, "ORG_CARBON": carbon / (d + 1)})
+    return pd.DataFrame(rows)
+
+
+def _brute_force(index, query):
+    distances = ((index.features - query) ** 2).sum(axis=1)
+    return np.argsort(distances, kind="stable")
+
+
+def test_query_matches_brute_force_and_finds_self():
+    layers = _layers()
+    index = ProfileIndex.build(layers, PROPERTIES)
+    assert len(index) == 100 and index.features.shape == (100, 7 * 3)
+
+    pedon = layers[(layers["HWSD2_SMU_ID"] == 17) & (layers["SEQUENCE"] == 2)]
+    result = index.query(pedon[["TOPDEP", "BOTDEP", *PROPERTIES]], k=5)
+    assert result[["HWSD2_SMU_ID", "SEQUENCE"]].iloc[0].tolist() == [17, 2]
+    assert result["DISTANCE"].iloc[0] == pytest.approx(0, abs=1e-3)
+    assert result["DISTANCE"].is_monotonic_increasing
+
+    expected = _brute_force(index, index.features_for(pedon)[0])[:5]
+    assert result["HWSD2_SMU_ID"].tolist() == index.keys[expected, 0].tolist()
+
+
+def test_pedon_horizons_and_missing_values():
+    index = ProfileIndex.build(_layers(), PROPERTIES)
+    # A measured pedon with its own horizons, no organic carbon, only to 50 cm
+    pedon = pd.DataFrame({"TOPDEP": [0, 15, 35], "BOTDEP": [15, 35, 50], "SAND": [40.0, 40.0, 40.0],
+                          "CLAY": [20.0, 21.0, 22.0], "ORG_CARBON": [np.nan] * 3})
+    features = index.features_for(pedon)
+    assert features.shape == (1, 21) and np.isnan(features).sum() == 21 - 3 * 2
+    result = index.query(pedon, k=3)
+    assert len(result) == 3 and np.isfinite(result["DISTANCE"]).all()
+
+    # Several pedons at once
+    pedons = pd.concat([pedon.assign(PEDON=1), pedon.assign(PEDON=2, SAND=70.0)])
+    batch = index.query(pedons, k=2)
+    assert batch["QUERY"].tolist() == [0, 0, 1, 1]
+
+
+def test_depth_weights():
+    np.testing.assert_allclose(depth_weights([0, 50, 100]), [0.5, 0.5])
+    decayed = depth_weights([0, 50, 100], depth_decay=50)
+    assert decayed[0] > decayed[1] and decayed.sum() == pytest.approx(1)
+
+
+def test_persisted_next_to_database(tmp_path):
+    db_path = tmp_path / "hwsd2.ddb"
+    conn = duckdb.connect(str(db_path))
+    conn.register("source", _layers(20))
+    conn.execute("CREATE TABLE HWSD2_LAYERS AS SELECT *, 7.0 AS PH_WATER, 1.3 AS BULK, 10.0 AS CEC_SOIL FROM source")
+    conn.close()
+
+    index = load_index(db_path)
+    path = index_path(db_path)
+    assert path == tmp_path / "hwsd2.similarity.npz" and path.exists()
+    loaded = load_index(db_path)
+    np.testing.assert_array_equal(loaded.features, index.features)
+    assert loaded.properties == index.properties and os.path.getmtime(path) > 0
+
+    # A changed database invalidates the stored index
+    conn = duckdb.connect(str(db_path))
+    conn.execute("DELETE FROM HWSD2_LAYERS WHERE HWSD2_SMU_ID > 10")
+    conn.execute("CHECKPOINT")
+    conn.close()
+    assert len(load_index(db_path)) == 20
+
+    # So do other build arguments
+    sand = load_index(db_path, properties=["SAND"], depth_decay=30)
+    assert sand.properties == ("SAND",) and sand.depth_decay == 30
+    assert sand.features.shape[1] == len(sand.edges) - 1
+    reloaded = ProfileIndex.load(path)
+    assert reloaded.depth_decay == 30 and reloaded.built_with(["SAND"], depth_decay=30)
+    assert load_index(db_path).properties == index.properties
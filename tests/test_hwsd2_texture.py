@@ -0,0 +1,63 @@
+"""Tests for the vectorized texture classifiers."""
+import duckdb
+import numpy as np
+import pandas as pd
+import pytest
+
+from hwsd2_texture import USDA_CLASSES, classify_layers, classify_soter, classify_usda, usda_names
+
+
+def _triangle(step=0.5):
+    sand, clay = np.meshgrid(np.arange(0, 100 + step, step), np.arange(0, 100 + step, step))
+    inside = sand + clay <= 100
+    return sand[inside], clay[inside]
+
+
+def test_usda_partitions_the_triangle():
+    sand, clay = _triangle()
+    codes = classify_usda(sand, clay)
+    assert codes.min() >= 1 and set(codes.tolist()) == set(USDA_CLASSES)
+
+
+@pytest.mark.parametrize("sand, silt, clay, name", [
+    (92, 4, 4, "Sand"), (82, 12, 6, "Loamy sand"), (65, 25, 10, "Sandy loam"), (40, 40, 20, "Loam"),
+    (20, 65, 15, "Silt loam"), (5, 90, 5, "Silt"), (60, 15, 25, "Sandy clay loam"),
+    (35, 35, 30, "Clay loam"), (10, 58, 32, "Silty clay loam"), (50, 5, 45, "Sandy clay"),
+    (5, 50, 45, "Silty clay"), (25, 25, 50, "Clay (light)"), (15, 15, 70, "Clay (heavy)"),
+])
+def test_usda_reference_points(sand, silt, clay, name):
+    assert usda_names(classify_usda(sand, clay, silt)) == name
+
+
+def test_normalization_missing_and_shapes():
+    # Fractions summing to 50 are scaled to 100: same class as 40/40/20
+    assert classify_usda(20, 10, 20) == 9
+    assert classify_usda([np.nan, -9, 40], [20, 20, -9]).tolist() == [0, 0, 0]
+    cube = classify_usda(np.full((2, 3, 7), 40.0), np.linspace(5, 70, 7))
+    assert cube.shape == (2, 3, 7) and cube.dtype == np.int16
+    assert classify_soter([90, 40, 10, 5, 30, -9], [5, 20, 65, 20, 40, 5]).tolist() == ["C", "M", "V", "Z", "F", ""]
+
+
+@pytest.mark.parametrize("mode", ["check", "fill", "overwrite"])
+def test_classify_layers_in_database(mode):
+    conn = duckdb.connect()
+    conn.register("source", pd.DataFrame({
+        "ID": [1, 2, 3, 4],
+        "SAND": [40.0, 40.0, 92.0, -9.0],
+        "SILT": [40.0, 40.0, 4.0, -9.0],
+        "CLAY": [20.0, 20.0, 4.0, -9.0],
+        "TEXTURE_USDA": [9, -9, 1, -9],
+        "TEXTURE_SOTER": ["M", None, "C", None],
+    }))
+    conn.execute("CREATE TABLE HWSD2_LAYERS AS SELECT * FROM source")
+
+    counts = classify_layers(conn, mode)
+    assert counts["TEXTURE_USDA"]["missing"] == 2 and counts["TEXTURE_USDA"]["mismatched"] == 1
+    assert counts["TEXTURE_USDA"]["unclassified"] == 1
+    codes = [row[0] for row in conn.execute("SELECT TEXTURE_USDA FROM HWSD2_LAYERS ORDER BY ID").fetchall()]
+    soter = [row[0] for row in conn.execute("SELECT TEXTURE_SOTER FROM HWSD2_LAYERS ORDER BY ID").fetchall()]
+    expected = {"check": [9, -9, 1, -9], "fill": [9, 9, 1, -9], "overwrite": [9, 9, 13, -9]}[mode]
+    assert codes == expected
+    assert soter[1] == (None if mode == "check" else "M")
+    with pytest.raises(ValueError, match="Unknown mode"):
+        classify_layers(conn, "guess")
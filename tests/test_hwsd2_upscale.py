@@ -0,0 +1,87 @@
+"""Tests for area-weighted upscaling to coarse grids."""
+import duckdb
+import numpy as np
+import pytest
+
+from hwsd2_extractor import NODATA
+from hwsd2_upscale import SMUTables, band_triples, grid_coordinates, smu_tables, upscale
+
+
+@pytest.fixture
+def extractor(make_extractor):
+    """A 10° raster of 18 × 36 pixels with random SMUs 1-4 and ocean."""
+    rng = np.random.default_rng(0)
+    raster = rng.choice(np.array([1, 2, 3, 4, NODATA], dtype=np.uint16), size=(18, 36))
+    raster[:6, :6] = 2
+    return make_extractor(raster, {"HWSD2_LAYERS": (
+        "HWSD2_SMU_ID INTEGER, SEQUENCE INTEGER, SHARE DECIMAL(5,2), LAYER VARCHAR, WRB2 VARCHAR, "
+        "SAND DOUBLE, CLAY DOUBLE", [
+            (1, 1, 100, "D1", "CM", 40.0, 20.0), (1, 1, 100, "D2", "CM", 10.0, 60.0),
+            (2, 1, 60, "D1", "LV", 20.0, 40.0), (2, 2, 40, "D1", "CM", 70.0, -9),
+            (3, 1, 100, "D1", "AR", 90.0, 5.0),
+            # SMU 4 is not in the database and counts as no soil
+        ])})
+
+
+@pytest.fixture
+def tables(extractor):
+    conn = duckdb.connect(str(extractor.db_path), read_only=True)
+    try:
+        return smu_tables(conn, ["SAND", "CLAY"])
+    finally:
+        conn.close()
+
+
+def test_smu_tables(tables, tmp_path):
+    np.testing.assert_allclose(tables.values[[1, 2, 3]], [[40, 20], [40, 40], [90, 5]])
+    assert np.isnan(tables.values[4]).all() and np.flatnonzero(tables.known).tolist() == [1, 2, 3]
+    assert tables.class_codes == ("AR", "CM", "LV")
+    assert tables.class_shares[2].tolist() == pytest.approx([0, 0.4, 0.6])
+
+    loaded = SMUTables.load(tables.save(tmp_path / "tables.npz"))
+    assert loaded.properties == ("SAND", "CLAY") and loaded.class_column == "WRB2"
+    np.testing.assert_array_equal(loaded.class_shares, tables.class_shares)
+
+
+def test_upscale_matches_pixel_reduction(extractor, tables):
+    raster = extractor.open_raster()
+    grids = upscale(extractor, tables, resolution=30, workers=1)
+    assert grids["land_fraction"].shape == (6, 12)
+    lat, lon = grid_coordinates(extractor, 30)
+    assert lat[0] == 75 and lon[0] == -165 and grids["lat"].tolist() == lat.tolist()
+
+    # Brute force over pixels, weighted by area
+    area = np.broadcast_to(extractor.row_areas()[:, None], raster.shape)
+    soil = tables.known[raster] & (raster != NODATA)
+    blocks = lambda a: a.reshape(6, 3, 12, 3).sum(axis=(1, 3))
+    np.testing.assert_allclose(grids["land_fraction"], blocks(area * soil) / blocks(area))
+    sand = tables.values[raster, 0]
+    with np.errstate(invalid="ignore"):
+        expected = blocks(area * soil * np.nan_to_num(sand)) / blocks(area * soil)
+    np.testing.assert_allclose(grids["SAND"], expected)
+
+    fractions = grids["class_fractions"]
+    assert fractions.shape == (3, 6, 12)
+    np.testing.assert_allclose(fractions.sum(axis=0)[grids["land_fraction"] > 0], 1, rtol=1e-6)
+    assert grids["dominant_smu"][0, 0] == 2 and grids["dominant_smu_fraction"][0, 0] == 1
+    assert grids["dominant_class"][0, 0] == 2 and grids["dominant_class_fraction"][0, 0] == pytest.approx(0.6)
+
+    # Banding and threading do not change the result
+    banded = upscale(extractor, tables, resolution=30, band_cells=4, workers=2)
+    for name in ("land_fraction", "SAND", "class_fractions", "dominant_smu"):
+        np.testing.assert_allclose(banded[name], grids[name])
+
+
+def test_band_triples_break_at_cell_edges():
+    band = np.array([[1, 1, 1, 1], [1, 1, 2, 2]], dtype=np.uint16)
+    known = np.zeros(1 << 16, dtype=bool)
+    known[[1, 2]] = True
+    cell, smu, area = band_triples(band, np.array([1.0, 2.0]), 2, known)
+    assert cell.tolist() == [0, 1, 1] and smu.tolist() == [1, 1, 2] and area.tolist() == [6, 2, 4]
+
+
+def test_resolution_must_tile_raster(extractor, tables):
+    with pytest.raises(ValueError, match="not a multiple"):
+        upscale(extractor, tables, resolution=25)
+    with pytest.raises(ValueError, match="does not tile"):
+        upscale(extractor, tables, resolution=40)
@@ -0,0 +1,68 @@
+"""Import-time benchmarks: lightweight entry points must not load heavy dependencies."""
+import os
+import subprocess
+import sys
+from pathlib import Path
+
+import pytest
+
+SCRIPTS_DIR = Path(__file__).parent.parent / "scripts"
+
+# Cumulative import time allowed for each entry point, in seconds
+IMPORT_TIME_BUDGET = 1.0
+
+
+def _import_profile(module):
+    """Import ``module`` in a fresh interpreter; return (cumulative seconds, loaded modules)."""
+    env = dict(os.environ, PYTHONPATH=os.pathsep.join(filter(None, [str(SCRIPTS_DIR), os.environ.get("PYTHONPATH")])))
+    code = f"import sys, {module}; print(' '.join(sys.modules))"
+    result = subprocess.run([sys.executable, "-X", "importtime", "-c", code],
+                            capture_output=True, text=True, env=env, check=True)
+    # -X importtime writes "import time: self [us] | cumulative | name" lines to stderr
+    cumulative = 0
+    for line in result.stderr.splitlines():
+        parts = [part.strip() for part in line.split("|")]
+        if len(parts) == 3 and parts[2] == module:
+            cumulative = int(parts[1])
+    return cumulative / 1e6, set(result.stdout.split())
+
+
+@pytest.mark.parametrize("module, heavy", [
+    ("fao_soils", {"linkml_runtime", "pydantic", "pyarrow"}),
+    ("fao_soils.datamodel", {"linkml_runtime", "rdflib"}),
+    ("hwsd2_extractor", {"duckdb", "pandas", "numpy"}),
+])
+def test_import_is_lazy_and_fast(module, heavy):
+    seconds, loaded = _import_profile(module)
+    assert not heavy & loaded, f"importing {module} loaded {sorted(heavy & loaded)}"
+    assert seconds < IMPORT_TIME_BUDGET, f"importing {module} took {seconds:.3f} s"
+
+
+def test_lazy_attributes_still_resolve():
+    import fao_soils
+    import fao_soils.datamodel
+    import hwsd2_extractor
+    from fao_soils.datamodel.fao_soils import SoilLayer
+
+    assert fao_soils.datamodel.SoilLayer is SoilLayer
+    assert "SoilLayer" in dir(fao_soils.datamodel)
+    assert fao_soils.bulk.build_objects
+    assert hwsd2_extractor.duckdb.connect
+    with pytest.raises(AttributeError):
+        fao_soils.datamodel.NoSuchClass
+
+
+def test_public_api_resolves_lazily():
+    """Every submodule is reachable from the package and star imports still export the generated classes."""
+    import fao_soils
+    from fao_soils.datamodel.fao_soils import SoilLayer
+
+    for name in fao_soils._SUBMODULES:
+        assert getattr(fao_soils, name).__name__ == f"fao_soils.{name}"
+    assert fao_soils.serialize.export_profiles and fao_soils.streaming
+
+    namespace = {}
+    exec("from fao_soils.datamodel import *", namespace)
+    assert namespace["SoilLayer"] is SoilLayer
+    assert namespace["MAIN_SCHEMA_PATH"].name == "fao_soils.yaml"
+    assert "_datamodel" not in namespace
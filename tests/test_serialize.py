@@ -0,0 +1,116 @@
+"""Tests for streaming profile serialization."""
+import io
+import json
+from pathlib import Path
+
+import duckdb
+import pytest
+import yaml
+
+from fao_soils.datamodel.fao_soils_pydantic import SoilLayer, SoilMappingUnit
+from fao_soils.serialize import export_profiles, iter_profiles, write_profiles
+
+LOOKUP_CSV_DIR = Path(__file__).parent.parent / "data" / "hwsd2" / "HWSD2_csv"
+
+
+@pytest.fixture
+def profile_db(tmp_path):
+    db_path = tmp_path / "hwsd2.ddb"
+    con = duckdb.connect(str(db_path))
+    con.execute("""
+        CREATE TABLE HWSD2_SMU AS SELECT
+            i AS ID, 100 + i AS HWSD2_SMU_ID, 60.0::DECIMAL(5,2) AS SHARE, 'MW' AS DRAINAGE,
+            i % 3 AS COVERAGE, 'Haplic Phaeozem' AS WRB4_NAME
+        FROM range(1, 6) t(i)
+    """)
+    con.execute("""
+        CREATE TABLE HWSD2_LAYERS AS SELECT
+            (smu - 1) * 7 + d AS ID, 100 + smu AS HWSD2_SMU_ID, 1 AS SEQUENCE, 'D' || d AS LAYER,
+            CASE WHEN d = 7 THEN NULL ELSE 30.0 END AS SAND, '168' AS AWC, (d * 20)::INTEGER AS BOTDEP
+        FROM range(1, 5) s(smu), range(1, 8) l(d)
+        ORDER BY random()
+    """)
+    con.close()
+    return db_path
+
+
+def test_profiles_from_columns_are_schema_conformant(layer_columns):
+    smus = {"ID": [1, 2], "HWSD2_SMU_ID": [4828, 4829], "DRAINAGE": ["MW", "W"]}
+    profiles = list(iter_profiles(smus, layer_columns))
+    assert [len(p["soil_layers"]) for p in profiles] == [2, 1]
+    first = profiles[0]["soil_layers"][1]
+    assert first == {"id": 2, "hwsd2_smu_id": 4828, "sequence": 1, "share": 60.0, "drainage": "MW",
+                     "layer": "D2", "topdep": 20, "botdep": 40, "clay": 27.0}
+    for profile in profiles:
+        SoilMappingUnit(**profile["soil_mapping_unit"])
+        for layer in profile["soil_layers"]:
+            SoilLayer(**layer)
+
+
+@pytest.mark.parametrize("format", ["jsonl", "yaml"])
+def test_export_profiles_streams_database(profile_db, tmp_path, format):
+    output = tmp_path / f"profiles.{format}"
+    stats = export_profiles(profile_db, output, format=format, chunk_smus=2,
+                            code_maps={"coverage": {0: "NONE", 1: "ESDB", 2: "CHINA"}})
+    if format == "jsonl":
+        profiles = [json.loads(line) for line in output.read_text().splitlines()]
+    else:
+        profiles = list(yaml.safe_load_all(output.read_text()))
+
+    assert stats.profiles == 5 and stats.rows == 5 + 4 * 7 and stats.rows_per_second > 0
+    assert [p["soil_mapping_unit"]["hwsd2_smu_id"] for p in profiles] == [101, 102, 103, 104, 105]
+    assert "soil_layers" not in profiles[-1]
+    smu = profiles[0]["soil_mapping_unit"]
+    assert smu == {"id": 1, "hwsd2_smu_id": 101, "share": 60.0, "drainage": "MW", "coverage": "ESDB"}
+    layers = profiles[0]["soil_layers"]
+    assert [layer["layer"] for layer in layers] == [f"D{d}" for d in range(1, 8)]
+    assert layers[0]["awc_layer"] == "168" and "sand" not in layers[6]
+
+
+def test_write_profiles_to_stream():
+    buffer = io.BytesIO()
+    stats = write_profiles([{"soil_mapping_unit": {"id": 1, "hwsd2_smu_id": 1}}], buffer)
+    assert json.loads(buffer.getvalue()) == {"soil_mapping_unit": {"id": 1, "hwsd2_smu_id": 1}}
+    assert stats.rows == 1
+    with pytest.raises(ValueError, match="Unknown profile format"):
+        write_profiles([], buffer, format="xml")
+
+
+def test_export_maps_lookup_codes_by_default(tmp_path):
+    """Integer-coded enum columns are translated through the D_* tables without explicit code maps."""
+    db_path = tmp_path / "hwsd2.ddb"
+    con = duckdb.connect(str(db_path))
+    for table in ["D_COVERAGE", "D_PHASE", "D_ROOTS", "D_IL", "D_SWR", "D_ADD_PROP", "D_TEXTURE_USDA", "D_ROOT_DEPTH"]:
+        con.execute(f"CREATE TABLE {table} AS SELECT * FROM read_csv_auto('{LOOKUP_CSV_DIR / table}.csv')")
+    con.execute("""
+        CREATE TABLE HWSD2_SMU AS SELECT * FROM (VALUES
+            (1, 101, 3, 1, 10, 9, 1, 2, 2, 3),
+            (2, 102, 8, 0, 0, 11, 3, 0, 4, 0)
+        ) t(ID, HWSD2_SMU_ID, COVERAGE, PHASE1, PHASE2, TEXTURE_USDA, ROOT_DEPTH, ROOTS, IL, ADD_PROP)
+    """)
+    con.execute("""
+        CREATE TABLE HWSD2_LAYERS AS SELECT * FROM (VALUES
+            (1, 101, 1, 'D1', 3, 2, 1, '168'),
+            (2, 102, 1, 'D1', 8, 0, 3, '20')
+        ) t(ID, HWSD2_SMU_ID, SEQUENCE, LAYER, COVERAGE, PHASE1, SWR, AWC)
+    """)
+    con.close()
+
+    output = tmp_path / "profiles.jsonl"
+    stats = export_profiles(db_path, output)
+    profiles = [json.loads(line) for line in output.read_text().splitlines()]
+    for profile in profiles:
+        SoilMappingUnit(**profile["soil_mapping_unit"])
+        for layer in profile["soil_layers"]:
+            SoilLayer(**layer)
+
+    first, second = (p["soil_mapping_unit"] for p in profiles)
+    assert first == {"id": 1, "hwsd2_smu_id": 101, "coverage": "SOTWIS", "texture_usda": "LOAM",
+                     "root_depth": "DEEP", "phase1": "STONY", "roots": "60_80", "il": "80_150", "add_prop": "VERTIC"}
+    assert second["coverage"] == "TURKEY" and second["il"] == "LT_40" and second["phase2"] == "NONE"
+    assert profiles[0]["soil_layers"][0]["swr"] == "SLIGHTLY_WET"
+    assert profiles[1]["soil_layers"][0]["swr"] == "WET"
+    # D_PHASE "Saline" and D_TEXTURE_USDA "Sandy loam" have no permissible value in the schema
+    assert "phase2" not in first and "texture_usda" not in second
+    assert stats.omitted == {"phase2": 1, "texture_usda": 1}
+    assert "omitted non-permissible phase2 (1), texture_usda (1)" in str(stats)
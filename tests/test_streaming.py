@@ -0,0 +1,83 @@
+"""Tests for the streaming collection loader."""
+import tracemalloc
+
+import pytest
+import yaml
+
+from fao_soils.datamodel.fao_soils import SoilLayer
+from fao_soils.datamodel import fao_soils_pydantic
+from fao_soils.serialize import write_profiles
+from fao_soils.streaming import iter_batches, iter_object_batches, iter_objects, iter_records
+
+
+def _layers(n):
+    return [{"id": i, "hwsd2_smu_id": 4828 + i // 7, "layer": f"D{i % 7 + 1}", "drainage": "MW",
+             "sand": 30.0 + i % 10} for i in range(1, n + 1)]
+
+
+def _write_collection(path, n):
+    """A collection file with the layers under soil_layers between other entries."""
+    with open(path, "w") as f:
+        yaml.safe_dump({"name": "test", "meta": {"nested": [1, {"a": [2]}]}}, f, sort_keys=False)
+        f.write("soil_layers:\n")
+        for layer in _layers(n):
+            f.write("  - {" + ", ".join(f"{k}: {v}" for k, v in layer.items()) + "}\n")
+        f.write("trailer: end\n")
+
+
+@pytest.mark.parametrize("suffix", [".yaml", ".json", ".jsonl"])
+def test_records_in_every_format(tmp_path, suffix):
+    path = tmp_path / f"layers{suffix}"
+    layers = _layers(20)
+    if suffix == ".yaml":
+        _write_collection(path, 20)
+    elif suffix == ".json":
+        import json
+        path.write_text(json.dumps({"name": "x", "soil_layers": layers}))
+    else:
+        profiles = [{"soil_mapping_unit": {"id": 1, "hwsd2_smu_id": 4828}, "soil_layers": layers[:5]},
+                    {"soil_mapping_unit": {"id": 2, "hwsd2_smu_id": 4829}, "soil_layers": layers[5:]}]
+        write_profiles(profiles, path)
+    assert list(iter_records(path, key="soil_layers")) == layers
+
+
+def test_objects_and_batches(tmp_path):
+    path = tmp_path / "layers.yaml"
+    _write_collection(path, 25)
+    expected = [SoilLayer(**layer) for layer in _layers(25)]
+
+    assert list(iter_objects(path, SoilLayer, key="soil_layers", batch_size=10)) == expected
+    pydantic_batches = list(iter_object_batches(path, fao_soils_pydantic.SoilLayer, key="soil_layers", batch_size=10))
+    assert [len(b) for b in pydantic_batches] == [10, 10, 5]
+    assert pydantic_batches[2][-1].layer == "D5"
+    batches = list(iter_batches(path, "SoilLayer", key="soil_layers", batch_size=10))
+    assert [b[0].id for b in batches] == [1, 11, 21]
+
+    # Multi-document YAML: each document is a record
+    docs = tmp_path / "docs.yaml"
+    docs.write_text(yaml.safe_dump_all(_layers(3)))
+    assert [layer.id for layer in iter_objects(docs, SoilLayer)] == [1, 2, 3]
+
+
+def test_invalid_records_raise(tmp_path):
+    path = tmp_path / "bad.yaml"
+    path.write_text("- {id: 1, hwsd2_smu_id: 1, drainage: XX}\n")
+    with pytest.raises(ValueError):
+        list(iter_batches(path, "SoilLayer"))
+    with pytest.raises(ValueError, match="Cannot infer"):
+        iter_records(tmp_path / "layers.txt")
+
+
+def test_memory_depends_on_batch_size_not_file_size(tmp_path):
+    def peak(n):
+        path = tmp_path / f"layers_{n}.yaml"
+        _write_collection(path, n)
+        tracemalloc.start()
+        count = sum(len(b) for b in iter_batches(path, "SoilLayer", key="soil_layers", batch_size=200))
+        _, peak_bytes = tracemalloc.get_traced_memory()
+        tracemalloc.stop()
+        assert count == n
+        return peak_bytes
+
+    small, large = peak(1_000), peak(10_000)
+    assert large < 1.5 * small
@@ -0,0 +1,53 @@
+"""Tests for vectorized schema validation of tables."""
+import duckdb
+import pyarrow as pa
+
+from fao_soils.validation import compile_rules, validate_duckdb, validate_table
+
+
+def test_rules_compiled_from_schema():
+    rules = {rule.rule_id for rule in compile_rules("SoilLayer")}
+    assert {"id.required", "hwsd2_smu_id.required", "topdep.type", "drainage.enum",
+            "sand.minimum", "sand.maximum"} <= rules
+    assert "layer.type" not in rules
+
+
+def test_valid_table_passes_in_chunks(layer_columns):
+    table = pa.table(layer_columns)
+    report = validate_table(table, "SoilLayer", chunk_size=2)
+    assert report.ok, report.summary()
+    assert report.rows == 3
+
+
+def test_violations_counted_across_chunks(tmp_path):
+    n = 1000
+    con = duckdb.connect(str(tmp_path / "hwsd2.ddb"))
+    con.execute(f"""
+        CREATE TABLE HWSD2_LAYERS AS SELECT
+            i AS ID,
+            CASE WHEN i % 250 = 0 THEN NULL ELSE 4828 END AS HWSD2_SMU_ID,
+            CASE WHEN i % 100 = 0 THEN 'XX' ELSE 'MW' END AS DRAINAGE,
+            CASE WHEN i % 10 = 0 THEN -9.0 ELSE 30.0 END AS SAND,
+            CASE WHEN i % 500 = 0 THEN 'n/a' ELSE '20' END AS TOPDEP,
+            i % 7 AS COVERAGE,
+            '60' AS AWC
+        FROM range({n}) t(i)
+    """)
+    con.close()
+
+    report = validate_duckdb(tmp_path / "hwsd2.ddb", "HWSD2_LAYERS", chunk_size=128, sample_size=3,
+                             code_maps={"coverage": {0: "NONE", 1: "ESDB", 2: "CHINA", 3: "SOTWIS"}})
+    violations = {r.rule_id: r.violations for r in report.failed()}
+    assert violations == {
+        "hwsd2_smu_id.required": 4,
+        "drainage.enum": 10,
+        "coverage.enum": sum(1 for i in range(n) if i % 7 > 3),
+        "topdep.type": 2,
+        "sand.minimum": 100,
+    }
+    assert report.rows == n and not report.unknown_columns
+
+    samples = next(r for r in report.results if r.rule_id == "sand.minimum").samples
+    assert [s["row"] for s in samples] == [0, 10, 20]
+    assert samples[1]["value"] == -9.0 and samples[1]["record"]["ID"] == 10
+    assert report.to_dict()["class_name"] == "SoilLayer"